@@ -0,0 +1,25 @@
+"""测试公共配置"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """每个测试使用独立的本地缓存目录（哈希缓存、上传日志等）"""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("OMEGA_CACHE_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def stand_in_server():
+    """本机替身服务器（tools/benchmark/stand_in_server.py）"""
+    from tools.benchmark.stand_in_server import StandInServer
+
+    with StandInServer() as server:
+        yield server
@@ -0,0 +1,46 @@
+"""本地内容寻址存储：默认不启用；取出的文件与存储互相独立"""
+
+import hashlib
+import os
+
+import tools.download.blob_store as blob_store
+from tools.download.blob_store import BlobStore
+
+
+def _store_file(tmp_path, store: BlobStore, content: bytes):
+    source = tmp_path / "downloaded.bin"
+    source.write_bytes(content)
+    sha256 = hashlib.sha256(content).hexdigest()
+    store.add(sha256, source)
+    return source, sha256
+
+
+def test_disabled_unless_configured(monkeypatch):
+    monkeypatch.setattr(blob_store, "get_config", lambda: {})
+    assert BlobStore.from_config() is None
+    monkeypatch.setattr(blob_store, "get_config", lambda: {"download": {"blob_store_max_mb": 0}})
+    assert BlobStore.from_config() is None
+    monkeypatch.setattr(blob_store, "get_config", lambda: {"download": {"blob_store_max_mb": 16}})
+    store = BlobStore.from_config()
+    assert store is not None and store.max_bytes == 16 * 1024 * 1024
+    store.close()
+
+
+def test_in_place_edit_does_not_affect_other_installs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    content = os.urandom(4096)
+    source, sha256 = _store_file(tmp_path, store, content)
+    first = tmp_path / "stable" / "app.bin"
+    second = tmp_path / "beta" / "app.bin"
+    assert store.materialize(sha256, len(content), first)
+
+    # 原地修改下载的文件和一个安装目录中的文件
+    for path in (source, first):
+        with open(path, "r+b") as f:
+            f.write(b"edited")
+
+    assert store.contains(sha256, len(content))
+    assert store.materialize(sha256, len(content), second)
+    assert second.read_bytes() == content
+    assert os.stat(first).st_ino != os.stat(second).st_ino
+    store.close()
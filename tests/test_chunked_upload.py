@@ -0,0 +1,128 @@
+"""分块上传：在本地替身服务器上验证完成、续传、分块哈希校验和不支持时的回退"""
+
+import hashlib
+import os
+
+import pytest
+
+import tools.common.chunked_upload as chunked_upload
+import tools.upload.incremental_uploader as incremental_uploader
+from tools.common.chunked_upload import ChunkedUploader, ChunkedUploadError
+
+KEY = ("stable", "windows", "x64")
+PART_SIZE = 64 * 1024
+PART_COUNT = 6
+INITIATE_REQUEST = "/api/v2/upload/chunked/initiate"
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(chunked_upload, "RETRY_DELAY", 0)
+
+
+@pytest.fixture
+def large_file(tmp_path):
+    # 最后一块不满
+    path = tmp_path / "large.bin"
+    path.write_bytes(os.urandom(PART_SIZE * (PART_COUNT - 1) + 1000))
+    return path
+
+
+def _sha256(path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _new_uploader(server) -> ChunkedUploader:
+    return ChunkedUploader(server.url, "", threshold=PART_SIZE, part_size=PART_SIZE, workers=2)
+
+
+def _upload(uploader: ChunkedUploader, path) -> bool:
+    return uploader.upload_file(path, path.name, *KEY, _sha256(path))
+
+
+def _part_requests(server) -> dict:
+    """各分块的上传请求数: 序号 -> 次数"""
+    return {int(path.rsplit("/", 1)[1]): count for path, count in server.request_counts.items()
+            if "/parts/" in path}
+
+
+def _stored(server, name: str) -> bytes:
+    return server.store.get(KEY)[name].content
+
+
+def test_upload_completes(stand_in_server, large_file):
+    uploader = _new_uploader(stand_in_server)
+    assert uploader.accepts(large_file.stat().st_size)
+    assert _upload(uploader, large_file)
+
+    assert _stored(stand_in_server, large_file.name) == large_file.read_bytes()
+    assert _part_requests(stand_in_server) == {n: 1 for n in range(PART_COUNT)}
+    # 完成后不保留会话
+    assert not stand_in_server.chunked_uploads
+    assert uploader.store.find((uploader.server_url, *KEY, large_file.name),
+                               large_file.stat().st_size, _sha256(large_file)) is None
+
+
+def test_interrupted_upload_resumes_from_acknowledged_parts(stand_in_server, large_file):
+    stand_in_server.reject_part = lambda part_number: part_number == 3
+    with pytest.raises(ChunkedUploadError):
+        _upload(_new_uploader(stand_in_server), large_file)
+    assert large_file.name not in (stand_in_server.store.get(KEY) or {})
+    before = _part_requests(stand_in_server)
+    assert before[3] == chunked_upload.PART_RETRIES
+
+    # 新的上传客户端（模拟重新启动）只上传服务器未确认的分块
+    stand_in_server.reject_part = None
+    assert _upload(_new_uploader(stand_in_server), large_file)
+    after = _part_requests(stand_in_server)
+    assert {n: after[n] - before[n] for n in after} == {n: int(n == 3) for n in range(PART_COUNT)}
+    assert stand_in_server.request_counts[INITIATE_REQUEST] == 1
+    assert _stored(stand_in_server, large_file.name) == large_file.read_bytes()
+
+
+class CorruptingSession:
+    """在传输中改动分块内容（X-Part-SHA256 头保持不变）"""
+
+    def __init__(self, session):
+        self.session = session
+        self.part_statuses = []
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def put(self, url, data=None, **kwargs):
+        body = bytearray(b"".join(iter(data.read, b"")))
+        body[0] ^= 0xFF
+        response = self.session.put(url, data=bytes(body), **kwargs)
+        self.part_statuses.append(response.status_code)
+        return response
+
+
+def test_part_with_mismatched_sha256_is_rejected(stand_in_server, large_file):
+    uploader = _new_uploader(stand_in_server)
+    uploader.session = CorruptingSession(uploader.session)
+    with pytest.raises(ChunkedUploadError):
+        _upload(uploader, large_file)
+
+    assert uploader.session.part_statuses and set(uploader.session.part_statuses) == {400}
+    upload, = stand_in_server.chunked_uploads.values()
+    assert not upload.parts
+    assert large_file.name not in (stand_in_server.store.get(KEY) or {})
+
+
+def test_falls_back_to_single_request_when_unsupported(stand_in_server, large_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental_uploader, "get_server_url", lambda: stand_in_server.url)
+    stand_in_server.chunked_supported = False
+    second = tmp_path / "second.bin"
+    second.write_bytes(os.urandom(PART_SIZE * 2))
+
+    uploader = incremental_uploader.IncrementalUploader()
+    uploader.chunked_uploader = _new_uploader(stand_in_server)
+    for path in (large_file, second):
+        assert uploader._upload_single_file(path, path.name, *KEY, "")
+        assert _stored(stand_in_server, path.name) == path.read_bytes()
+
+    # 第一次发起失败后不再尝试分块上传
+    assert not uploader.chunked_uploader.supported
+    assert stand_in_server.request_counts[INITIATE_REQUEST] == 1
+    assert not _part_requests(stand_in_server)
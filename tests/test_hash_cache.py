@@ -0,0 +1,93 @@
+"""哈希缓存与扫描：修改时间变化的文件必须重新计算完整哈希"""
+
+import hashlib
+import os
+import time
+
+import pytest
+
+from tools.common.file_fingerprint import hash_with_fingerprint, quick_fingerprint
+from tools.common.hash_cache import HashCache
+from tools.common.manifest_summary import RemoteManifestSummary
+from tools.common.parallel_scan import SCAN_MODES, scan_tree
+from tools.download.local_file_scanner import LocalFileScanner
+
+FILE_SIZE = 1024 * 1024
+
+
+def _touch(path, offset=5):
+    later = time.time() + offset
+    os.utime(path, (later, later))
+
+
+def _edit_byte(path, position):
+    """就地修改一个字节（大小不变）"""
+    data = bytearray(path.read_bytes())
+    data[position] ^= 0xFF
+    path.write_bytes(data)
+    _touch(path)
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    root.mkdir()
+    (root / "big.bin").write_bytes(os.urandom(FILE_SIZE))
+    (root / "small.txt").write_bytes(b"config")
+    return root
+
+
+def _scan_hashes(root, mode, remote_summary=None):
+    hash_cache = HashCache(str(root))
+    result = scan_tree(str(root), mode, 2, hash_cache, remote_summary)
+    hash_cache.save()
+    return {record[0]: (record[3], record[5]) for record in result.records}
+
+
+@pytest.mark.parametrize("size", [0, 100, 3 * 64 * 1024, 3 * 64 * 1024 + 1, FILE_SIZE + 7])
+def test_hash_with_fingerprint_matches_separate_reads(tmp_path, size):
+    path = tmp_path / "f.bin"
+    data = os.urandom(size)
+    path.write_bytes(data)
+    sha256, fingerprint = hash_with_fingerprint(path, size, chunk_size=50000)
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert fingerprint == quick_fingerprint(path, size)
+
+
+@pytest.mark.parametrize("mode", SCAN_MODES)
+def test_edit_outside_fingerprint_samples_is_rehashed(tree, mode):
+    _scan_hashes(tree, mode)
+    expected = _edit_byte(tree / "big.bin", 300000)
+
+    sha256, source = _scan_hashes(tree, mode)["big.bin"]
+    assert (sha256, source) == (expected, "hashed")
+    # 新的哈希写入缓存后按修改时间命中
+    assert _scan_hashes(tree, mode)["big.bin"] == (expected, "cached")
+
+
+def test_local_scanner_rehashes_after_touch(tree):
+    LocalFileScanner().scan_directory(str(tree))
+    expected = _edit_byte(tree / "big.bin", 300000)
+    assert LocalFileScanner().scan_directory(str(tree))["big.bin"].sha256_hash == expected
+
+
+@pytest.mark.parametrize("mode", SCAN_MODES)
+def test_changed_fingerprint_defers_hash_when_remote_has_cached_version(tree, mode):
+    # 远程仍是缓存中的版本，修改落在采样块内：指纹不同，肯定与远程不同，推迟哈希
+    original = hashlib.sha256((tree / "big.bin").read_bytes()).hexdigest()
+    _scan_hashes(tree, mode)
+    summary = RemoteManifestSummary.from_entries([("big.bin", FILE_SIZE, original)])
+    _edit_byte(tree / "big.bin", 0)
+    assert _scan_hashes(tree, mode, summary)["big.bin"] == ("", "deferred")
+    assert LocalFileScanner().scan_directory(str(tree), remote_summary=summary)["big.bin"].sha256_hash == ""
+
+
+@pytest.mark.parametrize("mode", SCAN_MODES)
+def test_unchanged_fingerprint_does_not_confirm_same(tree, mode):
+    # 修改落在采样块外：指纹一致不能说明未变化，仍计算完整哈希
+    original = hashlib.sha256((tree / "big.bin").read_bytes()).hexdigest()
+    _scan_hashes(tree, mode)
+    summary = RemoteManifestSummary.from_entries([("big.bin", FILE_SIZE, original)])
+    expected = _edit_byte(tree / "big.bin", 300000)
+    assert _scan_hashes(tree, mode, summary)["big.bin"] == (expected, "hashed")
@@ -0,0 +1,92 @@
+"""增量上传：扫描时推迟哈希的文件在同步云端清单时带有上传时计算的哈希；有文件上传失败时不同步删除"""
+
+import hashlib
+import os
+
+import pytest
+
+import tools.upload.incremental_uploader as incremental_uploader
+
+KEY = ("stable", "windows", "x64")
+
+
+class Interrupted(BaseException):
+    """模拟进程被终止（perform_incremental_upload 只捕获 Exception）"""
+
+
+@pytest.fixture
+def tree(tmp_path, stand_in_server, monkeypatch):
+    monkeypatch.setattr(incremental_uploader, "get_server_url", lambda: stand_in_server.url)
+    root = tmp_path / "tree"
+    root.mkdir()
+    for i in range(4):
+        content = os.urandom(1000 + i)
+        (root / f"f{i}.bin").write_bytes(content)
+        # 远程版本大小不同，扫描时推迟哈希
+        stand_in_server.add_file("stable", f"f{i}.bin", content[:500])
+    stand_in_server.add_file("stable", "removed.bin", b"only on the server")
+    return root
+
+
+def _capture_sync(uploader):
+    """记录同步时发送的本地清单"""
+    sync = uploader._sync_remote_files
+    payloads = []
+
+    def capturing(version_type, platform, architecture, local_files):
+        payloads.append({info.relative_path: info.sha256_hash for info in local_files})
+        return sync(version_type, platform, architecture, local_files)
+
+    uploader._sync_remote_files = capturing
+    return payloads
+
+
+def _local_hashes(root) -> dict:
+    return {path.name: hashlib.sha256(path.read_bytes()).hexdigest() for path in root.iterdir()}
+
+
+@pytest.mark.parametrize("pipelined", [False, True], ids=["batch", "pipelined"])
+def test_sync_payload_carries_hashes_of_deferred_files(stand_in_server, tree, pipelined):
+    uploader = incremental_uploader.IncrementalUploader(pipelined=pipelined)
+    payloads = _capture_sync(uploader)
+    assert uploader.perform_incremental_upload(str(tree), "stable")
+
+    assert uploader.local_scanner.last_scan_stats["deferred"] == 4
+    assert payloads == [_local_hashes(tree)]
+    assert set(stand_in_server.store.get(KEY)) == set(_local_hashes(tree))
+
+
+def test_resumed_sync_payload_carries_hashes_from_journal(stand_in_server, tree):
+    uploader = incremental_uploader.IncrementalUploader()
+    upload = uploader._upload_single_file
+    calls = []
+
+    def interrupting(*args, **kwargs):
+        calls.append(args[1])
+        if len(calls) > 2:
+            raise Interrupted()
+        return upload(*args, **kwargs)
+
+    uploader._upload_single_file = interrupting
+    with pytest.raises(Interrupted):
+        uploader.perform_incremental_upload(str(tree), "stable")
+
+    # 已上传的文件按日志视为相同，哈希来自日志
+    resumed = incremental_uploader.IncrementalUploader()
+    payloads = _capture_sync(resumed)
+    assert resumed.perform_incremental_upload(str(tree), "stable")
+    assert payloads == [_local_hashes(tree)]
+
+
+@pytest.mark.parametrize("journal", [False, True], ids=["no-journal", "journal"])
+@pytest.mark.parametrize("pipelined", [False, True], ids=["batch", "pipelined"])
+def test_failed_upload_skips_sync_and_reports_failure(stand_in_server, tree, pipelined, journal):
+    uploader = incremental_uploader.IncrementalUploader(pipelined=pipelined, journal=journal)
+    upload = uploader._upload_single_file
+    uploader._upload_single_file = lambda path, *args, **kwargs: (
+        path.name != "f1.bin" and upload(path, *args, **kwargs))
+    payloads = _capture_sync(uploader)
+
+    assert not uploader.perform_incremental_upload(str(tree), "stable")
+    assert payloads == []
+    assert "removed.bin" in stand_in_server.store.get(KEY)
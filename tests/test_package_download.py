@@ -0,0 +1,75 @@
+"""安装包下载：边下载边解压的文件在安装包校验通过后才移入安装目录"""
+
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from tools.common.transfer_control import TransferControl
+from tools.download.download_tool import SimplifiedDownloadTool
+from tools.download.package_extract import STAGING_SUFFIX
+
+FILES = {"app.bin": os.urandom(200 * 1024), "sub/data.bin": os.urandom(50 * 1024)}
+PREVIOUS = {"app.bin": b"previous version"}
+
+
+class ImmediateUI:
+    """在当前线程执行界面更新"""
+
+    def set_var(self, var, value):
+        pass
+
+    def configure(self, widget, **options):
+        pass
+
+    def post(self, callback):
+        callback()
+
+
+def _tree(root) -> dict:
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in root.rglob("*") if path.is_file()}
+
+
+def _run_worker(server, tmp_path, file_hash: str) -> SimpleNamespace:
+    """以最小的界面替身运行下载工作线程的逻辑"""
+    install = tmp_path / "install"
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    tool = SimpleNamespace(
+        server_url=server.url, ui=ImmediateUI(), progress_var=None, progress_bar=None,
+        download_control=TransferControl(), failures=[], extracted=[],
+        _fetch_expected_hashes=lambda *args: {},
+    )
+    tool._download_failed = tool.failures.append
+    tool._extract_success = lambda path, result: tool.extracted.append(result)
+    SimplifiedDownloadTool._download_worker(tool, "stable", "windows", "x64", str(downloads),
+                                            {"file_hash": file_hash}, str(install))
+    tool.install = install
+    return tool
+
+
+@pytest.fixture
+def server(stand_in_server, tmp_path):
+    for path, content in FILES.items():
+        stand_in_server.add_file("stable", path, content)
+    install = tmp_path / "install"
+    install.mkdir()
+    for path, content in PREVIOUS.items():
+        (install / path).write_bytes(content)
+    return stand_in_server
+
+
+def test_extracted_files_installed_after_verification(server, tmp_path):
+    tool = _run_worker(server, tmp_path, server.package(("stable", "windows", "x64"))[1])
+    assert not tool.failures and len(tool.extracted) == 1
+    assert _tree(tool.install) == FILES
+    assert not (tmp_path / ("install" + STAGING_SUFFIX)).exists()
+
+
+def test_install_untouched_when_package_hash_mismatches(server, tmp_path):
+    tool = _run_worker(server, tmp_path, hashlib.sha256(b"another package").hexdigest())
+    assert len(tool.failures) == 1 and not tool.extracted
+    assert _tree(tool.install) == PREVIOUS
+    assert not (tmp_path / ("install" + STAGING_SUFFIX)).exists()
@@ -0,0 +1,145 @@
+"""安装包解压：流式ZIP解析（stored、deflate、数据描述符、ZIP64）、路径校验、跳过未变化的文件、哈希校验和暂存"""
+
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+
+from tools.download.package_extract import ExtractError, PackageExtractor, StreamingNotSupported
+
+FILES = {
+    "a.txt": b"hello " * 1000,
+    "bin/app.exe": os.urandom(100 * 1024),
+    "empty.txt": b"",
+}
+
+
+class Unseekable(io.RawIOBase):
+    """只能顺序写入的输出，zipfile 写入时改用数据描述符"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def _zip(files=FILES, compression=zipfile.ZIP_DEFLATED, seekable=True, zip64=False) -> bytes:
+    output = io.BytesIO() if seekable else Unseekable()
+    with zipfile.ZipFile(output, "w", compression) as archive:
+        for name, content in files.items():
+            info = zipfile.ZipInfo(name)
+            info.compress_type = compression
+            with archive.open(info, "w", force_zip64=zip64) as entry:
+                entry.write(content)
+    return (output if seekable else output.buffer).getvalue()
+
+
+def _hashes(files=FILES) -> dict:
+    return {name: hashlib.sha256(content).hexdigest() for name, content in files.items()}
+
+
+def _tree(root) -> dict:
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in root.rglob("*") if path.is_file()}
+
+
+def _first_header(data: bytes):
+    """第一个本地文件头的 (是否带数据描述符, 压缩方式)"""
+    return bool(int.from_bytes(data[6:8], "little") & 0x8), int.from_bytes(data[8:10], "little")
+
+
+@pytest.mark.parametrize("options", [
+    {"compression": zipfile.ZIP_STORED},
+    {"compression": zipfile.ZIP_DEFLATED},
+    {"compression": zipfile.ZIP_DEFLATED, "seekable": False},
+    {"compression": zipfile.ZIP_STORED, "zip64": True},
+    {"compression": zipfile.ZIP_DEFLATED, "seekable": False, "zip64": True},
+], ids=["stored", "deflated", "data-descriptor", "zip64", "zip64-data-descriptor"])
+def test_extract_stream(tmp_path, options):
+    data = _zip(**options)
+    assert _first_header(data) == (not options.get("seekable", True), options["compression"])
+
+    result = PackageExtractor(str(tmp_path / "install"), _hashes()).extract_stream(io.BytesIO(data))
+    assert _tree(tmp_path / "install") == FILES
+    assert result.files_written == len(FILES)
+
+
+def test_stored_entry_with_data_descriptor_needs_file_extraction(tmp_path):
+    data = _zip(compression=zipfile.ZIP_STORED, seekable=False)
+    extractor = PackageExtractor(str(tmp_path / "install"), _hashes())
+    with pytest.raises(StreamingNotSupported):
+        extractor.extract_stream(io.BytesIO(data))
+
+    package = tmp_path / "package.zip"
+    package.write_bytes(data)
+    extractor.extract_file(package)
+    assert _tree(tmp_path / "install") == FILES
+
+
+@pytest.mark.parametrize("name", ["../evil.txt", "bin/../../evil.txt", "/etc/evil.txt", "C:/evil.txt"])
+def test_unsafe_paths_rejected(tmp_path, name):
+    data = _zip({name: b"EVIL"})
+    install = tmp_path / "deep" / "install"
+    with pytest.raises(ExtractError):
+        PackageExtractor(str(install)).extract_stream(io.BytesIO(data))
+    assert not [path for path in tmp_path.rglob("evil.txt")]
+
+
+@pytest.mark.parametrize("expected_hashes", [_hashes(), None], ids=["hash-cache", "compare"])
+def test_unchanged_files_skipped(tmp_path, expected_hashes):
+    data = _zip()
+    install = tmp_path / "install"
+    PackageExtractor(str(install), expected_hashes).extract_stream(io.BytesIO(data))
+    mtimes = {path: path.stat().st_mtime_ns for path in install.rglob("*") if path.is_file()}
+
+    result = PackageExtractor(str(install), expected_hashes).extract_stream(io.BytesIO(data))
+    assert (result.files_written, result.files_unchanged) == (0, len(FILES))
+    assert {path: path.stat().st_mtime_ns for path in mtimes} == mtimes
+
+
+@pytest.mark.parametrize("streaming", [True, False], ids=["stream", "file"])
+def test_entry_not_matching_manifest_hash_is_not_written(tmp_path, streaming):
+    install = tmp_path / "install"
+    install.mkdir()
+    (install / "a.txt").write_bytes(b"previous version")
+    data = _zip({"a.txt": b"EVIL" * 100})
+    extractor = PackageExtractor(str(install), {"a.txt": hashlib.sha256(b"expected").hexdigest()})
+
+    with pytest.raises(ExtractError):
+        if streaming:
+            extractor.extract_stream(io.BytesIO(data))
+        else:
+            package = tmp_path / "package.zip"
+            package.write_bytes(data)
+            extractor.extract_file(package)
+    assert _tree(install) == {"a.txt": b"previous version"}
+    assert extractor.result.files_written == 0
+
+
+def test_staged_entries_installed_only_on_commit(tmp_path):
+    install = tmp_path / "install"
+    install.mkdir()
+    (install / "a.txt").write_bytes(b"previous version")
+    data = _zip()
+
+    extractor = PackageExtractor(str(install), _hashes(), staged=True)
+    extractor.extract_stream(io.BytesIO(data))
+    assert _tree(install) == {"a.txt": b"previous version"}
+    assert extractor.staging.exists()
+    extractor.discard_staged()
+    assert not extractor.staging.exists()
+
+    extractor = PackageExtractor(str(install), _hashes(), staged=True)
+    extractor.extract_stream(io.BytesIO(data))
+    extractor.commit_staged()
+    assert _tree(install) == FILES
+    assert not extractor.staging.exists()
+    # 移入后写入哈希缓存，再次解压全部跳过
+    result = PackageExtractor(str(install), _hashes()).extract_stream(io.BytesIO(data))
+    assert (result.files_written, result.files_unchanged) == (0, len(FILES))
@@ -0,0 +1,103 @@
+"""限速：在本地替身服务器上测量实际吞吐量并与限速值比较"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from tools.benchmark.rate_limit_benchmark import download, upload
+from tools.common.rate_limiter import RateLimiter
+
+pytestmark = pytest.mark.integration
+
+LIMIT = 512 * 1024  # 字节/秒
+SIZE = 512 * 1024   # 按限速约传输 1 秒
+TOLERANCE = 0.15
+
+
+def assert_rate(transferred: int, elapsed: float, expected: float):
+    achieved = transferred / elapsed
+    assert abs(achieved / expected - 1) <= TOLERANCE, \
+        f"实际 {achieved / 1024:.1f} KB/s，期望 {expected / 1024:.1f} KB/s"
+
+
+@pytest.fixture
+def content():
+    return os.urandom(SIZE)
+
+
+def test_single_upload_respects_per_transfer_limit(stand_in_server, content):
+    limiter = RateLimiter(per_transfer_limit=LIMIT)
+    assert_rate(SIZE, upload(stand_in_server, "single.bin", content, limiter.open_transfer()), LIMIT)
+
+
+def test_single_download_respects_per_transfer_limit(stand_in_server, content):
+    stand_in_server.add_file("bench", "single.bin", content)
+    limiter = RateLimiter(per_transfer_limit=LIMIT)
+    elapsed, received = download(stand_in_server, "single.bin", limiter.open_transfer())
+    assert received == SIZE
+    assert_rate(received, elapsed, LIMIT)
+
+
+def test_concurrent_uploads_share_global_limit(stand_in_server, content):
+    limiter = RateLimiter(global_limit=LIMIT)
+    parts = [content[i::3] for i in range(3)]
+    elapsed = [0.0] * len(parts)
+
+    def worker(index: int):
+        elapsed[index] = upload(stand_in_server, f"concurrent_{index}.bin", parts[index], limiter.open_transfer())
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(parts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 合计吞吐量等于全局限速，各传输平分
+    assert_rate(SIZE, time.perf_counter() - started, LIMIT)
+    for part, seconds in zip(parts, elapsed):
+        assert_rate(len(part), seconds, LIMIT / len(parts))
+
+
+class CountingThrottle:
+    """记录已通过限速的字节数"""
+
+    def __init__(self, transfer):
+        self.transfer = transfer
+        self.transferred = 0
+
+    def throttle(self, amount: int, control=None) -> bool:
+        self.transferred += amount
+        return self.transfer.throttle(amount, control)
+
+
+@pytest.mark.parametrize("change, new_limit", [
+    ({"per_transfer_limit": LIMIT * 2}, LIMIT * 2),
+    ({"global_limit": LIMIT / 2}, LIMIT / 2),
+], ids=["per-transfer-raised", "global-lowered"])
+def test_set_limits_mid_transfer(stand_in_server, change, new_limit):
+    # 调整前后各约 1 秒，分别按调整时已通过的字节数计算两段吞吐量
+    size = int(LIMIT + new_limit)
+    stand_in_server.add_file("bench", "large.bin", os.urandom(size))
+    limiter = RateLimiter(per_transfer_limit=LIMIT)
+    throttle = CountingThrottle(limiter.open_transfer())
+    switched = {}
+
+    def switch():
+        switched.update(time=time.perf_counter(), transferred=throttle.transferred)
+        limiter.set_limits(**change)
+
+    timer = threading.Timer(1.0, switch)
+    started = time.perf_counter()
+    timer.start()
+    try:
+        _, received = download(stand_in_server, "large.bin", throttle)
+    finally:
+        timer.cancel()
+    ended = time.perf_counter()
+
+    assert received == size
+    assert_rate(switched["transferred"], switched["time"] - started, LIMIT)
+    assert_rate(received - switched["transferred"], ended - switched["time"], new_limit)
@@ -0,0 +1,83 @@
+"""流式更新：download_tool --update 在本地替身服务器上更新安装目录并删除多余文件；普通下载不删除"""
+
+import hashlib
+import os
+
+import pytest
+
+import tools.download.download_handler as download_handler
+from tools.common.difference_detector import ChangeType, FileChange, UpdatePlan
+from tools.download.download_manager import DownloadManager
+from tools.download.download_tool import run_streaming_update
+
+REMOTE = {
+    "same.bin": os.urandom(3000),
+    "changed.bin": os.urandom(2000),
+    "resized.bin": os.urandom(1500),
+    "new.bin": os.urandom(1000),
+    "sub/new.bin": os.urandom(500),
+}
+
+
+@pytest.fixture
+def install_dir(tmp_path, stand_in_server, monkeypatch):
+    monkeypatch.setattr(download_handler, "get_server_url", lambda: stand_in_server.url)
+    for path, content in REMOTE.items():
+        stand_in_server.add_file("stable", path, content)
+
+    root = tmp_path / "install"
+    local = {
+        "same.bin": REMOTE["same.bin"],
+        "changed.bin": os.urandom(2000),
+        "resized.bin": os.urandom(100),
+        "extra.bin": b"only in the old version",
+        "sub/extra.bin": b"only in the old version",
+    }
+    for path, content in local.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_bytes(content)
+    return root
+
+
+def _tree(root) -> dict:
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in root.rglob("*") if path.is_file()}
+
+
+def test_update_downloads_changes_and_deletes_extra_files(install_dir, stand_in_server):
+    assert run_streaming_update(str(install_dir), "stable", "windows", "x64")
+    assert _tree(install_dir) == REMOTE
+    # 内容相同的文件不下载
+    assert stand_in_server.request_counts["/api/v1/download/file"] == len(REMOTE) - 1
+
+
+def test_extra_files_kept_when_a_download_fails(install_dir, stand_in_server):
+    # 清单中有但服务器无法提供内容的文件
+    stand_in_server.add_manifest_entry("stable", "missing.bin", 10, hashlib.sha256(b"0123456789").hexdigest())
+    assert not run_streaming_update(str(install_dir), "stable", "windows", "x64")
+    assert (install_dir / "extra.bin").exists()
+    assert (install_dir / "sub" / "extra.bin").exists()
+
+
+def _plan() -> UpdatePlan:
+    """下载 new.bin，计划中 extra.bin 为本地多余文件"""
+    content = REMOTE["new.bin"]
+    download = FileChange("new.bin", ChangeType.NEW, len(content), hashlib.sha256(content).hexdigest())
+    extra = FileChange("extra.bin", ChangeType.DELETED, 0, "")
+    return UpdatePlan("stable", "windows", "x64", [download], [extra], [], len(content), 1)
+
+
+@pytest.mark.parametrize("staged", [False, True], ids=["direct", "staged"])
+@pytest.mark.parametrize("kwargs, deleted", [
+    ({}, False),
+    ({"delete_extra": True, "selected_files": ["new.bin"]}, False),
+    ({"delete_extra": True}, True),
+], ids=["default", "selected-files", "delete-extra"])
+def test_download_deletes_extra_files_only_when_requested(install_dir, stand_in_server, staged, kwargs, deleted):
+    manager = DownloadManager(stand_in_server.url, "", staged=staged)
+    assert manager.start_download(_plan(), str(install_dir), **kwargs)
+    manager.wait()
+
+    assert manager.files_failed == 0 and manager.install_error is None
+    assert (install_dir / "new.bin").read_bytes() == REMOTE["new.bin"]
+    assert (install_dir / "extra.bin").exists() != deleted
@@ -0,0 +1,137 @@
+"""上传日志：中断后继续前核对本地目录树，目录树变化时不使用过时的计划"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import tools.upload.incremental_uploader as incremental_uploader
+from tools.upload.auto_upload import AutoUploader
+
+KEY = ("stable", "windows", "x64")
+LIST_REQUEST = "/api/v2/files/simple/stable"
+
+
+class Interrupted(BaseException):
+    """模拟进程被终止（perform_incremental_upload 只捕获 Exception）"""
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    root.mkdir()
+    for i in range(10):
+        (root / f"f{i:02d}.bin").write_bytes(os.urandom(1000 + i))
+    return root
+
+
+@pytest.fixture
+def new_uploader(stand_in_server, monkeypatch):
+    monkeypatch.setattr(incremental_uploader, "get_server_url", lambda: stand_in_server.url)
+    return incremental_uploader.IncrementalUploader
+
+
+def _interrupted_upload(uploader, root, after: int):
+    """上传 after 个文件后中断"""
+    upload = uploader._upload_single_file
+    calls = []
+
+    def interrupting(*args, **kwargs):
+        calls.append(args[1])
+        if len(calls) > after:
+            raise Interrupted()
+        return upload(*args, **kwargs)
+
+    uploader._upload_single_file = interrupting
+    with pytest.raises(Interrupted):
+        uploader.perform_incremental_upload(str(root), "stable")
+    return calls[:after]
+
+
+def _remote_matches(server, root) -> bool:
+    remote = server.store.get(KEY)
+    local = {path.name: path.read_bytes() for path in root.iterdir()}
+    return set(remote) == set(local) and all(remote[name].content == data for name, data in local.items())
+
+
+def _rewrite_same_size(path):
+    path.write_bytes(os.urandom(path.stat().st_size))
+    later = time.time() + 5
+    os.utime(path, (later, later))
+
+
+def test_resume_uses_journal_when_tree_unchanged(stand_in_server, new_uploader, tree):
+    stand_in_server.add_file("stable", "old.bin", b"remote only")
+    _interrupted_upload(new_uploader(), tree, after=4)
+    lists_before = stand_in_server.request_counts.get(LIST_REQUEST, 0)
+
+    assert new_uploader().perform_incremental_upload(str(tree), "stable")
+    # 按日志继续，不重新获取远程清单
+    assert stand_in_server.request_counts.get(LIST_REQUEST, 0) == lists_before
+    assert _remote_matches(stand_in_server, tree)
+
+
+def test_resume_discards_journal_when_file_added(stand_in_server, new_uploader, tree):
+    stand_in_server.add_file("stable", "old.bin", b"remote only")
+    _interrupted_upload(new_uploader(), tree, after=4)
+    (tree / "added.bin").write_bytes(b"added after the interrupted run")
+
+    assert new_uploader().perform_incremental_upload(str(tree), "stable")
+    assert _remote_matches(stand_in_server, tree)
+
+
+def test_resume_discards_journal_when_committed_file_modified(stand_in_server, new_uploader, tree):
+    uploaded = _interrupted_upload(new_uploader(), tree, after=4)
+    _rewrite_same_size(tree / uploaded[0])
+
+    assert new_uploader().perform_incremental_upload(str(tree), "stable")
+    assert _remote_matches(stand_in_server, tree)
+
+
+def test_resume_discards_journal_when_file_removed(stand_in_server, new_uploader, tree):
+    _interrupted_upload(new_uploader(), tree, after=4)
+    (tree / "f09.bin").unlink()
+
+    assert new_uploader().perform_incremental_upload(str(tree), "stable")
+    assert _remote_matches(stand_in_server, tree)
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    folders = []
+    for name in ("a", "b"):
+        folder = tmp_path / name
+        folder.mkdir()
+        (folder / "app.bin").write_bytes(os.urandom(100))
+        folders.append({"path": str(folder), "version": f"1.0.{name}"})
+    (tmp_path / "upload_config.json").write_text(json.dumps({"server": {"url": "http://127.0.0.1:1"}}))
+    return {"folders": folders}
+
+
+def _run_batch(batch_config, fail=()):
+    """运行批量上传，记录上传了哪些文件夹"""
+    uploader = AutoUploader("upload_config.json")
+    uploaded = []
+
+    def upload_folder(folder_path, **kwargs):
+        uploaded.append(folder_path)
+        return folder_path not in fail
+
+    uploader.upload_folder = upload_folder
+    return uploader.upload_batch(batch_config), uploaded
+
+
+def test_batch_resume_skips_unchanged_folder(batch):
+    first, second = (folder["path"] for folder in batch["folders"])
+    assert _run_batch(batch, fail={second}) == (False, [first, second])
+    assert _run_batch(batch) == (True, [second])
+
+
+def test_batch_resume_reuploads_changed_folder(batch):
+    first, second = (folder["path"] for folder in batch["folders"])
+    assert _run_batch(batch, fail={second}) == (False, [first, second])
+    _rewrite_same_size(Path(first) / "app.bin")
+    assert _run_batch(batch) == (True, [first, second])
@@ -0,0 +1,3 @@
+"""
+基准测试与本地替身服务器模块
+"""
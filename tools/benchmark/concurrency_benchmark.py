@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+自适应并发模拟
+用模拟链路（往返延迟 + 共享带宽 + 过载时的错误率）驱动 AdaptiveConcurrency，
+比较固定并发和自适应并发的吞吐量，并输出控制器选择的并发数变化。
+
+用法:
+    python tools/benchmark/concurrency_benchmark.py --requests 200
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.adaptive_concurrency import AdaptiveConcurrency
+
+# 链路: (往返延迟秒, 带宽 bytes/sec, 服务器可同时处理的请求数，超过后按比例报错)
+LINKS: Dict[str, tuple] = {
+    "局域网": (0.002, 100 * 1024 * 1024, 64),
+    "远程构建机": (0.080, 4 * 1024 * 1024, 64),
+    "过载服务器": (0.020, 20 * 1024 * 1024, 3),
+}
+
+
+class SimulatedLink:
+    """共享带宽的模拟链路"""
+
+    def __init__(self, rtt: float, bandwidth: float, capacity: int, seed: int = 1):
+        self.rtt = rtt
+        self.bandwidth = bandwidth
+        self.capacity = capacity
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def request(self, size: int) -> bool:
+        with self._lock:
+            self.in_flight += 1
+            concurrent = self.in_flight
+            overloaded = concurrent > self.capacity and self._random.random() < 1 - self.capacity / concurrent
+        try:
+            # 带宽由同时进行的请求平分
+            time.sleep(self.rtt + size * concurrent / self.bandwidth)
+            return not overloaded
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def run_link(link: SimulatedLink, request_count: int, size: int, workers: int,
+             concurrency: Optional[AdaptiveConcurrency]) -> float:
+    """返回有效吞吐量（成功请求的 bytes/sec）"""
+    remaining = [request_count]
+    succeeded = [0]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            if concurrency is not None:
+                concurrency.acquire()
+            started = time.monotonic()
+            ok = link.request(size)
+            if concurrency is not None:
+                concurrency.release(time.monotonic() - started, size, ok)
+            if ok:
+                with lock:
+                    succeeded[0] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return succeeded[0] * size / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自适应并发模拟")
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--size-kb", type=int, default=128, help="每个请求的大小（KB）")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="自适应并发上限")
+    args = parser.parse_args()
+    size = args.size_kb * 1024
+
+    print(f"{'链路':<10}{'固定1(MB/s)':>12}{'固定上限(MB/s)':>16}{'自适应(MB/s)':>14}  并发数变化")
+    for name, params in LINKS.items():
+        fixed_one = run_link(SimulatedLink(*params), args.requests, size, 1, None)
+        fixed_max = run_link(SimulatedLink(*params), args.requests, size, args.max_concurrency, None)
+        concurrency = AdaptiveConcurrency(1, args.max_concurrency)
+        adaptive = run_link(SimulatedLink(*params), args.requests, size, args.max_concurrency, concurrency)
+        stats = concurrency.stats()
+        history = " -> ".join(str(limit) for _, limit in stats.history[-12:])
+        print(f"{name:<10}{fixed_one / 1048576:>12.1f}{fixed_max / 1048576:>16.1f}{adaptive / 1048576:>14.1f}"
+              f"  {history}（提高{stats.increases}次/降低{stats.decreases}次）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+扫描哈希基准测试
+在临时目录中生成接近真实发布包的文件树（大量小文件 + 少量大文件），
+比较纯SHA256扫描与使用修改时间缓存时各场景的耗时，并检查就地修改（大小不变）的文件都被重新哈希。
+最后一个场景提供远程清单摘要：在指纹采样块内修改的文件由指纹判定已变化，推迟哈希；
+在采样块外修改的文件指纹不变，仍计算完整哈希。报告推迟哈希的文件数和节省的时间。
+
+用法:
+    python tools/benchmark/hash_benchmark.py --scale 1.0
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.file_fingerprint import FINGERPRINT_BACKEND, FINGERPRINT_BLOCK_SIZE
+from tools.common.manifest_summary import RemoteManifestSummary
+from tools.download.local_file_scanner import LocalFileScanner
+
+# (文件数, 最小大小, 最大大小)：配置与脚本 / 资源 / 动态库 / 数据包
+TREE_PROFILE: List[Tuple[int, int, int]] = [
+    (2000, 512, 16 * 1024),
+    (400, 64 * 1024, 1024 * 1024),
+    (40, 2 * 1024 * 1024, 8 * 1024 * 1024),
+    (4, 32 * 1024 * 1024, 64 * 1024 * 1024),
+]
+
+
+def build_tree(root: Path, scale: float, seed: int = 1) -> Tuple[List[Path], int]:
+    """生成测试文件树，返回 (文件列表, 总字节数)"""
+    rng = random.Random(seed)
+    files: List[Path] = []
+    total = 0
+    for count, min_size, max_size in TREE_PROFILE:
+        for _ in range(max(1, int(count * scale))):
+            size = rng.randint(min_size, max_size)
+            path = root / f"d{rng.randint(0, 31):02d}" / f"f{len(files):05d}.bin"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(os.urandom(size))
+            files.append(path)
+            total += size
+    return files, total
+
+
+def touch_all(files: List[Path]):
+    """只更新修改时间（模拟 git checkout / 复制 / 解压后的目录）"""
+    now = time.time()
+    for path in files:
+        os.utime(path, (now + 10, now + 10))
+
+
+def modify_some(files: List[Path], ratio: float, seed: int = 2,
+                offset: Callable[[int], int] = lambda size: size // 3) -> List[Path]:
+    """
+    就地修改部分文件的一个字节（大小不变），返回修改的文件
+
+    默认修改三分之一处（大文件上位于指纹采样块之外）；offset 接收文件大小，返回修改位置
+    """
+    rng = random.Random(seed)
+    chosen = rng.sample(files, max(1, int(len(files) * ratio)))
+    for path in chosen:
+        with open(path, "r+b") as f:
+            f.seek(offset(path.stat().st_size))
+            byte = f.read(1)
+            f.seek(-len(byte), os.SEEK_CUR)
+            f.write(bytes([(byte[0] + 1) % 256]) if byte else b"\x00")
+    return chosen
+
+
+def timed(func: Callable[[], Dict]) -> Tuple[float, Dict]:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run(scale: float):
+    work_dir = Path(tempfile.mkdtemp(prefix="omega_hash_bench_"))
+    tree = work_dir / "tree"
+    os.environ["OMEGA_CACHE_DIR"] = str(work_dir / "cache")
+    try:
+        files, total = build_tree(tree, scale)
+        print(f"文件树: {len(files)} 个文件, {total / 1024 / 1024:.1f} MB, 指纹算法 {FINGERPRINT_BACKEND}")
+
+        def scan_plain():
+            return LocalFileScanner(use_hash_cache=False).scan_directory(str(tree))
+
+        def scan_tiered(remote_summary=None):
+            return LocalFileScanner(use_hash_cache=True).scan_directory(str(tree), remote_summary=remote_summary)
+
+        rows = []
+        baseline, reference = timed(scan_plain)
+        rows.append(("纯SHA256", baseline))
+
+        cold, _ = timed(scan_tiered)
+        rows.append(("首次扫描（建立缓存）", cold))
+
+        warm, result = timed(scan_tiered)
+        assert all(result[p].sha256_hash == reference[p].sha256_hash for p in reference)
+        rows.append(("未变化（修改时间命中）", warm))
+
+        touch_all(files)
+        touched, result = timed(scan_tiered)
+        assert all(result[p].sha256_hash == reference[p].sha256_hash for p in reference)
+        rows.append(("全部touch（重新哈希）", touched))
+
+        modified = modify_some(files, 0.05)
+        touch_all(files)
+        changed, result = timed(scan_tiered)
+        _, reference = timed(scan_plain)
+        assert all(result[p].sha256_hash == reference[p].sha256_hash for p in reference)
+        rows.append((f"touch + 修改{len(modified)}个文件", changed))
+
+        # 远程清单为当前内容（缓存与之一致）；一部分文件在采样块内修改，一部分大文件在采样块外修改
+        summary = RemoteManifestSummary.from_entries(
+            (p, info.file_size, info.sha256_hash) for p, info in reference.items())
+        inside = modify_some(files, 0.05, seed=3, offset=lambda size: 0)
+        large = [path for path in files if path not in inside and path.stat().st_size > FINGERPRINT_BLOCK_SIZE * 3]
+        outside = modify_some(large, 0.05, seed=4) if large else []
+        _, expected = timed(scan_plain)
+
+        touch_all(files)
+        with_summary, result = timed(lambda: scan_tiered(summary))
+        deferred = {p for p, info in result.items() if not info.sha256_hash}
+        assert deferred == {path.relative_to(tree).as_posix() for path in inside}
+        assert all(result[p].sha256_hash == expected[p].sha256_hash for p in expected if p not in deferred)
+        touch_all(files)
+        without_summary, result = timed(scan_tiered)
+        assert all(result[p].sha256_hash == expected[p].sha256_hash for p in expected)
+        rows.append((f"无远程摘要（块内{len(inside)}/块外{len(outside)}）", without_summary))
+        rows.append(("远程摘要 + 指纹预检", with_summary))
+
+        print(f"\n{'场景':<24}{'耗时(秒)':>10}{'相对纯SHA256':>16}")
+        for name, seconds in rows:
+            print(f"{name:<24}{seconds:>10.3f}{baseline / seconds if seconds else 0:>15.1f}x")
+        print(f"\n指纹预检推迟哈希 {len(deferred)} 个文件（采样块外修改的 {len(outside)} 个仍计算完整哈希），"
+              f"节省 {without_summary - with_summary:.3f} 秒")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="扫描哈希基准测试")
+    parser.add_argument("--scale", type=float, default=1.0, help="文件树规模系数")
+    args = parser.parse_args()
+    run(args.scale)
+
+
+if __name__ == "__main__":
+    main()
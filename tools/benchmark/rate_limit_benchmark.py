@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+限速验证
+在本地替身服务器上传和下载，测量实际吞吐量并与限速值比较:
+    1. 单传输限速的上传
+    2. 全局限速下多个并发上传（总吞吐量和各传输的公平性）
+    3. 单传输限速的下载
+    4. 传输过程中调整限速
+
+偏差超过容差时以非零状态退出。
+
+用法:
+    python tools/benchmark/rate_limit_benchmark.py --limit-kbps 1024 --size-mb 2
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.benchmark.stand_in_server import StandInServer
+from tools.common.rate_limiter import MultipartBody, RateLimiter, TransferThrottle
+
+READ_SIZE = 64 * 1024
+
+
+def upload(server: StandInServer, relative_path: str, content: bytes, throttle: TransferThrottle) -> float:
+    """按客户端的方式以流式 multipart 上传，返回耗时"""
+    fields = {
+        "version_type": "bench", "platform": "windows", "architecture": "x64",
+        "relative_path": relative_path, "file_hash": hashlib.sha256(content).hexdigest()
+    }
+    body = MultipartBody(fields, "file", relative_path, io.BytesIO(content), len(content), throttle)
+    request = urllib.request.Request(
+        f"{server.url}/api/v2/upload/simple/file", data=body, method="POST",
+        headers={"Content-Type": body.content_type, "Content-Length": str(len(body))}
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def download(server: StandInServer, relative_path: str, throttle: TransferThrottle) -> Tuple[float, int]:
+    """按客户端的方式逐块下载并限速，返回 (耗时, 字节数)"""
+    url = (f"{server.url}/api/v1/download/file?version=bench&platform=windows&arch=x64"
+           f"&relative_path={relative_path}")
+    received = 0
+    start = time.perf_counter()
+    with urllib.request.urlopen(url) as response:
+        while True:
+            chunk = response.read(READ_SIZE)
+            if not chunk:
+                break
+            throttle.throttle(len(chunk))
+            received += len(chunk)
+    return time.perf_counter() - start, received
+
+
+def run(limit_kbps: float, size_mb: float, tolerance: float) -> bool:
+    limit = limit_kbps * 1024
+    size = int(size_mb * 1024 * 1024)
+    content = os.urandom(size)
+    rows: List[Tuple[str, float, float]] = []
+
+    with StandInServer() as server:
+        # 1. 单传输限速上传
+        limiter = RateLimiter(per_transfer_limit=limit)
+        elapsed = upload(server, "single.bin", content, limiter.open_transfer())
+        rows.append(("单传输上传", size / elapsed, limit))
+
+        # 2. 全局限速下三个并发上传，每个传输应各得约三分之一
+        limiter = RateLimiter(global_limit=limit)
+        parts = [content[i::3] for i in range(3)]
+        elapsed_each = [0.0] * 3
+        start = time.perf_counter()
+
+        def worker(index: int):
+            elapsed_each[index] = upload(server, f"concurrent_{index}.bin", parts[index], limiter.open_transfer())
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total_elapsed = time.perf_counter() - start
+        rows.append(("全局限速并发上传(合计)", sum(len(part) for part in parts) / total_elapsed, limit))
+        for i, part in enumerate(parts):
+            rows.append((f"  并发上传 #{i + 1}", len(part) / elapsed_each[i], limit / 3))
+
+        # 3. 单传输限速下载（下载上一步上传的文件）
+        limiter = RateLimiter(per_transfer_limit=limit)
+        elapsed, received = download(server, "single.bin", limiter.open_transfer())
+        assert received == size, "下载内容长度不一致"
+        rows.append(("单传输下载", received / elapsed, limit))
+
+        # 4. 下载到一半时把限速提高一倍，整体吞吐量应接近两者的调和平均
+        limiter = RateLimiter(per_transfer_limit=limit)
+        half_time = size / 2 / limit
+        timer = threading.Timer(half_time, lambda: limiter.set_limits(per_transfer_limit=limit * 2))
+        timer.start()
+        elapsed, received = download(server, "single.bin", limiter.open_transfer())
+        timer.cancel()
+        expected_elapsed = half_time + size / 2 / (limit * 2)
+        rows.append(("运行时调整限速", received / elapsed, size / expected_elapsed))
+
+    print(f"\n{'场景':<24}{'实际(KB/s)':>12}{'期望(KB/s)':>12}{'偏差':>8}")
+    passed = True
+    for name, achieved, expected in rows:
+        deviation = achieved / expected - 1
+        ok = abs(deviation) <= tolerance
+        passed = passed and ok
+        print(f"{name:<24}{achieved / 1024:>12.1f}{expected / 1024:>12.1f}{deviation:>+7.1%} {'✓' if ok else '✗'}")
+    print(f"\n{'全部通过' if passed else '存在超出容差的场景'}（容差 ±{tolerance:.0%}）")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="限速验证")
+    parser.add_argument("--limit-kbps", type=float, default=1024, help="限速值（KB/s）")
+    parser.add_argument("--size-mb", type=float, default=2, help="每个场景传输的数据量（MB）")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="允许的相对偏差")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.limit_kbps, args.size_mb, args.tolerance) else 1)
+
+
+if __name__ == "__main__":
+    main()
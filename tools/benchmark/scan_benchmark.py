@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+扫描模式基准测试
+生成大量小文件的目录树，比较 serial / thread / process 三种扫描模式的耗时，
+分别测量无缓存（全部计算SHA256）和缓存命中两种情况。
+
+用法:
+    python tools/benchmark/scan_benchmark.py --files 100000 --workers 8
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.hash_cache import HashCache
+from tools.common.parallel_scan import SCAN_MODES, scan_tree
+
+
+def build_small_file_tree(root: Path, file_count: int, seed: int = 1) -> int:
+    """生成 file_count 个 0.2~8KB 的小文件，分布在两级目录中，返回总字节数"""
+    rng = random.Random(seed)
+    top_dirs = max(1, int(file_count ** 0.5) // 4)
+    total = 0
+    for i in range(file_count):
+        directory = root / f"m{i % top_dirs:03d}" / f"s{(i // top_dirs) % 8}"
+        directory.mkdir(parents=True, exist_ok=True)
+        size = rng.randint(200, 8 * 1024)
+        (directory / f"f{i:06d}.dat").write_bytes(rng.randbytes(size))
+        total += size
+    return total
+
+
+def timed_scan(root: Path, mode: str, workers: Optional[int], use_cache: bool) -> Tuple[float, Dict[str, str]]:
+    hash_cache = HashCache(str(root)) if use_cache else None
+    start = time.perf_counter()
+    result = scan_tree(str(root), mode, workers, hash_cache)
+    elapsed = time.perf_counter() - start
+    if hash_cache is not None:
+        hash_cache.save()
+    return elapsed, {record[0]: record[3] for record in result.records}
+
+
+def run(file_count: int, workers: Optional[int]):
+    work_dir = Path(tempfile.mkdtemp(prefix="omega_scan_bench_"))
+    tree = work_dir / "tree"
+    os.environ["OMEGA_CACHE_DIR"] = str(work_dir / "cache")
+    try:
+        print(f"生成 {file_count} 个小文件...")
+        total = build_small_file_tree(tree, file_count)
+        print(f"文件树: {file_count} 个文件, {total / 1024 / 1024:.1f} MB, "
+              f"并行度 {workers or os.cpu_count()}")
+
+        reference = None
+        rows = []
+        for mode in SCAN_MODES:
+            cold, hashes = timed_scan(tree, mode, workers, use_cache=False)
+            if reference is None:
+                reference = hashes
+            assert hashes == reference, f"{mode} 模式结果与串行不一致"
+
+            # 建立缓存后测量缓存命中的扫描
+            shutil.rmtree(work_dir / "cache", ignore_errors=True)
+            timed_scan(tree, mode, workers, use_cache=True)
+            warm, hashes = timed_scan(tree, mode, workers, use_cache=True)
+            assert hashes == reference, f"{mode} 模式缓存结果与串行不一致"
+            rows.append((mode, cold, warm))
+
+        serial_cold, serial_warm = rows[0][1], rows[0][2]
+        print(f"\n{'模式':<10}{'无缓存(秒)':>12}{'加速':>8}{'缓存命中(秒)':>14}{'加速':>8}")
+        for mode, cold, warm in rows:
+            print(f"{mode:<10}{cold:>12.2f}{serial_cold / cold:>7.1f}x{warm:>14.2f}{serial_warm / warm:>7.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="扫描模式基准测试")
+    parser.add_argument("--files", type=int, default=100000, help="小文件数量")
+    parser.add_argument("--workers", type=int, help="并行度，默认CPU核数")
+    args = parser.parse_args()
+    run(args.files, args.workers)
+
+
+if __name__ == "__main__":
+    main()
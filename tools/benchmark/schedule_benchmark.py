@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+传输调度模拟
+按列表调度（空闲的工作线程取下一个文件）模拟并行传输，比较不同顺序的总完成时间:
+    - 扫描顺序：大文件恰好最后被发现
+    - 随机顺序
+    - 大小降序（不分优先级类别的 LPT）
+    - 调度顺序：transfer_scheduler.schedule（优先级类别 + 大小降序）
+同时给出理论下界 max(总量 / 线程数, 最大文件)，以及调度顺序下第一个可执行/配置文件完成的时间。
+
+用法:
+    python tools/benchmark/schedule_benchmark.py --workers 4
+"""
+
+import argparse
+import heapq
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.transfer_scheduler import priority_class, schedule
+
+MB = 1024 * 1024
+
+# 每个文件的固定开销（请求往返、建立文件等，秒）
+PER_FILE_OVERHEAD = 0.02
+
+
+def build_workload(seed: int) -> List[Tuple[str, int]]:
+    """典型的游戏/应用发布目录：一个很大的资源包、若干中等资源、大量小文件和少量可执行/配置文件"""
+    rng = random.Random(seed)
+    files = [(f"assets/textures/tex_{i}.png", rng.randint(1, 4) * MB) for i in range(120)]
+    files += [(f"assets/audio/track_{i}.ogg", rng.randint(20, 80) * MB) for i in range(12)]
+    files += [(f"data/config_{i}.json", rng.randint(1, 64) * 1024) for i in range(30)]
+    files += [(f"bin/module_{i}.dll", rng.randint(1, 30) * MB) for i in range(8)]
+    files.append(("bin/app.exe", 60 * MB))
+    rng.shuffle(files)
+    # 扫描时最大的资源包最后才被发现
+    files.append(("assets/packs/world.pak", 1024 * MB))
+    return files
+
+
+def simulate(files: List[Tuple[str, int]], workers: int, rate: float) -> Tuple[float, float]:
+    """
+    列表调度模拟
+
+    Returns:
+        (总完成时间, 最后一个可执行/配置文件完成的时间)
+    """
+    finish_times = [0.0] * workers
+    heapq.heapify(finish_times)
+    priority_done = 0.0
+    for relative_path, size in files:
+        start = heapq.heappop(finish_times)
+        end = start + PER_FILE_OVERHEAD + size / rate
+        heapq.heappush(finish_times, end)
+        if priority_class(relative_path) == 0:
+            priority_done = max(priority_done, end)
+    return max(finish_times), priority_done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="传输调度模拟")
+    parser.add_argument("--workers", type=int, default=4, help="并行传输数")
+    parser.add_argument("--rate-mbps", type=float, default=20, help="每个传输的速率（MB/s）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    args = parser.parse_args()
+    rate = args.rate_mbps * MB
+
+    files = build_workload(args.seed)
+    shuffled = list(files)
+    random.Random(args.seed).shuffle(shuffled)
+    orders: Dict[str, List[Tuple[str, int]]] = {
+        "扫描顺序": files,
+        "随机顺序": shuffled,
+        "大小降序": sorted(files, key=lambda item: -item[1]),
+        "调度顺序": schedule(files, lambda item: item[0], lambda item: item[1]),
+    }
+
+    total = sum(PER_FILE_OVERHEAD + size / rate for _, size in files)
+    largest = max(PER_FILE_OVERHEAD + size / rate for _, size in files)
+    lower_bound = max(total / args.workers, largest)
+
+    print(f"{len(files)} 个文件, 共 {sum(size for _, size in files) / MB:.0f} MB, "
+          f"{args.workers} 个并行传输, 每个 {args.rate_mbps:g} MB/s")
+    print(f"\n{'顺序':<10}{'总完成时间(s)':>14}{'相对下界':>10}{'可执行/配置完成(s)':>20}")
+    for name, order in orders.items():
+        makespan, priority_done = simulate(order, args.workers, rate)
+        print(f"{name:<10}{makespan:>14.1f}{makespan / lower_bound:>10.2f}{priority_done:>20.1f}")
+    print(f"{'理论下界':<10}{lower_bound:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
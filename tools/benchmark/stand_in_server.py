@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+本地替身服务器
+在本机进程内实现客户端使用的 /api/v2 端点子集，用于验证协议和离线测量性能，
+不依赖生产服务器。
+"""
+
+import email.parser
+import email.policy
+import hashlib
+import io
+import json
+import re
+import sys
+import threading
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.compare_payload import (
+    COMPARE_CONTENT_TYPE, CompareOp, PayloadError, decode_compare_request,
+    encode_compare_response, encode_manifest_summary
+)
+
+
+@dataclass
+class StoredFile:
+    """替身服务器上保存的文件"""
+    relative_path: str
+    file_size: int
+    sha256: str
+    content: Optional[bytes] = None
+
+
+ManifestKey = Tuple[str, str, str]
+
+
+@dataclass
+class ChunkedUpload:
+    """未完成的分块上传会话"""
+    upload_id: str
+    key: ManifestKey
+    relative_path: str
+    file_size: int
+    file_hash: str
+    part_size: int
+    parts: Dict[int, bytes] = field(default_factory=dict)
+
+
+class ManifestStore:
+    """按 (版本, 平台, 架构) 组织的内存文件清单"""
+
+    def __init__(self):
+        self._manifests: Dict[ManifestKey, Dict[str, StoredFile]] = {}
+        self._revisions: Dict[ManifestKey, int] = {}
+        self._lock = threading.Lock()
+
+    def put(self, key: ManifestKey, stored: StoredFile):
+        """添加或替换文件"""
+        with self._lock:
+            self._manifests.setdefault(key, {})[stored.relative_path] = stored
+            self._revisions[key] = self._revisions.get(key, 0) + 1
+
+    def revision(self, key: ManifestKey) -> int:
+        """清单的修改次数（用于判断缓存的完整安装包是否过期）"""
+        with self._lock:
+            return self._revisions.get(key, 0)
+
+    def get(self, key: ManifestKey) -> Optional[Dict[str, StoredFile]]:
+        """获取清单快照，版本不存在时返回None"""
+        with self._lock:
+            manifest = self._manifests.get(key)
+            return dict(manifest) if manifest is not None else None
+
+    def retain(self, key: ManifestKey, keep_paths: set) -> int:
+        """只保留指定路径，返回删除的文件数"""
+        with self._lock:
+            manifest = self._manifests.get(key, {})
+            removed = [path for path in manifest if path not in keep_paths]
+            for path in removed:
+                del manifest[path]
+            if removed:
+                self._revisions[key] = self._revisions.get(key, 0) + 1
+            return len(removed)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """请求处理器，路由表见 ROUTES"""
+
+    protocol_version = "HTTP/1.1"
+    server: "_StandInHTTPServer"
+
+    ROUTES: List[Tuple[str, "re.Pattern[str]", str]] = [
+        ("GET", re.compile(r"^/api/v2/status/simple$"), "handle_status"),
+        ("GET", re.compile(r"^/api/v2/files/simple/(?P<version>[^/]+)$"), "handle_files_v2"),
+        ("GET", re.compile(r"^/api/v2/files/summary/(?P<version>[^/]+)$"), "handle_files_summary"),
+        ("GET", re.compile(r"^/api/v1/files/list$"), "handle_files_v1"),
+        ("POST", re.compile(r"^/api/v2/version/compare/binary$"), "handle_compare_binary"),
+        ("POST", re.compile(r"^/api/v2/sync/binary/(?P<version>[^/]+)$"), "handle_sync_binary"),
+        ("POST", re.compile(r"^/api/v2/sync/simple/(?P<version>[^/]+)$"), "handle_sync_form"),
+        ("POST", re.compile(r"^/api/v2/upload/simple/file$"), "handle_upload_file"),
+        ("GET", re.compile(r"^/api/v1/download/file$"), "handle_download_file"),
+        ("GET", re.compile(r"^/api/v2/version/simple/(?P<version>[^/]+)$"), "handle_version_info"),
+        ("GET", re.compile(r"^/api/v2/download/simple/(?P<version>[^/]+)/(?P<platform>[^/]+)/(?P<architecture>[^/]+)$"),
+         "handle_download_package"),
+        ("POST", re.compile(r"^/api/v2/upload/chunked/initiate$"), "handle_chunked_initiate"),
+        ("GET", re.compile(r"^/api/v2/upload/chunked/(?P<upload_id>[^/]+)$"), "handle_chunked_status"),
+        ("PUT", re.compile(r"^/api/v2/upload/chunked/(?P<upload_id>[^/]+)/parts/(?P<part_number>\d+)$"),
+         "handle_chunked_part"),
+        ("POST", re.compile(r"^/api/v2/upload/chunked/(?P<upload_id>[^/]+)/complete$"), "handle_chunked_complete"),
+    ]
+
+    def log_message(self, format, *args):
+        """静默访问日志"""
+
+    # ------------------------------------------------------------------
+    # 分发与基础工具
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _dispatch(self, method: str):
+        parsed = urlparse(self.path)
+        self.query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        self.server.stand_in.record_request(parsed.path)
+
+        for route_method, pattern, handler_name in self.ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.match(parsed.path)
+            if match:
+                if not self._authorized():
+                    self._drain_body()
+                    self._send_json(401, {"detail": "API密钥无效"})
+                    return
+                try:
+                    getattr(self, handler_name)(**match.groupdict())
+                except PayloadError as e:
+                    self._send_json(400, {"detail": str(e)})
+                return
+
+        self._drain_body()
+        self._send_json(404, {"detail": "Not Found"})
+
+    def _authorized(self) -> bool:
+        expected = self.server.stand_in.api_key
+        provided = self.headers.get("X-API-Key") or self.query.get("api_key")
+        return not expected or not provided or provided == expected
+
+    def _manifest_key(self, version: str, arch_param: str = "architecture") -> ManifestKey:
+        return (version, self.query.get("platform", "windows"),
+                self.query.get(arch_param, "x64"))
+
+    def _iter_body(self) -> Iterator[bytes]:
+        """读取请求体，支持Content-Length和分块传输编码"""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size_line = self.rfile.readline().strip()
+                size = int(size_line.split(b";")[0], 16)
+                if size == 0:
+                    # 跳过尾部头字段直到空行
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                data = self.rfile.read(size)
+                self.rfile.readline()
+                self.server.stand_in.record_bytes_in(len(data))
+                yield data
+        else:
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining > 0:
+                data = self.rfile.read(min(65536, remaining))
+                if not data:
+                    return
+                remaining -= len(data)
+                self.server.stand_in.record_bytes_in(len(data))
+                yield data
+
+    def _read_multipart(self) -> Tuple[Dict[str, str], Optional[bytes]]:
+        """解析 multipart/form-data 请求体，返回 (表单字段, 文件内容)"""
+        body = b"".join(self._iter_body())
+        header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode("latin-1")
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+        fields: Dict[str, str] = {}
+        content = None
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True) or b""
+            if part.get_filename() is not None:
+                content = payload
+            elif name:
+                fields[name] = payload.decode("utf-8")
+        return fields, content
+
+    def _read_json(self) -> dict:
+        return json.loads(b"".join(self._iter_body()) or b"{}")
+
+    def _drain_body(self):
+        for _ in self._iter_body():
+            pass
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stand_in.record_bytes_out(len(body))
+
+    def _send_content(self, content: bytes):
+        """发送文件内容，支持 "bytes=start-" 和 "bytes=start-end" 形式的范围请求"""
+        size = len(content)
+        start, end = 0, size - 1
+        range_match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if range_match:
+            start = int(range_match.group(1))
+            if range_match.group(2):
+                end = min(int(range_match.group(2)), size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        self.send_response(206 if range_match else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end + 1 - start))
+        if range_match:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        view = memoryview(content)
+        for offset in range(start, end + 1, 65536):
+            chunk = view[offset:min(offset + 65536, end + 1)]
+            self.wfile.write(chunk)
+            self.server.stand_in.record_bytes_out(len(chunk))
+
+    def _send_chunked(self, status: int, content_type: str, chunks: Iterator[bytes]):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            if chunk:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.server.stand_in.record_bytes_out(len(chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    # ------------------------------------------------------------------
+    # 端点实现
+
+    def handle_status(self):
+        self._send_json(200, {"status": "ok", "server": "stand-in"})
+
+    def handle_files_v2(self, version: str):
+        manifest = self.server.stand_in.store.get(self._manifest_key(version))
+        if manifest is None:
+            self._send_json(404, {"detail": f"版本不存在: {version}"})
+            return
+        files = [
+            {
+                "relative_path": stored.relative_path,
+                "file_size": stored.file_size,
+                "file_hash": stored.sha256,
+                "storage_path": f"{version}/{stored.relative_path}"
+            }
+            for stored in sorted(manifest.values(), key=lambda item: item.relative_path)
+        ]
+        self._send_json(200, {
+            "files": files,
+            "total_files": len(files),
+            "total_size": sum(item["file_size"] for item in files)
+        })
+
+    def handle_files_summary(self, version: str):
+        # 版本不存在时返回空摘要，404 只表示服务器不支持该接口
+        manifest = self.server.stand_in.store.get(self._manifest_key(version)) or {}
+        entries = ((stored.relative_path, stored.file_size, stored.sha256) for stored in manifest.values())
+        self._send_chunked(200, COMPARE_CONTENT_TYPE, encode_manifest_summary(entries))
+
+    def handle_files_v1(self):
+        version = self.query.get("version", "")
+        manifest = self.server.stand_in.store.get(self._manifest_key(version, "arch"))
+        if manifest is None:
+            self._send_json(404, {"detail": f"版本不存在: {version}"})
+            return
+        files = [
+            {"relative_path": stored.relative_path, "file_size": stored.file_size, "sha256": stored.sha256}
+            for stored in sorted(manifest.values(), key=lambda item: item.relative_path)
+        ]
+        self._send_json(200, {"files": files})
+
+    def handle_compare_binary(self):
+        version = self.query.get("target_version", "")
+        manifest = self.server.stand_in.store.get(self._manifest_key(version, "arch"))
+        if manifest is None:
+            self._drain_body()
+            self._send_json(404, {"detail": f"版本不存在: {version}"})
+            return
+
+        # 以下载端视角比较：服务器清单为目标，本地清单为现状
+        local = {path: (size, sha256) for path, size, sha256 in decode_compare_request(self._iter_body())}
+
+        def entries():
+            for path in sorted(set(local) | set(manifest)):
+                remote = manifest.get(path)
+                if remote is None:
+                    size, sha256 = local[path]
+                    yield CompareOp.DELETED, path, size, sha256
+                elif path not in local:
+                    yield CompareOp.NEW, path, remote.file_size, remote.sha256
+                elif local[path][1] != remote.sha256:
+                    yield CompareOp.UPDATED, path, remote.file_size, remote.sha256
+                else:
+                    yield CompareOp.SAME, path, remote.file_size, remote.sha256
+
+        self._send_chunked(200, COMPARE_CONTENT_TYPE, encode_compare_response(entries()))
+
+    def handle_sync_binary(self, version: str):
+        keep = {path for path, _, _ in decode_compare_request(self._iter_body())}
+        deleted = self.server.stand_in.store.retain(self._manifest_key(version), keep)
+        self._send_json(200, {"success": True, "deleted_files": deleted})
+
+    def handle_sync_form(self, version: str):
+        form = parse_qs(b"".join(self._iter_body()).decode("utf-8"))
+        self.query.update({k: v[0] for k, v in form.items()})
+        local_files = json.loads(self.query.get("local_files", "[]"))
+        keep = {item["relative_path"] for item in local_files}
+        deleted = self.server.stand_in.store.retain(self._manifest_key(version), keep)
+        self._send_json(200, {"success": True, "deleted_files": deleted})
+
+
+    def handle_upload_file(self):
+        fields, content = self._read_multipart()
+        self.query.update(fields)
+        if content is None or not fields.get("relative_path"):
+            self._send_json(400, {"detail": "缺少文件或相对路径"})
+            return
+        sha256 = hashlib.sha256(content).hexdigest()
+        if fields.get("file_hash") and fields["file_hash"] != sha256:
+            self._send_json(400, {"detail": "文件哈希不匹配"})
+            return
+        self.server.stand_in.add_file(fields.get("version_type", ""), fields["relative_path"], content,
+                                      fields.get("platform", "windows"), fields.get("architecture", "x64"))
+        self._send_json(200, {"success": True, "file_hash": sha256})
+
+    def handle_download_file(self):
+        manifest = self.server.stand_in.store.get(self._manifest_key(self.query.get("version", ""), "arch"))
+        stored = (manifest or {}).get(self.query.get("relative_path", ""))
+        if stored is None or stored.content is None:
+            self._send_json(404, {"detail": "文件不存在"})
+            return
+
+        self._send_content(stored.content)
+
+    def handle_version_info(self, version: str):
+        package = self.server.stand_in.package(self._manifest_key(version))
+        if package is None:
+            self._send_json(404, {"detail": f"版本不存在: {version}"})
+            return
+        content, sha256, upload_date = package
+        self._send_json(200, {
+            "version_type": version,
+            "description": f"替身服务器 {version}",
+            "upload_date": upload_date,
+            "file_size": len(content),
+            "file_hash": sha256
+        })
+
+    def handle_download_package(self, version: str, platform: str, architecture: str):
+        package = self.server.stand_in.package((version, platform, architecture))
+        if package is None:
+            self._send_json(404, {"detail": f"版本不存在: {version}"})
+            return
+        self._send_content(package[0])
+
+    def handle_chunked_initiate(self):
+        request = self._read_json()
+        if not self.server.stand_in.chunked_supported:
+            # 模拟不支持分块上传的旧版服务器
+            self._send_json(404, {"detail": "Not Found"})
+            return
+        upload = ChunkedUpload(
+            upload_id=uuid.uuid4().hex,
+            key=(request.get("version_type", ""), request.get("platform", "windows"),
+                 request.get("architecture", "x64")),
+            relative_path=request.get("relative_path", ""),
+            file_size=int(request.get("file_size", 0)),
+            file_hash=request.get("file_hash", ""),
+            part_size=int(request.get("part_size") or 8 * 1024 * 1024)
+        )
+        self.server.stand_in.chunked_uploads[upload.upload_id] = upload
+        self._send_json(200, {"upload_id": upload.upload_id, "part_size": upload.part_size})
+
+    def handle_chunked_status(self, upload_id: str):
+        upload = self.server.stand_in.chunked_uploads.get(upload_id)
+        if upload is None:
+            self._send_json(404, {"detail": "上传会话不存在"})
+            return
+        parts = [{"part_number": n, "sha256": hashlib.sha256(data).hexdigest()}
+                 for n, data in sorted(upload.parts.items())]
+        self._send_json(200, {"upload_id": upload_id, "file_size": upload.file_size,
+                              "part_size": upload.part_size, "parts": parts})
+
+    def handle_chunked_part(self, upload_id: str, part_number: str):
+        upload = self.server.stand_in.chunked_uploads.get(upload_id)
+        data = b"".join(self._iter_body())
+        if upload is None:
+            self._send_json(404, {"detail": "上传会话不存在"})
+            return
+        reject = self.server.stand_in.reject_part
+        if reject is not None and reject(int(part_number)):
+            self._send_json(503, {"detail": "模拟的分块上传失败"})
+            return
+        sha256 = hashlib.sha256(data).hexdigest()
+        if self.headers.get("X-Part-SHA256") not in (None, sha256):
+            self._send_json(400, {"detail": "分块哈希不匹配"})
+            return
+        upload.parts[int(part_number)] = data
+        self._send_json(200, {"part_number": int(part_number), "sha256": sha256})
+
+    def handle_chunked_complete(self, upload_id: str):
+        request = self._read_json()
+        upload = self.server.stand_in.chunked_uploads.get(upload_id)
+        if upload is None:
+            self._send_json(404, {"detail": "上传会话不存在"})
+            return
+        parts = request.get("parts", [])
+        if [part["part_number"] for part in parts] != list(range(len(parts))) or any(
+                part["part_number"] not in upload.parts
+                or hashlib.sha256(upload.parts[part["part_number"]]).hexdigest() != part["sha256"]
+                for part in parts):
+            self._send_json(400, {"detail": "分块不完整或哈希不一致"})
+            return
+        content = b"".join(upload.parts[part["part_number"]] for part in parts)
+        sha256 = hashlib.sha256(content).hexdigest()
+        if len(content) != upload.file_size or sha256 != request.get("file_hash", upload.file_hash):
+            self._send_json(400, {"detail": "文件哈希不匹配"})
+            return
+        version, platform, architecture = upload.key
+        self.server.stand_in.add_file(version, upload.relative_path, content, platform, architecture)
+        del self.server.stand_in.chunked_uploads[upload_id]
+        self._send_json(200, {"success": True, "file_hash": sha256})
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stand_in: "StandInServer"
+
+
+class StandInServer:
+    """本地替身服务器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, api_key: Optional[str] = None):
+        """
+        初始化替身服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            api_key: 期望的API密钥，None表示不校验
+        """
+        self.api_key = api_key
+        self.store = ManifestStore()
+        self.stats: Dict[str, int] = {"bytes_in": 0, "bytes_out": 0}
+        self.request_counts: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        # 分块上传会话；reject_part 返回True时拒绝对应分块，用于模拟网络中断；
+        # chunked_supported 为False时发起请求返回404，模拟旧版服务器
+        self.chunked_uploads: Dict[str, ChunkedUpload] = {}
+        self.chunked_supported = True
+        self.reject_part: Optional[Callable[[int], bool]] = None
+        # 完整安装包缓存：(版本, 平台, 架构) -> (清单修改次数, 压缩包, SHA256, 生成时间)
+        self._packages: Dict[ManifestKey, Tuple[int, bytes, str, str]] = {}
+        self._package_lock = threading.Lock()
+
+        self._httpd = _StandInHTTPServer((host, port), _StandInHandler)
+        self._httpd.stand_in = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """服务器根URL"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def package(self, key: ManifestKey) -> Optional[Tuple[bytes, str, str]]:
+        """
+        按当前清单生成完整安装包（ZIP），清单未变化时复用
+
+        Returns:
+            (压缩包内容, SHA256, 生成时间)，版本不存在时返回None
+        """
+        with self._package_lock:
+            revision = self.store.revision(key)
+            manifest = self.store.get(key)
+            if manifest is None:
+                return None
+            cached = self._packages.get(key)
+            if cached and cached[0] == revision:
+                return cached[1:]
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+                for stored in sorted(manifest.values(), key=lambda item: item.relative_path):
+                    archive.writestr(stored.relative_path, stored.content or b"")
+            content = buffer.getvalue()
+            cached = (revision, content, hashlib.sha256(content).hexdigest(),
+                      datetime.now(timezone.utc).isoformat())
+            self._packages[key] = cached
+            return cached[1:]
+
+    def add_file(self, version: str, relative_path: str, content: bytes,
+                 platform: str = "windows", architecture: str = "x64"):
+        """添加带内容的文件"""
+        self.store.put((version, platform, architecture), StoredFile(
+            relative_path=relative_path,
+            file_size=len(content),
+            sha256=hashlib.sha256(content).hexdigest(),
+            content=content
+        ))
+
+    def add_manifest_entry(self, version: str, relative_path: str, file_size: int, sha256: str,
+                           platform: str = "windows", architecture: str = "x64"):
+        """只添加清单条目（不保存内容），用于比较类场景"""
+        self.store.put((version, platform, architecture), StoredFile(
+            relative_path=relative_path, file_size=file_size, sha256=sha256
+        ))
+
+    def record_request(self, path: str):
+        with self._stats_lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def record_bytes_in(self, count: int):
+        with self._stats_lock:
+            self.stats["bytes_in"] += count
+
+    def record_bytes_out(self, count: int):
+        with self._stats_lock:
+            self.stats["bytes_out"] += count
+
+
+def serve_forever(host: str = "127.0.0.1", port: int = 8000,
+                  populate: Optional[Callable[[StandInServer], None]] = None):
+    """前台运行替身服务器，供手动联调使用"""
+    server = StandInServer(host, port)
+    if populate:
+        populate(server)
+    print(f"替身服务器已启动: {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Omega更新系统本地替身服务器")
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    args = parser.parse_args()
+
+    serve_forever(args.host, args.port)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+上传/下载吞吐量基准测试
+在本地替身服务器上运行完整的客户端流程，不依赖生产服务器:
+    full_upload         首次上传整个文件树
+    incremental_upload  修改一部分文件后增量上传
+    update_check        扫描旧版本安装目录并与服务器比较
+    update_download     按更新计划下载变化的文件
+    package_download    分段下载完整安装包并流式解压到空目录
+
+文件树（--tree）:
+    small   大量小文件
+    huge    少量大文件
+    mixed   小文件、中等文件和大文件混合
+
+替身服务器在本进程中运行，每个场景在独立的子进程中执行，CPU时间和峰值内存只统计客户端。
+结果（files/s、MB/s、CPU秒、峰值RSS，以及各场景的分阶段耗时）写入 JSON，可用 --compare 与之前的结果比较。
+
+用法:
+    python tools/benchmark/transfer_benchmark.py --tree mixed --output results.json
+    python tools/benchmark/transfer_benchmark.py --tree mixed --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+try:
+    import resource  # 仅 POSIX
+except ImportError:
+    resource = None
+
+try:
+    import psutil  # 可选依赖，Windows 上用于读取峰值内存
+except ImportError:
+    psutil = None
+
+from tools.benchmark.stand_in_server import StandInServer
+
+VERSION_TYPE = "stable"
+PLATFORM = "windows"
+ARCHITECTURE = "x64"
+
+SCENARIOS = ["full_upload", "incremental_upload", "update_check", "update_download", "package_download"]
+
+# 文件树: 名称 -> [(文件数, 最小大小, 最大大小)]，数量和大小按 --scale 缩放
+TREES: Dict[str, List[Tuple[int, int, int]]] = {
+    "small": [(5000, 512, 8 * 1024)],
+    "huge": [(4, 64 * 1024 * 1024, 128 * 1024 * 1024)],
+    "mixed": [(2000, 512, 16 * 1024), (200, 64 * 1024, 1024 * 1024), (4, 16 * 1024 * 1024, 48 * 1024 * 1024)],
+}
+
+# 增量场景修改的文件比例
+MODIFY_RATIO = 0.05
+
+# 回归判定：吞吐量下降或资源占用上升超过该比例时标记
+REGRESSION_THRESHOLD = 0.10
+
+
+# ----------------------------------------------------------------------
+# 文件树生成
+
+def build_tree(root: Path, tree: str, scale: float, seed: int = 1) -> Tuple[int, int]:
+    """生成合成文件树，返回 (文件数, 总字节数)"""
+    rng = random.Random(seed)
+    count = 0
+    total = 0
+    for group, (files, min_size, max_size) in enumerate(TREES[tree]):
+        for i in range(max(1, int(files * scale))):
+            size = rng.randint(min_size, max_size)
+            if scale < 1 and min_size >= 1024 * 1024:
+                size = max(1024 * 1024, int(size * scale))
+            path = root / f"group{group}" / f"dir{i % 50:02d}" / f"file{i:05d}.bin"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _write_random(path, size, rng)
+            count += 1
+            total += size
+    return count, total
+
+
+def modify_tree(root: Path, ratio: float, seed: int = 2) -> int:
+    """改写一部分文件并新增少量文件，返回变化的文件数"""
+    rng = random.Random(seed)
+    files = sorted(p for p in root.rglob("*") if p.is_file())
+    chosen = rng.sample(files, max(1, int(len(files) * ratio)))
+    for path in chosen:
+        with open(path, "r+b") as f:
+            f.write(_random_bytes(rng, min(4096, path.stat().st_size) or 1))
+    added = max(1, len(chosen) // 10)
+    for i in range(added):
+        _write_random(root / "added" / f"new{i:04d}.bin", rng.randint(512, 64 * 1024), rng)
+    return len(chosen) + added
+
+
+def _write_random(path: Path, size: int, rng: random.Random):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            block = min(remaining, 1024 * 1024)
+            f.write(_random_bytes(rng, block))
+            remaining -= block
+
+
+def _random_bytes(rng: random.Random, size: int) -> bytes:
+    return rng.getrandbits(size * 8).to_bytes(size, "little")
+
+
+def tree_stats(root: Path) -> Tuple[int, int]:
+    files = [p for p in root.rglob("*") if p.is_file()]
+    return len(files), sum(p.stat().st_size for p in files)
+
+
+# ----------------------------------------------------------------------
+# 场景（在子进程中运行）
+
+def _point_client_at(server_url: str):
+    """让客户端的 get_server_url() 指向替身服务器"""
+    from tools.common.common_utils import config_manager
+    host, port = server_url.rsplit("//", 1)[1].rsplit(":", 1)
+    config_manager.config["server"] = dict(config_manager.config.get("server", {}), ip=host, port=int(port))
+
+
+def _scenario_upload(server_url: str, work: Path) -> Dict:
+    from tools.upload.incremental_uploader import IncrementalUploader
+    uploader = IncrementalUploader(None)
+    ok = uploader.perform_incremental_upload(str(work / "tree"), VERSION_TYPE, PLATFORM, ARCHITECTURE,
+                                             resume=False)
+    files, size = tree_stats(work / "tree")
+    return {"ok": bool(ok), "files": files, "bytes": size}
+
+
+def _scan_and_compare(server_url: str, install_dir: Path):
+    from tools.common.common_utils import get_api_key
+    from tools.common.difference_detector import DifferenceDetector
+    from tools.download.local_file_scanner import LocalFileScanner
+    local_files = LocalFileScanner().scan_directory(str(install_dir))
+    detector = DifferenceDetector(server_url, get_api_key())
+    return local_files, detector.detect_differences(local_files, VERSION_TYPE, PLATFORM, ARCHITECTURE)
+
+
+def _scenario_update_check(server_url: str, work: Path) -> Dict:
+    local_files, plan = _scan_and_compare(server_url, work / "install")
+    return {"ok": plan is not None, "files": len(local_files),
+            "bytes": sum(info.file_size for info in local_files.values()),
+            "to_download": len(plan.files_to_download), "to_delete": len(plan.files_to_delete)}
+
+
+def _scenario_update_download(server_url: str, work: Path) -> Dict:
+    from tools.common.common_utils import get_api_key
+    from tools.download.download_manager import DownloadManager
+    _, plan = _scan_and_compare(server_url, work / "install")
+    manager = DownloadManager(server_url, get_api_key())
+    started = time.perf_counter()
+    manager.start_download(plan, str(work / "install"))
+    while manager.is_downloading:
+        time.sleep(0.01)
+    return {"ok": manager.files_failed == 0 and not manager.install_error,
+            "files": manager.files_completed, "bytes": plan.total_download_size,
+            "transfer_seconds": time.perf_counter() - started}
+
+
+def _scenario_package_download(server_url: str, work: Path) -> Dict:
+    import requests
+    from tools.download.package_download import PackageDownloader
+    from tools.download.package_extract import PackageExtractor
+    info = requests.get(f"{server_url}/api/v2/version/simple/{VERSION_TYPE}",
+                        params={"platform": PLATFORM, "architecture": ARCHITECTURE}, timeout=30).json()
+    downloader = PackageDownloader(
+        f"{server_url}/api/v2/download/simple/{VERSION_TYPE}/{PLATFORM}/{ARCHITECTURE}",
+        work / "package" / "package.zip", info["file_size"], info["file_hash"])
+    extractor = PackageExtractor(str(work / "package" / "install"), use_hash_cache=False)
+    reader = downloader.open_reader()
+    errors = []
+
+    def extract():
+        try:
+            with reader:
+                extractor.extract_stream(reader)
+        except Exception as e:
+            errors.append(str(e))
+
+    thread = threading.Thread(target=extract)
+    thread.start()
+    ok = downloader.download()
+    thread.join()
+    return {"ok": ok and not errors, "files": extractor.result.files_written,
+            "bytes": info["file_size"], "errors": errors}
+
+
+SCENARIO_FUNCTIONS: Dict[str, Callable[[str, Path], Dict]] = {
+    "full_upload": _scenario_upload,
+    "incremental_upload": _scenario_upload,
+    "update_check": _scenario_update_check,
+    "update_download": _scenario_update_download,
+    "package_download": _scenario_package_download,
+}
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """本进程的峰值常驻内存（字节），无法获取时返回None"""
+    # Linux 上 ru_maxrss 包含 fork 时继承的父进程峰值，优先读 VmHWM（exec 时重置）
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，其他为KB
+        return peak if sys.platform == "darwin" else peak * 1024
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss)
+    return None
+
+
+def run_scenario_child(name: str, server_url: str, work: Path) -> Dict:
+    """子进程入口：运行一个场景并测量耗时、CPU和峰值内存"""
+    os.environ["OMEGA_CACHE_DIR"] = str(work / "cache")
+    _point_client_at(server_url)
+    from tools.common.instrumentation import get_instrumentation
+    metrics = get_instrumentation()
+    metrics.enable()
+    cpu_start = time.process_time()
+    started = time.perf_counter()
+    result = SCENARIO_FUNCTIONS[name](server_url, work)
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_start
+    result.update({
+        "scenario": name,
+        "seconds": elapsed,
+        "cpu_seconds": cpu,
+        "files_per_second": result["files"] / elapsed if elapsed else 0.0,
+        "mb_per_second": result["bytes"] / 1024 / 1024 / elapsed if elapsed else 0.0,
+        "peak_rss_mb": (peak_rss_bytes() or 0) / 1024 / 1024 or None,
+        "phases": metrics.report()["phases"],
+    })
+    return result
+
+
+# ----------------------------------------------------------------------
+# 主流程（替身服务器所在的父进程）
+
+def _run_child(name: str, server_url: str, work: Path) -> Dict:
+    command = [sys.executable, str(Path(__file__).resolve()), "--child", name,
+               "--server-url", server_url, "--work", str(work)]
+    completed = subprocess.run(command, capture_output=True, text=True, encoding="utf-8")
+    if completed.returncode != 0:
+        raise RuntimeError(f"场景 {name} 失败:\n{completed.stderr}")
+    # 客户端可能向标准输出打印日志，结果在最后一行
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(tree: str, scale: float, scenarios: List[str]) -> Dict:
+    work = Path(tempfile.mkdtemp(prefix="omega_transfer_bench_"))
+    try:
+        files, total = build_tree(work / "tree", tree, scale)
+        print(f"文件树 {tree}: {files} 个文件, {total / 1024 / 1024:.1f} MB")
+        # 旧版本安装目录：修改前的文件树
+        shutil.copytree(work / "tree", work / "install")
+        print_header()
+
+        results = []
+        with StandInServer() as server:
+            for name in SCENARIOS:
+                if name not in scenarios:
+                    continue
+                if name == "incremental_upload":
+                    changed = modify_tree(work / "tree", MODIFY_RATIO)
+                    print(f"修改了 {changed} 个文件")
+                bytes_in, bytes_out = server.stats["bytes_in"], server.stats["bytes_out"]
+                result = _run_child(name, server.url, work)
+                result["server_bytes_in"] = server.stats["bytes_in"] - bytes_in
+                result["server_bytes_out"] = server.stats["bytes_out"] - bytes_out
+                results.append(result)
+                print_row(result)
+        return {
+            "tree": tree,
+            "scale": scale,
+            "files": files,
+            "bytes": total,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def print_header():
+    print(f"\n{'场景':<20}{'耗时(秒)':>10}{'files/s':>12}{'MB/s':>10}{'CPU(秒)':>10}{'峰值RSS(MB)':>14}  结果")
+
+
+def print_row(result: Dict):
+    rss = result.get("peak_rss_mb")
+    print(f"{result['scenario']:<20}{result['seconds']:>10.2f}{result['files_per_second']:>12.1f}"
+          f"{result['mb_per_second']:>10.1f}{result['cpu_seconds']:>10.2f}"
+          f"{(f'{rss:.1f}' if rss else '-'):>14}  {'OK' if result['ok'] else '失败'}")
+
+
+def compare(current: Dict, baseline: Dict):
+    """与之前的结果比较，吞吐量下降或CPU/内存上升超过阈值时标记为回归"""
+    previous = {result["scenario"]: result for result in baseline.get("results", [])}
+    print(f"\n与基线比较（{baseline.get('timestamp', '?')}，文件树 {baseline.get('tree')} x{baseline.get('scale')}）")
+    print(f"{'场景':<20}{'MB/s':>18}{'CPU(秒)':>18}{'峰值RSS(MB)':>20}")
+    regressions = 0
+    for result in current["results"]:
+        old = previous.get(result["scenario"])
+        if not old:
+            continue
+        cells = []
+        for key, higher_is_better in (("mb_per_second", True), ("cpu_seconds", False), ("peak_rss_mb", False)):
+            new_value, old_value = result.get(key), old.get(key)
+            if not new_value or not old_value:
+                cells.append("-")
+                continue
+            change = new_value / old_value - 1
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > REGRESSION_THRESHOLD else ""
+            regressions += bool(flag)
+            cells.append(f"{change:+.1%}{flag}")
+        print(f"{result['scenario']:<20}{cells[0]:>18}{cells[1]:>18}{cells[2]:>20}")
+    if regressions:
+        print(f"\n{regressions} 项指标变差超过 {REGRESSION_THRESHOLD:.0%}（标记为 !）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上传/下载吞吐量基准测试")
+    parser.add_argument("--tree", choices=sorted(TREES), default="mixed", help="合成文件树")
+    parser.add_argument("--scale", type=float, default=1.0, help="文件树规模系数")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="只运行指定场景（可重复），默认全部；后面的场景依赖前面场景的服务器状态")
+    parser.add_argument("--output", help="结果JSON文件")
+    parser.add_argument("--compare", help="与之前保存的结果JSON比较")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--server-url", help=argparse.SUPPRESS)
+    parser.add_argument("--work", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_scenario_child(args.child, args.server_url, Path(args.work))
+        print(json.dumps(result, ensure_ascii=False))
+        return
+
+    report = run(args.tree, args.scale, args.scenario or SCENARIOS)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
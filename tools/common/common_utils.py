@@ -4,11 +4,22 @@ Omega更新系统 - 公共工具模块
 包含上传和下载工具共享的配置、工具函数和常量
 """
 
+import atexit
 import json
+import logging
+import logging.handlers
 import os
+import queue
+import sys
+import threading
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 
+# 成功日志级别（介于 INFO 和 WARNING 之间）
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+
 
 class ConfigManager:
     """配置管理器"""
@@ -74,6 +85,17 @@ class FileUtils:
         
         return f"{size_bytes:.1f} {size_names[i]}"
     
+    @staticmethod
+    def parse_file_size(size_text) -> int:
+        """解析文件大小（如 "10MB"、"512 KB"、1048576），返回字节数"""
+        if isinstance(size_text, (int, float)):
+            return int(size_text)
+        text = str(size_text).strip().upper().replace(" ", "")
+        for i, unit in reversed(list(enumerate(["B", "KB", "MB", "GB", "TB"]))):
+            if text.endswith(unit):
+                return int(float(text[:-len(unit)]) * 1024 ** i)
+        return int(float(text))
+    
     @staticmethod
     def get_timestamp():
         """获取当前时间戳字符串"""
@@ -85,62 +107,144 @@ class FileUtils:
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
+class _WidgetHandler(logging.Handler):
+    """缓存格式化后的日志行，由界面线程按间隔批量插入 Text 组件"""
+
+    def __init__(self, widget, max_lines: int, interval_ms: int):
+        super().__init__()
+        self.widget = widget
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        # 两次插入之间最多保留 max_lines 行，更早的行反正会被裁掉
+        self._lines = deque(maxlen=max_lines)
+        self._lines_lock = threading.Lock()
+        self.widget.after(self.interval_ms, self._flush)
+
+    def emit(self, record: logging.LogRecord):
+        line = self.format(record)
+        with self._lines_lock:
+            self._lines.append(line)
+
+    def _flush(self):
+        """界面线程：插入缓存的行，只保留最近 max_lines 行"""
+        with self._lines_lock:
+            lines = list(self._lines)
+            self._lines.clear()
+        try:
+            if lines:
+                self.widget.insert("end", "\n".join(lines) + "\n")
+                line_count = int(self.widget.index("end-1c").split(".")[0])
+                if line_count > self.max_lines:
+                    self.widget.delete("1.0", f"{line_count - self.max_lines}.0")
+                self.widget.see("end")
+            self.widget.after(self.interval_ms, self._flush)
+        except Exception:
+            # 组件已销毁
+            pass
+
+
 class LogManager:
-    """日志管理器"""
-    
-    def __init__(self, log_widget=None, log_file=None):
+    """
+    日志管理器（基于 logging）
+
+    记录日志的线程只把日志记录放入队列，由后台线程写入控制台和日志文件（按大小轮转）；
+    界面 Text 组件由界面线程按间隔批量插入，只保留最近 max_lines 行。
+    """
+
+    DEFAULT_MAX_LINES = 1000
+    DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+    DEFAULT_BACKUP_COUNT = 5
+    WIDGET_FLUSH_MS = 100
+
+    def __init__(self, log_widget=None, log_file=None, level=logging.INFO, console: bool = True,
+                 max_lines: int = DEFAULT_MAX_LINES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 backup_count: int = DEFAULT_BACKUP_COUNT):
         """
         初始化日志管理器
-        
+
         Args:
-            log_widget: tkinter Text组件，用于GUI显示
+            log_widget: tkinter Text组件，用于GUI显示（需在界面线程中创建日志管理器）
             log_file: 日志文件路径
+            level: 最低记录级别（logging 级别或名称，如 "DEBUG"）
+            console: 是否输出到控制台
+            max_lines: 界面组件保留的最大行数
+            max_bytes: 日志文件轮转大小
+            backup_count: 保留的轮转文件数
         """
         self.log_widget = log_widget
         self.log_file = log_file
-    
+
+        # 不注册到 logging 的全局日志器表，各实例互不影响
+        self.logger = logging.Logger(f"omega_update.{id(self)}")
+        self.logger.setLevel(level)
+
+        formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+        handlers = []
+        if console:
+            handlers.append(logging.StreamHandler(sys.stdout))
+        if log_file:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+            ))
+        if log_widget is not None:
+            handlers.append(_WidgetHandler(log_widget, max_lines, self.WIDGET_FLUSH_MS))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        self._queue = queue.SimpleQueue()
+        self.logger.addHandler(logging.handlers.QueueHandler(self._queue))
+        self._handlers = handlers
+        self._listener = logging.handlers.QueueListener(self._queue, *handlers)
+        self._listener.start()
+        # 退出前写完队列中的日志
+        atexit.register(self.close)
+
+    def set_level(self, level):
+        """修改最低记录级别"""
+        self.logger.setLevel(level)
+
     def log_message(self, message, level="INFO"):
         """
         记录日志消息
-        
+
         Args:
             message: 日志消息
             level: 日志级别
         """
-        timestamp = FileUtils.get_timestamp()
-        formatted_message = f"[{timestamp}] [{level}] {message}"
-        
-        # 输出到GUI
-        if self.log_widget:
-            self.log_widget.insert("end", f"{formatted_message}\n")
-            self.log_widget.see("end")
-        
-        # 输出到文件
-        if self.log_file:
-            try:
-                with open(self.log_file, 'a', encoding='utf-8') as f:
-                    f.write(f"{formatted_message}\n")
-            except Exception as e:
-                print(f"写入日志文件失败: {e}")
-        
-        # 输出到控制台
-        print(formatted_message)
-    
+        level_number = logging.getLevelName(level)
+        if not isinstance(level_number, int):
+            level_number = logging.INFO
+        self.logger.log(level_number, message)
+
+    def log_debug(self, message):
+        """记录调试日志"""
+        self.logger.debug(message)
+
     def log_info(self, message):
         """记录信息日志"""
-        self.log_message(message, "INFO")
+        self.logger.info(message)
     
     def log_warning(self, message):
         """记录警告日志"""
-        self.log_message(message, "WARNING")
+        self.logger.warning(message)
     
     def log_error(self, message):
         """记录错误日志"""
-        self.log_message(message, "ERROR")
+        self.logger.error(message)
     
     def log_success(self, message):
         """记录成功日志"""
-        self.log_message(message, "SUCCESS")
+        self.logger.log(SUCCESS, message)
+
+    def close(self):
+        """写完队列中的日志并关闭文件（可重复调用）"""
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._listener = None
+        for handler in self._handlers:
+            handler.close()
+        atexit.unregister(self.close)
 
 
 class APIEndpoints:
@@ -149,6 +253,12 @@ class APIEndpoints:
     # 上传相关API
     UPLOAD_PACKAGE = "/api/v1/upload/package"
     UPLOAD_FILE = "/api/v1/upload/file"
+
+    # 分块上传API（路径中的 {upload_id}/{part_number} 由调用方填充）
+    UPLOAD_CHUNKED_INITIATE = "/api/v2/upload/chunked/initiate"
+    UPLOAD_CHUNKED_SESSION = "/api/v2/upload/chunked/{upload_id}"
+    UPLOAD_CHUNKED_PART = "/api/v2/upload/chunked/{upload_id}/parts/{part_number}"
+    UPLOAD_CHUNKED_COMPLETE = "/api/v2/upload/chunked/{upload_id}/complete"
     
     # 下载相关API
     FILES_LIST = "/api/v1/files/list"
@@ -172,6 +282,11 @@ class APIEndpoints:
     
     # 文件验证API
     FILE_VERIFY = "/api/v1/file/verify"
+
+    # 二进制清单比较/同步API（流式载荷，见 compare_payload）
+    VERSION_COMPARE_BINARY = "/api/v2/version/compare/binary"
+    SYNC_BINARY = "/api/v2/sync/binary"
+    FILES_SUMMARY = "/api/v2/files/summary"
     
     # 健康检查API
     HEALTH = "/health"
@@ -305,6 +420,13 @@ def get_api_key():
     return config_manager.get_api_key()
 
 
+def get_cache_dir() -> Path:
+    """获取本地缓存目录（哈希缓存等），可用 OMEGA_CACHE_DIR 环境变量覆盖"""
+    cache_dir = Path(os.environ.get("OMEGA_CACHE_DIR") or Path.home() / ".omega_update")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
 # 测试代码
 if __name__ == "__main__":
     print("=== 公共工具模块测试 ===")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+快速文件指纹
+用文件大小 + 头/中/尾数据块的非加密哈希构成的廉价指纹，与哈希缓存配合使用：
+修改时间变化且指纹与缓存不同时，文件内容肯定已变化，可以不计算完整哈希就判定为需要传输。
+
+注意：指纹只采样文件的一部分，只能证明文件已变化，不能证明未变化。大于 3 个数据块的文件
+若只在未采样区域被修改且大小不变，指纹无法察觉，因此修改时间变化后必须重新计算完整哈希，
+不能因为指纹一致就复用缓存的SHA256。
+"""
+
+import hashlib
+import zlib
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+try:
+    import xxhash  # 可选依赖，安装后使用更快的 xxh64
+except ImportError:
+    xxhash = None
+
+# 每个采样块的大小
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+FINGERPRINT_BACKEND = "xxh64" if xxhash else "crc32"
+
+
+def _block_digest(data: bytes) -> str:
+    if xxhash:
+        return xxhash.xxh64_hexdigest(data)
+    return format(zlib.crc32(data), "08x")
+
+
+def _sample_ranges(file_size: int, block_size: int) -> List[Tuple[int, int]]:
+    """采样区间 [开始, 结束)：小文件整个文件，其余为头/中/尾三块"""
+    if file_size <= block_size * 3:
+        return [(0, file_size)]
+    middle = (file_size - block_size) // 2
+    tail = file_size - block_size
+    return [(0, block_size), (middle, middle + block_size), (tail, file_size)]
+
+
+def _format_fingerprint(file_size: int, samples: List[bytes]) -> str:
+    digests = "-".join(_block_digest(sample) for sample in samples)
+    return f"{FINGERPRINT_BACKEND}:{file_size}:{digests}"
+
+
+def quick_fingerprint(file_path: Path, file_size: int,
+                      block_size: int = FINGERPRINT_BLOCK_SIZE) -> str:
+    """
+    计算文件快速指纹
+
+    Args:
+        file_path: 文件路径
+        file_size: 文件大小（由调用方的 stat 提供，避免重复 stat）
+        block_size: 采样块大小
+
+    Returns:
+        指纹字符串，读取失败时返回空字符串
+    """
+    samples = []
+    try:
+        with open(file_path, 'rb') as f:
+            for start, end in _sample_ranges(file_size, block_size):
+                f.seek(start)
+                samples.append(f.read(end - start))
+    except OSError:
+        return ""
+    return _format_fingerprint(file_size, samples)
+
+
+def hash_with_fingerprint(file_path, file_size: int, chunk_size: int = 1024 * 1024,
+                          should_cancel: Optional[Callable[[], bool]] = None,
+                          block_size: int = FINGERPRINT_BLOCK_SIZE) -> Tuple[str, str]:
+    """
+    读取一遍文件，同时计算SHA256和快速指纹（避免为写入缓存的指纹再读一次文件）
+
+    Args:
+        file_path: 文件路径
+        file_size: 文件大小（由调用方的 stat 提供）
+        chunk_size: 读取块大小
+        should_cancel: 返回True时停止读取
+        block_size: 指纹采样块大小
+
+    Returns:
+        (SHA256, 指纹)。被取消时返回 ("", "")；实际读到的大小与 file_size 不同（文件正在被写入）时指纹为空
+
+    Raises:
+        OSError: 读取失败
+    """
+    sha256_hash = hashlib.sha256()
+    ranges = _sample_ranges(file_size, block_size)
+    samples = [bytearray() for _ in ranges]
+    position = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            if should_cancel is not None and should_cancel():
+                return "", ""
+            sha256_hash.update(chunk)
+            end_position = position + len(chunk)
+            for (start, end), sample in zip(ranges, samples):
+                if start < end_position and end > position:
+                    sample += chunk[max(start, position) - position:min(end, end_position) - position]
+            position = end_position
+    fingerprint = _format_fingerprint(file_size, [bytes(sample) for sample in samples]) if position == file_size else ""
+    return sha256_hash.hexdigest(), fingerprint
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+远程清单摘要
+只包含 路径 + 大小 + SHA256前缀 的紧凑清单，用于在扫描前判定哪些本地文件
+"肯定已变化"（路径不存在或大小不同），从而把这些文件的完整哈希推迟到真正需要时。
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.compare_payload import (
+    SUMMARY_PREFIX_SIZE, decode_manifest_summary, digest_to_bytes
+)
+
+
+class RemoteManifestSummary:
+    """远程清单摘要"""
+
+    def __init__(self, entries: Optional[Dict[str, Tuple[int, bytes]]] = None):
+        """
+        初始化清单摘要
+
+        Args:
+            entries: 相对路径到 (文件大小, SHA256前缀字节) 的映射
+        """
+        self.entries = entries or {}
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, int, str]]) -> "RemoteManifestSummary":
+        """从 (相对路径, 文件大小, SHA256十六进制) 序列构建"""
+        return cls({
+            path: (size, digest_to_bytes(sha256_hex)[:SUMMARY_PREFIX_SIZE])
+            for path, size, sha256_hex in entries
+        })
+
+    @classmethod
+    def decode(cls, chunks: Iterable[bytes]) -> "RemoteManifestSummary":
+        """从摘要载荷字节块解码"""
+        return cls({path: (size, prefix) for path, size, prefix in decode_manifest_summary(chunks)})
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, relative_path: str) -> bool:
+        return relative_path in self.entries
+
+    def is_certainly_changed(self, relative_path: str, file_size: int) -> bool:
+        """路径在远程不存在或大小不同时，文件肯定需要传输，无需哈希即可判定"""
+        entry = self.entries.get(relative_path)
+        return entry is None or entry[0] != file_size
+
+    def has_digest(self, relative_path: str, sha256_hex: str) -> bool:
+        """远程条目的SHA256前缀与给定哈希一致（远程仍是该版本）"""
+        entry = self.entries.get(relative_path)
+        if entry is None or not sha256_hex:
+            return False
+        return digest_to_bytes(sha256_hex)[:SUMMARY_PREFIX_SIZE] == entry[1]
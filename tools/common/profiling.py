@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+阶段性能分析
+只对选定阶段（scan / diff / transfer）的调用启用 cProfile，可选用 tracemalloc 统计该阶段的内存分配，
+结束时写入文件并打印耗时最多的函数和分配内存最多的代码位置。
+
+挂接在 instrumentation 上：阶段进入时决定是否采样，被采样的调用在所在线程启用该线程自己的
+cProfile（上传/下载工作线程同样可被分析），阶段退出时停用。首次调用总是采样，其余按采样率
+随机采样，生产环境中以较低采样率开启时开销有限。内存统计只在有被采样的调用进行时开启 tracemalloc，
+每段结束时记录这段时间分配且仍未释放的内存，按代码位置取各段的最大值。
+
+进程池扫描在子进程中执行，不在分析范围内。Python 3.12 起同一时刻只能有一个 cProfile 启用，
+与正在分析的调用并发的其他调用会被跳过。
+
+输出:
+    <输出路径>.prof  pstats 格式，可用 python -m pstats 或 snakeviz 等工具查看
+    <输出路径>.txt   热点函数和内存分配位置摘要（同时打印）
+"""
+
+import cProfile
+import io
+import pstats
+import random
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common import instrumentation
+from tools.common.instrumentation import Instrumentation, get_instrumentation
+
+# 可分析的阶段及其包含的计时阶段
+PROFILE_PHASES = {
+    "scan": ("walk", "hash", "scan"),
+    "diff": ("manifest", "compare", "diff"),
+    "transfer": ("upload", "commit", "download", "verify", "reuse", "extract"),
+}
+
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_TOP = 20
+
+# 分析器自身的代码，不计入热点函数和内存分配位置
+_OWN_FILES = (__file__, instrumentation.__file__)
+
+
+class _ThreadState(threading.local):
+    """线程内状态：嵌套深度、当前调用是否被采样、本线程的分析器"""
+
+    def __init__(self):
+        self.depth = 0
+        self.sampled = False
+        self.profile: Optional[cProfile.Profile] = None
+
+
+class PhaseProfiler:
+    """选定阶段的采样性能分析"""
+
+    def __init__(self, phase: str, output: str, sample_rate: float = DEFAULT_SAMPLE_RATE,
+                 memory: bool = False, top: int = DEFAULT_TOP,
+                 metrics: Optional[Instrumentation] = None):
+        """
+        Args:
+            phase: 阶段，见 PROFILE_PHASES
+            output: 输出路径（不含扩展名，写入 .prof 和 .txt）
+            sample_rate: 采样率（0-1），首次调用总是采样
+            memory: 是否统计内存分配（tracemalloc）
+            top: 摘要中列出的条目数
+            metrics: 统计对象，默认进程内共享的对象
+        """
+        if phase not in PROFILE_PHASES:
+            raise ValueError(f"不支持的分析阶段: {phase}")
+        self.phase = phase
+        self.output = Path(output)
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.memory = memory
+        self.top = top
+        self.metrics = metrics or get_instrumentation()
+        self.calls = 0
+        self.sampled_calls = 0
+        self.peak_memory = 0
+        self._names = frozenset(PROFILE_PHASES[phase])
+        self._state = _ThreadState()
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._memory_active = 0
+        self._allocations: Dict[Tuple[str, int], List[int]] = {}  # (文件, 行号) -> [字节数, 块数]
+
+    @property
+    def prof_path(self) -> Path:
+        return self.output.with_suffix(".prof")
+
+    @property
+    def summary_path(self) -> Path:
+        return self.output.with_suffix(".txt")
+
+    def start(self):
+        """挂接到统计对象（未开启统计时同时开启）"""
+        if not self.metrics.enabled:
+            self.metrics.enable()
+        self.metrics.profiler = self
+
+    # ------------------------------------------------------------------
+    # instrumentation 回调
+
+    def enter(self, name: str) -> Optional[bool]:
+        """阶段进入，返回令牌（None 表示不属于分析的阶段）"""
+        if name not in self._names:
+            return None
+        state = self._state
+        state.depth += 1
+        if state.depth > 1:
+            # 嵌套在同组阶段中，跟随外层调用
+            return True
+
+        with self._lock:
+            self.calls += 1
+            sampled = self.calls == 1 or self._random.random() < self.sample_rate
+        state.sampled = False
+        if not sampled:
+            return True
+
+        if state.profile is None:
+            state.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(state.profile)
+        try:
+            state.profile.enable()
+        except ValueError:
+            # 其他线程的分析器正在运行（Python 3.12+）
+            return True
+        state.sampled = True
+        with self._lock:
+            self.sampled_calls += 1
+        if self.memory:
+            self._memory_enter()
+        return True
+
+    def exit(self, token: bool):
+        """阶段退出"""
+        state = self._state
+        state.depth -= 1
+        if state.depth or not state.sampled:
+            return
+        state.profile.disable()
+        state.sampled = False
+        if self.memory:
+            self._memory_exit()
+
+    # ------------------------------------------------------------------
+    # 内存分配
+
+    def _memory_enter(self):
+        with self._lock:
+            if self._memory_active == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._memory_active += 1
+
+    def _memory_exit(self):
+        with self._lock:
+            self._memory_active -= 1
+            if self._memory_active == 0:
+                self._collect_memory()
+
+    def _collect_memory(self):
+        """记录本段分配且仍未释放的内存并停止跟踪（调用方持有锁）"""
+        if not tracemalloc.is_tracing():
+            return
+        self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            *(tracemalloc.Filter(False, filename) for filename in _OWN_FILES),
+        ])
+        tracemalloc.stop()
+        for stat in snapshot.statistics("lineno"):
+            frame = stat.traceback[0]
+            largest = self._allocations.setdefault((frame.filename, frame.lineno), [0, 0])
+            if stat.size > largest[0]:
+                largest[:] = [stat.size, stat.count]
+
+    # ------------------------------------------------------------------
+    # 结果
+
+    def stop(self) -> str:
+        """
+        停止分析，写入结果文件
+
+        Returns:
+            摘要文本
+        """
+        if self.metrics.profiler is self:
+            self.metrics.profiler = None
+        with self._lock:
+            if self._memory_active:
+                # 阶段仍在进行（例如被取消）时也汇总已有的数据
+                self._memory_active = 0
+                self._collect_memory()
+
+        summary = self.format_summary()
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        stats = self._stats()
+        if stats is not None:
+            stats.dump_stats(str(self.prof_path))
+        with open(self.summary_path, "w", encoding="utf-8") as f:
+            f.write(summary + "\n")
+        return summary
+
+    def _stats(self) -> Optional[pstats.Stats]:
+        stats = None
+        for profile in self._profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile, stream=io.StringIO())
+            else:
+                stats.add(profile)
+        return stats
+
+    def format_summary(self) -> str:
+        """热点函数和内存分配位置摘要"""
+        lines = [
+            f"性能分析: 阶段 {self.phase}（{'/'.join(sorted(self._names))}），"
+            f"采样 {self.sampled_calls}/{self.calls} 次调用，采样率 {self.sample_rate:.0%}"
+        ]
+        stats = self._stats()
+        if stats is None:
+            lines.append("没有采样到该阶段的调用")
+        else:
+            lines.append(f"\n热点函数（按自身耗时前 {self.top}）:")
+            lines.append(f"{'自身(秒)':>10}{'累计(秒)':>10}{'调用次数':>10}  函数")
+            entries = sorted(((key, value) for key, value in stats.stats.items()
+                              if key[0] not in _OWN_FILES and "_lsprof" not in key[2]),
+                             key=lambda item: item[1][2], reverse=True)
+            for (filename, lineno, function), (_, calls, own, cumulative, _) in entries[:self.top]:
+                location = f"{filename}:{lineno}({function})" if lineno else function
+                lines.append(f"{own:>10.3f}{cumulative:>10.3f}{calls:>10}  {location}")
+
+        if self.memory:
+            lines.append(f"\n内存分配位置（阶段结束时仍未释放，各次中的最大值，前 {self.top}；"
+                         f"峰值 {self.peak_memory / 1024 / 1024:.1f} MB）:")
+            lines.append(f"{'KB':>10}{'块数':>10}  位置")
+            allocations = sorted(self._allocations.items(), key=lambda item: item[1][0], reverse=True)
+            for (filename, lineno), (size, count) in allocations[:self.top]:
+                lines.append(f"{size / 1024:>10.1f}{count:>10}  {filename}:{lineno}")
+        return "\n".join(lines)
+
+
+def add_profile_arguments(parser):
+    """为命令行工具添加性能分析参数"""
+    group = parser.add_argument_group("性能分析")
+    group.add_argument('--profile-phase', choices=sorted(PROFILE_PHASES),
+                       help='对该阶段启用 cProfile 采样分析（scan 扫描 / diff 差异对比 / transfer 传输）')
+    group.add_argument('--profile-output', default='omega_profile',
+                       help='分析结果路径（写入 .prof 和 .txt），默认 omega_profile')
+    group.add_argument('--profile-sample', type=float, default=DEFAULT_SAMPLE_RATE,
+                       help=f'采样率（0-1），默认 {DEFAULT_SAMPLE_RATE}，首次调用总是采样')
+    group.add_argument('--profile-memory', action='store_true', help='同时用 tracemalloc 统计内存分配')
+
+
+def profiler_from_args(args) -> Optional[PhaseProfiler]:
+    """按命令行参数创建并启动分析器，未指定 --profile-phase 时返回None"""
+    if not args.profile_phase:
+        return None
+    profiler = PhaseProfiler(args.profile_phase, args.profile_output, args.profile_sample,
+                             args.profile_memory)
+    profiler.start()
+    return profiler
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+进度聚合
+数据路径（每个读写块）只对计数器做加法，由采样线程按 AppConstants.PROGRESS_UPDATE_INTERVAL
+定时读取计数、计算速度和剩余时间并调用回调；高频的逐文件回调用 CoalescingCallback 合并。
+上传和下载共用。
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.common_utils import AppConstants
+
+DEFAULT_INTERVAL = AppConstants.PROGRESS_UPDATE_INTERVAL / 1000
+
+# 速度的指数滑动平均系数
+SPEED_SMOOTHING = 0.3
+
+
+class ProgressCounter:
+    """
+    无锁计数器
+
+    每个线程只写自己的槽位（单写者，不会丢失更新），读取时对所有槽位求和。
+    """
+
+    def __init__(self):
+        self._slots: Dict[int, int] = {}
+
+    def add(self, amount: int = 1):
+        """累加计数（只在调用线程自己的槽位上操作）"""
+        ident = threading.get_ident()
+        self._slots[ident] = self._slots.get(ident, 0) + amount
+
+    @property
+    def value(self) -> int:
+        """当前总计数"""
+        return sum(list(self._slots.values()))
+
+    def reset(self):
+        """清零（只应在没有写者时调用）"""
+        self._slots = {}
+
+
+@dataclass
+class ProgressSnapshot:
+    """进度快照"""
+    done_bytes: int
+    total_bytes: int
+    done_items: int
+    total_items: int
+    message: str
+    speed: float  # bytes/sec
+    eta_seconds: int
+
+    @property
+    def fraction(self) -> float:
+        """完成比例 0.0 - 1.0，优先按字节计算"""
+        if self.total_bytes > 0:
+            return min(1.0, self.done_bytes / self.total_bytes)
+        if self.total_items > 0:
+            return min(1.0, self.done_items / self.total_items)
+        return 0.0
+
+
+class ProgressAggregator:
+    """采样式进度聚合器"""
+
+    def __init__(self, callback: Callable[[ProgressSnapshot], None], interval: float = DEFAULT_INTERVAL):
+        """
+        初始化进度聚合器
+
+        Args:
+            callback: 采样回调，在采样线程中调用
+            interval: 采样间隔（秒）
+        """
+        self.callback = callback
+        self.interval = interval
+        self.done_bytes = ProgressCounter()
+        self.done_items = ProgressCounter()
+        self.total_bytes = 0
+        self.total_items = 0
+        self.message = ""
+
+        self._speed = 0.0
+        self._last_time = 0.0
+        self._last_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._emit_lock = threading.Lock()
+
+    def reset(self):
+        """清零计数和总量（开始新一轮传输前调用）"""
+        self.done_bytes.reset()
+        self.done_items.reset()
+        self.total_bytes = 0
+        self.total_items = 0
+        self.message = ""
+        self._speed = 0.0
+        self._last_time = time.monotonic()
+        self._last_bytes = 0
+
+    def add_total(self, total_bytes: int = 0, total_items: int = 0):
+        """追加总量（流式传输时总量逐步增加）"""
+        self.total_bytes += total_bytes
+        self.total_items += total_items
+
+    def snapshot(self) -> ProgressSnapshot:
+        """读取当前进度并更新速度估计"""
+        now = time.monotonic()
+        done = self.done_bytes.value
+        elapsed = now - self._last_time
+        if elapsed > 0:
+            instant = max(0, done - self._last_bytes) / elapsed
+            self._speed = instant if self._speed == 0 else (
+                SPEED_SMOOTHING * instant + (1 - SPEED_SMOOTHING) * self._speed)
+            self._last_time = now
+            self._last_bytes = done
+
+        remaining = max(0, self.total_bytes - done)
+        eta = int(remaining / self._speed) if self._speed > 0 else 0
+        return ProgressSnapshot(
+            done_bytes=done,
+            total_bytes=self.total_bytes,
+            done_items=self.done_items.value,
+            total_items=self.total_items,
+            message=self.message,
+            speed=self._speed,
+            eta_seconds=eta
+        )
+
+    def emit(self):
+        """立即采样并调用回调"""
+        with self._emit_lock:
+            snapshot = self.snapshot()
+        try:
+            self.callback(snapshot)
+        except Exception as e:
+            print(f"进度回调函数错误: {e}")
+
+    def start(self):
+        """启动采样线程"""
+        if self._thread is not None:
+            return
+        self._last_time = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, final_emit: bool = True):
+        """停止采样线程，默认再发出一次最终进度"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            if thread is not threading.current_thread():
+                thread.join()
+        if final_emit:
+            self.emit()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.emit()
+
+
+class CoalescingCallback:
+    """
+    合并高频回调：同一间隔内的多次调用只转发第一次，其余只保留最新参数，
+    下一次到期的调用或 flush 时转发最新参数。
+    """
+
+    def __init__(self, callback: Optional[Callable], interval: float = DEFAULT_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self._next_due = 0.0
+        self._pending: Optional[tuple] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_due:
+                self._pending = args
+                return
+            self._next_due = now + self.interval
+            self._pending = None
+        self.callback(*args)
+
+    def flush(self):
+        """转发被合并掉的最新一次调用"""
+        with self._lock:
+            args, self._pending = self._pending, None
+        if args is not None and self.callback is not None:
+            self.callback(*args)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+传输限速
+令牌桶限速器：所有并发传输共享一个全局桶，每个传输（一次上传或下载会话）另有自己的桶，
+发送/接收每个数据块前同时从两个桶预约令牌。限速值可在运行时调整，下一个数据块即生效。
+
+预约可以透支，等待时间按透支量计算，先到先得；各传输每次只预约一个数据块，
+因此共享全局带宽时按数据块轮流推进，带宽在并发传输间公平分配。
+
+配置（服务器配置文件的 "transfer" 节，单位 KB/s，0 表示不限速）:
+    "transfer": {"global_limit_kbps": 2048, "per_transfer_limit_kbps": 0}
+"""
+
+import io
+import threading
+import time
+import uuid
+import weakref
+from typing import BinaryIO, Dict, Optional
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.common_utils import get_config
+from tools.common.transfer_control import TransferCancelled, TransferControl
+
+UNLIMITED = 0
+
+# 限速粒度：每次预约的最大字节数
+THROTTLE_CHUNK_SIZE = 64 * 1024
+
+# 允许的突发量（按当前速率计算的秒数）
+BURST_SECONDS = 0.25
+
+
+class TokenBucket:
+    """令牌桶（单位: 字节/秒）"""
+
+    def __init__(self, rate: float = UNLIMITED):
+        self._lock = threading.Lock()
+        self._rate = 0.0
+        self._capacity = 0.0
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate: float):
+        """调整速率，0 表示不限速"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._rate = max(0.0, float(rate or 0))
+            self._capacity = max(self._rate * BURST_SECONDS, THROTTLE_CHUNK_SIZE)
+            if self._rate <= 0:
+                self._tokens = 0.0
+            self._tokens = min(self._tokens, self._capacity)
+
+    def reserve(self, amount: int) -> float:
+        """
+        预约令牌
+
+        Args:
+            amount: 字节数
+
+        Returns:
+            需要等待的秒数（不限速时为0）
+        """
+        if self._rate <= 0:
+            return 0.0
+        with self._lock:
+            if self._rate <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            return -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+    def _refill(self, now: float):
+        if self._rate > 0:
+            self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+        self._last = now
+
+
+class TransferThrottle:
+    """单个传输的限速器，同时受全局桶约束"""
+
+    def __init__(self, limiter: "RateLimiter", rate: Optional[float]):
+        self._limiter = limiter
+        self._follows_default = rate is None
+        self.bucket = TokenBucket(limiter.per_transfer_limit if rate is None else rate)
+
+    def set_rate(self, rate: float):
+        """单独调整本传输的速率（之后不再跟随默认的单传输限速）"""
+        self._follows_default = False
+        self.bucket.set_rate(rate)
+
+    def throttle(self, amount: int, control: Optional[TransferControl] = None) -> bool:
+        """
+        为 amount 字节预约带宽并等待
+
+        Args:
+            amount: 字节数
+            control: 传输控制对象，等待期间取消时立即返回
+
+        Returns:
+            是否继续传输
+        """
+        wait = max(self.bucket.reserve(amount), self._limiter.global_bucket.reserve(amount))
+        if wait <= 0:
+            return True
+        if control is not None:
+            return control.sleep(wait)
+        time.sleep(wait)
+        return True
+
+
+class RateLimiter:
+    """全局限速器（单位: 字节/秒）"""
+
+    def __init__(self, global_limit: float = UNLIMITED, per_transfer_limit: float = UNLIMITED):
+        self.global_bucket = TokenBucket(global_limit)
+        self.per_transfer_limit = per_transfer_limit
+        self._transfers: "weakref.WeakSet[TransferThrottle]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def set_limits(self, global_limit: Optional[float] = None, per_transfer_limit: Optional[float] = None):
+        """运行时调整限速，None 表示不修改；已开始的传输也会立即采用新的单传输限速"""
+        if global_limit is not None:
+            self.global_bucket.set_rate(global_limit)
+        if per_transfer_limit is not None:
+            with self._lock:
+                self.per_transfer_limit = per_transfer_limit
+                transfers = list(self._transfers)
+            for transfer in transfers:
+                if transfer._follows_default:
+                    transfer.bucket.set_rate(per_transfer_limit)
+
+    def open_transfer(self, rate: Optional[float] = None) -> TransferThrottle:
+        """
+        开始一个传输
+
+        Args:
+            rate: 本传输的速率，None 表示使用默认的单传输限速
+        """
+        transfer = TransferThrottle(self, rate)
+        with self._lock:
+            self._transfers.add(transfer)
+        return transfer
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取进程内共享的限速器（首次调用时按配置初始化）"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            transfer_config = get_config().get("transfer", {})
+            _rate_limiter = RateLimiter(
+                transfer_config.get("global_limit_kbps", UNLIMITED) * 1024,
+                transfer_config.get("per_transfer_limit_kbps", UNLIMITED) * 1024
+            )
+        return _rate_limiter
+
+
+class ThrottledReader:
+    """按块读取文件并限速的只读流"""
+
+    def __init__(self, fileobj: BinaryIO, throttle: Optional[TransferThrottle],
+                 control: Optional[TransferControl] = None, length: Optional[int] = None):
+        """length: 内容长度，给出时 requests 发送 Content-Length 而不是分块传输编码"""
+        self._fileobj = fileobj
+        self._throttle = throttle
+        self._control = control
+        if length is not None:
+            self.len = length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0 or size > THROTTLE_CHUNK_SIZE:
+            size = THROTTLE_CHUNK_SIZE
+        if self._control is not None and not self._control.checkpoint():
+            raise TransferCancelled()
+        data = self._fileobj.read(size)
+        if data and self._throttle is not None and not self._throttle.throttle(len(data), self._control):
+            raise TransferCancelled()
+        return data
+
+
+class MultipartBody:
+    """
+    流式 multipart/form-data 请求体：若干表单字段加一个文件，文件部分按块读取并限速，
+    不把整个文件读入内存。作为 requests 的 data 参数使用，需同时设置 Content-Type 头。
+    """
+
+    def __init__(self, fields: Dict[str, str], file_field: str, filename: str,
+                 fileobj: BinaryIO, file_size: int,
+                 throttle: Optional[TransferThrottle] = None,
+                 control: Optional[TransferControl] = None,
+                 file_content_type: str = "application/octet-stream"):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+
+        head = io.BytesIO()
+        for name, value in fields.items():
+            head.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n".encode("utf-8"))
+            head.write(str(value).encode("utf-8"))
+            head.write(b"\r\n")
+        filename = filename.replace('"', "%22")
+        head.write((f"--{boundary}\r\nContent-Disposition: form-data; name=\"{file_field}\"; "
+                    f"filename=\"{filename}\"\r\nContent-Type: {file_content_type}\r\n\r\n").encode("utf-8"))
+        tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+        self.len = head.tell() + file_size + len(tail)
+        head.seek(0)
+        self._parts = [head, ThrottledReader(fileobj, throttle, control), io.BytesIO(tail)]
+
+    def __len__(self) -> int:
+        return self.len
+
+    def read(self, size: int = -1) -> bytes:
+        while self._parts:
+            data = self._parts[0].read(size)
+            if data:
+                return data
+            self._parts.pop(0)
+        return b""
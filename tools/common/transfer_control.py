@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+传输控制
+上传和下载共用的暂停/恢复/取消原语。一个传输的所有工作线程共享同一个 TransferControl，
+暂停、恢复和取消对整组线程同时生效，并立即唤醒等待中的线程（不再轮询）。
+
+数据路径每个块调用一次 checkpoint()：未暂停时只读两个布尔值，不加锁。
+"""
+
+import threading
+
+
+class TransferCancelled(Exception):
+    """传输在数据流中途被取消"""
+
+    def __init__(self, message: str = "传输已取消"):
+        super().__init__(message)
+
+
+class TransferControl:
+    """暂停/恢复/取消控制"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._paused = False
+        self._cancelled = False
+
+    @property
+    def is_paused(self) -> bool:
+        return self._paused
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def reset(self):
+        """恢复初始状态（开始新一轮传输前调用）"""
+        with self._condition:
+            self._paused = False
+            self._cancelled = False
+            self._condition.notify_all()
+
+    def pause(self):
+        """暂停：工作线程在下一个 checkpoint 处阻塞"""
+        with self._condition:
+            if not self._cancelled:
+                self._paused = True
+
+    def resume(self):
+        """恢复：立即唤醒所有被暂停的工作线程"""
+        with self._condition:
+            self._paused = False
+            self._condition.notify_all()
+
+    def cancel(self):
+        """取消：立即唤醒所有等待中的工作线程，checkpoint 返回 False"""
+        with self._condition:
+            self._cancelled = True
+            self._paused = False
+            self._condition.notify_all()
+
+    def checkpoint(self) -> bool:
+        """
+        工作线程的检查点：暂停时阻塞直到恢复或取消
+
+        Returns:
+            是否继续传输（已取消时返回False）
+        """
+        if self._paused:
+            with self._condition:
+                while self._paused and not self._cancelled:
+                    self._condition.wait()
+        return not self._cancelled
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        可被取消打断的等待（用于重试间隔等）
+
+        Returns:
+            是否继续传输（等待期间被取消时立即返回False）
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._cancelled, timeout=seconds)
+        return self.checkpoint()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+传输调度
+按优先级类别和文件大小排列待传输文件，使并行传输的总完成时间（makespan）最短:
+    1. 优先级类别：可执行文件和配置文件先于其他文件（资源文件等）
+    2. 同一类别内按大小降序（LPT，最长处理时间优先）：大文件尽早开始，
+       小文件排在最后，由先空闲的工作线程取走，填平各线程结束时间的差距
+
+工作线程从同一个队列按顺序取任务（列表调度），因此只需决定顺序。
+流式场景（文件陆续加入）使用 ScheduledQueue，在已加入的文件中按同样的顺序取出。
+
+剩余时间的估计同时考虑总量和收尾：剩余字节数按总速率计算，但不会短于最大的
+进行中文件按单线程速率完成所需的时间（大文件最后单独传输时其他线程已空闲）。
+"""
+
+import fnmatch
+import itertools
+import queue
+from typing import Callable, Generic, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 优先级类别（按顺序），未匹配的文件属于最后一类
+PRIORITY_PATTERNS: Sequence[Sequence[str]] = (
+    # 可执行文件和配置文件
+    ('*.exe', '*.dll', '*.so', '*.dylib', '*.bat', '*.cmd', '*.sh', '*.py',
+     '*.json', '*.ini', '*.cfg', '*.conf', '*.config', '*.yaml', '*.yml', '*.xml', '*.toml'),
+)
+
+
+def priority_class(relative_path: str) -> int:
+    """文件的优先级类别，数值越小越先传输"""
+    name = relative_path.rsplit('/', 1)[-1].lower()
+    for index, patterns in enumerate(PRIORITY_PATTERNS):
+        if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            return index
+    return len(PRIORITY_PATTERNS)
+
+
+def schedule_key(relative_path: str, file_size: int) -> Tuple[int, int]:
+    """排序键：(优先级类别, -文件大小)"""
+    return priority_class(relative_path), -file_size
+
+
+def schedule(items: Iterable[T], path_of: Callable[[T], str], size_of: Callable[[T], int]) -> List[T]:
+    """
+    排列待传输文件
+
+    Args:
+        items: 待传输项
+        path_of: 取相对路径
+        size_of: 取文件大小
+
+    Returns:
+        按调度顺序排列的列表
+    """
+    return sorted(items, key=lambda item: schedule_key(path_of(item), size_of(item)))
+
+
+def predict_remaining_seconds(remaining_bytes: int, active_remaining: Sequence[int], speed: float) -> int:
+    """
+    估计并行传输的剩余时间
+
+    Args:
+        remaining_bytes: 剩余总字节数
+        active_remaining: 各进行中文件的剩余字节数
+        speed: 当前总速率（bytes/sec）
+
+    Returns:
+        剩余秒数，速率未知时为0
+    """
+    if speed <= 0:
+        return 0
+    total_bound = remaining_bytes / speed
+    if not active_remaining:
+        return int(total_bound)
+    # 进行中的传输平分总速率
+    per_transfer_speed = speed / len(active_remaining)
+    tail_bound = max(active_remaining) / per_transfer_speed
+    return int(max(total_bound, tail_bound))
+
+
+class ScheduledQueue(Generic[T]):
+    """
+    按调度顺序出队的线程安全队列（文件陆续加入的流式场景）
+
+    close() 之后所有等待中的 get() 返回 None。
+    """
+
+    _END = (float("inf"), 0)
+
+    def __init__(self, path_of: Callable[[T], str], size_of: Callable[[T], int], maxsize: int = 0):
+        self._path_of = path_of
+        self._size_of = size_of
+        self._queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue(maxsize)
+        self._sequence = itertools.count()
+
+    def put(self, item: T):
+        """加入一个文件（队列满时阻塞）"""
+        key = schedule_key(self._path_of(item), self._size_of(item))
+        self._queue.put((key, next(self._sequence), item))
+
+    def close(self, consumers: int = 1):
+        """表示不再加入文件；已加入的文件全部取出后，每个消费者收到一个 None"""
+        for _ in range(consumers):
+            self._queue.put((self._END, next(self._sequence), None))
+
+    def get(self) -> Optional[T]:
+        """取出下一个文件，队列关闭且取空后返回 None"""
+        _, _, item = self._queue.get()
+        return item
+
+    def qsize(self) -> int:
+        """队列中的文件数（近似值，含关闭标记）"""
+        return self._queue.qsize()
+
+    def __iter__(self):
+        return iter(self.get, None)
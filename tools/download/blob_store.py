@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+本地内容寻址存储
+以 SHA-256 为键保存下载过的文件，切换版本类型（stable / beta / alpha）或版本时，
+内容相同的文件直接从本地取出，不再下载:
+    - 加入和取出都使用 reflink（写时复制克隆），文件系统不支持时复制
+    - 不使用硬链接：安装目录中的文件可能被原地修改，共享数据会让存储和其他安装目录一起被改坏
+    - 总大小超过上限时按最近使用时间淘汰（LRU）
+
+默认不启用，需在配置中设置 download.blob_store_max_mb（不支持 reflink 时存储会额外占用同样大小的空间）。
+每个条目记录大小和修改时间，取出前核对，存储中的文件被改动过时丢弃该条目。
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.common_utils import get_cache_dir, get_config
+
+# 启用时的默认总大小上限
+DEFAULT_MAX_MB = 2048
+
+# Linux 的 FICLONE ioctl（btrfs、xfs 等支持 reflink 的文件系统）
+FICLONE = 0x40049409
+
+
+class BlobStore:
+    """基于SHA-256的本地文件存储，索引保存在SQLite中"""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        """
+        打开本地存储
+
+        Args:
+            root: 存储目录，默认位于本地缓存目录
+            max_bytes: 总大小上限（字节）
+        """
+        self.root = Path(root) if root else get_cache_dir() / "blobs"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / "blobs.db"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " sha256 TEXT PRIMARY KEY, file_size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(file_size), 0) FROM blobs").fetchone()[0]
+
+    @classmethod
+    def from_config(cls) -> Optional["BlobStore"]:
+        """按配置 download.blob_store_max_mb 创建，未配置或上限为0时不使用本地存储"""
+        max_mb = get_config().get("download", {}).get("blob_store_max_mb", 0)
+        if not max_mb or max_mb <= 0:
+            return None
+        return cls(max_bytes=int(max_mb * 1024 * 1024))
+
+    @property
+    def total_bytes(self) -> int:
+        """已保存内容的总大小"""
+        return self._total
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    def contains(self, sha256: str, file_size: int) -> bool:
+        """是否保存了该内容"""
+        return self._valid_blob(sha256, file_size) is not None
+
+    def materialize(self, sha256: str, file_size: int, dest: Path) -> bool:
+        """
+        把保存的内容放到目标路径（目标已存在时替换）
+
+        Args:
+            sha256: 内容哈希
+            file_size: 文件大小
+            dest: 目标路径
+
+        Returns:
+            是否成功（未保存该内容时返回False）
+        """
+        blob = self._valid_blob(sha256, file_size)
+        if blob is None:
+            return False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        temp = dest.with_name(dest.name + ".blob_tmp")
+        try:
+            if temp.exists():
+                temp.unlink()
+            _clone_or_copy(blob, temp)
+            os.replace(temp, dest)
+        except OSError:
+            if temp.exists():
+                temp.unlink()
+            return False
+        with self._lock:
+            self._conn.execute("UPDATE blobs SET last_used = ? WHERE sha256 = ?", (time.time(), sha256))
+            self._conn.commit()
+        return True
+
+    def add(self, sha256: str, source: Path):
+        """
+        保存已校验的文件（已保存时只更新使用时间）
+
+        Args:
+            sha256: 文件内容的哈希（调用方已校验）
+            source: 文件路径
+        """
+        if not sha256 or self.max_bytes <= 0:
+            return
+        stat = source.stat()
+        if stat.st_size > self.max_bytes:
+            return
+        if self._valid_blob(sha256, stat.st_size) is not None:
+            with self._lock:
+                self._conn.execute("UPDATE blobs SET last_used = ? WHERE sha256 = ?", (time.time(), sha256))
+                self._conn.commit()
+            return
+
+        blob = self._blob_path(sha256)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        temp = blob.with_name(f"{blob.name}.{threading.get_ident()}.tmp")
+        try:
+            _clone_or_copy(source, temp)
+            os.replace(temp, blob)
+        except OSError:
+            if temp.exists():
+                temp.unlink()
+            return
+        blob_stat = blob.stat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)",
+                (sha256, blob_stat.st_size, blob_stat.st_mtime_ns, time.time())
+            )
+            self._conn.commit()
+            self._total += blob_stat.st_size
+            self._evict()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _valid_blob(self, sha256: str, file_size: int) -> Optional[Path]:
+        """条目存在且文件未被修改时返回路径，否则丢弃条目并返回None"""
+        if not sha256:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_size, mtime_ns FROM blobs WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        if row is None or row[0] != file_size:
+            return None
+        blob = self._blob_path(sha256)
+        try:
+            stat = blob.stat()
+            if stat.st_size == row[0] and stat.st_mtime_ns == row[1]:
+                return blob
+        except OSError:
+            pass
+        with self._lock:
+            self._remove(sha256, row[0])
+            self._conn.commit()
+        return None
+
+    def _evict(self):
+        """按最近使用时间淘汰，直到总大小不超过上限（调用方持有锁）"""
+        if self._total <= self.max_bytes:
+            return
+        for sha256, file_size in self._conn.execute(
+                "SELECT sha256, file_size FROM blobs ORDER BY last_used").fetchall():
+            if self._total <= self.max_bytes:
+                break
+            self._remove(sha256, file_size)
+        self._conn.commit()
+
+    def _remove(self, sha256: str, file_size: int):
+        """删除条目和文件（调用方持有锁）"""
+        cursor = self._conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        if cursor.rowcount:
+            self._total -= file_size
+        try:
+            self._blob_path(sha256).unlink()
+        except OSError:
+            pass
+
+
+def _clone_or_copy(source: Path, dest: Path):
+    """reflink，不支持时复制（两者都得到独立的文件，修改一方不影响另一方）"""
+    if sys.platform.startswith("linux"):
+        try:
+            import fcntl
+            with open(source, "rb") as src, open(dest, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            if dest.exists():
+                dest.unlink()
+    shutil.copyfile(source, dest)
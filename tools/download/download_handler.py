@@ -4,18 +4,26 @@
 处理文件下载、更新检查等核心业务逻辑
 """
 
+import os
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
 from typing import Dict, List, Optional, Callable
 from pathlib import Path
 
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from tools.common.adaptive_concurrency import AdaptiveConcurrency
 from tools.common.common_utils import (
-    get_server_url, get_api_key, LogManager, ValidationUtils
+    get_config, get_server_url, get_api_key, LogManager, ValidationUtils
 )
 from tools.download.local_file_scanner import LocalFileScanner, FileInfo
-from tools.common.difference_detector import DifferenceDetector, UpdatePlan
+from tools.common.difference_detector import ChangeType, DifferenceDetector, FileChange, UpdatePlan
+from tools.common.hash_cache import HashCache
+from tools.common.manifest_summary import RemoteManifestSummary
+from tools.common.progress import CoalescingCallback
 from tools.download.download_manager import DownloadManager, DownloadStatus
 
 
@@ -33,13 +41,16 @@ class LocalFileScanHandler:
         self.scanner = None
         self.scan_results = {}
 
-    def start_scan(self, folder_path: str, progress_callback: Optional[Callable] = None) -> bool:
+    def start_scan(self, folder_path: str, progress_callback: Optional[Callable] = None,
+                   summary_provider: Optional[Callable[[], Optional[RemoteManifestSummary]]] = None) -> bool:
         """
         开始扫描本地文件
 
         Args:
             folder_path: 文件夹路径
             progress_callback: 进度回调函数
+            summary_provider: 远程清单摘要提供函数，在扫描线程中调用；
+                              返回摘要时只对可能未变化的文件计算哈希
 
         Returns:
             是否成功启动扫描
@@ -57,14 +68,22 @@ class LocalFileScanHandler:
         # 在新线程中扫描文件
         def scan_thread():
             try:
-                def internal_progress_callback(current, total, current_file):
+                # 逐文件回调和日志按间隔合并，避免每个文件写一行日志
+                def report_progress(current, total, current_file):
                     if progress_callback:
                         progress_callback(current, total, current_file)
                     if self.log_manager:
-                        self.log_manager.log_info(f"扫描进度: {current}/{total} - {current_file}")
+                        self.log_manager.log_debug(f"扫描进度: {current}/{total} - {current_file}")
+
+                internal_progress_callback = CoalescingCallback(report_progress)
+
+                remote_summary = summary_provider() if summary_provider else None
+                if remote_summary is not None and self.log_manager:
+                    self.log_manager.log_info(f"预检模式: 远程清单共 {len(remote_summary)} 个文件")
 
                 self.scanner = LocalFileScanner(internal_progress_callback)
-                self.scan_results = self.scanner.scan_directory(folder_path)
+                self.scan_results = self.scanner.scan_directory(folder_path, remote_summary=remote_summary)
+                internal_progress_callback.flush()
 
                 if self.log_manager:
                     self.log_manager.log_info(f"扫描完成，共找到 {len(self.scan_results)} 个文件")
@@ -182,6 +201,15 @@ class DownloadController:
         self.download_manager = None
         self.is_downloading = False
 
+    def _create_download_manager(self, progress_callback: Optional[Callable]) -> DownloadManager:
+        """创建下载管理器，并发数按配置的 transfer 节自适应调节"""
+        def log_concurrency(limit: int, reason: str):
+            if self.log_manager:
+                self.log_manager.log_info(f"下载并发数调整为 {limit}（{reason}）")
+
+        concurrency = AdaptiveConcurrency.from_config(get_config().get("transfer", {}), log_concurrency)
+        return DownloadManager(get_server_url(), get_api_key(), progress_callback, concurrency)
+
     def start_download(self, update_plan: UpdatePlan, target_directory: str,
                       selected_files: Optional[List[str]] = None,
                       progress_callback: Optional[Callable] = None) -> bool:
@@ -215,9 +243,7 @@ class DownloadController:
             return False
 
         try:
-            self.download_manager = DownloadManager(
-                get_server_url(), get_api_key(), progress_callback
-            )
+            self.download_manager = self._create_download_manager(progress_callback)
 
             success = self.download_manager.start_download(
                 update_plan, target_directory, selected_files
@@ -238,6 +264,35 @@ class DownloadController:
                 self.log_manager.log_error(f"启动下载失败: {e}")
             return False
 
+    def start_streaming_download(self, update_plan: UpdatePlan, target_directory: str,
+                                 progress_callback: Optional[Callable] = None,
+                                 delete_extra: bool = False) -> Optional[DownloadManager]:
+        """
+        开始流式下载，文件由调用方通过返回的下载管理器逐个加入
+
+        Args:
+            update_plan: 更新计划（逐步填充）
+            target_directory: 目标目录
+            progress_callback: 进度回调函数
+            delete_extra: 全部成功后删除计划中的本地多余文件
+
+        Returns:
+            下载管理器，无法开始时返回None
+        """
+        if self.is_downloading:
+            if self.log_manager:
+                self.log_manager.log_warning("已有下载任务在进行")
+            return None
+
+        self.download_manager = self._create_download_manager(progress_callback)
+        if not self.download_manager.start_streaming_download(update_plan, target_directory, delete_extra):
+            return None
+
+        self.is_downloading = True
+        if self.log_manager:
+            self.log_manager.log_info("开始流式下载...")
+        return self.download_manager
+
     def pause_download(self):
         """暂停下载"""
         if self.download_manager:
@@ -271,6 +326,209 @@ class DownloadController:
         return self.download_manager
 
 
+class StreamingUpdater:
+    """
+    流式更新器：边检查边下载
+
+    先获取远程清单，再逐个检查本地对应文件：本地不存在或大小不同的文件立即加入下载队列，
+    大小相同的文件交给哈希线程池确认（复用哈希缓存），更新计划随之逐步构建。
+    下载在第一个差异文件确定后就开始，不必等待整个安装目录哈希完成。
+    指定 delete_extra 时，本地独有的文件在全部下载成功后删除（暂存模式下随切换一起删除）。
+    """
+
+    def __init__(self, update_checker: UpdateChecker, download_controller: DownloadController,
+                 log_manager: Optional[LogManager] = None, hash_workers: Optional[int] = None):
+        """
+        初始化流式更新器
+
+        Args:
+            update_checker: 更新检查器（提供差异检测器并保存更新计划）
+            download_controller: 下载控制器
+            log_manager: 日志管理器
+            hash_workers: 哈希确认线程数，默认 min(4, CPU核数)
+        """
+        self.update_checker = update_checker
+        self.download_controller = download_controller
+        self.log_manager = log_manager
+        self.hash_workers = hash_workers or min(4, os.cpu_count() or 1)
+        self.scanner = LocalFileScanner()
+        self._thread: Optional[threading.Thread] = None
+        self._checked = False
+
+    def start(self, folder_path: str, target_version: str, platform: str = "windows", arch: str = "x64",
+              progress_callback: Optional[Callable] = None,
+              result_callback: Optional[Callable] = None, delete_extra: bool = False) -> bool:
+        """
+        开始流式更新
+
+        Args:
+            folder_path: 本地安装目录（同时也是下载目标目录）
+            target_version: 目标版本
+            platform: 平台
+            arch: 架构
+            progress_callback: 下载进度回调函数，接收DownloadProgress参数
+            result_callback: 更新计划构建完成后的回调函数，接收UpdatePlan参数
+            delete_extra: 全部下载成功后删除目标版本中不存在的本地文件（默认保留）
+
+        Returns:
+            是否成功启动
+        """
+        valid, msg = ValidationUtils.validate_folder_path(folder_path)
+        if not valid:
+            if self.log_manager:
+                self.log_manager.log_error(f"文件夹路径无效: {msg}")
+            return False
+
+        if not target_version.strip():
+            if self.log_manager:
+                self.log_manager.log_error("目标版本号不能为空")
+            return False
+
+        self.scanner = LocalFileScanner()
+        self._checked = False
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(folder_path, target_version, platform, arch, progress_callback, result_callback, delete_extra),
+            daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def wait(self) -> bool:
+        """
+        等待检查和下载结束
+
+        Returns:
+            是否全部完成（检查完成，文件全部下载成功且未被取消）
+        """
+        if self._thread is not None:
+            self._thread.join()
+        manager = self.download_controller.get_download_manager()
+        if not self._checked or manager is None:
+            return False
+        manager.wait()
+        return not manager.is_cancelled and manager.files_failed == 0 and manager.install_error is None
+
+    def cancel(self):
+        """取消流式更新（停止检查并取消下载）"""
+        self.scanner.cancel_scan()
+        self.download_controller.cancel_download()
+
+    def _run(self, folder_path: str, target_version: str, platform: str, arch: str,
+             progress_callback: Optional[Callable], result_callback: Optional[Callable], delete_extra: bool):
+        try:
+            remote_files = self.update_checker.detector.get_remote_file_list(target_version, platform, arch)
+        except Exception as e:
+            if self.log_manager:
+                self.log_manager.log_error(f"获取远程文件列表失败: {e}")
+            return
+
+        plan = UpdatePlan(
+            target_version=target_version, platform=platform, architecture=arch,
+            files_to_download=[], files_to_delete=[], files_same=[],
+            total_download_size=0, total_file_count=0
+        )
+        manager = self.download_controller.start_streaming_download(plan, folder_path, progress_callback,
+                                                                    delete_extra)
+        if manager is None:
+            return
+
+        base_path = Path(folder_path)
+        plan_lock = threading.Lock()
+        hash_cache = HashCache(folder_path)
+
+        def add_change(change: FileChange):
+            with plan_lock:
+                if change.change_type == ChangeType.SAME:
+                    plan.files_same.append(change)
+                elif change.change_type == ChangeType.DELETED:
+                    plan.files_to_delete.append(change)
+                else:
+                    plan.files_to_download.append(change)
+                    plan.total_download_size += change.file_size
+                    plan.total_file_count += 1
+            if change.change_type in (ChangeType.NEW, ChangeType.UPDATED):
+                manager.enqueue_file(change)
+
+        def remote_change(path: str, remote_info: dict, change_type: ChangeType,
+                          local_info: Optional[FileInfo] = None) -> FileChange:
+            return FileChange(
+                relative_path=path, change_type=change_type,
+                file_size=remote_info["file_size"], sha256_hash=remote_info["sha256"],
+                local_info=local_info, remote_info=remote_info
+            )
+
+        def confirm_by_hash(path: str, remote_info: dict):
+            local_info = self.scanner.get_file_info(base_path / path, base_path, hash_cache=hash_cache)
+            if local_info is not None and local_info.sha256_hash == remote_info["sha256"]:
+                add_change(remote_change(path, remote_info, ChangeType.SAME, local_info))
+            else:
+                add_change(remote_change(path, remote_info, ChangeType.UPDATED, local_info))
+
+        local_paths = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.hash_workers) as hash_pool:
+                # 远程文件：不存在或大小不同的立即下载，其余交给哈希线程池确认
+                for path, remote_info in remote_files.items():
+                    if self.scanner.is_cancelled:
+                        break
+                    file_path = base_path / path
+                    try:
+                        stat = file_path.stat()
+                    except OSError:
+                        add_change(remote_change(path, remote_info, ChangeType.NEW))
+                        continue
+
+                    if stat.st_size != remote_info["file_size"]:
+                        local_info = FileInfo(
+                            relative_path=path, absolute_path=str(file_path), file_name=file_path.name,
+                            file_size=stat.st_size, sha256_hash="",
+                            last_modified=datetime.fromtimestamp(stat.st_mtime)
+                        )
+                        add_change(remote_change(path, remote_info, ChangeType.UPDATED, local_info))
+                    else:
+                        hash_pool.submit(confirm_by_hash, path, remote_info)
+
+                # 本地独有文件（只遍历不哈希），与下载和哈希确认同时进行
+                for path in self.scanner.iter_relative_paths(folder_path):
+                    local_paths.append(path)
+                    if path not in remote_files:
+                        try:
+                            file_size = (base_path / path).stat().st_size
+                        except OSError:
+                            continue
+                        add_change(FileChange(
+                            relative_path=path, change_type=ChangeType.DELETED,
+                            file_size=file_size, sha256_hash="", local_info=None, remote_info=None
+                        ))
+        except Exception as e:
+            if self.log_manager:
+                self.log_manager.log_error(f"流式更新检查失败: {e}")
+            self.download_controller.cancel_download()
+            return
+        finally:
+            manager.finish_enqueue()
+
+        if self.scanner.is_cancelled:
+            return
+
+        hash_cache.prune(local_paths)
+        hash_cache.save()
+
+        self.update_checker.update_plan = plan
+        self._checked = True
+        if result_callback:
+            result_callback(plan)
+
+        if self.log_manager:
+            summary = plan.get_summary()
+            self.log_manager.log_info(
+                f"流式更新检查完成: 需要下载 {summary['files_to_download']} 个文件 "
+                f"({summary['download_size_mb']} MB) | 相同文件: {summary['files_same']} 个 | "
+                f"需要删除: {summary['files_to_delete']} 个"
+            )
+
+
 class DownloadHandler:
     """下载业务逻辑处理器"""
 
@@ -285,20 +543,29 @@ class DownloadHandler:
         self.scan_handler = LocalFileScanHandler(log_manager)
         self.update_checker = UpdateChecker(log_manager)
         self.download_controller = DownloadController(log_manager)
+        self.streaming_updater = StreamingUpdater(self.update_checker, self.download_controller, log_manager)
 
     def scan_local_files(self, folder_path: str,
-                        progress_callback: Optional[Callable] = None) -> bool:
+                        progress_callback: Optional[Callable] = None,
+                        target_version: Optional[str] = None,
+                        platform: str = "windows", arch: str = "x64") -> bool:
         """
         扫描本地文件
 
         Args:
             folder_path: 文件夹路径
             progress_callback: 进度回调函数
+            target_version: 目标版本，提供时先获取远程清单摘要，跳过肯定已变化文件的哈希计算
+            platform: 平台
+            arch: 架构
 
         Returns:
             是否成功启动扫描
         """
-        return self.scan_handler.start_scan(folder_path, progress_callback)
+        summary_provider = partial(
+            self.update_checker.detector.get_remote_summary, target_version, platform, arch
+        ) if target_version else None
+        return self.scan_handler.start_scan(folder_path, progress_callback, summary_provider)
 
     def get_local_files(self) -> Dict[str, FileInfo]:
         """获取本地文件扫描结果"""
@@ -347,6 +614,32 @@ class DownloadHandler:
             update_plan, target_directory, selected_files, progress_callback
         )
 
+    def start_streaming_update(self, folder_path: str, target_version: str, platform: str = "windows",
+                               arch: str = "x64", progress_callback: Optional[Callable] = None,
+                               result_callback: Optional[Callable] = None, delete_extra: bool = False) -> bool:
+        """
+        流式更新：不等待本地扫描完成，边检查边下载到本地目录
+
+        Args:
+            folder_path: 本地安装目录
+            target_version: 目标版本
+            platform: 平台
+            arch: 架构
+            progress_callback: 下载进度回调函数
+            result_callback: 更新计划构建完成后的回调函数
+            delete_extra: 全部下载成功后删除目标版本中不存在的本地文件（默认保留）
+
+        Returns:
+            是否成功启动
+        """
+        return self.streaming_updater.start(
+            folder_path, target_version, platform, arch, progress_callback, result_callback, delete_extra
+        )
+
+    def wait_streaming_update(self) -> bool:
+        """等待流式更新结束，返回是否全部完成"""
+        return self.streaming_updater.wait()
+
     def pause_download(self):
         """暂停下载"""
         self.download_controller.pause_download()
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+安装包解压
+把完整安装包（ZIP）直接解压到安装目录，不再先保存压缩包再另行解压:
+    - 流式解压：按本地文件头顺序解析正在下载的数据，下载到哪里就解压到哪里
+    - 下载完成后解压：按条目并行解压（每个线程各自打开压缩包）
+
+每个条目按以下顺序处理，尽量不写入未变化的文件:
+    1. 已知条目的SHA256（远程清单）且与哈希缓存中本地文件的哈希相同：直接跳过，不解压
+    2. 本地文件大小相同：边解压边与本地文件比较，内容相同时不写入；
+       从第一个不同的位置起才写入临时文件（先复制本地文件中相同的前缀）
+    3. 其他情况：解压到临时文件
+写入的文件校验CRC32（已知SHA256时同时校验SHA256）后用 os.replace 原子替换，
+并把新哈希写入哈希缓存，下次更新可直接跳过。与远程清单哈希不一致的条目不写入安装目录。
+
+暂存模式（staged=True）下写入的文件先放在安装目录旁的暂存目录中，安装目录保持不变；
+调用方在整个安装包下载并校验通过后调用 commit_staged 移入安装目录，失败或取消时调用 discard_staged。
+
+流式解压不支持的条目（加密、除 stored/deflate 以外的压缩方式、带数据描述符的 stored 条目）
+抛出 StreamingNotSupported，由调用方在下载完成后改用 extract_file。
+"""
+
+import hashlib
+import os
+import shutil
+import struct
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Dict, Iterator, Optional
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.file_fingerprint import quick_fingerprint
+from tools.common.hash_cache import HashCache
+from tools.common.instrumentation import get_instrumentation
+from tools.common.transfer_control import TransferControl, TransferCancelled
+
+CHUNK_SIZE = 256 * 1024
+TEMP_SUFFIX = ".omega_extract"
+STAGING_SUFFIX = ".omega_extract_staging"
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_LOCAL_SIGNATURE = 0x04034b50
+_DESCRIPTOR_SIGNATURE = 0x08074b50
+_CENTRAL_SIGNATURES = (0x02014b50, 0x06054b50, 0x06064b50, 0x05054b50)
+_ZIP64_EXTRA = 0x0001
+
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DESCRIPTOR = 0x8
+_FLAG_UTF8 = 0x800
+
+
+class ExtractError(Exception):
+    """安装包损坏或包含不安全的路径"""
+
+
+class StreamingNotSupported(ExtractError):
+    """条目无法流式解压，需要在下载完成后按文件解压"""
+
+
+@dataclass
+class ExtractResult:
+    """解压结果统计"""
+    files_written: int = 0
+    files_unchanged: int = 0  # 内容与本地文件相同，未写入
+    bytes_written: int = 0
+    bytes_unchanged: int = 0
+
+
+class PackageExtractor:
+    """把ZIP安装包解压到安装目录"""
+
+    def __init__(self, target_directory: str, expected_hashes: Optional[Dict[str, str]] = None,
+                 use_hash_cache: bool = True, control: Optional[TransferControl] = None,
+                 workers: Optional[int] = None,
+                 progress_callback: Optional[Callable[[ExtractResult], None]] = None,
+                 staged: bool = False):
+        """
+        初始化解压器
+
+        Args:
+            target_directory: 安装目录
+            expected_hashes: 相对路径 -> SHA256（远程清单），用于跳过未变化的条目和校验解压结果
+            use_hash_cache: 是否使用扫描器的哈希缓存判断本地文件的哈希
+            control: 暂停/取消控制
+            workers: 按文件解压时的并行线程数，默认CPU核数
+            progress_callback: 每处理完一个条目调用一次，接收累计统计
+            staged: 写入的文件先放入暂存目录，commit_staged 后才移入安装目录
+        """
+        self.target = Path(target_directory)
+        self.expected_hashes = expected_hashes or {}
+        self.hash_cache = HashCache(str(self.target)) if use_hash_cache else None
+        self.control = control or TransferControl()
+        self.workers = workers or os.cpu_count() or 4
+        self.progress_callback = progress_callback
+        self.result = ExtractResult()
+        self._lock = threading.Lock()
+        # 暂存模式：上次未提交的暂存内容不可信（对应的安装包未必校验通过），先清除
+        self.staging = self.target.with_name(self.target.name + STAGING_SUFFIX) if staged else None
+        self._staged_hashes: Dict[str, str] = {}
+        if self.staging is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # 对外接口
+
+    def extract_stream(self, stream: BinaryIO) -> ExtractResult:
+        """
+        从顺序读取的数据流解压（例如 PackageDownloader.open_reader()）
+
+        Raises:
+            StreamingNotSupported: 遇到无法流式解压的条目
+            ExtractError: 数据损坏或路径不安全
+            TransferCancelled: 被取消
+        """
+        self.target.mkdir(parents=True, exist_ok=True)
+        reader = _StreamBuffer(stream)
+        metrics = get_instrumentation()
+        try:
+            while True:
+                signature = reader.peek_signature()
+                if signature is None or signature in _CENTRAL_SIGNATURES:
+                    break
+                if signature != _LOCAL_SIGNATURE:
+                    raise ExtractError("无效的ZIP本地文件头")
+                with metrics.phase("extract", files=1):
+                    self._extract_stream_entry(reader)
+        finally:
+            self._save_cache()
+        return self.result
+
+    def extract_file(self, zip_path: Path) -> ExtractResult:
+        """
+        解压已下载完成的压缩包，按条目并行
+
+        Raises:
+            ExtractError: 数据损坏或路径不安全
+            TransferCancelled: 被取消
+        """
+        self.target.mkdir(parents=True, exist_ok=True)
+        local = threading.local()
+        archives = []
+        metrics = get_instrumentation()
+
+        def open_archive() -> zipfile.ZipFile:
+            if not hasattr(local, "archive"):
+                local.archive = zipfile.ZipFile(zip_path)
+                with self._lock:
+                    archives.append(local.archive)
+            return local.archive
+
+        def extract_entry(info: zipfile.ZipInfo):
+            if not self.control.checkpoint():
+                raise TransferCancelled()
+            dest = self._dest_path(info.filename)
+            if info.is_dir():
+                self._output_path(dest).mkdir(parents=True, exist_ok=True)
+                return
+            if self._can_skip(info.filename, info.file_size, dest):
+                self._count_unchanged(info.file_size)
+                return
+            with metrics.phase("extract", files=1, bytes=info.file_size), open_archive().open(info) as source:
+                # ZipExtFile 在读完时自行校验CRC32
+                self._write_entry(info.filename, dest, info.file_size, iter(lambda: source.read(CHUNK_SIZE), b""))
+
+        try:
+            with zipfile.ZipFile(zip_path) as archive:
+                entries = sorted(archive.infolist(), key=lambda info: info.file_size, reverse=True)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for future in [executor.submit(extract_entry, info) for info in entries]:
+                    future.result()
+        except zipfile.BadZipFile as e:
+            raise ExtractError(f"安装包损坏: {e}") from e
+        finally:
+            for archive in archives:
+                archive.close()
+            self._save_cache()
+        return self.result
+
+    def commit_staged(self):
+        """把暂存目录中的文件移入安装目录（安装包校验通过后调用）"""
+        if self.staging is None or not self.staging.exists():
+            return
+        for root, dirs, files in os.walk(self.staging):
+            relative_root = Path(root).relative_to(self.staging)
+            (self.target / relative_root).mkdir(parents=True, exist_ok=True)
+            for name in files:
+                dest = self.target / relative_root / name
+                os.replace(os.path.join(root, name), dest)
+                relative_path = (relative_root / name).as_posix()
+                sha256 = self._staged_hashes.get(relative_path)
+                if self.hash_cache is not None and sha256:
+                    stat = dest.stat()
+                    self.hash_cache.store(relative_path, stat.st_size, stat.st_mtime_ns, sha256,
+                                          quick_fingerprint(dest, stat.st_size))
+        shutil.rmtree(self.staging, ignore_errors=True)
+        self._staged_hashes.clear()
+        self._save_cache()
+
+    def discard_staged(self):
+        """放弃暂存目录中的文件（下载失败、校验不通过或取消时调用）"""
+        if self.staging is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            self._staged_hashes.clear()
+
+    # ------------------------------------------------------------------
+    # 流式解析
+
+    def _extract_stream_entry(self, reader: "_StreamBuffer"):
+        (_, _, flags, method, _, _, crc, compressed_size, file_size,
+         name_length, extra_length) = _LOCAL_HEADER.unpack(reader.read_exact(_LOCAL_HEADER.size))
+        raw_name = reader.read_exact(name_length)
+        extra = reader.read_exact(extra_length)
+        name = raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+        compressed_size, file_size, zip64 = _apply_zip64(extra, compressed_size, file_size)
+
+        if flags & _FLAG_ENCRYPTED:
+            raise StreamingNotSupported(f"加密条目不支持流式解压: {name}")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise StreamingNotSupported(f"压缩方式 {method} 不支持流式解压: {name}")
+        has_descriptor = bool(flags & _FLAG_DESCRIPTOR)
+
+        dest = self._dest_path(name)
+        if name.endswith("/"):
+            # 目录条目没有数据（stored 时数据描述符紧跟在文件头之后）
+            self._output_path(dest).mkdir(parents=True, exist_ok=True)
+            if not has_descriptor:
+                reader.skip(compressed_size)
+                return
+            if method == zipfile.ZIP_DEFLATED:
+                for _ in _inflate(reader, None):
+                    pass
+            reader.read_descriptor(zip64)
+            return
+        if has_descriptor and method == zipfile.ZIP_STORED:
+            raise StreamingNotSupported(f"带数据描述符的未压缩条目不支持流式解压: {name}")
+
+        # 大小在数据描述符中时无法预先判断，只能边解压边比较
+        if not has_descriptor and self._can_skip(name, file_size, dest):
+            reader.skip(compressed_size)
+            self._count_unchanged(file_size)
+            return
+
+        checksum = _Crc32()
+        if method == zipfile.ZIP_STORED:
+            chunks = checksum.wrap(reader.iter_exact(compressed_size))
+        else:
+            chunks = checksum.wrap(_inflate(reader, None if has_descriptor else compressed_size))
+
+        def verify():
+            expected_crc, expected_size = crc, file_size
+            if has_descriptor:
+                expected_crc, _, expected_size = reader.read_descriptor(zip64)
+            if checksum.value != expected_crc or checksum.length != expected_size:
+                raise ExtractError(f"条目校验失败（CRC32或大小不一致）: {name}")
+
+        self._write_entry(name, dest, None if has_descriptor else file_size, chunks, verify)
+
+    # ------------------------------------------------------------------
+    # 条目处理
+
+    def _dest_path(self, name: str) -> Path:
+        """条目在安装目录中的路径，拒绝绝对路径和 .. 路径"""
+        parts = PurePosixPath(name.replace("\\", "/")).parts
+        if not parts or name.startswith("/") or ".." in parts or ":" in parts[0]:
+            raise ExtractError(f"不安全的条目路径: {name}")
+        return self.target.joinpath(*parts)
+
+    def _output_path(self, dest: Path) -> Path:
+        """写入位置：暂存模式下为暂存目录中的对应路径"""
+        if self.staging is None:
+            return dest
+        return self.staging / dest.relative_to(self.target)
+
+    def _can_skip(self, name: str, file_size: int, dest: Path) -> bool:
+        """远程清单中的哈希与哈希缓存中本地文件的哈希相同时跳过"""
+        expected = self.expected_hashes.get(name)
+        if not expected or self.hash_cache is None:
+            return False
+        try:
+            stat = dest.stat()
+        except OSError:
+            return False
+        return stat.st_size == file_size and \
+            self.hash_cache.lookup(name, stat.st_size, stat.st_mtime_ns) == expected
+
+    def _write_entry(self, name: str, dest: Path, file_size: Optional[int], chunks: Iterator[bytes],
+                     verify: Optional[Callable[[], None]] = None):
+        """
+        写入一个条目：本地文件大小相同时先比较，内容相同则不写入
+
+        Args:
+            name: 条目名（相对路径）
+            dest: 目标路径
+            file_size: 解压后大小，未知时为None
+            chunks: 解压后的数据块
+            verify: 数据读完、替换目标文件之前调用的校验（不通过时抛出异常）
+        """
+        sha256 = hashlib.sha256()
+        expected_hash = self.expected_hashes.get(name)
+        output = self._output_path(dest)
+        local = None
+        try:
+            if dest.is_file() and (file_size is None or dest.stat().st_size == file_size):
+                local = open(dest, "rb")
+        except OSError:
+            local = None
+
+        temp = None
+        out = None
+        matched = 0  # 与本地文件相同的前缀长度
+        try:
+            for chunk in chunks:
+                if not self.control.checkpoint():
+                    raise TransferCancelled()
+                sha256.update(chunk)
+                if out is None and local is not None:
+                    if local.read(len(chunk)) == chunk:
+                        matched += len(chunk)
+                        continue
+                if out is None:
+                    output.parent.mkdir(parents=True, exist_ok=True)
+                    temp = output.with_name(output.name + TEMP_SUFFIX)
+                    out = open(temp, "wb")
+                    if local is not None:
+                        local.seek(0)
+                        _copy_prefix(local, out, matched)
+                out.write(chunk)
+            if verify:
+                verify()
+            if expected_hash and sha256.hexdigest() != expected_hash.lower():
+                raise ExtractError(f"条目内容与远程清单的SHA256不一致: {name}")
+
+            if out is None and local is not None and local.read(1):
+                # 本地文件更长（解压后大小未知时）
+                output.parent.mkdir(parents=True, exist_ok=True)
+                temp = output.with_name(output.name + TEMP_SUFFIX)
+                out = open(temp, "wb")
+                local.seek(0)
+                _copy_prefix(local, out, matched)
+            if out is None and local is None:
+                # 空条目且本地不存在
+                output.parent.mkdir(parents=True, exist_ok=True)
+                temp = output.with_name(output.name + TEMP_SUFFIX)
+                out = open(temp, "wb")
+        except BaseException:
+            if out is not None:
+                out.close()
+                temp.unlink()
+            raise
+        finally:
+            if local is not None:
+                local.close()
+
+        if out is None:
+            self._count_unchanged(matched)
+        else:
+            out.close()
+            length = temp.stat().st_size
+            os.replace(temp, output)
+            with self._lock:
+                self.result.files_written += 1
+                self.result.bytes_written += length
+                if output != dest:
+                    # 暂存的文件在移入安装目录后写入哈希缓存
+                    self._staged_hashes[dest.relative_to(self.target).as_posix()] = sha256.hexdigest()
+            self._report()
+            if output != dest:
+                return
+        if self.hash_cache is not None:
+            stat = dest.stat()
+            self.hash_cache.store(name, stat.st_size, stat.st_mtime_ns, sha256.hexdigest(),
+                                  quick_fingerprint(dest, stat.st_size))
+
+    def _count_unchanged(self, file_size: int):
+        with self._lock:
+            self.result.files_unchanged += 1
+            self.result.bytes_unchanged += file_size
+        self._report()
+
+    def _report(self):
+        if self.progress_callback:
+            self.progress_callback(self.result)
+
+    def _save_cache(self):
+        if self.hash_cache is not None:
+            self.hash_cache.save()
+
+
+class _StreamBuffer:
+    """在顺序数据流上提供精确读取和回退（deflate 解压多读的数据放回缓冲区）"""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._buffer = b""
+
+    def _fill(self, size: int) -> bool:
+        while len(self._buffer) < size:
+            data = self._stream.read(max(CHUNK_SIZE, size - len(self._buffer)))
+            if not data:
+                return False
+            self._buffer += data
+        return True
+
+    def peek_signature(self) -> Optional[int]:
+        if not self._fill(4):
+            return None
+        return struct.unpack("<I", self._buffer[:4])[0]
+
+    def read_exact(self, size: int) -> bytes:
+        if not self._fill(size):
+            raise ExtractError("安装包数据不完整")
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def read_some(self) -> bytes:
+        """返回缓冲区中的数据或读取一块，数据流结束时返回空"""
+        if not self._buffer:
+            self._buffer = self._stream.read(CHUNK_SIZE)
+        data, self._buffer = self._buffer, b""
+        return data
+
+    def unread(self, data: bytes):
+        self._buffer = data + self._buffer
+
+    def iter_exact(self, size: int) -> Iterator[bytes]:
+        remaining = size
+        while remaining > 0:
+            data = self.read_some()
+            if not data:
+                raise ExtractError("安装包数据不完整")
+            if len(data) > remaining:
+                self.unread(data[remaining:])
+                data = data[:remaining]
+            remaining -= len(data)
+            yield data
+
+    def skip(self, size: int):
+        for _ in self.iter_exact(size):
+            pass
+
+    def read_descriptor(self, zip64: bool):
+        """读取数据描述符，返回 (crc, 压缩后大小, 解压后大小)"""
+        if self.peek_signature() == _DESCRIPTOR_SIGNATURE:
+            self.read_exact(4)
+        if zip64:
+            return struct.unpack("<IQQ", self.read_exact(20))
+        return struct.unpack("<III", self.read_exact(12))
+
+
+class _Crc32:
+    """边读取边计算CRC32和长度"""
+
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def wrap(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.value = zlib.crc32(chunk, self.value)
+            self.length += len(chunk)
+            yield chunk
+
+
+def _inflate(reader: _StreamBuffer, compressed_size: Optional[int]) -> Iterator[bytes]:
+    """解压 deflate 数据，直到压缩流结束；多读的数据放回缓冲区"""
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    source = reader.iter_exact(compressed_size) if compressed_size is not None else \
+        iter(reader.read_some, b"")
+    for data in source:
+        output = decompressor.decompress(data, CHUNK_SIZE)
+        while output:
+            yield output
+            output = decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE)
+        if decompressor.eof:
+            if decompressor.unused_data:
+                reader.unread(decompressor.unused_data)
+            # 按压缩后大小读取时数据恰好在此结束，迭代器会自然耗尽
+            break
+    if not decompressor.eof:
+        raise ExtractError("压缩数据不完整")
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def _apply_zip64(extra: bytes, compressed_size: int, file_size: int):
+    """按 ZIP64 扩展字段修正大小，返回 (压缩后大小, 解压后大小, 是否为ZIP64)"""
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, length = struct.unpack("<HH", extra[position:position + 4])
+        if header_id == _ZIP64_EXTRA:
+            data = extra[position + 4:position + 4 + length]
+            offset = 0
+            if file_size == 0xFFFFFFFF and offset + 8 <= len(data):
+                file_size = struct.unpack("<Q", data[offset:offset + 8])[0]
+                offset += 8
+            if compressed_size == 0xFFFFFFFF and offset + 8 <= len(data):
+                compressed_size = struct.unpack("<Q", data[offset:offset + 8])[0]
+            return compressed_size, file_size, True
+        position += 4 + length
+    return compressed_size, file_size, False
+
+
+def _copy_prefix(source: BinaryIO, dest: BinaryIO, length: int):
+    """复制本地文件中与新内容相同的前缀"""
+    remaining = length
+    while remaining > 0:
+        data = source.read(min(CHUNK_SIZE, remaining))
+        if not data:
+            break
+        dest.write(data)
+        remaining -= len(data)
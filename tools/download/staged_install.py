@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+暂存安装
+更新不直接写入安装目录，而是在同级的暂存目录中组装新版本，全部下载并校验通过后再切换:
+    1. 准备：安装目录中未变化的文件以硬链接放入暂存目录（不支持硬链接时复制），
+       待下载和待删除的文件不放入
+    2. 下载：下载管理器把文件写入暂存目录，每个文件下载后校验哈希
+    3. 切换：安装目录改名为备份目录，暂存目录改名为安装目录，成功后删除备份；
+       目录无法改名时（例如 Windows 下有文件被占用）改为逐个文件替换，并记录切换日志用于回滚
+
+下载中断或失败时暂存目录保留，下次更新在其中续传；切换过程中断时，下次准备阶段按备份目录
+和切换日志恢复原安装目录。切换后把下载文件的哈希写入哈希缓存，下次检查更新无需重新计算。
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.common_utils import LogManager
+from tools.common.difference_detector import FileChange, UpdatePlan
+from tools.common.hash_cache import HashCache
+
+STAGING_SUFFIX = ".omega_staging"
+BACKUP_SUFFIX = ".omega_backup"
+# 逐个文件切换时的日志，位于备份目录中，每行一个已移走的相对路径
+SWITCH_LOG = ".omega_switch.log"
+
+
+class StagedInstallError(Exception):
+    """暂存安装失败（安装目录已回滚到原状态）"""
+
+
+class StagedInstall:
+    """暂存安装"""
+
+    def __init__(self, target_directory: str, log_manager: Optional[LogManager] = None):
+        """
+        初始化暂存安装
+
+        Args:
+            target_directory: 安装目录
+            log_manager: 日志管理器
+        """
+        self.target = Path(target_directory).resolve()
+        self.staging = self.target.with_name(self.target.name + STAGING_SUFFIX)
+        self.backup = self.target.with_name(self.target.name + BACKUP_SUFFIX)
+        self.log_manager = log_manager
+        # 本次准备阶段从安装目录放入暂存目录的文件
+        self._prepared: Set[str] = set()
+
+    def prepare(self, exclude: Iterable[str] = ()) -> Path:
+        """
+        建立暂存目录：安装目录中的文件以硬链接放入，exclude 中的文件（待下载、待删除）不放入
+
+        上次中断的暂存目录会被复用（其中已下载的文件用于续传）。
+
+        Args:
+            exclude: 不放入暂存目录的相对路径
+
+        Returns:
+            暂存目录
+        """
+        self.recover()
+        excluded: Set[str] = set(exclude)
+        self._prepared = set()
+        self.staging.mkdir(parents=True, exist_ok=True)
+        if not self.target.exists():
+            return self.staging
+
+        linked = copied = 0
+        for root, dirs, files in os.walk(self.target):
+            root_path = Path(root)
+            relative_root = root_path.relative_to(self.target)
+            (self.staging / relative_root).mkdir(parents=True, exist_ok=True)
+            for name in files:
+                relative_path = (relative_root / name).as_posix()
+                source = root_path / name
+                staged = self.staging / relative_root / name
+                if relative_path in excluded:
+                    # 上次留下的同一文件的链接会在写入时改动安装目录中的原文件，先断开
+                    if staged.exists() and _same_file(source, staged):
+                        staged.unlink()
+                    continue
+                self._prepared.add(relative_path)
+                if staged.exists():
+                    if _same_file(source, staged):
+                        continue
+                    staged.unlink()
+                try:
+                    os.link(source, staged)
+                    linked += 1
+                except OSError:
+                    shutil.copy2(source, staged)
+                    copied += 1
+
+        if self.log_manager:
+            self.log_manager.log_info(f"暂存目录已准备: 硬链接 {linked} 个文件, 复制 {copied} 个文件")
+        return self.staging
+
+    def detach(self, relative_path: str):
+        """断开暂存目录中与安装目录共享的文件（写入前调用，避免改动安装目录中的旧版本）"""
+        staged = self.staging / relative_path
+        if staged.exists() and _same_file(self.target / relative_path, staged):
+            staged.unlink()
+
+    def commit(self, update_plan: UpdatePlan, downloaded: List[FileChange]):
+        """
+        切换到暂存目录中的新版本
+
+        Args:
+            update_plan: 更新计划（应用其中的 files_to_delete）
+            downloaded: 已下载并校验通过的文件
+
+        Raises:
+            StagedInstallError: 暂存目录不完整或切换失败（已回滚）
+        """
+        for change in downloaded:
+            staged = self.staging / change.relative_path
+            if not staged.is_file() or staged.stat().st_size != change.file_size:
+                raise StagedInstallError(f"暂存目录中的文件不完整: {change.relative_path}")
+
+        # 新版本只包含未变化的文件和本次下载的文件：待删除的文件和以前中断的更新留下的文件不进入
+        keep = self._prepared | {change.relative_path for change in downloaded}
+        keep.difference_update(change.relative_path for change in update_plan.files_to_delete)
+        for root, dirs, files in os.walk(self.staging):
+            relative_root = Path(root).relative_to(self.staging)
+            for name in files:
+                if (relative_root / name).as_posix() not in keep:
+                    os.unlink(os.path.join(root, name))
+
+        if not self.target.exists():
+            os.replace(self.staging, self.target)
+        else:
+            try:
+                os.rename(self.target, self.backup)
+            except OSError:
+                # 安装目录无法整体改名，逐个文件替换
+                self._switch_files(update_plan, downloaded)
+            else:
+                try:
+                    os.rename(self.staging, self.target)
+                except OSError as e:
+                    os.rename(self.backup, self.target)
+                    raise StagedInstallError(f"切换到新版本失败，已回滚: {e}")
+                shutil.rmtree(self.staging, ignore_errors=True)
+            shutil.rmtree(self.backup, ignore_errors=True)
+
+        self._record_hashes(update_plan, downloaded)
+        if self.log_manager:
+            self.log_manager.log_success(
+                f"已切换到新版本: 更新 {len(downloaded)} 个文件, 删除 {len(update_plan.files_to_delete)} 个文件"
+            )
+
+    def discard(self):
+        """放弃暂存目录（不再续传）"""
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def recover(self):
+        """恢复上次中断的切换：安装目录缺失时从备份还原，逐个文件切换中断时按切换日志回滚"""
+        if not self.backup.exists():
+            return
+        if not self.target.exists():
+            os.rename(self.backup, self.target)
+            if self.log_manager:
+                self.log_manager.log_warning("上次切换未完成，已从备份还原安装目录")
+            return
+        log_path = self.backup / SWITCH_LOG
+        if log_path.exists():
+            self._rollback_files(log_path.read_text(encoding="utf-8").splitlines())
+            if self.log_manager:
+                self.log_manager.log_warning("上次逐个文件切换未完成，已回滚")
+        shutil.rmtree(self.backup, ignore_errors=True)
+
+    def _switch_files(self, update_plan: UpdatePlan, downloaded: List[FileChange]):
+        """逐个文件切换：原文件移入备份目录并记录日志，新文件移入安装目录；任一步失败时回滚"""
+        self.backup.mkdir(parents=True, exist_ok=True)
+        moved: List[str] = []
+        with open(self.backup / SWITCH_LOG, "w", encoding="utf-8") as log:
+            try:
+                for relative_path in [change.relative_path for change in update_plan.files_to_delete] + \
+                        [change.relative_path for change in downloaded]:
+                    current = self.target / relative_path
+                    if current.exists():
+                        backup_path = self.backup / relative_path
+                        backup_path.parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(current, backup_path)
+                    # 先写日志再移入新文件，回滚时据此还原
+                    log.write(relative_path + "\n")
+                    log.flush()
+                    moved.append(relative_path)
+                for change in downloaded:
+                    current = self.target / change.relative_path
+                    current.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(self.staging / change.relative_path, current)
+            except OSError as e:
+                log.close()
+                self._rollback_files(moved)
+                shutil.rmtree(self.backup, ignore_errors=True)
+                raise StagedInstallError(f"切换到新版本失败，已回滚: {e}")
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def _rollback_files(self, relative_paths: Iterable[str]):
+        """把备份目录中的原文件移回安装目录（先移走已替换的新文件，新文件放回暂存目录）"""
+        for relative_path in relative_paths:
+            current = self.target / relative_path
+            backup_path = self.backup / relative_path
+            if current.exists():
+                staged = self.staging / relative_path
+                staged.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(current, staged)
+            if backup_path.exists():
+                os.replace(backup_path, current)
+
+    def _record_hashes(self, update_plan: UpdatePlan, downloaded: List[FileChange]):
+        """新版本已校验，把下载文件的哈希写入哈希缓存"""
+        hash_cache = HashCache(str(self.target))
+        for change in downloaded:
+            try:
+                stat = (self.target / change.relative_path).stat()
+            except OSError:
+                continue
+            hash_cache.store(change.relative_path, stat.st_size, stat.st_mtime_ns, change.sha256_hash)
+        deleted = {change.relative_path for change in update_plan.files_to_delete}
+        hash_cache.prune(path for path in hash_cache.entries() if path not in deleted)
+        hash_cache.save()
+
+
+def _same_file(a: Path, b: Path) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
@@ -5,6 +5,7 @@ Omega更新服务器 - 自动化上传工具
 """
 
 import argparse
+import hashlib
 import json
 import sys
 import os
@@ -12,12 +13,21 @@ import time
 from pathlib import Path
 from typing import Dict, Any, Optional
 import logging
+import logging.handlers
 
 # 导入现有模块
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from tools.upload.upload_handler import UploadHandler
-from tools.common.common_utils import get_config, LogManager, ValidationUtils
+from tools.upload.incremental_uploader import IncrementalUploader
+from tools.common.common_utils import get_config, FileUtils, LogManager, ValidationUtils
+from tools.common.adaptive_concurrency import AdaptiveConcurrency
+from tools.common.instrumentation import get_instrumentation
+from tools.common.metrics_export import MetricsExporter
+from tools.common.parallel_scan import SCAN_MODES, stat_tree, tree_digest
+from tools.common.profiling import add_profile_arguments, profiler_from_args
+from tools.common.rate_limiter import get_rate_limiter
+from tools.common.upload_journal import COMMITTED, IN_FLIGHT, JournalEntry, UploadJournal
 
 
 class AutoUploader:
@@ -38,6 +48,11 @@ class AutoUploader:
         self.log_manager = LogManager()
         self.upload_handler = UploadHandler(self.log_manager)
 
+        # 带宽限制（KB/s，0 表示不限速），命令行参数可覆盖
+        upload_config = self.config.get('upload', {})
+        self.set_bandwidth_limits(upload_config.get('bandwidth_limit_kbps'),
+                                  upload_config.get('per_transfer_limit_kbps'))
+
         # 统计信息
         self.stats = {
             'total_folders': 0,
@@ -47,6 +62,9 @@ class AutoUploader:
             'end_time': None
         }
 
+        # 指标导出（start_metrics 启用）
+        self.metrics_exporter: Optional[MetricsExporter] = None
+
     def load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
         try:
@@ -102,8 +120,11 @@ class AutoUploader:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
 
-        # 文件处理器
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        # 文件处理器（按大小轮转）
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=FileUtils.parse_file_size(log_config.get('max_size', '10MB')),
+            backupCount=log_config.get('backup_count', 5), encoding='utf-8'
+        )
         file_handler.setFormatter(formatter)
         file_handler.setLevel(log_level)
 
@@ -121,6 +142,68 @@ class AutoUploader:
         self.logger = logging.getLogger(__name__)
         self.logger.info("自动化上传工具启动")
 
+    def set_bandwidth_limits(self, global_kbps: Optional[float] = None,
+                             per_transfer_kbps: Optional[float] = None):
+        """
+        设置带宽限制（对所有并发传输生效，可在上传过程中调整）
+
+        Args:
+            global_kbps: 所有传输合计的上限（KB/s），0 表示不限速，None 表示不修改
+            per_transfer_kbps: 单个传输的上限（KB/s），0 表示不限速，None 表示不修改
+        """
+        get_rate_limiter().set_limits(
+            global_kbps * 1024 if global_kbps is not None else None,
+            per_transfer_kbps * 1024 if per_transfer_kbps is not None else None
+        )
+        if global_kbps or per_transfer_kbps:
+            self.logger.info(f"带宽限制: 全局 {global_kbps or '不限'} KB/s, 单传输 {per_transfer_kbps or '不限'} KB/s")
+
+    def start_metrics(self, textfile: Optional[str] = None, port: Optional[int] = None,
+                      interval: Optional[float] = None, tool: str = "auto_upload") -> bool:
+        """
+        开始导出运行指标（Prometheus 文本格式）
+
+        Args:
+            textfile: 指标文件路径，None 表示按配置
+            port: 本机HTTP端口，None 表示按配置
+            interval: 写文件间隔（秒），None 表示按配置
+            tool: 指标的 tool 标签
+
+        Returns:
+            是否已启用导出（参数和配置都未指定时不导出）
+        """
+        exporter = MetricsExporter.from_config(self.config.get('metrics', {}), textfile, port, interval,
+                                               labels={"tool": tool})
+        if exporter is None:
+            return False
+        try:
+            exporter.start()
+        except OSError as e:
+            self.logger.error(f"启动指标导出失败: {e}")
+            return False
+
+        # 文件夹级别的结果（导出时取值）
+        metrics = get_instrumentation()
+        metrics.set_gauge("folders_succeeded", lambda: self.stats['successful_uploads'])
+        metrics.set_gauge("folders_failed", lambda: self.stats['failed_uploads'])
+
+        self.metrics_exporter = exporter
+        if exporter.textfile:
+            self.logger.info(f"指标写入: {exporter.textfile}（每 {exporter.interval:g} 秒）")
+        if exporter.url:
+            self.logger.info(f"指标地址: {exporter.url}")
+        return True
+
+    def stop_metrics(self):
+        """停止导出运行指标（写入最终的指标文件）"""
+        if self.metrics_exporter is None:
+            return
+        try:
+            self.metrics_exporter.stop()
+        except OSError as e:
+            self.logger.error(f"写入指标文件失败: {e}")
+        self.metrics_exporter = None
+
     def validate_upload_params(self, params: Dict[str, Any]) -> tuple:
         """验证上传参数"""
         # 验证必需参数
@@ -224,12 +307,95 @@ class AutoUploader:
             self.stats['failed_uploads'] += 1
             return False
 
-    def upload_batch(self, batch_config: Dict[str, Any]) -> bool:
+    def incremental_upload_folder(self, folder_path: str, version_type: str, description: str = "",
+                                  platform: Optional[str] = None, architecture: Optional[str] = None,
+                                  enable_sync: bool = True, scan_mode: Optional[str] = None,
+                                  workers: Optional[int] = None, pipelined: bool = False,
+                                  adaptive: Optional[bool] = None, max_concurrency: Optional[int] = None,
+                                  resume: bool = True) -> bool:
+        """
+        增量上传单个文件夹（只上传与云端不同的文件）
+
+        Args:
+            folder_path: 文件夹路径
+            version_type: 版本类型 (stable/beta/alpha)
+            description: 描述
+            platform: 平台
+            architecture: 架构
+            enable_sync: 是否删除云端多余文件
+            scan_mode: 本地扫描模式 (serial/thread/process)
+            workers: 本地扫描并行度
+            pipelined: 是否边扫描边上传
+            adaptive: 是否自适应调节上传并发数（启用时使用流水线模式），None 表示按配置
+            max_concurrency: 自适应并发的上限，None 表示按配置
+            resume: 上次运行中断时是否按上传日志继续
+
+        Returns:
+            是否成功
+        """
+        upload_config = self.config.get('upload', {})
+
+        valid, msg = ValidationUtils.validate_folder_path(folder_path)
+        if not valid:
+            self.logger.error(f"文件夹路径无效: {msg}")
+            return False
+
+        scan_mode = scan_mode or upload_config.get('scan_mode', 'serial')
+
+        # 自适应并发：同一份配置在局域网和远程构建机上都能自动找到合适的并发数
+        concurrency = None
+        if adaptive if adaptive is not None else upload_config.get('adaptive_concurrency', False):
+            concurrency_config = dict(upload_config)
+            if max_concurrency:
+                concurrency_config['max_concurrency'] = max_concurrency
+            concurrency = AdaptiveConcurrency.from_config(
+                concurrency_config,
+                on_change=lambda limit, reason: self.logger.info(f"上传并发数调整为 {limit}（{reason}）")
+            )
+            pipelined = True
+
+        uploader = IncrementalUploader(self.log_manager, scan_mode=scan_mode,
+                                       scan_workers=workers or upload_config.get('scan_workers'),
+                                       pipelined=pipelined, concurrency=concurrency)
+
+        self.logger.info(f"开始增量上传: {folder_path} -> {version_type} (扫描模式: {scan_mode})")
+
+        def progress_callback(progress: float, status: str):
+            """进度回调"""
+            print(f"\r上传进度: {progress:.1f}% - {status}", end='', flush=True)
+
+        try:
+            success = uploader.perform_incremental_upload(
+                folder_path=folder_path,
+                version_type=version_type,
+                platform=platform or upload_config.get('default_platform', 'windows'),
+                architecture=architecture or upload_config.get('default_architecture', 'x64'),
+                description=description or f"自动增量上传 - {version_type}",
+                enable_sync=enable_sync,
+                progress_callback=progress_callback,
+                resume=resume
+            )
+            print()  # 换行
+        except Exception as e:
+            print()  # 换行
+            self.logger.error(f"增量上传异常: {e}")
+            success = False
+
+        if success:
+            self.logger.info(f"增量上传成功: {version_type}")
+            self.stats['successful_uploads'] += 1
+        else:
+            self.logger.error(f"增量上传失败: {version_type}")
+            self.stats['failed_uploads'] += 1
+        return success
+
+    def upload_batch(self, batch_config: Dict[str, Any], resume: bool = True) -> bool:
         """
         批量上传
 
         Args:
             batch_config: 批量配置
+            resume: 同一批量配置上次运行中断时是否跳过已完成且之后未变化的文件夹
 
         Returns:
             是否全部成功
@@ -244,6 +410,18 @@ class AutoUploader:
 
         self.logger.info(f"开始批量上传，共 {len(folders)} 个文件夹")
 
+        # 上传日志：按批量配置内容识别同一批次，记录每个文件夹是否已完成
+        batch_id = hashlib.sha256(json.dumps(folders, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+        journal = UploadJournal(("batch", self.config.get('server', {}).get('url', '')))
+        entries = journal.load(batch_id) if resume else None
+        # 已完成的文件夹 -> 完成时的目录树摘要（路径、大小、修改时间）
+        committed = {entry.relative_path: entry.sha256 for entry in entries or [] if entry.state == COMMITTED}
+        if entries is None:
+            journal.begin(batch_id, [JournalEntry(self._batch_entry_key(i, folder_config), "folder")
+                                     for i, folder_config in enumerate(folders, 1)])
+        elif committed:
+            self.logger.info(f"按上传日志继续上次中断的批量上传，跳过已完成的 {len(committed)} 个文件夹")
+
         all_success = True
 
         for i, folder_config in enumerate(folders, 1):
@@ -256,6 +434,16 @@ class AutoUploader:
                 all_success = False
                 continue
 
+            entry_key = self._batch_entry_key(i, folder_config)
+            digest = tree_digest(stat_tree(folder_path))
+            if entry_key in committed:
+                if committed[entry_key] == digest:
+                    self.logger.info(f"已在上次运行中完成，跳过: {folder_path}")
+                    self.stats['successful_uploads'] += 1
+                    continue
+                self.logger.info(f"文件夹在上次完成后已变化，重新上传: {folder_path}")
+            journal.mark(entry_key, IN_FLIGHT)
+
             # 上传文件夹
             success = self.upload_folder(
                 folder_path=folder_path,
@@ -269,18 +457,27 @@ class AutoUploader:
                 from_version=folder_config.get('from_version', '')
             )
 
-            if not success:
+            if success:
+                # 记录上传前的目录树摘要，下次继续时目录树已变化则重新上传
+                journal.mark(entry_key, COMMITTED, sha256=digest)
+            else:
                 all_success = False
 
-            # 添加延迟避免服务器压力
-            if i < len(folders):
-                time.sleep(2)
+        # 全部完成后清除日志，否则下次运行同一批量配置时跳过已完成的文件夹
+        if all_success:
+            journal.finish()
+        journal.close()
 
         self.stats['end_time'] = time.time()
         self.print_statistics()
 
         return all_success
 
+    @staticmethod
+    def _batch_entry_key(index: int, folder_config: Dict[str, Any]) -> str:
+        """批量上传日志中文件夹条目的键（序号 + 路径 + 版本）"""
+        return f"{index:04d}|{folder_config.get('path', '')}|{folder_config.get('version', '')}"
+
     def print_statistics(self):
         """打印统计信息"""
         if self.stats['start_time'] and self.stats['end_time']:
@@ -301,6 +498,17 @@ class AutoUploader:
 
         self.logger.info(f"上传完成 - 成功: {self.stats['successful_uploads']}, 失败: {self.stats['failed_uploads']}")
 
+    def print_profile(self, json_path: Optional[str] = None):
+        """打印分阶段耗时报告，指定 json_path 时同时写入JSON文件"""
+        metrics = get_instrumentation()
+        print("\n" + metrics.format_report())
+        if json_path:
+            try:
+                metrics.save_json(json_path)
+                print(f"✓ 分阶段耗时报告已写入: {json_path}")
+            except OSError as e:
+                self.logger.error(f"写入分阶段耗时报告失败: {e}")
+
 
 def create_sample_config():
     """创建示例配置文件"""
@@ -314,11 +522,21 @@ def create_sample_config():
             "default_architecture": "x64",
             "default_package_type": "full",
             "default_is_stable": True,
-            "default_is_critical": False
+            "default_is_critical": False,
+            "bandwidth_limit_kbps": 0,
+            "per_transfer_limit_kbps": 0,
+            "adaptive_concurrency": False,
+            "min_concurrency": 1,
+            "max_concurrency": 8
         },
         "logging": {
             "level": "INFO",
             "file": "auto_upload.log"
+        },
+        "metrics": {
+            "textfile": "",
+            "port": 0,
+            "interval_seconds": 15
         }
     }
 
@@ -350,6 +568,36 @@ def main():
     # 批量上传参数
     parser.add_argument('--batch', '-b', help='批量配置文件路径')
 
+    # 增量上传参数
+    parser.add_argument('--incremental', action='store_true', help='增量上传（只上传与云端不同的文件）')
+    parser.add_argument('--version-type', choices=['stable', 'beta', 'alpha'], default='stable',
+                        help='增量上传的版本类型')
+    parser.add_argument('--no-sync', action='store_true', help='增量上传时不删除云端多余文件')
+    parser.add_argument('--scan-mode', choices=SCAN_MODES,
+                        help='本地扫描模式: serial 串行 / thread 线程池 / process 进程池（大量小文件时最快）')
+    parser.add_argument('--workers', type=int, help='本地扫描并行度，默认CPU核数')
+    parser.add_argument('--pipeline', action='store_true', help='增量上传时边扫描边上传')
+    parser.add_argument('--adaptive', action='store_true', default=None,
+                        help='增量上传时自适应调节并发上传数（隐含 --pipeline）')
+    parser.add_argument('--max-concurrency', type=int, help='自适应并发的上限，默认按配置或 8')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='不按上传日志继续上次中断的运行（增量上传和批量上传），重新开始')
+
+    # 带宽限制参数
+    parser.add_argument('--limit-kbps', type=float, help='所有传输合计的带宽上限（KB/s），0 表示不限速')
+    parser.add_argument('--transfer-limit-kbps', type=float, help='单个传输的带宽上限（KB/s），0 表示不限速')
+
+    # 性能分析参数
+    parser.add_argument('--profile', action='store_true',
+                        help='结束时打印分阶段耗时报告（遍历、哈希、清单、差异、上传、提交）')
+    parser.add_argument('--profile-json', help='把分阶段耗时报告写入JSON文件（隐含 --profile）')
+    add_profile_arguments(parser)
+
+    # 指标导出参数
+    parser.add_argument('--metrics-file', help='按间隔把运行指标写入该文件（Prometheus 文本格式）')
+    parser.add_argument('--metrics-port', type=int, help='在本机该端口提供 /metrics（0 表示自动分配）')
+    parser.add_argument('--metrics-interval', type=float, help='写入指标文件的间隔（秒），默认 15')
+
     args = parser.parse_args()
 
     # 创建示例配置
@@ -364,18 +612,54 @@ def main():
         print(f"✗ 初始化失败: {e}")
         sys.exit(1)
 
+    uploader.set_bandwidth_limits(args.limit_kbps, args.transfer_limit_kbps)
+
+    profiling = args.profile or bool(args.profile_json)
+    if profiling:
+        get_instrumentation().enable()
+    profiler = profiler_from_args(args)
+    uploader.start_metrics(args.metrics_file, args.metrics_port, args.metrics_interval)
+
+    def finish(success: bool):
+        uploader.stop_metrics()
+        if profiling:
+            uploader.print_profile(args.profile_json)
+        if profiler:
+            print("\n" + profiler.stop())
+            print(f"✓ 性能分析结果已写入: {profiler.prof_path}, {profiler.summary_path}")
+        sys.exit(0 if success else 1)
+
     # 批量上传模式
     if args.batch:
         try:
             with open(args.batch, 'r', encoding='utf-8') as f:
                 batch_config = json.load(f)
 
-            success = uploader.upload_batch(batch_config)
-            sys.exit(0 if success else 1)
+            success = uploader.upload_batch(batch_config, resume=not args.no_resume)
 
         except Exception as e:
             print(f"✗ 批量上传失败: {e}")
-            sys.exit(1)
+            success = False
+        finish(success)
+
+    # 增量上传模式
+    elif args.incremental and args.folder:
+        success = uploader.incremental_upload_folder(
+            folder_path=args.folder,
+            version_type=args.version_type,
+            description=args.description,
+            platform=args.platform,
+            architecture=args.architecture,
+            enable_sync=not args.no_sync,
+            scan_mode=args.scan_mode,
+            workers=args.workers,
+            pipelined=args.pipeline,
+            adaptive=args.adaptive,
+            max_concurrency=args.max_concurrency,
+            resume=not args.no_resume
+        )
+
+        finish(success)
 
     # 单文件夹上传模式
     elif args.folder and args.version:
@@ -391,13 +675,18 @@ def main():
             from_version=args.from_version
         )
 
-        sys.exit(0 if success else 1)
+        finish(success)
 
     else:
         parser.print_help()
         print("\n示例用法:")
         print("  python auto_upload.py --folder ./my_app --version v1.0.0 --description '新版本发布'")
         print("  python auto_upload.py --batch batch_config.json")
+        print("  python auto_upload.py --incremental --folder ./my_app --version-type beta --scan-mode process")
+        print("  python auto_upload.py --batch batch_config.json --limit-kbps 2048")
+        print("  python auto_upload.py --incremental --folder ./my_app --profile-json profile.json")
+        print("  python auto_upload.py --incremental --folder ./my_app --profile-phase scan --profile-memory")
+        print("  python auto_upload.py --batch batch_config.json --metrics-file /var/lib/node_exporter/omega.prom")
         print("  python auto_upload.py --create-config")
 
 
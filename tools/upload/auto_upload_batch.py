@@ -13,6 +13,7 @@ import time
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from tools.common.profiling import add_profile_arguments, profiler_from_args
 from tools.upload.auto_upload import AutoUploader
 
 
@@ -128,10 +129,6 @@ class BatchUploader:
             if not success:
                 all_success = False
 
-            # 添加延迟
-            if i < len(version_folders):
-                time.sleep(3)
-
         self.print_batch_results()
         return all_success
 
@@ -232,6 +229,18 @@ def main():
     # 批处理文件模式
     parser.add_argument('--batch-file', '-b', help='批处理配置文件')
 
+    # 带宽限制
+    parser.add_argument('--limit-kbps', type=float, help='所有传输合计的带宽上限（KB/s），0 表示不限速')
+    parser.add_argument('--transfer-limit-kbps', type=float, help='单个传输的带宽上限（KB/s），0 表示不限速')
+
+    # 指标导出
+    parser.add_argument('--metrics-file', help='按间隔把运行指标写入该文件（Prometheus 文本格式）')
+    parser.add_argument('--metrics-port', type=int, help='在本机该端口提供 /metrics（0 表示自动分配）')
+    parser.add_argument('--metrics-interval', type=float, help='写入指标文件的间隔（秒），默认 15')
+
+    # 性能分析
+    add_profile_arguments(parser)
+
     args = parser.parse_args()
 
     # 创建示例配置
@@ -246,40 +255,57 @@ def main():
         print(f"✗ 初始化失败: {e}")
         sys.exit(1)
 
+    batch_uploader.uploader.set_bandwidth_limits(args.limit_kbps, args.transfer_limit_kbps)
+
     # 扫描目录模式
     if args.scan_dir:
         batch_uploader.create_batch_config_from_directory(args.scan_dir, args.output)
         return
 
+    profiler = profiler_from_args(args)
+
+    def finish(success: bool):
+        batch_uploader.uploader.stop_metrics()
+        if profiler:
+            print("\n" + profiler.stop())
+            print(f"✓ 性能分析结果已写入: {profiler.prof_path}, {profiler.summary_path}")
+        sys.exit(0 if success else 1)
+
     # 直接上传模式
     if args.upload_dir:
+        batch_uploader.uploader.start_metrics(args.metrics_file, args.metrics_port, args.metrics_interval,
+                                              tool="auto_upload_batch")
         success = batch_uploader.upload_from_directory(
             args.upload_dir,
             args.platform,
             args.architecture,
             args.package_type
         )
-        sys.exit(0 if success else 1)
+        finish(success)
 
     # 批处理文件模式
     if args.batch_file:
+        batch_uploader.uploader.start_metrics(args.metrics_file, args.metrics_port, args.metrics_interval,
+                                              tool="auto_upload_batch")
         try:
             with open(args.batch_file, 'r', encoding='utf-8') as f:
                 batch_config = json.load(f)
 
             success = batch_uploader.uploader.upload_batch(batch_config)
-            sys.exit(0 if success else 1)
 
         except Exception as e:
             print(f"✗ 批处理上传失败: {e}")
-            sys.exit(1)
+            success = False
+        finish(success)
 
     else:
         parser.print_help()
         print("\n示例用法:")
         print("  python auto_upload_batch.py --scan-dir ./versions")
-        print("  python auto_upload_batch.py --upload-dir ./versions --platform windows")
+        print("  python auto_upload_batch.py --upload-dir ./versions --platform windows --limit-kbps 2048")
         print("  python auto_upload_batch.py --batch-file batch_config.json")
+        print("  python auto_upload_batch.py --batch-file batch_config.json --metrics-port 9469")
+        print("  python auto_upload_batch.py --batch-file batch_config.json --profile-phase transfer --profile-sample 0.05")
         print("  python auto_upload_batch.py --create-sample")
 
 
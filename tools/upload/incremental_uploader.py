@@ -4,12 +4,13 @@
 实现智能文件差异对比和增量上传功能
 """
 
-import os
 import hashlib
+import threading
+import time
 import requests
 import json
 from pathlib import Path
-from typing import Dict, List, Optional, Callable, Any, Tuple
+from typing import Dict, Iterator, List, Optional, Callable, Any, Tuple
 from datetime import datetime
 from dataclasses import dataclass
 from enum import Enum
@@ -17,7 +18,19 @@ from enum import Enum
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from tools.common.common_utils import get_server_url, get_api_key, FileUtils, LogManager
+from tools.common.common_utils import get_server_url, get_api_key, FileUtils, LogManager, APIEndpoints
+from tools.common.compare_payload import COMPARE_CONTENT_TYPE, encode_compare_request
+from tools.common.hash_cache import HashCache
+from tools.common.instrumentation import get_instrumentation
+from tools.common.manifest_summary import RemoteManifestSummary
+from tools.common.parallel_scan import SCAN_MODES, iter_scan_tree, stat_tree
+from tools.common.progress import CoalescingCallback
+from tools.common.adaptive_concurrency import AdaptiveConcurrency
+from tools.common.chunked_upload import ChunkedUploader, ChunkedUploadUnsupported
+from tools.common.rate_limiter import MultipartBody, TransferThrottle, get_rate_limiter
+from tools.common.transfer_control import TransferControl
+from tools.common.transfer_scheduler import ScheduledQueue, schedule
+from tools.common.upload_journal import COMMITTED, IN_FLIGHT, PLANNED, JournalEntry, UploadJournal
 
 
 class ChangeType(Enum):
@@ -47,6 +60,36 @@ class FileDifference:
     remote_info: Optional[FileInfo] = None
 
 
+def _diff_path(file_diff: FileDifference) -> str:
+    return file_diff.relative_path
+
+
+def _diff_size(file_diff: FileDifference) -> int:
+    return file_diff.local_info.file_size if file_diff.local_info else 0
+
+
+@dataclass
+class ScanProgress:
+    """本地扫描进度（每完成一个扫描分区更新一次）"""
+    files_scanned: int
+    bytes_hashed: int
+    partitions_done: int
+    partitions_total: int
+    elapsed: float  # 秒
+
+    @property
+    def fraction(self) -> float:
+        """完成比例（按分区计）"""
+        return self.partitions_done / self.partitions_total if self.partitions_total else 0.0
+
+    @property
+    def eta_seconds(self) -> int:
+        """按已完成分区的平均耗时估计的剩余秒数，尚无分区完成时为0"""
+        if not self.partitions_done:
+            return 0
+        return int(self.elapsed * (self.partitions_total - self.partitions_done) / self.partitions_done)
+
+
 @dataclass
 class DifferenceReport:
     """差异报告"""
@@ -62,57 +105,106 @@ class DifferenceReport:
 class LocalFileScanner:
     """本地文件扫描器"""
 
-    def __init__(self, log_manager: Optional[LogManager] = None):
+    def __init__(self, log_manager: Optional[LogManager] = None, use_hash_cache: bool = True,
+                 scan_mode: str = "serial", workers: Optional[int] = None):
+        """
+        初始化本地文件扫描器
+
+        Args:
+            log_manager: 日志管理器
+            use_hash_cache: 是否复用本地哈希缓存
+            scan_mode: 扫描模式（serial / thread / process）
+            workers: 并行度，默认CPU核数
+        """
+        if scan_mode not in SCAN_MODES:
+            raise ValueError(f"不支持的扫描模式: {scan_mode}")
         self.log_manager = log_manager
+        self.use_hash_cache = use_hash_cache
+        self.scan_mode = scan_mode
+        self.workers = workers
+        self.last_scan_stats: Dict[str, int] = {}
 
-    def scan_folder(self, folder_path: str) -> Dict[str, FileInfo]:
+    def scan_folder(self, folder_path: str,
+                    remote_summary: Optional[RemoteManifestSummary] = None) -> Dict[str, FileInfo]:
         """
         扫描本地文件夹，生成文件信息字典
 
         Args:
             folder_path: 文件夹路径
+            remote_summary: 远程清单摘要。提供时，远程不存在或大小不同的文件肯定需要上传，
+                            不计算哈希（sha256_hash 为空），推迟到上传时再计算
 
         Returns:
             文件相对路径到文件信息的映射
         """
+        file_map = {}
+        for batch in self.iter_scan_folder(folder_path, remote_summary):
+            for file_info in batch:
+                file_map[file_info.relative_path] = file_info
+        return file_map
+
+    def iter_scan_folder(self, folder_path: str,
+                         remote_summary: Optional[RemoteManifestSummary] = None,
+                         progress_callback: Optional[Callable[[ScanProgress], None]] = None) -> Iterator[List[FileInfo]]:
+        """
+        逐分区扫描本地文件夹，每完成一个分区产出一批文件信息（供流水线上传使用）
+
+        参数同 scan_folder，progress_callback 在每个分区完成后收到 ScanProgress。
+        迭代完成后写入哈希缓存并更新 last_scan_stats；提前关闭时只写入已计算的哈希。
+        """
         folder_path_obj = Path(folder_path)
         if not folder_path_obj.exists() or not folder_path_obj.is_dir():
             if self.log_manager:
                 self.log_manager.log_error(f"文件夹不存在或不是有效目录: {folder_path}")
-            return {}
+            return
 
-        file_map = {}
-
-        for root, dirs, files in os.walk(folder_path_obj):
-            for file in files:
-                file_path = Path(root) / file
-                try:
-                    relative_path = file_path.relative_to(folder_path_obj)
-                    relative_path_str = str(relative_path).replace('\\', '/')
+        hash_cache = HashCache(folder_path) if self.use_hash_cache else None
+        seen_paths = []
+        stats = {"files": 0, "hashed": 0, "cached": 0, "deferred": 0}
+        bytes_hashed = 0
+        started = time.monotonic()
 
-                    # 计算文件哈希
-                    sha256_hash = self._calculate_file_hash(file_path)
-
-                    # 获取文件信息
-                    stat = file_path.stat()
-                    file_info = FileInfo(
-                        relative_path=relative_path_str,
-                        file_size=stat.st_size,
+        completed = False
+        try:
+            for partial, done, total in iter_scan_tree(folder_path, self.scan_mode, self.workers,
+                                                       hash_cache, remote_summary):
+                if self.log_manager:
+                    for message in partial.skipped:
+                        self.log_manager.log_warning(f"跳过文件 {message}")
+
+                batch = []
+                for relative_path, file_size, mtime_ns, sha256_hash, _, source in partial.records:
+                    batch.append(FileInfo(
+                        relative_path=relative_path,
+                        file_size=file_size,
                         sha256_hash=sha256_hash,
-                        modified_time=datetime.fromtimestamp(stat.st_mtime)
-                    )
+                        modified_time=datetime.fromtimestamp(mtime_ns / 1e9)
+                    ))
+                    seen_paths.append(relative_path)
+                    stats[source] += 1
+                    if source == "hashed":
+                        bytes_hashed += file_size
+                if progress_callback:
+                    progress_callback(ScanProgress(len(seen_paths), bytes_hashed, done, total,
+                                                   time.monotonic() - started))
+                yield batch
+            completed = True
+        finally:
+            # 提前关闭（取消）时保留已计算的哈希，但不能按不完整的路径清理缓存
+            if hash_cache is not None:
+                if completed:
+                    hash_cache.prune(seen_paths)
+                hash_cache.save()
 
-                    file_map[relative_path_str] = file_info
+        stats["files"] = len(seen_paths)
 
-                except Exception as e:
-                    if self.log_manager:
-                        self.log_manager.log_warning(f"跳过文件 {file_path}: {e}")
-                    continue
+        self.last_scan_stats = stats
 
         if self.log_manager:
-            self.log_manager.log_info(f"扫描完成，找到 {len(file_map)} 个文件")
-
-        return file_map
+            self.log_manager.log_info(
+                f"扫描完成（{self.scan_mode}），找到 {stats['files']} 个文件 "
+                f"(计算哈希 {stats['hashed']}, 缓存命中 {stats['cached']}, 推迟哈希 {stats['deferred']})"
+            )
 
     def _calculate_file_hash(self, file_path: Path) -> str:
         """计算文件SHA256哈希"""
@@ -152,7 +244,8 @@ class RemoteFileRetriever:
                 "architecture": architecture
             }
 
-            response = requests.get(url, params=params, timeout=30)
+            with get_instrumentation().phase("manifest", requests=1):
+                response = requests.get(url, params=params, timeout=30)
 
             if response.status_code == 404:
                 # 版本不存在，返回空字典
@@ -193,6 +286,30 @@ class DifferenceAnalyzer:
     def __init__(self, log_manager: Optional[LogManager] = None):
         self.log_manager = log_manager
 
+    def classify_file(self, local_info: FileInfo, remote_files: Dict[str, FileInfo]) -> FileDifference:
+        """
+        判定单个本地文件相对远程的变化类型（新增 / 修改 / 相同）
+
+        Args:
+            local_info: 本地文件信息
+            remote_files: 远程文件信息
+
+        Returns:
+            文件差异
+        """
+        path = local_info.relative_path
+        remote_info = remote_files.get(path)
+        if remote_info is None:
+            return FileDifference(relative_path=path, change_type=ChangeType.NEW, local_info=local_info)
+
+        # 预检推迟哈希的文件（sha256_hash 为空）大小已与远程不同，同样视为修改
+        if local_info.sha256_hash != remote_info.sha256_hash:
+            change_type = ChangeType.MODIFIED
+        else:
+            change_type = ChangeType.SAME
+        return FileDifference(relative_path=path, change_type=change_type,
+                              local_info=local_info, remote_info=remote_info)
+
     def analyze_differences(self, local_files: Dict[str, FileInfo],
                           remote_files: Dict[str, FileInfo]) -> DifferenceReport:
         """
@@ -205,6 +322,19 @@ class DifferenceAnalyzer:
         Returns:
             差异报告
         """
+        with get_instrumentation().phase("diff", files=len(local_files)):
+            report = self._analyze_differences(local_files, remote_files)
+
+        if self.log_manager:
+            self.log_manager.log_info(
+                f"差异分析完成: 新增{len(report.new_files)}, 修改{len(report.modified_files)}, "
+                f"删除{len(report.deleted_files)}, 相同{len(report.same_files)}"
+            )
+
+        return report
+
+    def _analyze_differences(self, local_files: Dict[str, FileInfo],
+                             remote_files: Dict[str, FileInfo]) -> DifferenceReport:
         new_files = []
         modified_files = []
         deleted_files = []
@@ -214,36 +344,15 @@ class DifferenceAnalyzer:
 
         # 检查本地文件
         for path, local_info in local_files.items():
-            if path not in remote_files:
-                # 新增文件
-                diff = FileDifference(
-                    relative_path=path,
-                    change_type=ChangeType.NEW,
-                    local_info=local_info
-                )
+            diff = self.classify_file(local_info, remote_files)
+            if diff.change_type == ChangeType.NEW:
                 new_files.append(diff)
                 total_upload_size += local_info.file_size
+            elif diff.change_type == ChangeType.MODIFIED:
+                modified_files.append(diff)
+                total_upload_size += local_info.file_size
             else:
-                remote_info = remote_files[path]
-                if local_info.sha256_hash != remote_info.sha256_hash:
-                    # 修改文件
-                    diff = FileDifference(
-                        relative_path=path,
-                        change_type=ChangeType.MODIFIED,
-                        local_info=local_info,
-                        remote_info=remote_info
-                    )
-                    modified_files.append(diff)
-                    total_upload_size += local_info.file_size
-                else:
-                    # 相同文件
-                    diff = FileDifference(
-                        relative_path=path,
-                        change_type=ChangeType.SAME,
-                        local_info=local_info,
-                        remote_info=remote_info
-                    )
-                    same_files.append(diff)
+                same_files.append(diff)
 
         # 检查远程独有文件（需要删除）
         for path, remote_info in remote_files.items():
@@ -255,7 +364,7 @@ class DifferenceAnalyzer:
                 )
                 deleted_files.append(diff)
 
-        report = DifferenceReport(
+        return DifferenceReport(
             new_files=new_files,
             modified_files=modified_files,
             deleted_files=deleted_files,
@@ -265,27 +374,52 @@ class DifferenceAnalyzer:
             total_files_to_delete=len(deleted_files)
         )
 
-        if self.log_manager:
-            self.log_manager.log_info(
-                f"差异分析完成: 新增{len(new_files)}, 修改{len(modified_files)}, "
-                f"删除{len(deleted_files)}, 相同{len(same_files)}"
-            )
-
-        return report
-
 
 class IncrementalUploader:
     """增量上传器"""
 
-    def __init__(self, log_manager: Optional[LogManager] = None):
+    # 流水线模式下待上传队列的容量，队列满时扫描阶段阻塞等待
+    PIPELINE_QUEUE_SIZE = 256
+
+    def __init__(self, log_manager: Optional[LogManager] = None, precheck: bool = True,
+                 scan_mode: str = "serial", scan_workers: Optional[int] = None,
+                 pipelined: bool = False, upload_workers: int = 1,
+                 concurrency: Optional[AdaptiveConcurrency] = None, journal: bool = True):
+        """
+        初始化增量上传器
+
+        Args:
+            log_manager: 日志管理器
+            precheck: 是否启用预检模式（先获取远程清单，只对可能相同的文件计算哈希）
+            scan_mode: 本地扫描模式（serial / thread / process）
+            scan_workers: 本地扫描并行度，默认CPU核数
+            pipelined: 是否启用流水线模式（边扫描边上传）
+            upload_workers: 流水线模式下的上传线程数（固定并发）
+            concurrency: 自适应并发控制器，提供时流水线模式按其上限创建上传线程并由其调节并发数
+            journal: 是否记录上传日志（中断后下次运行从日志继续）
+        """
         self.log_manager = log_manager
-        self.local_scanner = LocalFileScanner(log_manager)
+        self.precheck = precheck
+        self.pipelined = pipelined
+        self.upload_workers = max(1, upload_workers)
+        self.concurrency = concurrency
+        self.use_journal = journal
+        self.local_scanner = LocalFileScanner(log_manager, scan_mode=scan_mode, workers=scan_workers)
         self.remote_retriever = RemoteFileRetriever(log_manager)
         self.difference_analyzer = DifferenceAnalyzer(log_manager)
-        self.is_cancelled = False
+        self.control = TransferControl()
+        self._throttle: Optional[TransferThrottle] = None
+        # 大文件分块上传，中断后从已确认的分块续传
+        self.chunked_uploader = ChunkedUploader(get_server_url(), get_api_key())
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.control.is_cancelled
 
     def analyze_folder_differences(self, folder_path: str, version_type: str,
-                                 platform: str = "windows", architecture: str = "x64") -> DifferenceReport:
+                                 platform: str = "windows", architecture: str = "x64",
+                                 progress_callback: Optional[Callable[[ScanProgress], None]] = None,
+                                 control: Optional[TransferControl] = None) -> Optional[DifferenceReport]:
         """
         分析文件夹与远程版本的差异
 
@@ -294,26 +428,46 @@ class IncrementalUploader:
             version_type: 版本类型
             platform: 平台
             architecture: 架构
+            progress_callback: 扫描进度回调函数，接收ScanProgress参数（在调用线程中调用）
+            control: 传输控制对象，取消后在下一个扫描分区完成时停止
 
         Returns:
-            差异报告
+            差异报告，被取消时返回None
         """
         if self.log_manager:
             self.log_manager.log_info(f"开始分析文件夹差异: {folder_path}")
 
-        # 扫描本地文件
-        local_files = self.local_scanner.scan_folder(folder_path)
-
-        # 获取远程文件
+        # 先获取远程文件，供扫描阶段预检使用
         remote_files = self.remote_retriever.get_remote_files(version_type, platform, architecture)
 
+        remote_summary = None
+        if self.precheck:
+            remote_summary = RemoteManifestSummary.from_entries(
+                (path, info.file_size, info.sha256_hash) for path, info in remote_files.items()
+            )
+
+        # 扫描本地文件
+        local_files = {}
+        scan = self.local_scanner.iter_scan_folder(folder_path, remote_summary, progress_callback)
+        try:
+            for batch in scan:
+                if control is not None and control.is_cancelled:
+                    return None
+                for file_info in batch:
+                    local_files[file_info.relative_path] = file_info
+        finally:
+            scan.close()
+        if control is not None and control.is_cancelled:
+            return None
+
         # 分析差异
         return self.difference_analyzer.analyze_differences(local_files, remote_files)
 
     def perform_incremental_upload(self, folder_path: str, version_type: str,
                                   platform: str = "windows", architecture: str = "x64",
                                   description: str = "", enable_sync: bool = True,
-                                  progress_callback: Optional[Callable] = None) -> bool:
+                                  progress_callback: Optional[Callable] = None,
+                                  resume: bool = True) -> bool:
         """
         执行增量上传
 
@@ -325,22 +479,54 @@ class IncrementalUploader:
             description: 版本描述
             enable_sync: 是否启用云端文件同步（删除多余文件）
             progress_callback: 进度回调函数
+            resume: 上次运行中断时是否按上传日志继续
 
         Returns:
             是否成功
         """
         try:
-            # 分析差异
-            if progress_callback:
-                progress_callback(0, "分析文件差异...")
+            # 整个上传会话（包括流水线的所有上传线程）共用一个单传输限速
+            self._throttle = get_rate_limiter().open_transfer()
+
+            journal = self._open_journal(version_type, platform, architecture)
+            root = str(Path(folder_path).resolve())
+            entries = journal.load(root) if journal is not None and resume else None
+            if entries is not None and not self._journal_matches_tree(entries, folder_path):
+                # 上次中断后目录树已变化（新增、删除或修改了文件），日志中的计划已过时
+                if self.log_manager:
+                    self.log_manager.log_info("本地文件在上次中断后已变化，不按上传日志继续，重新分析差异")
+                entries = None
 
-            report = self.analyze_folder_differences(folder_path, version_type, platform, architecture)
+            if self.pipelined and entries is None:
+                return self._perform_pipelined_upload(
+                    folder_path, version_type, platform, architecture,
+                    description, enable_sync, progress_callback, journal
+                )
+
+            if entries is not None:
+                # 按日志继续：不获取远程清单，不计算哈希，已确认的文件跳过
+                report = self._report_from_journal(entries)
+                if self.log_manager:
+                    self.log_manager.log_info(
+                        f"按上传日志继续上次中断的上传: 待上传 {report.total_files_to_upload} 个文件, "
+                        f"已确认 {len(report.same_files)} 个文件"
+                    )
+            else:
+                # 分析差异
+                if progress_callback:
+                    progress_callback(0, "分析文件差异...")
+
+                report = self.analyze_folder_differences(folder_path, version_type, platform, architecture)
+                if journal is not None:
+                    journal.begin(root, self._journal_entries(report))
 
             if self.is_cancelled:
                 return False
 
             total_operations = report.total_files_to_upload + (report.total_files_to_delete if enable_sync else 0)
             if total_operations == 0:
+                if journal is not None:
+                    journal.finish()
                 if progress_callback:
                     progress_callback(100, "没有需要更新的文件")
                 if self.log_manager:
@@ -348,38 +534,55 @@ class IncrementalUploader:
                 return True
 
             completed_operations = 0
+            report_progress = CoalescingCallback(progress_callback)
 
-            # 上传新增和修改的文件
-            for file_diff in report.new_files + report.modified_files:
-                if self.is_cancelled:
+            # 上传新增和修改的文件（可执行文件和配置文件优先，同类按大小降序）
+            failed = 0
+            for file_diff in schedule(report.new_files + report.modified_files, _diff_path, _diff_size):
+                # 暂停时阻塞，取消时结束
+                if not self.control.checkpoint():
                     return False
 
                 local_file_path = Path(folder_path) / file_diff.relative_path
 
-                if progress_callback:
-                    action = "新增" if file_diff.change_type == ChangeType.NEW else "更新"
-                    progress_callback(
-                        (completed_operations / total_operations) * 100,
-                        f"{action}: {file_diff.relative_path}"
-                    )
+                action = "新增" if file_diff.change_type == ChangeType.NEW else "更新"
+                report_progress(
+                    (completed_operations / total_operations) * 100,
+                    f"{action}: {file_diff.relative_path}"
+                )
 
+                if journal is not None:
+                    journal.mark(file_diff.relative_path, IN_FLIGHT)
+                file_hash = self._ensure_hash(local_file_path, file_diff.local_info)
                 success = self._upload_single_file(
                     local_file_path, file_diff.relative_path,
-                    version_type, platform, architecture, description
+                    version_type, platform, architecture, description, file_hash
                 )
 
                 if success:
+                    if journal is not None:
+                        journal.mark(file_diff.relative_path, COMMITTED, sha256=file_hash)
                     if self.log_manager:
                         action = "新增" if file_diff.change_type == ChangeType.NEW else "更新"
                         self.log_manager.log_success(f"{action}文件成功: {file_diff.relative_path}")
                 else:
+                    failed += 1
                     if self.log_manager:
                         self.log_manager.log_error(f"上传文件失败: {file_diff.relative_path}")
 
                 completed_operations += 1
 
-            # 同步删除云端多余文件
-            if enable_sync and report.deleted_files:
+            report_progress.flush()
+
+            # 同步删除云端多余文件（只在所有上传都成功且已确认后执行；未启用日志时 pending 恒为0）
+            pending = journal.pending_count() if journal is not None else 0
+            sync_failed = False
+            if enable_sync and report.deleted_files and (failed or pending):
+                if self.log_manager:
+                    self.log_manager.log_warning(
+                        f"有 {failed} 个文件上传失败、{pending} 个文件未确认上传，暂不删除云端多余文件"
+                    )
+            elif enable_sync and report.deleted_files:
                 if progress_callback:
                     progress_callback(
                         (completed_operations / total_operations) * 100,
@@ -395,11 +598,25 @@ class IncrementalUploader:
                     if self.log_manager:
                         self.log_manager.log_success(f"同步删除了 {len(report.deleted_files)} 个多余文件")
                 else:
+                    sync_failed = True
                     if self.log_manager:
                         self.log_manager.log_warning("同步删除文件失败")
 
                 completed_operations += len(report.deleted_files)
 
+            # 全部上传已确认且同步完成后清除日志，否则下次运行从日志继续
+            if journal is not None and not pending and not failed and not sync_failed:
+                journal.finish()
+
+            if failed or pending:
+                if progress_callback:
+                    progress_callback(100, "增量上传未完成")
+                if self.log_manager:
+                    self.log_manager.log_error(
+                        f"增量上传未完成: {failed} 个文件上传失败, {pending} 个文件未确认上传"
+                    )
+                return False
+
             if progress_callback:
                 progress_callback(100, "增量上传完成")
 
@@ -416,21 +633,303 @@ class IncrementalUploader:
                 self.log_manager.log_error(f"增量上传失败: {e}")
             return False
 
-    def _upload_single_file(self, file_path: Path, relative_path: str,
-                           version_type: str, platform: str, architecture: str,
-                           description: str) -> bool:
-        """上传单个文件"""
+    def _open_journal(self, version_type: str, platform: str, architecture: str) -> Optional[UploadJournal]:
+        """打开本次上传范围的日志，日志不可用时返回None（不影响上传）"""
+        if not self.use_journal:
+            return None
+        try:
+            return UploadJournal((get_server_url(), version_type, platform, architecture))
+        except Exception as e:
+            if self.log_manager:
+                self.log_manager.log_warning(f"无法打开上传日志，本次上传不支持中断后继续: {e}")
+            return None
+
+    @staticmethod
+    def _journal_entry(diff: FileDifference) -> JournalEntry:
+        """差异转换为日志条目：新增/修改的文件待上传，相同和云端多余的文件无需处理"""
+        info = diff.local_info
+        if info is None:
+            return JournalEntry(diff.relative_path, diff.change_type.value, state=COMMITTED)
+        return JournalEntry(
+            diff.relative_path, diff.change_type.value, info.file_size,
+            info.modified_time.timestamp() if info.modified_time else 0.0, info.sha256_hash,
+            PLANNED if diff.change_type in (ChangeType.NEW, ChangeType.MODIFIED) else COMMITTED
+        )
+
+    def _journal_entries(self, report: DifferenceReport) -> List[JournalEntry]:
+        return [self._journal_entry(diff) for diff in
+                report.new_files + report.modified_files + report.same_files + report.deleted_files]
+
+    @staticmethod
+    def _journal_matches_tree(entries: List[JournalEntry], folder_path: str) -> bool:
+        """
+        只读取文件属性遍历本地目录，核对日志的计划是否仍然有效：
+        本地文件的路径集合与日志一致，且每个文件（包括已确认的）的大小和修改时间都未变化
+        """
+        local_files = stat_tree(folder_path)
+        planned = 0
+        for entry in entries:
+            current = local_files.get(entry.relative_path)
+            if entry.change == ChangeType.DELETED.value:
+                if current is not None:
+                    return False
+                continue
+            if current is None or current[0] != entry.file_size or abs(current[1] / 1e9 - entry.mtime) > 1e-3:
+                return False
+            planned += 1
+        return planned == len(local_files)
+
+    def _report_from_journal(self, entries: List[JournalEntry]) -> DifferenceReport:
+        """按日志重建差异报告（日志已由 _journal_matches_tree 核对）：已确认的文件视为相同"""
+        new_files, modified_files, deleted_files, same_files = [], [], [], []
+        for entry in entries:
+            if entry.change == ChangeType.DELETED.value:
+                deleted_files.append(FileDifference(entry.relative_path, ChangeType.DELETED))
+                continue
+
+            info = FileInfo(entry.relative_path, entry.file_size, entry.sha256,
+                            datetime.fromtimestamp(entry.mtime) if entry.mtime else None)
+            if entry.state == COMMITTED:
+                same_files.append(FileDifference(entry.relative_path, ChangeType.SAME, local_info=info))
+                continue
+
+            diff = FileDifference(entry.relative_path, ChangeType(entry.change), local_info=info)
+            (new_files if diff.change_type == ChangeType.NEW else modified_files).append(diff)
+
+        return DifferenceReport(
+            new_files=new_files,
+            modified_files=modified_files,
+            deleted_files=deleted_files,
+            same_files=same_files,
+            total_upload_size=sum(diff.local_info.file_size for diff in new_files + modified_files),
+            total_files_to_upload=len(new_files) + len(modified_files),
+            total_files_to_delete=len(deleted_files)
+        )
+
+    def _perform_pipelined_upload(self, folder_path: str, version_type: str, platform: str,
+                                  architecture: str, description: str, enable_sync: bool,
+                                  progress_callback: Optional[Callable],
+                                  journal: Optional[UploadJournal] = None) -> bool:
+        """
+        流水线增量上传：获取远程清单 -> 逐分区扫描并对比 -> 新增/修改文件立即进入上传队列
+
+        扫描与上传同时进行，总耗时接近 max(扫描, 上传) 而不是两者之和。
+        删除同步需要完整的本地清单，在扫描结束且所有上传都已确认后执行。
+        上传日志在扫描过程中逐批写入，扫描完成后才可用于恢复。
+        """
+        if progress_callback:
+            progress_callback(0, "获取远程文件列表...")
+
+        remote_files = self.remote_retriever.get_remote_files(version_type, platform, architecture)
+        remote_summary = None
+        if self.precheck:
+            remote_summary = RemoteManifestSummary.from_entries(
+                (path, info.file_size, info.sha256_hash) for path, info in remote_files.items()
+            )
+
+        # 队列中已发现的文件按优先级和大小取出
+        upload_queue: "ScheduledQueue[FileDifference]" = ScheduledQueue(_diff_path, _diff_size,
+                                                                        maxsize=self.PIPELINE_QUEUE_SIZE)
+        counters = {"queued": 0, "uploaded": 0, "failed": 0}
+        counters_lock = threading.Lock()
+        scan_done = threading.Event()
+        # 多个上传线程逐文件上报，按间隔合并
+        coalesced_callback = CoalescingCallback(progress_callback)
+
+        def report(message: str):
+            if not progress_callback:
+                return
+            with counters_lock:
+                queued = counters["queued"]
+                finished = counters["uploaded"] + counters["failed"]
+            # 扫描结束前总量未知，进度不超过99%
+            progress = finished / queued * 100 if queued else 0
+            if not scan_done.is_set():
+                progress = min(progress, 99)
+                message = f"{message}（扫描中，已发现 {queued} 个待上传文件）"
+            coalesced_callback(progress, message)
+
+        def upload_worker():
+            while True:
+                file_diff = upload_queue.get()
+                if file_diff is None:
+                    return
+                # 所有上传线程共享同一个控制对象，暂停/取消对整组生效
+                if not self.control.checkpoint():
+                    continue
+                if self.concurrency is not None and not self.concurrency.acquire(self.control):
+                    continue
+
+                action = "新增" if file_diff.change_type == ChangeType.NEW else "更新"
+                report(f"{action}: {file_diff.relative_path}")
+                if journal is not None:
+                    journal.mark(file_diff.relative_path, IN_FLIGHT)
+                started = time.monotonic()
+                local_file_path = Path(folder_path) / file_diff.relative_path
+                file_hash = self._ensure_hash(local_file_path, file_diff.local_info)
+                success = self._upload_single_file(
+                    local_file_path, file_diff.relative_path,
+                    version_type, platform, architecture, description, file_hash
+                )
+                if success and journal is not None:
+                    journal.mark(file_diff.relative_path, COMMITTED, sha256=file_hash)
+                if self.concurrency is not None:
+                    self.concurrency.release(time.monotonic() - started, _diff_size(file_diff), success)
+
+                with counters_lock:
+                    counters["uploaded" if success else "failed"] += 1
+                if self.log_manager:
+                    if success:
+                        self.log_manager.log_success(f"{action}文件成功: {file_diff.relative_path}")
+                    else:
+                        self.log_manager.log_error(f"上传文件失败: {file_diff.relative_path}")
+
+        # 供指标导出观察队列积压和当前并发数（导出时取值）
+        metrics = get_instrumentation()
+        metrics.set_gauge("upload_queue_depth", upload_queue.qsize)
+        if self.concurrency is not None:
+            metrics.set_gauge("upload_concurrency", lambda: self.concurrency.limit)
+
+        worker_count = self.concurrency.max_limit if self.concurrency is not None else self.upload_workers
+        workers = [threading.Thread(target=upload_worker, daemon=True) for _ in range(worker_count)]
+        for worker in workers:
+            worker.start()
+
+        if journal is not None:
+            journal.begin(str(Path(folder_path).resolve()), complete=False)
+
+        local_files: Dict[str, FileInfo] = {}
+        scan = self.local_scanner.iter_scan_folder(folder_path, remote_summary)
         try:
-            # 计算文件哈希
+            for batch in scan:
+                if not self.control.checkpoint():
+                    break
+                diffs = []
+                for local_info in batch:
+                    local_files[local_info.relative_path] = local_info
+                    diffs.append(self.difference_analyzer.classify_file(local_info, remote_files))
+                # 先写入日志再进入上传队列
+                if journal is not None:
+                    journal.add(self._journal_entry(diff) for diff in diffs)
+                for file_diff in diffs:
+                    if file_diff.change_type in (ChangeType.NEW, ChangeType.MODIFIED):
+                        with counters_lock:
+                            counters["queued"] += 1
+                        upload_queue.put(file_diff)  # 队列满时阻塞，形成背压
+        finally:
+            scan.close()
+            scan_done.set()
+            upload_queue.close(len(workers))
+            for worker in workers:
+                worker.join()
+            metrics.remove_gauge("upload_queue_depth")
+            metrics.remove_gauge("upload_concurrency")
+
+        if self.is_cancelled:
+            return False
+
+        deleted_paths = [path for path in remote_files if path not in local_files]
+        pending = 0
+        if journal is not None:
+            journal.add(JournalEntry(path, ChangeType.DELETED.value, state=COMMITTED) for path in deleted_paths)
+            journal.plan_complete()
+            pending = journal.pending_count()
+
+        # 只在所有上传都成功且已确认后删除云端多余文件（未启用日志时 pending 恒为0）
+        failed = counters["failed"]
+        sync_failed = False
+        if enable_sync and deleted_paths and (failed or pending):
+            if self.log_manager:
+                self.log_manager.log_warning(
+                    f"有 {failed} 个文件上传失败、{pending} 个文件未确认上传，暂不删除云端多余文件"
+                )
+        elif enable_sync and deleted_paths:
+            report("同步删除云端多余文件...")
+            if self._sync_remote_files(version_type, platform, architecture, list(local_files.values())):
+                if self.log_manager:
+                    self.log_manager.log_success(f"同步删除了 {len(deleted_paths)} 个多余文件")
+            else:
+                sync_failed = True
+                if self.log_manager:
+                    self.log_manager.log_warning("同步删除文件失败")
+
+        # 全部上传已确认且同步完成后清除日志，否则下次运行从日志继续
+        if journal is not None and not pending and not failed and not sync_failed:
+            journal.finish()
+
+        coalesced_callback.flush()
+        if failed or pending:
+            if progress_callback:
+                progress_callback(100, "增量上传未完成")
+        elif progress_callback:
+            progress_callback(100, "增量上传完成" if counters["queued"] or deleted_paths else "没有需要更新的文件")
+
+        if self.log_manager:
+            if failed or pending:
+                self.log_manager.log_error(
+                    f"流水线增量上传未完成: 上传{counters['uploaded']}个文件, "
+                    f"{failed} 个文件上传失败, {pending} 个文件未确认上传"
+                )
+            else:
+                self.log_manager.log_success(
+                    f"流水线增量上传完成: 上传{counters['uploaded']}个文件, "
+                    f"删除{len(deleted_paths) if enable_sync else 0}个文件"
+                )
+            if self.concurrency is not None:
+                stats = self.concurrency.stats()
+                self.log_manager.log_info(
+                    f"自适应并发: 最终 {stats.limit}（范围 {self.concurrency.min_limit}-{self.concurrency.max_limit}）, "
+                    f"提高 {stats.increases} 次, 降低 {stats.decreases} 次, 最近错误率 {stats.error_rate:.0%}"
+                )
+
+        return not failed and not pending
+
+    def _hash_for_upload(self, file_path: Path, file_size: int) -> str:
+        """计算待上传文件的SHA256（计入 hash 阶段）"""
+        with get_instrumentation().phase("hash", files=1, bytes=file_size):
             sha256_hash = hashlib.sha256()
             with open(file_path, 'rb') as f:
                 for chunk in iter(lambda: f.read(8192), b""):
                     sha256_hash.update(chunk)
-            file_hash = sha256_hash.hexdigest()
+            return sha256_hash.hexdigest()
+
+    def _ensure_hash(self, file_path: Path, local_info: Optional[FileInfo]) -> Optional[str]:
+        """扫描时推迟哈希的文件在上传前计算哈希并写回文件信息，同步时的本地清单需要完整的哈希"""
+        if local_info is None:
+            return None
+        if not local_info.sha256_hash:
+            try:
+                local_info.sha256_hash = self._hash_for_upload(file_path, local_info.file_size)
+            except OSError:
+                # 读取失败时上传同样会失败并记录原因
+                return None
+        return local_info.sha256_hash
+
+    def _upload_single_file(self, file_path: Path, relative_path: str,
+                           version_type: str, platform: str, architecture: str,
+                           description: str, file_hash: Optional[str] = None) -> bool:
+        """上传单个文件（file_hash 为扫描时已得到的哈希，未提供时重新计算）"""
+        metrics = get_instrumentation()
+        try:
+            file_size = file_path.stat().st_size
+            if not file_hash:
+                file_hash = self._hash_for_upload(file_path, file_size)
+
+            # 大文件分块上传，服务器不支持时改用单请求上传
+            if self.chunked_uploader.accepts(file_size):
+                try:
+                    # 分块请求数和重试次数由 ChunkedUploader 计入
+                    with metrics.phase("upload", files=1, bytes=file_size):
+                        return self.chunked_uploader.upload_file(
+                            file_path, relative_path, version_type, platform, architecture,
+                            file_hash, description, self._throttle, self.control
+                        )
+                except ChunkedUploadUnsupported:
+                    if self.log_manager:
+                        self.log_manager.log_warning("服务器不支持分块上传，改用单请求上传")
 
             # 准备上传数据
             with open(file_path, 'rb') as f:
-                files = {'file': (file_path.name, f, 'application/octet-stream')}
                 data = {
                     'version_type': version_type,
                     'platform': platform,
@@ -440,14 +939,19 @@ class IncrementalUploader:
                     'api_key': get_api_key(),
                     'file_hash': file_hash
                 }
-
-                # 发送请求
-                response = requests.post(
-                    f"{get_server_url()}/api/v2/upload/simple/file",
-                    files=files,
-                    data=data,
-                    timeout=60
-                )
+                body = MultipartBody(data, 'file', file_path.name, f, file_size,
+                                     self._throttle, self.control)
+
+                # 发送请求（文件按块读取并限速）
+                with metrics.phase("upload", files=1, bytes=file_size, requests=1) as timer:
+                    response = requests.post(
+                        f"{get_server_url()}/api/v2/upload/simple/file",
+                        data=body,
+                        headers={'Content-Type': body.content_type},
+                        timeout=60
+                    )
+                    if response.status_code != 200:
+                        timer.add(errors=1)
 
                 return response.status_code == 200
 
@@ -459,6 +963,46 @@ class IncrementalUploader:
     def _sync_remote_files(self, version_type: str, platform: str, architecture: str,
                           local_files: List[FileInfo]) -> bool:
         """同步远程文件（删除多余文件）"""
+        unhashed = [file_info.relative_path for file_info in local_files if not file_info.sha256_hash]
+        if unhashed:
+            # 清单中缺少哈希的文件不能交给服务器比较
+            if self.log_manager:
+                self.log_manager.log_warning(f"有 {len(unhashed)} 个文件没有哈希，暂不同步: {unhashed[0]}")
+            return False
+        try:
+            # 以流式二进制载荷发送本地清单
+            payload = encode_compare_request(
+                (file_info.relative_path, file_info.file_size, file_info.sha256_hash)
+                for file_info in local_files
+            )
+
+            with get_instrumentation().phase("commit", files=len(local_files), requests=1):
+                response = requests.post(
+                    f"{get_server_url()}{APIEndpoints.SYNC_BINARY}/{version_type}",
+                    params={
+                        'platform': platform,
+                        'architecture': architecture,
+                        'api_key': get_api_key()
+                    },
+                    data=payload,
+                    headers={'Content-Type': COMPARE_CONTENT_TYPE},
+                    timeout=60
+                )
+
+            if response.status_code in (404, 405, 415):
+                # 服务器不支持二进制同步，回退到表单接口
+                return self._sync_remote_files_legacy(version_type, platform, architecture, local_files)
+
+            return response.status_code == 200
+
+        except Exception as e:
+            if self.log_manager:
+                self.log_manager.log_error(f"同步远程文件失败: {e}")
+            return False
+
+    def _sync_remote_files_legacy(self, version_type: str, platform: str, architecture: str,
+                                  local_files: List[FileInfo]) -> bool:
+        """通过表单JSON接口同步远程文件（旧服务器兼容）"""
         try:
             # 准备本地文件列表
             local_file_list = [
@@ -478,11 +1022,12 @@ class IncrementalUploader:
                 'api_key': get_api_key()
             }
 
-            response = requests.post(
-                f"{get_server_url()}/api/v2/sync/simple/{version_type}",
-                data=data,
-                timeout=60
-            )
+            with get_instrumentation().phase("commit", requests=1):
+                response = requests.post(
+                    f"{get_server_url()}/api/v2/sync/simple/{version_type}",
+                    data=data,
+                    timeout=60
+                )
 
             return response.status_code == 200
 
@@ -491,6 +1036,14 @@ class IncrementalUploader:
                 self.log_manager.log_error(f"同步远程文件失败: {e}")
             return False
 
+    def pause_upload(self):
+        """暂停上传"""
+        self.control.pause()
+
+    def resume_upload(self):
+        """恢复上传"""
+        self.control.resume()
+
     def cancel_upload(self):
         """取消上传"""
-        self.is_cancelled = True
+        self.control.cancel()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+自适应并发控制
+按 AIMD（加性增、乘性减）实时调整同时进行的请求数：每完成一个窗口的请求评估一次，
+    - 错误率超过阈值                 -> 并发数减半
+    - 延迟明显升高且吞吐量低于近期最好值 -> 并发数乘以 0.75（服务器过载）
+    - 延迟明显升高但吞吐量保持         -> 保持（链路已饱和，再增加只会排队）
+    - 其他情况                       -> 并发数加一
+上限和下限来自配置；链路越快、往返延迟越大，稳定时的并发数越高。
+
+工作线程按上限创建，每个请求前 acquire、结束后 release，由控制器决定同时放行多少个。
+
+配置（单位: 请求数）:
+    {"min_concurrency": 1, "max_concurrency": 8, "initial_concurrency": 2}
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.transfer_control import TransferControl
+
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_MAX_CONCURRENCY = 8
+
+# 窗口错误率超过该值时减半
+ERROR_RATE_THRESHOLD = 0.1
+# 窗口平均延迟超过最小窗口延迟的倍数时视为排队
+LATENCY_TOLERANCE = 2.0
+# 吞吐量低于近期最好值的该比例时视为过载
+THROUGHPUT_DROP = 0.75
+# 近期最好吞吐量每个窗口的衰减系数（跟随链路变化）
+BEST_THROUGHPUT_DECAY = 0.98
+# 每个窗口至少包含的请求数
+MIN_WINDOW = 8
+
+
+@dataclass
+class ConcurrencyStats:
+    """并发控制指标"""
+    limit: int
+    in_flight: int
+    throughput: float  # 最近一个窗口的吞吐量（bytes/sec，无字节数时为 请求/秒）
+    mean_latency: float  # 最近一个窗口的平均延迟（秒）
+    error_rate: float  # 最近一个窗口的错误率
+    increases: int
+    decreases: int
+    history: List[Tuple[float, int]] = field(default_factory=list)  # (时间, 并发数)
+
+
+class AdaptiveConcurrency:
+    """AIMD 并发控制器"""
+
+    def __init__(self, min_limit: int = DEFAULT_MIN_CONCURRENCY, max_limit: int = DEFAULT_MAX_CONCURRENCY,
+                 initial: Optional[int] = None,
+                 on_change: Optional[Callable[[int, str], None]] = None):
+        """
+        初始化并发控制器
+
+        Args:
+            min_limit: 最小并发数
+            max_limit: 最大并发数
+            initial: 初始并发数，默认取下限
+            on_change: 并发数变化回调 (新并发数, 原因)
+        """
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.on_change = on_change
+
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial or self.min_limit)))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._window_errors = 0
+        self._window_bytes = 0
+        self._window_latency = 0.0
+        self._last_throughput = 0.0
+        self._best_throughput = 0.0
+        self._last_latency = 0.0
+        self._last_error_rate = 0.0
+        self._min_latency = 0.0
+        self._increases = 0
+        self._decreases = 0
+        self._history: List[Tuple[float, int]] = [(time.time(), int(self._limit))]
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], on_change: Optional[Callable[[int, str], None]] = None,
+                    default_max: int = DEFAULT_MAX_CONCURRENCY) -> "AdaptiveConcurrency":
+        """按配置中的 min_concurrency / max_concurrency / initial_concurrency 创建"""
+        return cls(
+            config.get("min_concurrency", DEFAULT_MIN_CONCURRENCY),
+            config.get("max_concurrency", default_max),
+            config.get("initial_concurrency"),
+            on_change
+        )
+
+    @property
+    def limit(self) -> int:
+        """当前允许的并发数"""
+        return int(self._limit)
+
+    def acquire(self, control: Optional[TransferControl] = None) -> bool:
+        """
+        等待一个并发名额
+
+        Args:
+            control: 传输控制对象，取消时立即返回
+
+        Returns:
+            是否获得名额（已取消时返回False）
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                if control is not None and control.is_cancelled:
+                    return False
+                # 取消不会通知本条件变量，限时等待后重新检查
+                self._condition.wait(0.5 if control is not None else None)
+            self._in_flight += 1
+        return True
+
+    def release(self, latency: float, transferred_bytes: int = 0, success: bool = True):
+        """
+        归还名额并记录请求结果
+
+        Args:
+            latency: 请求耗时（秒）
+            transferred_bytes: 传输的字节数
+            success: 请求是否成功
+        """
+        change = None
+        with self._condition:
+            self._in_flight -= 1
+            self._window_count += 1
+            self._window_latency += latency
+            self._window_bytes += transferred_bytes
+            if not success:
+                self._window_errors += 1
+            if self._window_count >= max(MIN_WINDOW, int(self._limit)):
+                change = self._evaluate_window()
+            self._condition.notify_all()
+
+        if change and self.on_change:
+            self.on_change(*change)
+
+    def _evaluate_window(self) -> Optional[Tuple[int, str]]:
+        """评估一个窗口并调整并发数（持有锁时调用），返回 (新并发数, 原因) 或 None"""
+        now = time.monotonic()
+        elapsed = max(now - self._window_start, 1e-6)
+        throughput = (self._window_bytes or self._window_count) / elapsed
+        mean_latency = self._window_latency / self._window_count
+        error_rate = self._window_errors / self._window_count
+
+        self._min_latency = mean_latency if not self._min_latency else min(self._min_latency, mean_latency)
+        self._best_throughput = max(throughput, self._best_throughput * BEST_THROUGHPUT_DECAY)
+        self._last_throughput = throughput
+        self._last_latency = mean_latency
+        self._last_error_rate = error_rate
+        self._window_start = now
+        self._window_count = self._window_errors = self._window_bytes = 0
+        self._window_latency = 0.0
+
+        old_limit = int(self._limit)
+        queueing = mean_latency > self._min_latency * LATENCY_TOLERANCE
+        if error_rate > ERROR_RATE_THRESHOLD:
+            self._limit = max(self.min_limit, self._limit / 2)
+            reason = f"错误率 {error_rate:.0%}"
+        elif queueing and throughput < self._best_throughput * THROUGHPUT_DROP:
+            self._limit = max(self.min_limit, self._limit * 0.75)
+            reason = f"延迟升高到 {mean_latency / self._min_latency:.1f} 倍且吞吐量下降"
+        elif queueing:
+            return None
+        else:
+            self._limit = min(self.max_limit, self._limit + 1)
+            reason = "延迟正常"
+
+        new_limit = int(self._limit)
+        if new_limit == old_limit:
+            return None
+        if new_limit > old_limit:
+            self._increases += 1
+        else:
+            self._decreases += 1
+        self._history.append((time.time(), new_limit))
+        return new_limit, reason
+
+    def stats(self) -> ConcurrencyStats:
+        """获取当前指标"""
+        with self._condition:
+            return ConcurrencyStats(
+                limit=int(self._limit),
+                in_flight=self._in_flight,
+                throughput=self._last_throughput,
+                mean_latency=self._last_latency,
+                error_rate=self._last_error_rate,
+                increases=self._increases,
+                decreases=self._decreases,
+                history=list(self._history)
+            )
@@ -6,10 +6,16 @@ Omega更新系统 - API客户端
 
 import requests
 import json
+import hashlib
 import logging
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.chunked_upload import ChunkedUploader, ChunkedUploadUnsupported
+
 class OmegaAPIClient:
     """Omega服务器API客户端"""
     
@@ -31,6 +37,9 @@ class OmegaAPIClient:
         
         # 设置日志
         self.logger = logging.getLogger(__name__)
+
+        # 大文件分块上传（与本客户端共用网络会话）
+        self.chunked_uploader = ChunkedUploader(self.server_url, self.api_key, session=self.session)
     
     def test_connection(self) -> Dict[str, Any]:
         """测试服务器连接"""
@@ -145,6 +154,25 @@ class OmegaAPIClient:
             architecture: 架构
         """
         try:
+            # 大文件分块上传，中断后再次调用从已确认的分块继续
+            if self.chunked_uploader.accepts(file_path.stat().st_size):
+                sha256_hash = hashlib.sha256()
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        sha256_hash.update(chunk)
+                try:
+                    completed = self.chunked_uploader.upload_file(
+                        file_path, str(file_path.name), version_type, platform, architecture,
+                        sha256_hash.hexdigest()
+                    )
+                    return {
+                        "success": completed,
+                        "data": {"file_hash": sha256_hash.hexdigest(), "chunked": True},
+                        "status_code": 200 if completed else None
+                    }
+                except ChunkedUploadUnsupported:
+                    self.logger.warning("服务器不支持分块上传，改用单请求上传")
+
             url = f"{self.server_url}/api/v2/upload/simple/file"
             
             with open(file_path, 'rb') as f:
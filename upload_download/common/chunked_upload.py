@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+分块上传
+大文件按固定大小分块上传，任何一块失败只重传该块，不必重传整个文件:
+    1. 发起    POST /api/v2/upload/chunked/initiate            -> upload_id
+    2. 上传分块 PUT  /api/v2/upload/chunked/{upload_id}/parts/{n}  （并行，X-Part-SHA256 头携带分块哈希）
+    3. 提交    POST /api/v2/upload/chunked/{upload_id}/complete （各分块哈希 + 整个文件的哈希）
+
+上传会话保存在本地 SQLite 库中，记录每个已确认的分块；进程中断后再次上传同一文件
+（大小和哈希不变）时先向服务器查询会话状态，只上传缺少的分块。
+
+服务器不支持分块上传（发起请求返回 404/405）时抛出 ChunkedUploadUnsupported，调用方改用单请求上传。
+
+配置（服务器配置文件的 "upload" 节）:
+    {"chunked_threshold_mb": 64, "part_size_mb": 8, "part_workers": 4}
+"""
+
+import hashlib
+import io
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.common_utils import APIEndpoints, get_cache_dir, get_config
+from tools.common.instrumentation import get_instrumentation
+from tools.common.rate_limiter import ThrottledReader, TransferThrottle
+from tools.common.transfer_control import TransferCancelled, TransferControl
+
+MB = 1024 * 1024
+
+# 达到该大小的文件使用分块上传
+DEFAULT_CHUNKED_THRESHOLD = 64 * MB
+DEFAULT_PART_SIZE = 8 * MB
+DEFAULT_PART_WORKERS = 4
+
+# 单个分块的重试次数和退避间隔（秒，按次数递增）
+PART_RETRIES = 3
+RETRY_DELAY = 2.0
+
+SessionKey = Tuple[str, str, str, str, str]  # (服务器, 版本类型, 平台, 架构, 相对路径)
+
+
+class ChunkedUploadError(Exception):
+    """分块上传失败"""
+
+
+class ChunkedUploadUnsupported(ChunkedUploadError):
+    """服务器不支持分块上传"""
+
+
+@dataclass
+class UploadSession:
+    """一个未完成的分块上传会话"""
+    upload_id: str
+    part_size: int
+    parts: Dict[int, str] = field(default_factory=dict)  # 已确认的分块: 序号 -> SHA256
+
+
+class UploadSessionStore:
+    """基于SQLite的上传会话记录，进程中断后用于续传"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        初始化会话记录
+
+        Args:
+            db_path: 数据库路径，默认位于本地缓存目录
+        """
+        self.db_path = Path(db_path) if db_path else get_cache_dir() / "upload_sessions.db"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_sessions ("
+            " server TEXT NOT NULL, version_type TEXT NOT NULL, platform TEXT NOT NULL,"
+            " architecture TEXT NOT NULL, relative_path TEXT NOT NULL,"
+            " file_size INTEGER NOT NULL, file_hash TEXT NOT NULL,"
+            " upload_id TEXT NOT NULL, part_size INTEGER NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (server, version_type, platform, architecture, relative_path))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_parts ("
+            " upload_id TEXT NOT NULL, part_number INTEGER NOT NULL, sha256 TEXT NOT NULL,"
+            " PRIMARY KEY (upload_id, part_number))"
+        )
+        self._conn.commit()
+
+    def find(self, key: SessionKey, file_size: int, file_hash: str) -> Optional[UploadSession]:
+        """查找同一文件的未完成会话；文件已变化时丢弃旧会话并返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT upload_id, part_size, file_size, file_hash FROM upload_sessions"
+                " WHERE server = ? AND version_type = ? AND platform = ? AND architecture = ?"
+                " AND relative_path = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            upload_id, part_size, stored_size, stored_hash = row
+            if stored_size != file_size or stored_hash != file_hash:
+                self._delete(upload_id)
+                return None
+            parts = dict(self._conn.execute(
+                "SELECT part_number, sha256 FROM upload_parts WHERE upload_id = ?", (upload_id,)
+            ).fetchall())
+            return UploadSession(upload_id, part_size, parts)
+
+    def create(self, key: SessionKey, file_size: int, file_hash: str, upload_id: str, part_size: int):
+        """记录新会话（替换同一文件的旧会话）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT upload_id FROM upload_sessions WHERE server = ? AND version_type = ?"
+                " AND platform = ? AND architecture = ? AND relative_path = ?", key
+            ).fetchone()
+            if row is not None:
+                self._delete(row[0])
+            self._conn.execute(
+                "INSERT INTO upload_sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, file_size, file_hash, upload_id, part_size, time.time())
+            )
+            self._conn.commit()
+
+    def add_part(self, upload_id: str, part_number: int, sha256: str):
+        """记录一个已被服务器确认的分块"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO upload_parts VALUES (?, ?, ?)",
+                               (upload_id, part_number, sha256))
+            self._conn.commit()
+
+    def remove(self, upload_id: str):
+        """删除会话（上传完成或会话失效）"""
+        with self._lock:
+            self._delete(upload_id)
+
+    def _delete(self, upload_id: str):
+        self._conn.execute("DELETE FROM upload_parts WHERE upload_id = ?", (upload_id,))
+        self._conn.execute("DELETE FROM upload_sessions WHERE upload_id = ?", (upload_id,))
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ChunkedUploader:
+    """分块上传客户端"""
+
+    def __init__(self, server_url: str, api_key: str,
+                 session_store: Optional[UploadSessionStore] = None,
+                 threshold: Optional[int] = None, part_size: Optional[int] = None,
+                 workers: Optional[int] = None, session: Optional[requests.Session] = None,
+                 timeout: int = 60):
+        """
+        初始化分块上传客户端
+
+        Args:
+            server_url: 服务器URL
+            api_key: API密钥
+            session_store: 上传会话记录，默认使用本地缓存目录中的库
+            threshold: 使用分块上传的最小文件大小，默认按配置
+            part_size: 分块大小，默认按配置
+            workers: 同一文件并行上传的分块数，默认按配置
+            session: 网络会话
+            timeout: 单个请求的超时（秒）
+        """
+        upload_config = get_config().get("upload", {})
+        self.server_url = server_url.rstrip('/')
+        self.api_key = api_key
+        self.threshold = threshold or int(upload_config.get("chunked_threshold_mb", 0) * MB) or DEFAULT_CHUNKED_THRESHOLD
+        self.part_size = part_size or int(upload_config.get("part_size_mb", 0) * MB) or DEFAULT_PART_SIZE
+        self.workers = workers or upload_config.get("part_workers", DEFAULT_PART_WORKERS)
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self._store = session_store
+        self._store_lock = threading.Lock()
+        # 服务器不支持分块上传时置为False，之后不再尝试
+        self.supported = True
+
+    @property
+    def store(self) -> UploadSessionStore:
+        """上传会话记录（首次使用时打开）"""
+        with self._store_lock:
+            if self._store is None:
+                self._store = UploadSessionStore()
+            return self._store
+
+    def accepts(self, file_size: int) -> bool:
+        """该大小的文件是否应使用分块上传"""
+        return self.supported and file_size >= self.threshold
+
+    def upload_file(self, file_path: Path, relative_path: str, version_type: str,
+                    platform: str, architecture: str, file_hash: str, description: str = "",
+                    throttle: Optional[TransferThrottle] = None,
+                    control: Optional[TransferControl] = None,
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        """
+        分块上传一个文件，中断后再次调用会从已确认的分块继续
+
+        Args:
+            file_path: 本地文件路径
+            relative_path: 文件在版本中的相对路径
+            version_type: 版本类型
+            platform: 平台
+            architecture: 架构
+            file_hash: 整个文件的SHA256
+            description: 描述
+            throttle: 限速器
+            control: 传输控制对象
+            progress_callback: 进度回调 (已上传字节数, 文件大小)
+
+        Returns:
+            是否上传完成（被取消时返回False，会话保留以便续传）
+
+        Raises:
+            ChunkedUploadUnsupported: 服务器不支持分块上传
+            ChunkedUploadError: 分块多次重试仍失败或服务器拒绝提交
+        """
+        file_size = file_path.stat().st_size
+        key: SessionKey = (self.server_url, version_type, platform, architecture, relative_path)
+
+        session = self._resume_session(key, file_size, file_hash)
+        if session is None:
+            session = self._initiate(key, file_size, file_hash, relative_path, version_type,
+                                     platform, architecture, description)
+
+        part_count = max(1, -(-file_size // session.part_size))
+        missing = [n for n in range(part_count) if n not in session.parts]
+        uploaded = [sum(min(session.part_size, file_size - n * session.part_size) for n in session.parts)]
+        uploaded_lock = threading.Lock()
+        if progress_callback:
+            progress_callback(uploaded[0], file_size)
+
+        def upload_part(part_number: int) -> bool:
+            if control is not None and not control.checkpoint():
+                return False
+            offset = part_number * session.part_size
+            with open(file_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(session.part_size)
+            sha256 = self._put_part(session.upload_id, part_number, data, throttle, control)
+            if sha256 is None:
+                return False
+            session.parts[part_number] = sha256
+            self.store.add_part(session.upload_id, part_number, sha256)
+            if progress_callback:
+                with uploaded_lock:
+                    uploaded[0] += len(data)
+                    progress_callback(uploaded[0], file_size)
+            return True
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(missing) or 1))) as executor:
+            results = list(executor.map(upload_part, missing))
+        if not all(results):
+            return False
+
+        self._complete(session, part_count, file_hash)
+        self.store.remove(session.upload_id)
+        return True
+
+    def _resume_session(self, key: SessionKey, file_size: int, file_hash: str) -> Optional[UploadSession]:
+        """按本地记录和服务器状态恢复会话，服务器已不认识该会话时返回None"""
+        session = self.store.find(key, file_size, file_hash)
+        if session is None:
+            return None
+        response = self.session.get(
+            self._url(APIEndpoints.UPLOAD_CHUNKED_SESSION, upload_id=session.upload_id),
+            headers={'X-API-Key': self.api_key}, timeout=self.timeout
+        )
+        if response.status_code != 200:
+            # 会话已过期或被服务器清理
+            self.store.remove(session.upload_id)
+            return None
+        # 只采用双方一致的分块：本地已记录但服务器没有的分块需要重传
+        server_parts = {part["part_number"]: part["sha256"] for part in response.json().get("parts", [])}
+        session.parts = {n: sha256 for n, sha256 in session.parts.items() if server_parts.get(n) == sha256}
+        return session
+
+    def _initiate(self, key: SessionKey, file_size: int, file_hash: str, relative_path: str,
+                  version_type: str, platform: str, architecture: str, description: str) -> UploadSession:
+        response = self.session.post(
+            self._url(APIEndpoints.UPLOAD_CHUNKED_INITIATE),
+            json={
+                "version_type": version_type,
+                "platform": platform,
+                "architecture": architecture,
+                "relative_path": relative_path,
+                "description": description,
+                "file_size": file_size,
+                "file_hash": file_hash,
+                "part_size": self.part_size
+            },
+            headers={'X-API-Key': self.api_key},
+            timeout=self.timeout
+        )
+        if response.status_code in (404, 405):
+            self.supported = False
+            raise ChunkedUploadUnsupported("服务器不支持分块上传")
+        if response.status_code != 200:
+            raise ChunkedUploadError(f"发起分块上传失败: HTTP {response.status_code}")
+
+        result = response.json()
+        session = UploadSession(result["upload_id"], result.get("part_size", self.part_size))
+        self.store.create(key, file_size, file_hash, session.upload_id, session.part_size)
+        return session
+
+    def _put_part(self, upload_id: str, part_number: int, data: bytes,
+                  throttle: Optional[TransferThrottle], control: Optional[TransferControl]) -> Optional[str]:
+        """上传一个分块，失败时按递增间隔重试，返回分块哈希（被取消时返回None）"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        url = self._url(APIEndpoints.UPLOAD_CHUNKED_PART, upload_id=upload_id, part_number=part_number)
+        last_error = ""
+        for attempt in range(1, PART_RETRIES + 1):
+            get_instrumentation().count("upload", requests=1, retries=1 if attempt > 1 else 0)
+            try:
+                response = self.session.put(
+                    url,
+                    data=ThrottledReader(io.BytesIO(data), throttle, control, length=len(data)),
+                    headers={'X-API-Key': self.api_key, 'X-Part-SHA256': sha256,
+                             'Content-Type': 'application/octet-stream'},
+                    timeout=self.timeout
+                )
+                if response.status_code == 200 and response.json().get("sha256") == sha256:
+                    return sha256
+                last_error = f"HTTP {response.status_code}"
+            except TransferCancelled:
+                return None
+            except requests.RequestException as e:
+                last_error = str(e)
+            # 等待后重试，等待期间可被取消
+            if control is not None:
+                if not control.sleep(RETRY_DELAY * attempt):
+                    return None
+            else:
+                time.sleep(RETRY_DELAY * attempt)
+        raise ChunkedUploadError(f"分块 {part_number} 上传失败: {last_error}")
+
+    def _complete(self, session: UploadSession, part_count: int, file_hash: str):
+        response = self.session.post(
+            self._url(APIEndpoints.UPLOAD_CHUNKED_COMPLETE, upload_id=session.upload_id),
+            json={
+                "file_hash": file_hash,
+                "parts": [{"part_number": n, "sha256": session.parts[n]} for n in range(part_count)]
+            },
+            headers={'X-API-Key': self.api_key},
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            # 服务器拒绝提交（分块不完整或哈希不一致），丢弃会话以便下次重新上传
+            self.store.remove(session.upload_id)
+            raise ChunkedUploadError(f"提交分块上传失败: HTTP {response.status_code}")
+
+    def _url(self, endpoint: str, **params) -> str:
+        return self.server_url + endpoint.format(**params)
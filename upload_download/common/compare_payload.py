@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+紧凑二进制比较载荷
+用于与服务器交换文件清单（路径 + 大小 + SHA256），替代表单内嵌的JSON字符串。
+
+载荷格式::
+
+    头部: MAGIC(4) + 格式版本(1) + 标志位(1)        —— 始终不压缩
+    正文: 连续的记录，按路径排序                     —— 标志位含 FLAG_ZLIB 时为zlib流
+
+    请求记录: <H 路径长度><路径 UTF-8><Q 文件大小><32s SHA256摘要>
+    响应记录: <B 操作码><H 路径长度><路径 UTF-8><Q 文件大小><32s SHA256摘要>
+    摘要记录: <H 路径长度><路径 UTF-8><Q 文件大小><8s SHA256前缀>
+
+编码与解码均为流式：编码端按块产出字节，可直接作为 requests 的流式请求体；
+解码端逐块喂入数据，边接收边产出记录，不需要在内存中拼出完整载荷。
+"""
+
+import struct
+import zlib
+from enum import Enum
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"OMCP"
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x01
+
+COMPARE_CONTENT_TYPE = "application/x-omega-compare"
+
+DIGEST_SIZE = 32
+EMPTY_DIGEST = b"\x00" * DIGEST_SIZE
+
+_HEADER = struct.Struct("<4sBB")
+_PATH_LEN = struct.Struct("<H")
+_SIZE_DIGEST = struct.Struct("<Q32s")
+_OP = struct.Struct("<B")
+
+# 清单摘要只携带摘要前缀，足以判定"肯定不同"
+SUMMARY_PREFIX_SIZE = 8
+_SIZE_PREFIX = struct.Struct("<Q8s")
+
+# 每累积这么多字节的记录就产出一个块
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class CompareOp(Enum):
+    """比较结果操作码"""
+    NEW = ord("N")       # 服务器有、本地没有（下载端）或本地有、服务器没有（上传端）
+    UPDATED = ord("U")   # 双方都有但摘要不同
+    DELETED = ord("D")   # 应当删除
+    SAME = ord("S")      # 相同文件
+
+
+class PayloadError(Exception):
+    """载荷格式错误"""
+
+
+def digest_to_bytes(sha256_hex: Optional[str]) -> bytes:
+    """十六进制摘要转为32字节，缺失或非法时返回全零摘要"""
+    if not sha256_hex:
+        return EMPTY_DIGEST
+    try:
+        digest = bytes.fromhex(sha256_hex)
+    except ValueError:
+        return EMPTY_DIGEST
+    return digest if len(digest) == DIGEST_SIZE else EMPTY_DIGEST
+
+
+def digest_to_hex(digest: bytes) -> str:
+    """32字节摘要转为十六进制，全零摘要视为缺失"""
+    return "" if digest == EMPTY_DIGEST else digest.hex()
+
+
+def _pack_path(path: str) -> bytes:
+    encoded = path.encode("utf-8")
+    if len(encoded) > 0xFFFF:
+        raise PayloadError(f"路径过长: {path[:64]}...")
+    return _PATH_LEN.pack(len(encoded)) + encoded
+
+
+def _iter_payload(records: Iterable[bytes], compress: bool,
+                  chunk_size: int) -> Iterator[bytes]:
+    """把已打包的记录组合成带头部的载荷块"""
+    flags = FLAG_ZLIB if compress else 0
+    yield _HEADER.pack(MAGIC, FORMAT_VERSION, flags)
+
+    compressor = zlib.compressobj(6) if compress else None
+    buffer: List[bytes] = []
+    buffered = 0
+
+    for record in records:
+        buffer.append(record)
+        buffered += len(record)
+        if buffered >= chunk_size:
+            block = b"".join(buffer)
+            buffer.clear()
+            buffered = 0
+            if compressor:
+                block = compressor.compress(block)
+            if block:
+                yield block
+
+    block = b"".join(buffer)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
+
+
+def encode_compare_request(files: Iterable[Tuple[str, int, str]], compress: bool = True,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    编码比较请求载荷
+
+    Args:
+        files: (相对路径, 文件大小, SHA256十六进制) 序列，摘要可为空
+        compress: 是否压缩正文
+        chunk_size: 产出块的近似大小
+
+    Returns:
+        载荷字节块迭代器
+    """
+    ordered = sorted(files, key=lambda item: item[0])
+
+    def records() -> Iterator[bytes]:
+        for path, size, sha256_hex in ordered:
+            yield _pack_path(path) + _SIZE_DIGEST.pack(size, digest_to_bytes(sha256_hex))
+
+    return _iter_payload(records(), compress, chunk_size)
+
+
+def encode_compare_response(entries: Iterable[Tuple[CompareOp, str, int, str]],
+                            compress: bool = True,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    编码比较响应载荷
+
+    Args:
+        entries: (操作码, 相对路径, 文件大小, SHA256十六进制) 序列，调用方负责排序
+        compress: 是否压缩正文
+        chunk_size: 产出块的近似大小
+
+    Returns:
+        载荷字节块迭代器
+    """
+    def records() -> Iterator[bytes]:
+        for op, path, size, sha256_hex in entries:
+            yield (_OP.pack(op.value) + _pack_path(path) +
+                   _SIZE_DIGEST.pack(size, digest_to_bytes(sha256_hex)))
+
+    return _iter_payload(records(), compress, chunk_size)
+
+
+def encode_manifest_summary(entries: Iterable[Tuple[str, int, str]], compress: bool = True,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    编码清单摘要载荷（路径 + 大小 + 摘要前缀）
+
+    Args:
+        entries: (相对路径, 文件大小, SHA256十六进制) 序列
+        compress: 是否压缩正文
+        chunk_size: 产出块的近似大小
+
+    Returns:
+        载荷字节块迭代器
+    """
+    ordered = sorted(entries, key=lambda item: item[0])
+
+    def records() -> Iterator[bytes]:
+        for path, size, sha256_hex in ordered:
+            prefix = digest_to_bytes(sha256_hex)[:SUMMARY_PREFIX_SIZE]
+            yield _pack_path(path) + _SIZE_PREFIX.pack(size, prefix)
+
+    return _iter_payload(records(), compress, chunk_size)
+
+
+class _PayloadReader:
+    """增量载荷读取器，负责头部校验和解压"""
+
+    def __init__(self):
+        self._pending = b""
+        self._header_read = False
+        self._decompressor = None
+
+    def feed(self, chunk: bytes) -> bytes:
+        """喂入原始字节，返回可供解析的正文字节"""
+        if not self._header_read:
+            self._pending += chunk
+            if len(self._pending) < _HEADER.size:
+                return b""
+            magic, version, flags = _HEADER.unpack_from(self._pending)
+            if magic != MAGIC:
+                raise PayloadError("载荷魔数不匹配")
+            if version != FORMAT_VERSION:
+                raise PayloadError(f"不支持的载荷版本: {version}")
+            if flags & FLAG_ZLIB:
+                self._decompressor = zlib.decompressobj()
+            chunk = self._pending[_HEADER.size:]
+            self._pending = b""
+            self._header_read = True
+
+        if self._decompressor:
+            return self._decompressor.decompress(chunk)
+        return chunk
+
+    def finish(self) -> bytes:
+        """结束输入，返回剩余正文字节"""
+        if not self._header_read:
+            if self._pending:
+                raise PayloadError("载荷头部不完整")
+            return b""
+        if self._decompressor:
+            tail = self._decompressor.flush()
+            if not self._decompressor.eof:
+                raise PayloadError("压缩载荷被截断")
+            return tail
+        return b""
+
+
+def _parse_path(buffer: bytearray, offset: int) -> Optional[Tuple[str, int]]:
+    """解析路径字段，数据不足时返回None"""
+    head = offset + _PATH_LEN.size
+    if len(buffer) < head:
+        return None
+    (path_len,) = _PATH_LEN.unpack_from(buffer, offset)
+    if len(buffer) < head + path_len:
+        return None
+    return bytes(buffer[head:head + path_len]).decode("utf-8"), head + path_len
+
+
+def _parse_request_record(buffer: bytearray, offset: int) -> Optional[Tuple[tuple, int]]:
+    parsed = _parse_path(buffer, offset)
+    if parsed is None:
+        return None
+    path, pos = parsed
+    if len(buffer) < pos + _SIZE_DIGEST.size:
+        return None
+    size, digest = _SIZE_DIGEST.unpack_from(buffer, pos)
+    return (path, size, digest_to_hex(digest)), pos + _SIZE_DIGEST.size
+
+
+def _parse_summary_record(buffer: bytearray, offset: int) -> Optional[Tuple[tuple, int]]:
+    parsed = _parse_path(buffer, offset)
+    if parsed is None:
+        return None
+    path, pos = parsed
+    if len(buffer) < pos + _SIZE_PREFIX.size:
+        return None
+    size, prefix = _SIZE_PREFIX.unpack_from(buffer, pos)
+    return (path, size, prefix), pos + _SIZE_PREFIX.size
+
+
+def _parse_response_record(buffer: bytearray, offset: int) -> Optional[Tuple[tuple, int]]:
+    if len(buffer) < offset + _OP.size:
+        return None
+    parsed = _parse_request_record(buffer, offset + _OP.size)
+    if parsed is None:
+        return None
+    (op_value,) = _OP.unpack_from(buffer, offset)
+    try:
+        op = CompareOp(op_value)
+    except ValueError:
+        raise PayloadError(f"未知操作码: {op_value}")
+    return (op,) + parsed[0], parsed[1]
+
+
+def _iter_records(chunks: Iterable[bytes],
+                  parse_record: Callable[[bytearray, int], Optional[Tuple[tuple, int]]]) -> Iterator[tuple]:
+    reader = _PayloadReader()
+    buffer = bytearray()
+
+    def drain() -> Iterator[tuple]:
+        offset = 0
+        while True:
+            parsed = parse_record(buffer, offset)
+            if parsed is None:
+                break
+            item, offset = parsed
+            yield item
+        if offset:
+            del buffer[:offset]
+
+    for chunk in chunks:
+        if chunk:
+            buffer.extend(reader.feed(chunk))
+            yield from drain()
+
+    buffer.extend(reader.finish())
+    yield from drain()
+    if buffer:
+        raise PayloadError("载荷以不完整的记录结尾")
+
+
+def decode_compare_request(chunks: Iterable[bytes]) -> Iterator[Tuple[str, int, str]]:
+    """解码比较请求载荷，产出 (相对路径, 文件大小, SHA256十六进制)"""
+    return _iter_records(chunks, _parse_request_record)
+
+
+def decode_compare_response(chunks: Iterable[bytes]) -> Iterator[Tuple[CompareOp, str, int, str]]:
+    """解码比较响应载荷，产出 (操作码, 相对路径, 文件大小, SHA256十六进制)"""
+    return _iter_records(chunks, _parse_response_record)
+
+
+def decode_manifest_summary(chunks: Iterable[bytes]) -> Iterator[Tuple[str, int, bytes]]:
+    """解码清单摘要载荷，产出 (相对路径, 文件大小, 摘要前缀字节)"""
+    return _iter_records(chunks, _parse_summary_record)
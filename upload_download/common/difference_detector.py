@@ -14,6 +14,12 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from tools.download.local_file_scanner import FileInfo
+from tools.common.common_utils import APIEndpoints
+from tools.common.instrumentation import get_instrumentation
+from tools.common.compare_payload import (
+    COMPARE_CONTENT_TYPE, CompareOp, decode_compare_response, encode_compare_request
+)
+from tools.common.manifest_summary import RemoteManifestSummary
 
 
 class ChangeType(Enum):
@@ -102,16 +108,17 @@ class DifferenceDetector:
             远程文件信息字典
         """
         try:
-            response = self.session.get(
-                f"{self.server_url}/api/v1/files/list",
-                params={
-                    "version": version,
-                    "platform": platform,
-                    "arch": arch,
-                    "api_key": self.api_key
-                },
-                timeout=self.timeout
-            )
+            with get_instrumentation().phase("manifest", requests=1):
+                response = self.session.get(
+                    f"{self.server_url}/api/v1/files/list",
+                    params={
+                        "version": version,
+                        "platform": platform,
+                        "arch": arch,
+                        "api_key": self.api_key
+                    },
+                    timeout=self.timeout
+                )
 
             if response.status_code == 401:
                 raise Exception("API密钥无效")
@@ -135,11 +142,159 @@ class DifferenceDetector:
         except Exception as e:
             raise Exception(f"获取远程文件列表失败: {e}")
 
+    def get_remote_summary(self, version: str, platform: str = "windows",
+                           arch: str = "x64") -> Optional[RemoteManifestSummary]:
+        """
+        获取远程版本的紧凑清单摘要（路径 + 大小 + 摘要前缀）
+
+        Args:
+            version: 版本号
+            platform: 平台
+            arch: 架构
+
+        Returns:
+            清单摘要；服务器不支持摘要接口或请求失败时返回None
+        """
+        try:
+            with get_instrumentation().phase("manifest", requests=1):
+                response = self.session.get(
+                    f"{self.server_url}{APIEndpoints.FILES_SUMMARY}/{version}",
+                    params={
+                        "platform": platform,
+                        "architecture": arch,
+                        "api_key": self.api_key
+                    },
+                    headers={"Accept": COMPARE_CONTENT_TYPE},
+                    stream=True,
+                    timeout=self.timeout
+                )
+
+                with response:
+                    if response.status_code != 200:
+                        return None
+                    return RemoteManifestSummary.decode(response.iter_content(chunk_size=65536))
+
+        except Exception as e:
+            print(f"获取远程清单摘要失败: {e}")
+            return None
+
     def compare_with_server(self, local_files: Dict[str, FileInfo], target_version: str,
                           platform: str = "windows", arch: str = "x64") -> UpdatePlan:
         """
         使用服务器端比较API进行差异检测
 
+        优先使用流式二进制比较载荷；服务器不支持时回退到表单JSON比较接口。
+
+        Args:
+            local_files: 本地文件信息字典
+            target_version: 目标版本
+            platform: 平台
+            arch: 架构
+
+        Returns:
+            更新计划
+        """
+        # 请求、流式解码和回退的表单接口都计入 compare 阶段
+        with get_instrumentation().phase("compare", files=len(local_files), requests=1):
+            return self._compare_with_server(local_files, target_version, platform, arch)
+
+    def _compare_with_server(self, local_files: Dict[str, FileInfo], target_version: str,
+                             platform: str, arch: str) -> UpdatePlan:
+        try:
+            # 载荷按块生成并以分块传输发送，不在内存中拼出完整请求体
+            payload = encode_compare_request(
+                (info.relative_path, info.file_size, info.sha256_hash)
+                for info in local_files.values()
+            )
+
+            response = self.session.post(
+                f"{self.server_url}{APIEndpoints.VERSION_COMPARE_BINARY}",
+                params={
+                    "target_version": target_version,
+                    "platform": platform,
+                    "arch": arch,
+                    "api_key": self.api_key
+                },
+                data=payload,
+                headers={
+                    "Content-Type": COMPARE_CONTENT_TYPE,
+                    "Accept": COMPARE_CONTENT_TYPE
+                },
+                stream=True,
+                timeout=self.timeout
+            )
+
+            if response.status_code in (404, 405, 415):
+                response.close()
+                return self._compare_with_server_legacy(local_files, target_version, platform, arch)
+            elif response.status_code == 401:
+                raise Exception("API密钥无效")
+            elif response.status_code != 200:
+                raise Exception(f"版本比较失败: {response.status_code}")
+
+            files_to_download = []
+            files_to_delete = []
+            files_same = []
+            total_download_size = 0
+
+            with response:
+                records = decode_compare_response(response.iter_content(chunk_size=65536))
+                for op, path, size, sha256_hex in records:
+                    local_info = local_files.get(path)
+
+                    if op == CompareOp.DELETED:
+                        files_to_delete.append(FileChange(
+                            relative_path=path,
+                            change_type=ChangeType.DELETED,
+                            file_size=local_info.file_size if local_info else size,
+                            sha256_hash=local_info.sha256_hash if local_info else sha256_hex,
+                            local_info=local_info,
+                            remote_info=None
+                        ))
+                        continue
+
+                    remote_info = {"relative_path": path, "file_size": size, "sha256": sha256_hex}
+                    if op == CompareOp.SAME:
+                        files_same.append(FileChange(
+                            relative_path=path,
+                            change_type=ChangeType.SAME,
+                            file_size=size,
+                            sha256_hash=sha256_hex,
+                            local_info=local_info,
+                            remote_info=remote_info
+                        ))
+                    else:
+                        files_to_download.append(FileChange(
+                            relative_path=path,
+                            change_type=ChangeType.NEW if op == CompareOp.NEW else ChangeType.UPDATED,
+                            file_size=size,
+                            sha256_hash=sha256_hex,
+                            local_info=local_info,
+                            remote_info=remote_info
+                        ))
+                        total_download_size += size
+
+            return UpdatePlan(
+                target_version=target_version,
+                platform=platform,
+                architecture=arch,
+                files_to_download=files_to_download,
+                files_to_delete=files_to_delete,
+                files_same=files_same,
+                total_download_size=total_download_size,
+                total_file_count=len(files_to_download)
+            )
+
+        except requests.RequestException as e:
+            raise Exception(f"网络请求失败: {e}")
+        except Exception as e:
+            raise Exception(f"版本比较失败: {e}")
+
+    def _compare_with_server_legacy(self, local_files: Dict[str, FileInfo], target_version: str,
+                                    platform: str = "windows", arch: str = "x64") -> UpdatePlan:
+        """
+        使用表单JSON比较接口进行差异检测（旧服务器兼容）
+
         Args:
             local_files: 本地文件信息字典
             target_version: 目标版本
@@ -261,78 +416,82 @@ class DifferenceDetector:
         try:
             # 获取远程文件列表
             remote_files = self.get_remote_file_list(target_version, platform, arch)
+            with get_instrumentation().phase("diff", files=len(local_files)):
+                return self._diff_local(local_files, remote_files, target_version, platform, arch)
+        except Exception as e:
+            raise Exception(f"本地差异检测失败: {e}")
 
-            files_to_download = []
-            files_to_delete = []
-            files_same = []
-            total_download_size = 0
+    def _diff_local(self, local_files: Dict[str, FileInfo], remote_files: Dict[str, dict],
+                    target_version: str, platform: str, arch: str) -> UpdatePlan:
+        """比较本地和远程文件列表，生成更新计划"""
+        files_to_download = []
+        files_to_delete = []
+        files_same = []
+        total_download_size = 0
+
+        # 检查远程文件
+        for path, remote_info in remote_files.items():
+            if path not in local_files:
+                # 新文件
+                file_change = FileChange(
+                    relative_path=path,
+                    change_type=ChangeType.NEW,
+                    file_size=remote_info["file_size"],
+                    sha256_hash=remote_info["sha256"],
+                    local_info=None,
+                    remote_info=remote_info
+                )
+                files_to_download.append(file_change)
+                total_download_size += remote_info["file_size"]
 
-            # 检查远程文件
-            for path, remote_info in remote_files.items():
-                if path not in local_files:
-                    # 新文件
-                    file_change = FileChange(
-                        relative_path=path,
-                        change_type=ChangeType.NEW,
-                        file_size=remote_info["file_size"],
-                        sha256_hash=remote_info["sha256"],
-                        local_info=None,
-                        remote_info=remote_info
-                    )
-                    files_to_download.append(file_change)
-                    total_download_size += remote_info["file_size"]
-
-                elif local_files[path].sha256_hash != remote_info["sha256"]:
-                    # 更新文件
-                    file_change = FileChange(
-                        relative_path=path,
-                        change_type=ChangeType.UPDATED,
-                        file_size=remote_info["file_size"],
-                        sha256_hash=remote_info["sha256"],
-                        local_info=local_files[path],
-                        remote_info=remote_info
-                    )
-                    files_to_download.append(file_change)
-                    total_download_size += remote_info["file_size"]
-
-                else:
-                    # 相同文件
-                    file_change = FileChange(
-                        relative_path=path,
-                        change_type=ChangeType.SAME,
-                        file_size=remote_info["file_size"],
-                        sha256_hash=remote_info["sha256"],
-                        local_info=local_files[path],
-                        remote_info=remote_info
-                    )
-                    files_same.append(file_change)
-
-            # 检查本地独有文件（可能需要删除）
-            for path, local_info in local_files.items():
-                if path not in remote_files:
-                    file_change = FileChange(
-                        relative_path=path,
-                        change_type=ChangeType.DELETED,
-                        file_size=local_info.file_size,
-                        sha256_hash=local_info.sha256_hash,
-                        local_info=local_info,
-                        remote_info=None
-                    )
-                    files_to_delete.append(file_change)
+            elif local_files[path].sha256_hash != remote_info["sha256"]:
+                # 更新文件
+                file_change = FileChange(
+                    relative_path=path,
+                    change_type=ChangeType.UPDATED,
+                    file_size=remote_info["file_size"],
+                    sha256_hash=remote_info["sha256"],
+                    local_info=local_files[path],
+                    remote_info=remote_info
+                )
+                files_to_download.append(file_change)
+                total_download_size += remote_info["file_size"]
 
-            return UpdatePlan(
-                target_version=target_version,
-                platform=platform,
-                architecture=arch,
-                files_to_download=files_to_download,
-                files_to_delete=files_to_delete,
-                files_same=files_same,
-                total_download_size=total_download_size,
-                total_file_count=len(files_to_download)
-            )
+            else:
+                # 相同文件
+                file_change = FileChange(
+                    relative_path=path,
+                    change_type=ChangeType.SAME,
+                    file_size=remote_info["file_size"],
+                    sha256_hash=remote_info["sha256"],
+                    local_info=local_files[path],
+                    remote_info=remote_info
+                )
+                files_same.append(file_change)
 
-        except Exception as e:
-            raise Exception(f"本地差异检测失败: {e}")
+        # 检查本地独有文件（可能需要删除）
+        for path, local_info in local_files.items():
+            if path not in remote_files:
+                file_change = FileChange(
+                    relative_path=path,
+                    change_type=ChangeType.DELETED,
+                    file_size=local_info.file_size,
+                    sha256_hash=local_info.sha256_hash,
+                    local_info=local_info,
+                    remote_info=None
+                )
+                files_to_delete.append(file_change)
+
+        return UpdatePlan(
+            target_version=target_version,
+            platform=platform,
+            architecture=arch,
+            files_to_download=files_to_download,
+            files_to_delete=files_to_delete,
+            files_same=files_same,
+            total_download_size=total_download_size,
+            total_file_count=len(files_to_download)
+        )
 
     def detect_differences(self, local_files: Dict[str, FileInfo], target_version: str,
                           platform: str = "windows", arch: str = "x64",
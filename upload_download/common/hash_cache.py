@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+本地哈希缓存
+按 (根目录, 相对路径) 记录文件大小、修改时间、快速指纹和SHA256，文件未变化时直接复用哈希值，
+避免每次扫描都重新读取整个目录树。
+
+判定：
+    1. 大小和修改时间都一致 —— 直接复用SHA256，不读文件
+    2. 修改时间变化 —— 重新计算完整哈希。快速指纹只用于判定文件肯定已变化（见 fingerprint_changed），
+       指纹一致不能说明内容未变化，不会据此复用SHA256
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.common_utils import get_cache_dir
+from tools.common.file_fingerprint import quick_fingerprint
+
+CacheEntry = Tuple[int, int, str, str]  # (文件大小, 修改时间纳秒, SHA256, 快速指纹)
+
+
+class HashCache:
+    """基于SQLite的文件哈希缓存，一个实例对应一个根目录"""
+
+    def __init__(self, root_path: str, db_path: Optional[str] = None):
+        """
+        初始化哈希缓存并载入该根目录的全部条目
+
+        Args:
+            root_path: 被扫描的根目录
+            db_path: 缓存数据库路径，默认位于本地缓存目录
+        """
+        self.root = str(Path(root_path).resolve())
+        self.db_path = Path(db_path) if db_path else get_cache_dir() / "hash_cache.db"
+        self._entries: Dict[str, CacheEntry] = {}
+        self._dirty: Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path))
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            " root TEXT NOT NULL, relative_path TEXT NOT NULL,"
+            " file_size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL DEFAULT '',"
+            " PRIMARY KEY (root, relative_path))"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(file_hashes)")}
+        if "fingerprint" not in columns:
+            # 兼容没有指纹列的旧缓存库
+            conn.execute("ALTER TABLE file_hashes ADD COLUMN fingerprint TEXT NOT NULL DEFAULT ''")
+        return conn
+
+    def _load(self):
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT relative_path, file_size, mtime_ns, sha256, fingerprint"
+                    " FROM file_hashes WHERE root = ?",
+                    (self.root,)
+                )
+                self._entries = {row[0]: tuple(row[1:]) for row in rows}
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # 缓存损坏或不可写时退化为无缓存
+            print(f"载入哈希缓存失败: {e}")
+            self._entries = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> Dict[str, CacheEntry]:
+        """返回全部条目的快照（供并行扫描分发给工作线程/进程）"""
+        with self._lock:
+            return dict(self._entries)
+
+    def lookup(self, relative_path: str, file_size: int, mtime_ns: int) -> Optional[str]:
+        """
+        查询缓存的哈希值
+
+        Args:
+            relative_path: 相对路径
+            file_size: 当前文件大小
+            mtime_ns: 当前修改时间（纳秒）
+
+        Returns:
+            大小和修改时间都匹配时返回SHA256，否则返回None
+        """
+        entry = self._entries.get(relative_path)
+        if entry and entry[0] == file_size and entry[1] == mtime_ns:
+            return entry[2]
+        return None
+
+    def get(self, relative_path: str) -> Optional[CacheEntry]:
+        """返回缓存条目（不检查是否仍然有效）"""
+        return self._entries.get(relative_path)
+
+    def fingerprint_changed(self, relative_path: str, file_size: int, file_path: Path) -> bool:
+        """
+        按快速指纹判断文件内容是否肯定已不同于缓存的版本（修改时间已不匹配时使用）
+
+        只读取采样块。返回False不代表内容未变化，调用方仍需计算完整哈希。
+
+        Args:
+            relative_path: 相对路径
+            file_size: 当前文件大小
+            file_path: 文件绝对路径
+
+        Returns:
+            缓存中有同大小的带指纹条目且指纹不同时返回True
+        """
+        entry = self._entries.get(relative_path)
+        if not entry or entry[0] != file_size or not entry[3]:
+            return False
+        fingerprint = quick_fingerprint(file_path, file_size)
+        return bool(fingerprint) and fingerprint != entry[3]
+
+    def store(self, relative_path: str, file_size: int, mtime_ns: int, sha256: str,
+              fingerprint: str = ""):
+        """记录文件哈希值（调用 save 后写入磁盘）"""
+        if not sha256:
+            return
+        entry = (file_size, mtime_ns, sha256, fingerprint)
+        with self._lock:
+            self._entries[relative_path] = entry
+            self._dirty[relative_path] = entry
+
+    def prune(self, existing_paths: Iterable[str]) -> int:
+        """删除已不存在的文件条目，返回删除数量"""
+        keep = set(existing_paths)
+        with self._lock:
+            stale = [path for path in self._entries if path not in keep]
+            for path in stale:
+                del self._entries[path]
+                self._dirty.pop(path, None)
+        if stale:
+            try:
+                conn = self._connect()
+                try:
+                    with conn:
+                        conn.executemany(
+                            "DELETE FROM file_hashes WHERE root = ? AND relative_path = ?",
+                            ((self.root, path) for path in stale)
+                        )
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"清理哈希缓存失败: {e}")
+        return len(stale)
+
+    def save(self):
+        """把新增或变化的条目写入数据库"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO file_hashes"
+                        " (root, relative_path, file_size, mtime_ns, sha256, fingerprint)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        ((self.root, path) + entry for path, entry in dirty.items())
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"保存哈希缓存失败: {e}")
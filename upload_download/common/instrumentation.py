@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+热路径计时
+按阶段（walk / hash / manifest / diff / upload / commit / download ...）累计耗时、字节数、
+文件数、请求数和重试次数，运行结束时输出分阶段报告或 JSON，用于判断慢在哪里。
+
+默认关闭。关闭时 phase() 返回共享的空计时器、record() 立即返回，热路径上只多一次属性读取。
+耗时是各线程耗时之和（并行阶段会大于实际经过时间），同时记录阶段的首次开始到最后结束的跨度。
+
+除分阶段统计外还记录每次调用的耗时分布（直方图）、命名计数器（如哈希缓存命中/未命中）
+和仪表值（如上传队列长度，可为取值函数），供 metrics_export 导出为 Prometheus 文本格式。
+挂接 profiler（见 profiling.PhaseProfiler）后，阶段的进入和退出同时通知分析器。
+
+用法:
+    metrics = get_instrumentation()
+    with metrics.phase("upload", files=1, bytes=size, requests=1):
+        ...
+    metrics.record("hash", seconds=elapsed, bytes=size, files=1)
+    metrics.count("upload", requests=1, retries=1)
+    metrics.increment("hash_cache_hits")
+    metrics.set_gauge("upload_queue_depth", queue.qsize)
+"""
+
+import json
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Union
+
+# 报告中阶段的显示顺序（未列出的阶段按名称排在后面）
+PHASE_ORDER = ["walk", "hash", "manifest", "compare", "diff", "upload", "commit",
+               "download", "verify", "reuse", "extract"]
+
+# 单次调用耗时直方图的桶上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+GaugeValue = Union[float, Callable[[], float]]
+
+
+def _align(text: str, width: int, left: bool = False) -> str:
+    """按显示宽度对齐（中文字符占两列）"""
+    display = sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+    padding = " " * max(0, width - display)
+    return text + padding if left else padding + text
+
+
+@dataclass
+class PhaseStats:
+    """单个阶段的累计统计"""
+    seconds: float = 0.0  # 各线程耗时之和
+    calls: int = 0
+    bytes: int = 0
+    files: int = 0
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0  # 以异常结束的调用和显式计入的失败
+    first_start: float = 0.0  # perf_counter，0表示尚未开始
+    last_end: float = 0.0
+    # 单次调用耗时分布（只统计 phase() 计时的调用，不含 record() 汇总的耗时）
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    observed_seconds: float = 0.0
+
+    @property
+    def span_seconds(self) -> float:
+        """首次开始到最后结束的跨度"""
+        return max(0.0, self.last_end - self.first_start) if self.first_start else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """
+        阶段进行时的吞吐量
+        并行阶段按跨度计算（合计吞吐量），与其他阶段交替进行时按累计耗时计算
+        """
+        busy = min(self.seconds, self.span_seconds) or self.seconds
+        return self.bytes / 1024 / 1024 / busy if self.bytes and busy else 0.0
+
+
+class _PhaseTimer:
+    """阶段计时器（上下文管理器）"""
+
+    __slots__ = ("_owner", "_name", "_counts", "_started", "_profiler", "_profile")
+
+    def __init__(self, owner: "Instrumentation", name: str, counts: Dict[str, int]):
+        self._owner = owner
+        self._name = name
+        self._counts = counts
+        self._started = 0.0
+        self._profiler = owner.profiler
+        self._profile = None
+
+    def add(self, **counts: int):
+        """在计时过程中追加计数（例如实际传输的字节数）"""
+        for key, value in counts.items():
+            self._counts[key] = self._counts.get(key, 0) + value
+
+    def __enter__(self) -> "_PhaseTimer":
+        if self._profiler is not None:
+            self._profile = self._profiler.enter(self._name)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ended = time.perf_counter()
+        if self._profile is not None:
+            self._profiler.exit(self._profile)
+        if exc_type is not None:
+            self.add(errors=1)
+        self._owner._add(self._name, ended - self._started, self._started, ended, self._counts, observe=True)
+
+
+class _NullTimer:
+    """关闭时使用的空计时器"""
+
+    __slots__ = ()
+
+    def add(self, **counts: int):
+        pass
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _ProfileSection:
+    """只通知分析器、不计时的区段"""
+
+    __slots__ = ("_profiler", "_name", "_profile")
+
+    def __init__(self, profiler, name: str):
+        self._profiler = profiler
+        self._name = name
+        self._profile = None
+
+    def __enter__(self) -> "_ProfileSection":
+        self._profile = self._profiler.enter(self._name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profile is not None:
+            self._profiler.exit(self._profile)
+
+
+class Instrumentation:
+    """分阶段计时和计数"""
+
+    def __init__(self):
+        self.enabled = False
+        self._phases: Dict[str, PhaseStats] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, GaugeValue] = {}
+        self._lock = threading.Lock()
+        self._started = 0.0
+        self.started_at = 0.0  # time.time()，用于导出运行开始时间
+        self.profiler = None  # 阶段分析器，提供 enter(阶段名) -> 令牌 / exit(令牌)
+
+    def enable(self):
+        """开启统计（同时清空之前的数据）"""
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._phases = {}
+            self._counters = {}
+            self._gauges = {}
+            self._started = time.perf_counter()
+            self.started_at = time.time()
+
+    def phase(self, name: str, **counts: int):
+        """
+        为一个阶段计时
+
+        Args:
+            name: 阶段名
+            counts: 计数（bytes / files / requests / retries / errors）
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _PhaseTimer(self, name, counts)
+
+    def section(self, name: str):
+        """
+        不计入统计、只供分析器使用的区段（用于统计在别处汇总的代码，例如扫描分区）
+        """
+        if self.profiler is None:
+            return _NULL_TIMER
+        return _ProfileSection(self.profiler, name)
+
+    def record(self, name: str, seconds: float = 0.0, **counts: int):
+        """记录已测得的耗时和计数（例如子进程返回的计时）"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._add(name, seconds, now - seconds, now, counts)
+
+    def count(self, name: str, **counts: int):
+        """只累加计数，不计时也不增加次数（例如分块重试的请求数）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._phases.get(name)
+            if stats is None:
+                now = time.perf_counter()
+                stats = self._phases[name] = PhaseStats(first_start=now, last_end=now)
+            stats.bytes += counts.get("bytes", 0)
+            stats.files += counts.get("files", 0)
+            stats.requests += counts.get("requests", 0)
+            stats.retries += counts.get("retries", 0)
+            stats.errors += counts.get("errors", 0)
+
+    def increment(self, name: str, value: int = 1):
+        """累加命名计数器"""
+        if not self.enabled or not value:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: GaugeValue):
+        """设置仪表值；传入函数时在导出时取值（热路径上没有开销）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def remove_gauge(self, name: str):
+        with self._lock:
+            self._gauges.pop(name, None)
+
+    def _add(self, name: str, seconds: float, started: float, ended: float, counts: Dict[str, int],
+             observe: bool = False):
+        with self._lock:
+            stats = self._phases.get(name)
+            if stats is None:
+                stats = self._phases[name] = PhaseStats(first_start=started)
+            stats.seconds += seconds
+            stats.calls += 1
+            stats.bytes += counts.get("bytes", 0)
+            stats.files += counts.get("files", 0)
+            stats.requests += counts.get("requests", 0)
+            stats.retries += counts.get("retries", 0)
+            stats.errors += counts.get("errors", 0)
+            stats.first_start = min(stats.first_start, started)
+            stats.last_end = max(stats.last_end, ended)
+            if observe:
+                stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+                stats.observed_seconds += seconds
+
+    def snapshot(self) -> Dict[str, PhaseStats]:
+        """按显示顺序返回各阶段统计的副本"""
+        with self._lock:
+            phases = {name: PhaseStats(**asdict(stats)) for name, stats in self._phases.items()}
+        order = {name: i for i, name in enumerate(PHASE_ORDER)}
+        return dict(sorted(phases.items(), key=lambda item: (order.get(item[0], len(order)), item[0])))
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def gauges(self) -> Dict[str, float]:
+        """当前仪表值（取值函数出错的仪表被忽略）"""
+        with self._lock:
+            gauges = sorted(self._gauges.items())
+        values = {}
+        for name, value in gauges:
+            try:
+                values[name] = float(value() if callable(value) else value)
+            except Exception:
+                continue
+        return values
+
+    def report(self) -> dict:
+        """可序列化为JSON的报告"""
+        phases = {}
+        for name, stats in self.snapshot().items():
+            phases[name] = {
+                "seconds": round(stats.seconds, 6),
+                "span_seconds": round(stats.span_seconds, 6),
+                "calls": stats.calls,
+                "bytes": stats.bytes,
+                "files": stats.files,
+                "requests": stats.requests,
+                "retries": stats.retries,
+                "errors": stats.errors,
+                "mb_per_second": round(stats.mb_per_second, 3),
+            }
+        return {"wall_seconds": round(time.perf_counter() - self._started, 6), "phases": phases,
+                "counters": self.counters()}
+
+    def format_report(self) -> str:
+        """分阶段报告（表格文本）"""
+        report = self.report()
+        lines = [
+            f"分阶段耗时（总耗时 {report['wall_seconds']:.2f} 秒；耗时为各线程之和，跨度为首次开始到最后结束）",
+            _align("阶段", 10, left=True) + _align("耗时(秒)", 10) + _align("跨度(秒)", 10)
+            + _align("次数", 8) + _align("文件", 8) + _align("MB", 10) + _align("MB/s", 9)
+            + _align("请求", 8) + _align("重试", 6) + _align("失败", 6),
+        ]
+        for name, stats in report["phases"].items():
+            lines.append(
+                f"{name:<10}{stats['seconds']:>10.3f}{stats['span_seconds']:>10.3f}{stats['calls']:>8}"
+                f"{stats['files']:>8}{stats['bytes'] / 1024 / 1024:>10.1f}{stats['mb_per_second']:>9.1f}"
+                f"{stats['requests']:>8}{stats['retries']:>6}{stats['errors']:>6}"
+            )
+        if report["counters"]:
+            lines.append("计数: " + ", ".join(f"{name}={value}" for name, value in report["counters"].items()))
+        return "\n".join(lines)
+
+    def save_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+_instrumentation: Optional[Instrumentation] = None
+_instrumentation_lock = threading.Lock()
+
+
+def get_instrumentation() -> Instrumentation:
+    """进程内共享的计时对象"""
+    global _instrumentation
+    with _instrumentation_lock:
+        if _instrumentation is None:
+            _instrumentation = Instrumentation()
+        return _instrumentation
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+运行指标导出
+把 instrumentation 收集的分阶段统计以 Prometheus 文本格式导出，供构建机上无人值守的
+上传任务被监控系统采集:
+    - 文本文件：按间隔原子替换写入（适合 node_exporter 的 textfile collector）
+    - HTTP：在本机端口提供 /metrics
+
+导出的指标（前缀 omega_，标签 phase 为阶段名）:
+    omega_phase_seconds_total / calls / bytes / files / requests / retries / errors_total
+    omega_phase_duration_seconds            单次调用耗时直方图（请求类阶段即各接口的请求延迟）
+    omega_<计数器>_total                    如 hash_cache_hits / hash_cache_misses
+    omega_<缓存>_hit_ratio                  由 <缓存>_hits / <缓存>_misses 计算的命中率
+    omega_<仪表>                            如 upload_queue_depth / upload_concurrency
+
+配置（服务器配置文件的 "metrics" 节，命令行参数可覆盖）:
+    {"textfile": "/var/lib/node_exporter/omega_upload.prom", "port": 0, "interval_seconds": 15}
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.instrumentation import LATENCY_BUCKETS, Instrumentation, get_instrumentation
+
+METRIC_PREFIX = "omega"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_INTERVAL = 15.0
+
+# 分阶段计数器: (PhaseStats 属性, 指标名, 说明)
+PHASE_COUNTERS = [
+    ("seconds", "phase_seconds_total", "阶段累计耗时（各线程之和，秒）"),
+    ("calls", "phase_calls_total", "阶段调用次数"),
+    ("bytes", "phase_bytes_total", "阶段处理的字节数（上传/下载为传输量，hash/verify为哈希量）"),
+    ("files", "phase_files_total", "阶段处理的文件数"),
+    ("requests", "phase_requests_total", "阶段发出的HTTP请求数"),
+    ("retries", "phase_retries_total", "阶段重试次数"),
+    ("errors", "phase_errors_total", "阶段失败次数"),
+]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _metric_name(name: str) -> str:
+    """把计数器/仪表名转换为合法的指标名"""
+    cleaned = "".join(c if c.isalnum() or c == "_" else "_" for c in name)
+    return f"{METRIC_PREFIX}_{cleaned}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_metrics(metrics: Optional[Instrumentation] = None,
+                   labels: Optional[Dict[str, str]] = None) -> str:
+    """
+    生成 Prometheus 文本格式的指标
+
+    Args:
+        metrics: 统计对象，默认进程内共享的对象
+        labels: 附加到所有指标的标签（如 {"tool": "auto_upload"}）
+    """
+    metrics = metrics or get_instrumentation()
+    labels = labels or {}
+    phases = metrics.snapshot()
+    counters = metrics.counters()
+    lines: List[str] = []
+
+    def header(name: str, kind: str, help_text: str):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    name = _metric_name("run_start_time_seconds")
+    header(name, "gauge", "本次运行开始时间（Unix时间戳）")
+    lines.append(f"{name}{_labels(labels)} {metrics.started_at:.3f}")
+
+    for attribute, suffix, help_text in PHASE_COUNTERS:
+        name = _metric_name(suffix)
+        header(name, "counter", help_text)
+        for phase, stats in phases.items():
+            lines.append(f"{name}{_labels(dict(labels, phase=phase))} {_format_value(getattr(stats, attribute))}")
+
+    name = _metric_name("phase_duration_seconds")
+    header(name, "histogram", "单次调用耗时（请求类阶段即该接口的请求延迟，秒）")
+    for phase, stats in phases.items():
+        observed = sum(stats.buckets)
+        if not observed:
+            continue
+        phase_labels = dict(labels, phase=phase)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(dict(phase_labels, le=repr(bound)))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(dict(phase_labels, le='+Inf'))} {observed}")
+        lines.append(f"{name}_sum{_labels(phase_labels)} {_format_value(stats.observed_seconds)}")
+        lines.append(f"{name}_count{_labels(phase_labels)} {observed}")
+
+    for counter, value in counters.items():
+        name = _metric_name(f"{counter}_total")
+        header(name, "counter", counter)
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+    # 成对的 <缓存>_hits / <缓存>_misses 计数器额外导出命中率
+    caches = sorted({counter.rsplit("_", 1)[0] for counter in counters
+                     if counter.endswith("_hits") or counter.endswith("_misses")})
+    for cache in caches:
+        hits, misses = counters.get(f"{cache}_hits", 0), counters.get(f"{cache}_misses", 0)
+        name = _metric_name(f"{cache}_hit_ratio")
+        header(name, "gauge", f"{cache} 命中率")
+        lines.append(f"{name}{_labels(labels)} {_format_value(hits / (hits + misses) if hits + misses else 0)}")
+
+    for gauge, value in metrics.gauges().items():
+        name = _metric_name(gauge)
+        header(name, "gauge", gauge)
+        lines.append(f"{name}{_labels(labels)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.exporter.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, exporter: "MetricsExporter"):
+        self.exporter = exporter
+        super().__init__(address, _MetricsHandler)
+
+
+class MetricsExporter:
+    """按间隔写入指标文件和/或在本机端口提供 /metrics"""
+
+    def __init__(self, textfile: Optional[str] = None, port: Optional[int] = None,
+                 interval: float = DEFAULT_INTERVAL, host: str = "127.0.0.1",
+                 labels: Optional[Dict[str, str]] = None,
+                 metrics: Optional[Instrumentation] = None):
+        """
+        Args:
+            textfile: 指标文件路径，None 表示不写文件
+            port: HTTP端口，None 表示不提供HTTP（0 表示由系统分配）
+            interval: 写文件的间隔（秒）
+            host: HTTP监听地址，默认只监听本机
+            labels: 附加到所有指标的标签
+            metrics: 统计对象，默认进程内共享的对象
+        """
+        self.textfile = textfile
+        self.port = port
+        self.interval = max(1.0, interval)
+        self.host = host
+        self.labels = labels or {}
+        self.metrics = metrics or get_instrumentation()
+        self._server: Optional[_MetricsHTTPServer] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @classmethod
+    def from_config(cls, config: dict, textfile: Optional[str] = None, port: Optional[int] = None,
+                    interval: Optional[float] = None,
+                    labels: Optional[Dict[str, str]] = None) -> Optional["MetricsExporter"]:
+        """按配置（"metrics" 节）和命令行参数创建，两者都未启用导出时返回None"""
+        textfile = textfile or config.get("textfile") or None
+        port = port if port is not None else config.get("port") or None
+        if not textfile and port is None:
+            return None
+        return cls(textfile, port, interval or config.get("interval_seconds", DEFAULT_INTERVAL),
+                   config.get("host", "127.0.0.1"), labels)
+
+    @property
+    def url(self) -> Optional[str]:
+        if self._server is None:
+            return None
+        return f"http://{self.host}:{self._server.server_address[1]}/metrics"
+
+    def render(self) -> str:
+        return render_metrics(self.metrics, self.labels)
+
+    def write_textfile(self):
+        """原子写入指标文件（先写临时文件再替换，采集方不会读到写了一半的文件）"""
+        if not self.textfile:
+            return
+        path = Path(self.textfile)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def start(self):
+        """开始导出（未开启统计时同时开启）"""
+        if not self.metrics.enabled:
+            self.metrics.enable()
+        self._stop.clear()
+        if self.port is not None:
+            self._server = _MetricsHTTPServer((self.host, self.port), self)
+            thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.textfile:
+            self.write_textfile()
+            thread = threading.Thread(target=self._write_loop, name="metrics-textfile", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write_textfile()
+            except OSError:
+                # 磁盘暂时不可写时等下一次
+                continue
+
+    def stop(self):
+        """停止导出，并写入最终的指标文件"""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.textfile:
+            self.write_textfile()
+
+    def __enter__(self) -> "MetricsExporter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+并行目录扫描
+把目录树按目录划分为若干分区，在当前进程、线程池或进程池中扫描，
+每个分区只返回基本类型元组（不构造 Path / 数据类），由调用方合并成文件索引。
+
+扫描模式:
+    serial  —— 当前线程依次扫描
+    thread  —— 线程池，大文件哈希时释放GIL，适合少量大文件
+    process —— 进程池，绕开逐文件的Python开销在GIL上的串行化，适合大量小文件
+"""
+
+import fnmatch
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.compare_payload import SUMMARY_PREFIX_SIZE, digest_to_bytes
+from tools.common.file_fingerprint import hash_with_fingerprint, quick_fingerprint
+from tools.common.hash_cache import CacheEntry, HashCache
+from tools.common.instrumentation import get_instrumentation
+from tools.common.manifest_summary import RemoteManifestSummary
+
+SCAN_MODES = ("serial", "thread", "process")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 串行模式也拆成若干分区，便于流水线逐分区消费结果
+SERIAL_PARTITIONS = 16
+
+# 扫描记录: (相对路径, 文件大小, 修改时间纳秒, SHA256, 快速指纹, 来源)
+# 来源: cached（修改时间命中）/ hashed（计算哈希）/ deferred（推迟哈希）
+ScanRecord = Tuple[str, int, int, str, str, str]
+
+# 分区: (相对目录, 是否递归)
+Partition = Tuple[str, bool]
+
+
+@dataclass
+class ScanResult:
+    """扫描结果"""
+    records: List[ScanRecord] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)  # "相对路径: 错误信息"
+    # 计时在 scan_partition 内测得（子进程中也有效），由 iter_scan_tree 汇总到分阶段统计
+    seconds: float = 0.0  # 分区扫描总耗时（含哈希）
+    hash_seconds: float = 0.0
+    hash_bytes: int = 0
+    hash_files: int = 0
+
+
+def _should_exclude(name: str, exclude_patterns: Optional[Sequence[str]]) -> bool:
+    if not exclude_patterns:
+        return False
+    return any(fnmatch.fnmatch(name, pattern) for pattern in exclude_patterns)
+
+
+def _join(rel_dir: str, name: str) -> str:
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+def plan_partitions(root: str, target: int,
+                    exclude_patterns: Optional[Sequence[str]] = None) -> List[Partition]:
+    """
+    按目录划分分区
+
+    从整棵树一个递归分区开始，按广度优先把递归分区拆成
+    "该目录自身的文件" + "每个子目录各一个递归分区"，直到分区数达到 target。
+
+    Args:
+        root: 根目录
+        target: 期望的分区数
+        exclude_patterns: 排除的目录名模式
+
+    Returns:
+        分区列表
+    """
+    partitions: List[Partition] = [("", True)]
+    index = 0
+    while len(partitions) < target and index < len(partitions):
+        rel_dir, recursive = partitions[index]
+        if not recursive:
+            index += 1
+            continue
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as entries:
+                children = [
+                    _join(rel_dir, entry.name) for entry in entries
+                    if entry.is_dir() and not entry.is_symlink()
+                    and not _should_exclude(entry.name, exclude_patterns)
+                ]
+        except OSError:
+            index += 1
+            continue
+        if not children:
+            index += 1
+            continue
+        partitions[index] = (rel_dir, False)
+        partitions.extend((child, True) for child in sorted(children))
+        index += 1
+    return partitions
+
+
+def scan_partition(root: str, rel_dir: str, recursive: bool,
+                   cache_entries: Optional[Dict[str, CacheEntry]],
+                   summary_entries: Optional[Dict[str, Tuple[int, bytes]]],
+                   exclude_patterns: Optional[Sequence[str]] = None) -> ScanResult:
+    """
+    扫描单个分区（可在子进程中执行，参数和返回值均可序列化）
+
+    Args:
+        root: 根目录
+        rel_dir: 分区相对目录
+        recursive: 是否包含子目录
+        cache_entries: 哈希缓存条目，None 表示不使用缓存
+        summary_entries: 远程清单摘要条目，None 表示不预检
+        exclude_patterns: 排除的文件/目录名模式
+
+    Returns:
+        扫描结果
+    """
+    result = ScanResult()
+    started = time.perf_counter()
+    pending = [rel_dir]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(os.path.join(root, current)) as entries:
+                entries = list(entries)
+        except OSError as e:
+            result.skipped.append(f"{current or '.'}: {e}")
+            continue
+
+        for entry in entries:
+            if _should_exclude(entry.name, exclude_patterns):
+                continue
+            relative_path = _join(current, entry.name)
+            try:
+                if entry.is_dir():
+                    if recursive and not entry.is_symlink():
+                        pending.append(relative_path)
+                    continue
+                if not entry.is_file():
+                    continue
+
+                stat = entry.stat()
+                size, mtime_ns = stat.st_size, stat.st_mtime_ns
+                cached = cache_entries.get(relative_path) if cache_entries is not None else None
+
+                # 依次尝试：缓存命中 -> 预检判定肯定变化（推迟哈希） -> 计算哈希
+                if cached and cached[0] == size and cached[1] == mtime_ns:
+                    result.records.append((relative_path, size, mtime_ns, cached[2], cached[3], "cached"))
+                    continue
+
+                if summary_entries is not None:
+                    remote = summary_entries.get(relative_path)
+                    if remote is None or remote[0] != size or _fingerprint_changed(
+                            entry.path, size, cached, remote[1]):
+                        result.records.append((relative_path, size, mtime_ns, "", "", "deferred"))
+                        continue
+
+                hash_started = time.perf_counter()
+                sha256, fingerprint = hash_with_fingerprint(entry.path, size, HASH_CHUNK_SIZE)
+                result.hash_seconds += time.perf_counter() - hash_started
+                result.hash_bytes += size
+                result.hash_files += 1
+                result.records.append((relative_path, size, mtime_ns, sha256, fingerprint, "hashed"))
+            except OSError as e:
+                result.skipped.append(f"{relative_path}: {e}")
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def stat_tree(root: str, exclude_patterns: Optional[Sequence[str]] = None) -> Dict[str, Tuple[int, int]]:
+    """
+    只读取文件属性的遍历（不读文件内容），遍历规则与 scan_partition 相同
+
+    Returns:
+        相对路径 -> (文件大小, 修改时间纳秒)；无法读取的目录和文件被忽略
+    """
+    files: Dict[str, Tuple[int, int]] = {}
+    pending = [""]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(os.path.join(root, current)) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+        for entry in entries:
+            if _should_exclude(entry.name, exclude_patterns):
+                continue
+            relative_path = _join(current, entry.name)
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        pending.append(relative_path)
+                    continue
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[relative_path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+    return files
+
+
+def tree_digest(files: Dict[str, Tuple[int, int]]) -> str:
+    """按路径、大小和修改时间计算目录树摘要（stat_tree 的结果），用于判断目录树是否变化"""
+    sha256_hash = hashlib.sha256()
+    for relative_path, (size, mtime_ns) in sorted(files.items()):
+        sha256_hash.update(f"{relative_path}\0{size}\0{mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return sha256_hash.hexdigest()
+
+
+def _fingerprint_changed(path: str, size: int, cached: Optional[CacheEntry], remote_prefix: bytes) -> bool:
+    """
+    远程仍是缓存中的版本、而本地指纹已与缓存不同时，文件肯定与远程不同，可推迟哈希
+
+    指纹只用于判定已变化：指纹一致时文件仍可能在未采样区域被修改，由调用方计算完整哈希。
+    """
+    if not cached or cached[0] != size or not cached[3]:
+        return False
+    if digest_to_bytes(cached[2])[:SUMMARY_PREFIX_SIZE] != remote_prefix:
+        return False
+    fingerprint = quick_fingerprint(Path(path), size)
+    return bool(fingerprint) and fingerprint != cached[3]
+
+
+def _scan_partition_section(*args) -> ScanResult:
+    """在线程池中扫描分区（分析器按 scan 阶段采样该线程）"""
+    with get_instrumentation().section("scan"):
+        return scan_partition(*args)
+
+
+def _partition_entries(entries: Dict[str, tuple], partitions: List[Partition]) -> List[Dict[str, tuple]]:
+    """把 路径 -> 条目 的映射按分区拆分，避免把整个映射发给每个工作进程"""
+    flat = {rel_dir: i for i, (rel_dir, recursive) in enumerate(partitions) if not recursive}
+    deep = {rel_dir: i for i, (rel_dir, recursive) in enumerate(partitions) if recursive}
+    split: List[Dict[str, tuple]] = [{} for _ in partitions]
+    for path, entry in entries.items():
+        parent = path.rpartition("/")[0]
+        index = flat.get(parent)
+        while index is None:
+            index = deep.get(parent)
+            if index is None:
+                if not parent:
+                    break
+                parent = parent.rpartition("/")[0]
+        if index is not None:
+            split[index][path] = entry
+    return split
+
+
+def iter_scan_tree(root: str, mode: str = "serial", workers: Optional[int] = None,
+                   hash_cache: Optional[HashCache] = None,
+                   remote_summary: Optional[RemoteManifestSummary] = None,
+                   exclude_patterns: Optional[Sequence[str]] = None) -> Iterator[Tuple[ScanResult, int, int]]:
+    """
+    逐分区扫描目录树，每完成一个分区就产出结果，供流水线下游立即处理
+
+    参数同 scan_tree。提前关闭生成器时会取消尚未开始的分区。
+
+    Returns:
+        (分区扫描结果, 已完成分区数, 总分区数) 迭代器
+    """
+    if mode not in SCAN_MODES:
+        raise ValueError(f"不支持的扫描模式: {mode}")
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    target = SERIAL_PARTITIONS if mode == "serial" else workers * 4
+    partitions = plan_partitions(root, target, exclude_patterns)
+    cache_entries = hash_cache.entries() if hash_cache is not None else None
+    summary_entries = remote_summary.entries if remote_summary is not None else None
+
+    metrics = get_instrumentation()
+
+    def finish(partial: ScanResult) -> ScanResult:
+        metrics.record("walk", partial.seconds - partial.hash_seconds, files=len(partial.records))
+        if partial.hash_files:
+            metrics.record("hash", partial.hash_seconds, bytes=partial.hash_bytes, files=partial.hash_files)
+        if hash_cache is not None and metrics.enabled:
+            metrics.increment("hash_cache_hits", sum(1 for record in partial.records if record[5] == "cached"))
+            metrics.increment("hash_cache_misses", partial.hash_files)
+        if hash_cache is not None:
+            for relative_path, size, mtime_ns, sha256, fingerprint, source in partial.records:
+                if source == "hashed":
+                    hash_cache.store(relative_path, size, mtime_ns, sha256, fingerprint)
+        return partial
+
+    if mode == "serial":
+        for i, (rel_dir, recursive) in enumerate(partitions):
+            with metrics.section("scan"):
+                partial = scan_partition(root, rel_dir, recursive, cache_entries, summary_entries, exclude_patterns)
+            yield finish(partial), i + 1, len(partitions)
+        return
+
+    if mode == "process":
+        # 只把各分区自己的条目发给工作进程
+        cache_split = _partition_entries(cache_entries, partitions) if cache_entries is not None else None
+        summary_split = _partition_entries(summary_entries, partitions) if summary_entries is not None else None
+    else:
+        cache_split = summary_split = None
+
+    executor_class = ProcessPoolExecutor if mode == "process" else ThreadPoolExecutor
+    scan_function = scan_partition if mode == "process" else _scan_partition_section
+    with executor_class(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                scan_function, root, rel_dir, recursive,
+                cache_split[i] if cache_split is not None else cache_entries,
+                summary_split[i] if summary_split is not None else summary_entries,
+                exclude_patterns
+            )
+            for i, (rel_dir, recursive) in enumerate(partitions)
+        ]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                yield finish(future.result()), done, len(partitions)
+        finally:
+            for pending in futures:
+                pending.cancel()
+
+
+def scan_tree(root: str, mode: str = "serial", workers: Optional[int] = None,
+              hash_cache: Optional[HashCache] = None,
+              remote_summary: Optional[RemoteManifestSummary] = None,
+              exclude_patterns: Optional[Sequence[str]] = None,
+              on_partition_done: Optional[Callable[[int, int], None]] = None,
+              should_cancel: Optional[Callable[[], bool]] = None) -> ScanResult:
+    """
+    扫描目录树
+
+    Args:
+        root: 根目录
+        mode: 扫描模式，见 SCAN_MODES
+        workers: 并行度，默认CPU核数
+        hash_cache: 哈希缓存，新计算的哈希会写入缓存（由调用方负责 save）
+        remote_summary: 远程清单摘要
+        exclude_patterns: 排除的文件/目录名模式
+        on_partition_done: 分区完成回调 (已完成分区数, 总分区数)
+        should_cancel: 返回True时停止调度剩余分区
+
+    Returns:
+        合并后的扫描结果
+    """
+    merged = ScanResult()
+    scan = iter_scan_tree(root, mode, workers, hash_cache, remote_summary, exclude_patterns)
+    try:
+        for partial, done, total in scan:
+            merged.records.extend(partial.records)
+            merged.skipped.extend(partial.skipped)
+            merged.seconds += partial.seconds
+            merged.hash_seconds += partial.hash_seconds
+            merged.hash_bytes += partial.hash_bytes
+            merged.hash_files += partial.hash_files
+            if on_partition_done:
+                on_partition_done(done, total)
+            if should_cancel and should_cancel():
+                break
+    finally:
+        scan.close()
+    return merged
@@ -5,8 +5,10 @@ GUI组件工厂模块
 """
 
 import tkinter as tk
+import threading
+from collections import OrderedDict
 from tkinter import ttk
-from typing import Dict, Any, Optional, Callable, cast
+from typing import Dict, Any, Hashable, Optional, Callable, cast
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
@@ -352,3 +354,72 @@ class WindowFactory:
         root.rowconfigure(0, weight=1)
 
         return main_frame
+
+
+class UIDispatcher:
+    """
+    线程安全的界面更新调度器
+
+    任意线程通过 post / set_var / configure 提交界面更新，界面线程按固定间隔一次执行完；
+    同一个键（例如同一个变量或控件的同一组选项）在一个间隔内只保留最新的更新，
+    高频的进度更新不会在 Tk 事件队列中积压。
+    """
+
+    DEFAULT_TICK_MS = 16
+
+    def __init__(self, root: tk.Misc, tick_ms: int = DEFAULT_TICK_MS):
+        """
+        初始化调度器并开始按间隔执行
+
+        Args:
+            root: 界面线程的根窗口
+            tick_ms: 执行间隔（毫秒）
+        """
+        self.root = root
+        self.tick_ms = tick_ms
+        self._pending: "OrderedDict[Hashable, Callable[[], None]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = True
+        self.root.after(self.tick_ms, self._drain)
+
+    def post(self, callback: Callable[[], None], key: Optional[Hashable] = None):
+        """
+        提交一个界面更新（任意线程）
+
+        Args:
+            callback: 在界面线程中执行的函数
+            key: 合并键，键相同的更新只执行最新一次；None 表示每次都执行
+        """
+        if key is None:
+            key = object()
+        with self._lock:
+            # 先移除旧的更新，新的更新排在最后，保持提交顺序
+            self._pending.pop(key, None)
+            self._pending[key] = callback
+
+    def set_var(self, variable: tk.Variable, value: Any):
+        """设置 Tk 变量（任意线程，只保留最新值）"""
+        self.post(lambda: variable.set(value), key=("var", str(variable)))
+
+    def configure(self, widget: tk.Misc, **options):
+        """修改控件选项（任意线程，同一控件的同一组选项只保留最新值）"""
+        self.post(lambda: widget.config(**options), key=("config", str(widget), tuple(sorted(options))))
+
+    def stop(self):
+        """停止执行（窗口关闭时调用）"""
+        self._running = False
+
+    def _drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, OrderedDict()
+        for callback in pending.values():
+            try:
+                callback()
+            except Exception as e:
+                print(f"界面更新失败: {e}")
+        if self._running:
+            try:
+                self.root.after(self.tick_ms, self._drain)
+            except tk.TclError:
+                # 窗口已销毁
+                self._running = False
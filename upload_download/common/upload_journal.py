@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+上传日志（崩溃恢复）
+在本地 SQLite 库中记录一次上传运行的完整计划和每个文件的状态:
+    planned    已计划，尚未开始
+    in_flight  正在上传（中断后状态未知，恢复时重新上传）
+    committed  服务器已确认，或无需上传（与云端相同）
+
+每个文件的状态变化立即写入，进程在任何时刻退出后，下次运行可直接按日志继续：
+已确认的文件跳过，不再获取远程清单、不再计算哈希。继续之前调用方只读取文件属性遍历本地目录，
+路径集合、大小或修改时间与日志不一致时放弃日志重新计划（日志中的计划已过时）。
+运行的计划完整写入之前（例如流水线模式仍在扫描时）中断的日志不用于恢复。
+
+一个日志对应一个范围（例如 服务器 + 版本类型 + 平台 + 架构），同一范围同时只有一个未完成的运行。
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.common_utils import get_cache_dir
+
+PLANNED = "planned"
+IN_FLIGHT = "in_flight"
+COMMITTED = "committed"
+
+# 运行状态
+RUN_PLANNING = "planning"  # 计划尚未完整写入
+RUN_PLANNED = "planned"    # 计划已完整，可用于恢复
+
+
+@dataclass
+class JournalEntry:
+    """日志中的一个文件"""
+    relative_path: str
+    change: str  # 变化类型（new / modified / same / deleted 等，由调用方定义）
+    file_size: int = 0
+    mtime: float = 0.0  # 计划时的修改时间（秒）
+    sha256: str = ""
+    state: str = PLANNED
+
+
+class UploadJournal:
+    """基于SQLite的上传日志，一个实例对应一个范围"""
+
+    def __init__(self, scope: Sequence[str], db_path: Optional[str] = None):
+        """
+        打开上传日志
+
+        Args:
+            scope: 范围，例如 (服务器, 版本类型, 平台, 架构)
+            db_path: 数据库路径，默认位于本地缓存目录
+        """
+        self.scope = "|".join(scope)
+        self.db_path = Path(db_path) if db_path else get_cache_dir() / "upload_journal.db"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        # WAL 模式下每次状态变化的提交只追加日志页，进程崩溃不丢失已提交的状态
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal_runs ("
+            " scope TEXT PRIMARY KEY, root TEXT NOT NULL, state TEXT NOT NULL, started_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal_files ("
+            " scope TEXT NOT NULL, relative_path TEXT NOT NULL, change TEXT NOT NULL,"
+            " file_size INTEGER NOT NULL, mtime REAL NOT NULL, sha256 TEXT NOT NULL, state TEXT NOT NULL,"
+            " PRIMARY KEY (scope, relative_path))"
+        )
+        self._conn.commit()
+
+    def load(self, root: str) -> Optional[List[JournalEntry]]:
+        """
+        读取同一根目录上次未完成的运行
+
+        Args:
+            root: 本次运行的根目录（或其他标识）
+
+        Returns:
+            计划中的全部条目；没有可恢复的运行时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT root, state FROM journal_runs WHERE scope = ?", (self.scope,)
+            ).fetchone()
+            if row is None or row[0] != root or row[1] != RUN_PLANNED:
+                return None
+            return [
+                JournalEntry(*values) for values in self._conn.execute(
+                    "SELECT relative_path, change, file_size, mtime, sha256, state FROM journal_files"
+                    " WHERE scope = ? ORDER BY relative_path", (self.scope,)
+                )
+            ]
+
+    def begin(self, root: str, entries: Iterable[JournalEntry] = (), complete: bool = True):
+        """
+        开始新的运行（丢弃该范围的旧运行）
+
+        Args:
+            root: 本次运行的根目录（或其他标识）
+            entries: 计划中的条目
+            complete: 计划是否已完整；为False时需在全部 add 之后调用 plan_complete
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM journal_files WHERE scope = ?", (self.scope,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO journal_runs VALUES (?, ?, ?, ?)",
+                (self.scope, root, RUN_PLANNED if complete else RUN_PLANNING, time.time())
+            )
+            self._insert(entries)
+            self._conn.commit()
+
+    def add(self, entries: Iterable[JournalEntry]):
+        """向当前运行追加条目"""
+        with self._lock:
+            self._insert(entries)
+            self._conn.commit()
+
+    def plan_complete(self):
+        """标记计划已完整写入，此后中断的运行可以恢复"""
+        with self._lock:
+            self._conn.execute("UPDATE journal_runs SET state = ? WHERE scope = ?", (RUN_PLANNED, self.scope))
+            self._conn.commit()
+
+    def mark(self, relative_path: str, state: str, sha256: Optional[str] = None):
+        """
+        更新一个文件的状态（立即写入）
+
+        Args:
+            relative_path: 相对路径
+            state: 新状态
+            sha256: 上传时确定的哈希（计划时尚未计算哈希的文件）
+        """
+        with self._lock:
+            if sha256:
+                self._conn.execute(
+                    "UPDATE journal_files SET state = ?, sha256 = ? WHERE scope = ? AND relative_path = ?",
+                    (state, sha256, self.scope, relative_path)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE journal_files SET state = ? WHERE scope = ? AND relative_path = ?",
+                    (state, self.scope, relative_path)
+                )
+            self._conn.commit()
+
+    def pending_count(self) -> int:
+        """尚未确认的文件数"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM journal_files WHERE scope = ? AND state != ?", (self.scope, COMMITTED)
+            ).fetchone()[0]
+
+    def finish(self):
+        """运行完成，清除该范围的日志"""
+        with self._lock:
+            self._conn.execute("DELETE FROM journal_files WHERE scope = ?", (self.scope,))
+            self._conn.execute("DELETE FROM journal_runs WHERE scope = ?", (self.scope,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, entries: Iterable[JournalEntry]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO journal_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((self.scope, entry.relative_path, entry.change, entry.file_size, entry.mtime,
+              entry.sha256, entry.state) for entry in entries)
+        )
@@ -2,6 +2,9 @@
 """
 下载管理器
 支持最小化下载策略、断点续传和增量更新
+暂存模式下文件下载到同级的暂存目录，全部成功后整体切换（见 staged_install）
+调用方明确要求时（流式更新），全部文件下载成功后删除目标版本中已不存在的本地文件
+启用本地内容寻址存储时，下载前先查存储，内容相同的文件不再下载（见 blob_store）
 """
 
 import os
@@ -10,13 +13,22 @@ import requests
 import threading
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Callable
-from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Callable
+from dataclasses import dataclass, replace
 from enum import Enum
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from tools.common.adaptive_concurrency import AdaptiveConcurrency
+from tools.common.common_utils import get_config
 from tools.common.difference_detector import FileChange, UpdatePlan, ChangeType
+from tools.common.instrumentation import get_instrumentation
+from tools.common.progress import ProgressAggregator, ProgressSnapshot
+from tools.common.rate_limiter import TransferThrottle, get_rate_limiter
+from tools.common.transfer_control import TransferControl
+from tools.common.transfer_scheduler import ScheduledQueue, predict_remaining_seconds, schedule
+from tools.download.blob_store import BlobStore
+from tools.download.staged_install import StagedInstall, StagedInstallError
 
 
 class DownloadStatus(Enum):
@@ -46,12 +58,25 @@ class DownloadProgress:
     files_failed: int
     files_skipped: int
     status: DownloadStatus
+    concurrency: int = 1  # 当前并发下载数
+    files_reused: int = 0  # 从本地存储取出（未下载）的文件数
+    files_deleted: int = 0  # 已删除的本地多余文件数
+
+
+def _relative_path(file_change: FileChange) -> str:
+    return file_change.relative_path
+
+
+def _file_size(file_change: FileChange) -> int:
+    return file_change.file_size
 
 
 class DownloadManager:
     """下载管理器"""
 
-    def __init__(self, server_url: str, api_key: str, progress_callback: Optional[Callable] = None):
+    def __init__(self, server_url: str, api_key: str, progress_callback: Optional[Callable] = None,
+                 concurrency: Optional[AdaptiveConcurrency] = None, staged: Optional[bool] = None,
+                 blob_store: Optional[BlobStore] = None):
         """
         初始化下载管理器
 
@@ -59,41 +84,67 @@ class DownloadManager:
             server_url: 服务器URL
             api_key: API密钥
             progress_callback: 进度回调函数，接收DownloadProgress参数
+            concurrency: 并发控制器，默认按配置的 transfer 节创建自适应控制器
+            staged: 是否使用暂存安装，默认按配置 download.staged_install
+            blob_store: 本地内容寻址存储，默认按配置 download.blob_store_max_mb 创建（未配置时不使用）
         """
         self.server_url = server_url.rstrip('/')
         self.api_key = api_key
         self.progress_callback = progress_callback
 
-        # 下载状态
+        # 下载状态（暂停/取消由传输控制对象管理）
         self.is_downloading = False
-        self.is_cancelled = False
-        self.is_paused = False
+        self.control = TransferControl()
+        self._throttle: Optional[TransferThrottle] = None
 
-        # 进度跟踪
+        # 进度跟踪（已下载字节数由进度聚合器的无锁计数器累计）
         self.current_file = ""
         self.current_file_size = 0
         self.current_file_downloaded = 0
         self.overall_size = 0
-        self.overall_downloaded = 0
         self.files_completed = 0
         self.files_total = 0
         self.files_failed = 0
         self.files_skipped = 0
-
-        # 速度计算
-        self.speed_samples = []
-        self.last_update_time = 0
-        self.last_downloaded = 0
+        self.files_reused = 0
+        self.files_deleted = 0
+
+        # 本地内容寻址存储：下载前查找，下载后加入
+        self.blob_store = blob_store or BlobStore.from_config()
+
+        # 暂存安装：下载到暂存目录，全部成功后切换；切换失败的原因记录在 install_error
+        if staged is None:
+            staged = bool(get_config().get("download", {}).get("staged_install", False))
+        self.staged = staged
+        self._staged_install: Optional[StagedInstall] = None
+        self._exclude_from_staging: List[str] = []
+        self._completed_changes: List[FileChange] = []
+        # 是否删除目标版本中已不存在的本地文件（默认不删除，安装目录中可能有用户数据）
+        self._delete_extra = False
+        self.install_error: Optional[str] = None
+
+        # 按固定间隔采样进度，数据路径不调用回调
+        self.progress = ProgressAggregator(self._publish_progress)
 
         # 线程锁
         self._lock = threading.Lock()
 
-        # 网络会话
+        # 并发下载：按上限创建下载线程，由控制器决定同时进行的请求数
+        self.concurrency = concurrency or AdaptiveConcurrency.from_config(get_config().get("transfer", {}))
+        self._current_owner = 0
+        # 进行中的文件：线程ID -> [文件大小, 已下载字节数]，用于估计并行下载的剩余时间
+        self._active: Dict[int, List[int]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+        # 网络会话（连接池容量与并发上限一致）
         self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.concurrency.max_limit)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.timeout = 30
 
     def start_download(self, update_plan: UpdatePlan, target_directory: str,
-                      selected_files: Optional[List[str]] = None) -> bool:
+                      selected_files: Optional[List[str]] = None, delete_extra: bool = False) -> bool:
         """
         开始下载更新
 
@@ -101,6 +152,7 @@ class DownloadManager:
             update_plan: 更新计划
             target_directory: 目标目录
             selected_files: 选择下载的文件列表（相对路径），None表示下载所有
+            delete_extra: 全部成功后删除计划中的多余文件（只选择部分文件时不删除）
 
         Returns:
             是否成功开始下载
@@ -110,105 +162,217 @@ class DownloadManager:
 
         with self._lock:
             self.is_downloading = True
-            self.is_cancelled = False
-            self.is_paused = False
+            self.control.reset()
 
             # 重置进度
             self._reset_progress()
+            self._delete_extra = delete_extra and selected_files is None
 
             # 过滤要下载的文件
             files_to_download = update_plan.files_to_download
             if selected_files is not None:
                 files_to_download = [f for f in files_to_download if f.relative_path in selected_files]
+            # 按优先级和大小排序（大文件先开始，小文件填补各线程结束时间的差距）
+            files_to_download = schedule(files_to_download, _relative_path, _file_size)
+            # 暂存目录中不放入待下载和待删除文件的旧版本
+            self._exclude_from_staging = [f.relative_path for f in files_to_download]
+            if self._delete_extra:
+                self._exclude_from_staging += [f.relative_path for f in update_plan.files_to_delete]
 
             self.files_total = len(files_to_download)
             self.overall_size = sum(f.file_size for f in files_to_download)
+            self.progress.add_total(self.overall_size, self.files_total)
 
         # 在新线程中执行下载
-        download_thread = threading.Thread(
+        self._thread = threading.Thread(
             target=self._download_files,
             args=(files_to_download, target_directory, update_plan)
         )
-        download_thread.daemon = True
-        download_thread.start()
+        self._thread.daemon = True
+        self._thread.start()
 
         return True
 
+    def start_streaming_download(self, update_plan: UpdatePlan, target_directory: str,
+                                 delete_extra: bool = False) -> bool:
+        """
+        以流式方式开始下载：文件通过 enqueue_file 逐个加入，调用 finish_enqueue 表示不再有新文件
+
+        Args:
+            update_plan: 更新计划（只使用目标版本、平台和架构，文件清单由调用方逐步填充）
+            target_directory: 目标目录
+            delete_extra: 全部成功后删除计划中的多余文件（调用 finish_enqueue 前须已加入计划）
+
+        Returns:
+            是否成功开始下载
+        """
+        if self.is_downloading:
+            return False
+
+        with self._lock:
+            self.is_downloading = True
+            self.control.reset()
+            self._reset_progress()
+            self._delete_extra = delete_extra
+            self.files_total = 0
+            self.overall_size = 0
+            # 待下载文件尚未确定，暂存目录放入全部旧文件，下载前逐个断开
+            self._exclude_from_staging = []
+            # 已加入但未开始的文件按优先级和大小取出
+            self._stream_queue = ScheduledQueue(_relative_path, _file_size)
+
+        self._thread = threading.Thread(
+            target=self._download_files,
+            args=(iter(self._stream_queue), target_directory, update_plan)
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+        return True
+
+    def enqueue_file(self, file_change: FileChange):
+        """流式下载时追加一个待下载文件"""
+        with self._lock:
+            self.files_total += 1
+            self.overall_size += file_change.file_size
+            self.progress.add_total(file_change.file_size, 1)
+        self._stream_queue.put(file_change)
+
+    def finish_enqueue(self):
+        """流式下载时表示所有文件都已加入，队列处理完后下载结束"""
+        self._stream_queue.close()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待下载线程结束，返回是否已结束"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.is_downloading
+
     def pause_download(self):
         """暂停下载"""
-        with self._lock:
-            self.is_paused = True
+        self.control.pause()
 
     def resume_download(self):
         """恢复下载"""
-        with self._lock:
-            self.is_paused = False
+        self.control.resume()
 
     def cancel_download(self):
         """取消下载"""
-        with self._lock:
-            self.is_cancelled = True
-            self.is_paused = False
+        self.control.cancel()
+
+    @property
+    def is_paused(self) -> bool:
+        return self.control.is_paused
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.control.is_cancelled
+
+    @property
+    def overall_downloaded(self) -> int:
+        """已下载字节数"""
+        return self.progress.done_bytes.value
 
     def _reset_progress(self):
         """重置进度信息"""
         self.current_file = ""
         self.current_file_size = 0
         self.current_file_downloaded = 0
-        self.overall_downloaded = 0
         self.files_completed = 0
         self.files_failed = 0
         self.files_skipped = 0
-        self.speed_samples = []
-        self.last_update_time = time.time()
-        self.last_downloaded = 0
-
-    def _download_files(self, files_to_download: List[FileChange], target_directory: str, update_plan: UpdatePlan):
+        self.files_reused = 0
+        self.files_deleted = 0
+        self._completed_changes = []
+        self.install_error = None
+        self._active.clear()
+        self.progress.reset()
+
+    def _download_files(self, files_to_download: Iterable[FileChange], target_directory: str, update_plan: UpdatePlan):
         """
         下载文件列表（在单独线程中运行）
 
         Args:
-            files_to_download: 要下载的文件列表
+            files_to_download: 要下载的文件（列表，或流式下载时的队列迭代器）
             target_directory: 目标目录
             update_plan: 更新计划
         """
+        self.progress.start()
+        self._throttle = get_rate_limiter().open_transfer()
         try:
             target_path = Path(target_directory)
             target_path.mkdir(parents=True, exist_ok=True)
+            if self.staged:
+                self._staged_install = StagedInstall(target_directory)
+                target_path = self._staged_install.prepare(self._exclude_from_staging)
 
-            for file_change in files_to_download:
-                # 检查是否被取消
-                with self._lock:
-                    if self.is_cancelled:
-                        break
+            files = iter(files_to_download)
+            files_lock = threading.Lock()
 
-                # 等待暂停结束
+            def download_worker():
                 while True:
-                    with self._lock:
-                        if not self.is_paused or self.is_cancelled:
-                            break
-                    time.sleep(0.1)
-
-                if self.is_cancelled:
-                    break
-
-                # 下载单个文件
-                success = self._download_single_file(file_change, target_path, update_plan)
+                    # 暂停时阻塞，取消时结束
+                    if not self.control.checkpoint():
+                        return
+                    with files_lock:
+                        file_change = next(files, None)
+                    if file_change is None:
+                        return
 
-                with self._lock:
-                    if success:
-                        self.files_completed += 1
-                    else:
-                        self.files_failed += 1
-
-                # 更新进度
-                self._update_progress()
+                    # 下载单个文件
+                    success = self._download_single_file(file_change, target_path, update_plan)
 
+                    with self._lock:
+                        if success:
+                            self.files_completed += 1
+                            self._completed_changes.append(file_change)
+                        else:
+                            self.files_failed += 1
+                    self.progress.done_items.add()
+
+            workers = [threading.Thread(target=download_worker, daemon=True)
+                       for _ in range(self.concurrency.max_limit)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+            # 未要求删除时保留本地多余文件（可能是用户数据、本地配置或日志）
+            files_to_delete = list(update_plan.files_to_delete) if self._delete_extra else []
+
+            # 暂存安装：全部成功时切换到新版本，否则保留暂存目录供下次续传
+            if self._staged_install and not self.is_cancelled and self.files_failed == 0:
+                try:
+                    self._staged_install.commit(replace(update_plan, files_to_delete=files_to_delete),
+                                                self._completed_changes)
+                except (StagedInstallError, OSError) as e:
+                    self.install_error = str(e)
+                    print(f"切换到新版本失败: {e}")
+            # 直接写入安装目录：全部成功时再删除多余文件，失败或取消时保留以免留下不完整的版本
+            elif files_to_delete and not self.is_cancelled and self.files_failed == 0:
+                self._delete_files(target_path, files_to_delete)
+
+        except (StagedInstallError, OSError) as e:
+            self.install_error = str(e)
+            print(f"准备暂存目录失败: {e}")
         finally:
             with self._lock:
                 self.is_downloading = False
-                # 最终进度更新
-                self._update_progress()
+            # 停止采样并发出最终进度
+            self.progress.stop()
+
+    def _delete_files(self, target_path: Path, files_to_delete: List[FileChange]):
+        """删除目标版本中已不存在的本地文件"""
+        for file_change in files_to_delete:
+            try:
+                (target_path / file_change.relative_path).unlink()
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"删除文件失败 {file_change.relative_path}: {e}")
+                continue
+            with self._lock:
+                self.files_deleted += 1
 
     def _download_single_file(self, file_change: FileChange, target_path: Path, update_plan: UpdatePlan) -> bool:
         """
@@ -223,102 +387,160 @@ class DownloadManager:
             是否下载成功
         """
         try:
-            # 更新当前文件信息
+            # 更新当前文件信息（并发下载时显示最近开始的文件）
             with self._lock:
                 self.current_file = file_change.relative_path
                 self.current_file_size = file_change.file_size
                 self.current_file_downloaded = 0
+                self._current_owner = threading.get_ident()
 
             # 构建目标文件路径
             file_path = target_path / file_change.relative_path
             file_path.parent.mkdir(parents=True, exist_ok=True)
+            if self._staged_install:
+                # 暂存目录中与安装目录共享的旧版本不能写入
+                self._staged_install.detach(file_change.relative_path)
 
             # 检查是否需要断点续传
             resume_pos = 0
             if file_path.exists():
                 # 检查已下载部分的完整性
                 existing_size = file_path.stat().st_size
-                if existing_size < file_change.file_size:
+                if existing_size < file_change.file_size and file_change.change_type == ChangeType.NEW:
+                    # 只有新增文件才可能是上次未完成的下载；更新文件的本地副本是旧版本，需整体覆盖
                     # 验证已下载部分
                     if self._verify_partial_file(file_path, file_change.sha256_hash):
                         resume_pos = existing_size
-                        with self._lock:
-                            self.current_file_downloaded = resume_pos
-                            self.overall_downloaded += resume_pos
+                        self.current_file_downloaded = resume_pos
+                        self.progress.done_bytes.add(resume_pos)
                     else:
                         # 已下载部分损坏，重新下载
                         file_path.unlink()
                 elif existing_size == file_change.file_size:
                     # 文件已存在，验证完整性
                     if self._verify_file_integrity(file_path, file_change.sha256_hash):
+                        self.current_file_downloaded = file_change.file_size
+                        self.progress.done_bytes.add(file_change.file_size)
                         with self._lock:
-                            self.current_file_downloaded = file_change.file_size
-                            self.overall_downloaded += file_change.file_size
                             self.files_skipped += 1
+                        self._store_blob(file_change, file_path)
                         return True
                     else:
                         # 文件损坏，重新下载
                         file_path.unlink()
 
+            # 其他版本中内容相同的文件直接从本地存储取出
+            if resume_pos == 0 and self.blob_store:
+                metrics = get_instrumentation()
+                with metrics.phase("reuse") as timer:
+                    reused = self.blob_store.materialize(file_change.sha256_hash, file_change.file_size, file_path)
+                    if reused:
+                        timer.add(files=1, bytes=file_change.file_size)
+                metrics.increment("blob_store_hits" if reused else "blob_store_misses")
+            else:
+                reused = False
+            if reused:
+                self.current_file_downloaded = file_change.file_size
+                self.progress.done_bytes.add(file_change.file_size)
+                with self._lock:
+                    self.files_reused += 1
+                return True
+
             # 下载文件
             headers = {}
             if resume_pos > 0:
                 headers['Range'] = f'bytes={resume_pos}-'
 
-            response = self.session.get(
-                f"{self.server_url}/api/v1/download/file",
-                params={
-                    "version": update_plan.target_version,
-                    "platform": update_plan.platform,
-                    "arch": update_plan.architecture,
-                    "relative_path": file_change.relative_path,
-                    "api_key": self.api_key
-                },
-                headers=headers,
-                stream=True,
-                timeout=self.timeout
-            )
-
-            if response.status_code not in [200, 206]:  # 206 for partial content
-                raise Exception(f"下载失败: HTTP {response.status_code}")
-
-            # 写入文件
-            mode = 'ab' if resume_pos > 0 else 'wb'
-            with open(file_path, mode) as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    # 检查是否被取消
-                    with self._lock:
-                        if self.is_cancelled:
-                            return False
-
-                    # 等待暂停结束
-                    while True:
-                        with self._lock:
-                            if not self.is_paused or self.is_cancelled:
-                                break
-                        time.sleep(0.1)
-
-                    if chunk:
-                        f.write(chunk)
-
-                        # 更新进度
-                        with self._lock:
-                            self.current_file_downloaded += len(chunk)
-                            self.overall_downloaded += len(chunk)
-
-                        # 更新进度回调
-                        self._update_progress()
+            # 占用一个并发名额，结束后把耗时和结果反馈给控制器
+            if not self.concurrency.acquire(self.control):
+                return False
+            started = time.monotonic()
+            success = False
+            try:
+                with get_instrumentation().phase("download", files=1, requests=1,
+                                                 bytes=file_change.file_size - resume_pos):
+                    success = self._fetch_file(file_change, file_path, resume_pos, headers, update_plan)
+            finally:
+                self.concurrency.release(time.monotonic() - started,
+                                         file_change.file_size - resume_pos, success)
+            if not success:
+                return False
 
             # 验证下载的文件
             if not self._verify_file_integrity(file_path, file_change.sha256_hash):
                 raise Exception("文件完整性验证失败")
 
+            self._store_blob(file_change, file_path)
             return True
 
         except Exception as e:
             print(f"下载文件失败 {file_change.relative_path}: {e}")
             return False
 
+    def _store_blob(self, file_change: FileChange, file_path: Path):
+        """把已校验的文件加入本地存储"""
+        if not self.blob_store:
+            return
+        try:
+            self.blob_store.add(file_change.sha256_hash, file_path)
+        except OSError as e:
+            print(f"加入本地存储失败 {file_change.relative_path}: {e}")
+
+    def _fetch_file(self, file_change: FileChange, file_path: Path, resume_pos: int,
+                    headers: Dict[str, str], update_plan: UpdatePlan) -> bool:
+        """发送下载请求并写入文件，返回是否完整接收（被取消时返回False）"""
+        response = self.session.get(
+            f"{self.server_url}/api/v1/download/file",
+            params={
+                "version": update_plan.target_version,
+                "platform": update_plan.platform,
+                "arch": update_plan.architecture,
+                "relative_path": file_change.relative_path,
+                "api_key": self.api_key
+            },
+            headers=headers,
+            stream=True,
+            timeout=self.timeout
+        )
+
+        if response.status_code not in [200, 206]:  # 206 for partial content
+            raise Exception(f"下载失败: HTTP {response.status_code}")
+
+        # 登记为进行中的文件
+        ident = threading.get_ident()
+        active = [file_change.file_size, resume_pos]
+        with self._lock:
+            self._active[ident] = active
+
+        # 写入文件
+        mode = 'ab' if resume_pos > 0 else 'wb'
+        if mode == 'wb' and file_path.exists():
+            # 旧文件可能与本地存储或暂存目录共享数据（硬链接），先删除再写入新文件
+            file_path.unlink()
+        try:
+            with open(file_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    # 暂停时阻塞，取消时中止（未暂停时不加锁）
+                    if not self.control.checkpoint():
+                        return False
+
+                    if chunk:
+                        # 按全局和单传输限速等待
+                        if not self._throttle.throttle(len(chunk), self.control):
+                            return False
+                        f.write(chunk)
+
+                        # 只累加计数，由采样线程发布进度
+                        if self._current_owner == ident:
+                            self.current_file_downloaded += len(chunk)
+                        active[1] += len(chunk)
+                        self.progress.done_bytes.add(len(chunk))
+        finally:
+            with self._lock:
+                self._active.pop(ident, None)
+
+        return True
+
     def _verify_file_integrity(self, file_path: Path, expected_hash: str) -> bool:
         """
         验证文件完整性
@@ -331,10 +553,14 @@ class DownloadManager:
             是否验证通过
         """
         try:
-            sha256_hash = hashlib.sha256()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b""):
-                    sha256_hash.update(chunk)
+            with get_instrumentation().phase("verify", files=1) as timer:
+                sha256_hash = hashlib.sha256()
+                size = 0
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(8192), b""):
+                        sha256_hash.update(chunk)
+                        size += len(chunk)
+                timer.add(bytes=size)
 
             return sha256_hash.hexdigest() == expected_hash
 
@@ -356,99 +582,56 @@ class DownloadManager:
         # 实际实现中应该有更复杂的验证逻辑
         return file_path.exists() and file_path.stat().st_size > 0
 
-    def _calculate_speed_and_eta(self) -> tuple:
-        """
-        计算下载速度和预估剩余时间
-
-        Returns:
-            (速度 bytes/sec, 预估剩余时间 seconds)
-        """
-        current_time = time.time()
-
-        # 计算速度
-        if self.last_update_time > 0:
-            time_diff = current_time - self.last_update_time
-            bytes_diff = self.overall_downloaded - self.last_downloaded
-
-            if time_diff > 0:
-                current_speed = bytes_diff / time_diff
-
-                # 保持最近10个样本的平均值
-                self.speed_samples.append(current_speed)
-                if len(self.speed_samples) > 10:
-                    self.speed_samples.pop(0)
-
-        # 更新记录
-        self.last_update_time = current_time
-        self.last_downloaded = self.overall_downloaded
-
-        # 计算平均速度
-        if self.speed_samples:
-            avg_speed = sum(self.speed_samples) / len(self.speed_samples)
-        else:
-            avg_speed = 0
-
-        # 计算ETA
-        remaining_bytes = self.overall_size - self.overall_downloaded
-        if avg_speed > 0:
-            eta = int(remaining_bytes / avg_speed)
-        else:
-            eta = 0
-
-        return avg_speed, eta
+    def _predict_eta(self, snapshot: ProgressSnapshot) -> int:
+        """剩余时间：考虑并行下载时最大的进行中文件决定的收尾时间"""
+        with self._lock:
+            active_remaining = [size - done for size, done in self._active.values()]
+        return predict_remaining_seconds(snapshot.total_bytes - snapshot.done_bytes,
+                                         active_remaining, snapshot.speed)
 
-    def _update_progress(self):
-        """更新进度并调用回调函数"""
+    def _publish_progress(self, snapshot: ProgressSnapshot):
+        """采样线程回调：把进度快照转换为DownloadProgress并调用回调函数"""
         if not self.progress_callback:
             return
 
-        with self._lock:
-            # 计算进度
-            if self.current_file_size > 0:
-                current_file_progress = self.current_file_downloaded / self.current_file_size
-            else:
-                current_file_progress = 0.0
+        if self.current_file_size > 0:
+            current_file_progress = min(1.0, self.current_file_downloaded / self.current_file_size)
+        else:
+            current_file_progress = 0.0
+
+        # 确定状态
+        if self.is_cancelled:
+            status = DownloadStatus.CANCELLED
+        elif self.install_error:
+            status = DownloadStatus.FAILED
+        elif not self.is_downloading:
+            status = DownloadStatus.COMPLETED
+        elif self.is_paused:
+            status = DownloadStatus.PENDING
+        else:
+            status = DownloadStatus.DOWNLOADING
+
+        progress = DownloadProgress(
+            current_file=self.current_file,
+            current_file_progress=current_file_progress,
+            current_file_size=self.current_file_size,
+            current_file_downloaded=self.current_file_downloaded,
+            overall_progress=snapshot.fraction,
+            overall_size=snapshot.total_bytes,
+            overall_downloaded=snapshot.done_bytes,
+            download_speed=snapshot.speed,
+            eta_seconds=self._predict_eta(snapshot),
+            files_completed=self.files_completed,
+            files_total=self.files_total,
+            files_failed=self.files_failed,
+            files_skipped=self.files_skipped,
+            status=status,
+            concurrency=self.concurrency.limit,
+            files_reused=self.files_reused,
+            files_deleted=self.files_deleted
+        )
 
-            if self.overall_size > 0:
-                overall_progress = self.overall_downloaded / self.overall_size
-            else:
-                overall_progress = 0.0
-
-            # 计算速度和ETA
-            speed, eta = self._calculate_speed_and_eta()
-
-            # 确定状态
-            if self.is_cancelled:
-                status = DownloadStatus.CANCELLED
-            elif not self.is_downloading:
-                status = DownloadStatus.COMPLETED
-            elif self.is_paused:
-                status = DownloadStatus.PENDING
-            else:
-                status = DownloadStatus.DOWNLOADING
-
-            progress = DownloadProgress(
-                current_file=self.current_file,
-                current_file_progress=current_file_progress,
-                current_file_size=self.current_file_size,
-                current_file_downloaded=self.current_file_downloaded,
-                overall_progress=overall_progress,
-                overall_size=self.overall_size,
-                overall_downloaded=self.overall_downloaded,
-                download_speed=speed,
-                eta_seconds=eta,
-                files_completed=self.files_completed,
-                files_total=self.files_total,
-                files_failed=self.files_failed,
-                files_skipped=self.files_skipped,
-                status=status
-            )
-
-        # 调用回调函数
-        try:
-            self.progress_callback(progress)
-        except Exception as e:
-            print(f"进度回调函数错误: {e}")
+        self.progress_callback(progress)
 
 
 # 测试代码
@@ -2,8 +2,13 @@
 """
 简化下载工具
 实现新的三版本类型下载界面
+完整安装包使用多连接分段下载，中断后再次下载时续传（见 package_download）
+可选边下载边解压到安装目录，未变化的文件不重写（见 package_extract）；
+解压的文件先暂存，整个安装包下载并校验通过后才移入安装目录
+命令行 --update 按文件增量更新已有的安装目录，不打开界面（边检查边下载，见 download_handler.StreamingUpdater）
 """
 
+import argparse
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import sys
@@ -17,7 +22,14 @@ from typing import Optional, Dict, Any
 # 添加项目路径
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from tools.common.common_utils import get_config, get_server_url, get_api_key
+from tools.common.common_utils import get_config, get_server_url, get_api_key, LogManager
+from tools.common.instrumentation import get_instrumentation
+from tools.common.profiling import add_profile_arguments, profiler_from_args
+from tools.common.transfer_control import TransferControl
+from tools.common.ui_factory import UIDispatcher
+from tools.download.download_handler import DownloadHandler
+from tools.download.package_download import PackageDownloader
+from tools.download.package_extract import ExtractResult, PackageExtractor, StreamingNotSupported
 
 
 class SimplifiedDownloadTool:
@@ -40,10 +52,16 @@ class SimplifiedDownloadTool:
         self.platform_var = tk.StringVar(value="windows")
         self.architecture_var = tk.StringVar(value="x64")
         self.download_path_var = tk.StringVar(value=str(Path.home() / "Downloads"))
+        self.extract_var = tk.BooleanVar(value=False)
+        self.install_path_var = tk.StringVar(value="")
 
         # 状态变量
         self.is_downloading = False
         self.current_version_info = None
+        self.download_control = TransferControl()
+
+        # 后台线程的界面更新统一经调度器按固定间隔执行
+        self.ui = UIDispatcher(self.root)
 
         # 创建界面
         self.create_widgets()
@@ -131,6 +149,15 @@ class SimplifiedDownloadTool:
                                 command=self.select_download_path)
         path_button.grid(row=0, column=1)
 
+        # 下载时直接解压到安装目录
+        ttk.Checkbutton(path_frame, text="边下载边解压到安装目录:",
+                        variable=self.extract_var).grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        install_entry = ttk.Entry(path_frame, textvariable=self.install_path_var, width=50)
+        install_entry.grid(row=2, column=0, sticky=tk.W + tk.E, padx=(0, 10))
+        install_button = ttk.Button(path_frame, text="选择文件夹...",
+                                   command=self.select_install_path)
+        install_button.grid(row=2, column=1)
+
         row += 1
 
         # 高级选项
@@ -197,6 +224,13 @@ class SimplifiedDownloadTool:
             self.download_path_var.set(folder)
             self.status_var.set(f"下载路径: {folder}")
 
+    def select_install_path(self):
+        """选择安装目录"""
+        folder = filedialog.askdirectory(title="选择安装目录")
+        if folder:
+            self.install_path_var.set(folder)
+            self.extract_var.set(True)
+
     def on_version_changed(self, event=None):
         """版本类型改变事件"""
         # 从显示文本中提取版本类型
@@ -224,11 +258,11 @@ class SimplifiedDownloadTool:
             try:
                 response = requests.get(f"{self.server_url}/api/v2/status/simple", timeout=5)
                 if response.status_code == 200:
-                    self.root.after(0, lambda: self.status_var.set("服务器连接正常"))
+                    self.ui.set_var(self.status_var, "服务器连接正常")
                 else:
-                    self.root.after(0, lambda: self.status_var.set("服务器连接异常"))
+                    self.ui.set_var(self.status_var, "服务器连接异常")
             except:
-                self.root.after(0, lambda: self.status_var.set("无法连接到服务器"))
+                self.ui.set_var(self.status_var, "无法连接到服务器")
 
         threading.Thread(target=check, daemon=True).start()
 
@@ -251,14 +285,14 @@ class SimplifiedDownloadTool:
                     self.current_version_info = version_info
 
                     # 更新界面
-                    self.root.after(0, lambda: self._update_version_display(version_info))
+                    self.ui.post(lambda: self._update_version_display(version_info), key="version_display")
                 elif response.status_code == 404:
-                    self.root.after(0, lambda: self._update_version_display(None))
+                    self.ui.post(lambda: self._update_version_display(None), key="version_display")
                 else:
-                    self.root.after(0, lambda: self.status_var.set("获取版本信息失败"))
+                    self.ui.set_var(self.status_var, "获取版本信息失败")
 
             except Exception as e:
-                self.root.after(0, lambda: self.status_var.set(f"加载版本信息失败: {e}"))
+                self.ui.set_var(self.status_var, f"加载版本信息失败: {e}")
 
         threading.Thread(target=load, daemon=True).start()
 
@@ -326,6 +360,11 @@ class SimplifiedDownloadTool:
             messagebox.showerror("错误", "下载路径不存在")
             return
 
+        install_path = self.install_path_var.get() if self.extract_var.get() else ""
+        if self.extract_var.get() and not install_path:
+            messagebox.showwarning("警告", "请选择安装目录")
+            return
+
         # 确认下载
         version_type = self.version_type_var.get()
         platform = self.platform_var.get()
@@ -337,6 +376,7 @@ class SimplifiedDownloadTool:
 平台: {platform}
 架构: {architecture}
 下载路径: {download_path}
+解压到: {install_path or "不解压"}
 文件大小: {self.file_size_var.get()}
         """
 
@@ -348,53 +388,114 @@ class SimplifiedDownloadTool:
         self.download_button.config(state="disabled")
         self.progress_var.set("开始下载...")
         self.progress_bar.config(value=0)
+        self.download_control.reset()
 
         # 在后台线程中执行下载
         download_thread = threading.Thread(
             target=self._download_worker,
-            args=(version_type, platform, architecture, download_path),
+            args=(version_type, platform, architecture, download_path, self.current_version_info, install_path),
             daemon=True
         )
         download_thread.start()
 
-    def _download_worker(self, version_type: str, platform: str,
-                        architecture: str, download_path: str):
+    def _download_worker(self, version_type: str, platform: str, architecture: str,
+                        download_path: str, version_info: Dict, install_path: str = ""):
         """下载工作线程"""
         try:
             # 构建下载URL
             download_url = f"{self.server_url}/api/v2/download/simple/{version_type}/{platform}/{architecture}"
+            file_path = Path(download_path) / f"{version_type}_{platform}_{architecture}.zip"
+
+            self.ui.set_var(self.progress_var, "正在下载...")
+
+            # 分段并行下载，已完成的分段保留在 .part 文件中供中断后续传；
+            # 完成后按版本信息中的大小和哈希校验
+            downloader = PackageDownloader(
+                download_url, file_path,
+                expected_size=version_info.get("file_size", 0),
+                expected_hash=version_info.get("file_hash") or version_info.get("sha256", ""),
+                control=self.download_control
+            )
+
+            def on_progress(downloaded: int, total: int):
+                # 进度条更新交给调度器，每个间隔只显示最新进度
+                if total > 0:
+                    self.ui.configure(self.progress_bar, value=(downloaded / total) * 100)
+
+            # 边下载边解压：解压线程读取已连续下载完成的部分；
+            # 解压的文件先放在暂存目录，安装包校验通过后才移入安装目录
+            extractor = None
+            extract_thread = None
+            extract_errors = []
+            if install_path:
+                extractor = PackageExtractor(
+                    install_path,
+                    expected_hashes=self._fetch_expected_hashes(version_type, platform, architecture),
+                    control=self.download_control,
+                    staged=True
+                )
+                reader = downloader.open_reader()
 
-            self.root.after(0, lambda: self.progress_var.set("正在下载..."))
-
-            # 发送下载请求
-            response = requests.get(download_url, stream=True, timeout=600)
-
-            if response.status_code == 200:
-                # 获取文件大小
-                total_size = int(response.headers.get('content-length', 0))
-
-                # 构建文件名
-                filename = f"{version_type}_{platform}_{architecture}.zip"
-                file_path = Path(download_path) / filename
-
-                # 下载文件
-                downloaded = 0
-                with open(file_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
+                def extract():
+                    try:
+                        with reader:
+                            extractor.extract_stream(reader)
+                    except Exception as e:
+                        extract_errors.append(e)
 
-                            if total_size > 0:
-                                progress = (downloaded / total_size) * 100
-                                self.root.after(0, lambda p=progress: self.progress_bar.config(value=p))
+                extract_thread = threading.Thread(target=extract, daemon=True)
+                extract_thread.start()
 
-                self.root.after(0, lambda: self._download_success(str(file_path)))
+            completed = False
+            try:
+                completed = downloader.download(on_progress)
+            finally:
+                # 下载失败或取消时读取会抛出异常，解压线程随之结束
+                if extract_thread:
+                    extract_thread.join()
+                if extractor and not completed:
+                    extractor.discard_staged()
+            if not completed:
+                self.ui.post(lambda: self._download_failed("下载已取消，再次下载时将从中断处继续"))
+                return
+
+            if extractor:
+                try:
+                    if extract_errors and not isinstance(extract_errors[0], StreamingNotSupported):
+                        raise extract_errors[0]
+                    if extract_errors:
+                        # 无法流式解压的安装包：下载完成后按条目并行解压，已解压的文件比较后不再写入
+                        self.ui.set_var(self.progress_var, "正在解压...")
+                        extractor.extract_file(file_path)
+                except BaseException:
+                    extractor.discard_staged()
+                    raise
+                extractor.commit_staged()
+                # 已解压到安装目录，不再保留压缩包
+                file_path.unlink()
+                result = extractor.result
+                self.ui.post(lambda: self._extract_success(install_path, result))
             else:
-                self.root.after(0, lambda: self._download_failed(f"下载失败: {response.status_code}"))
+                self.ui.post(lambda: self._download_success(str(file_path)))
 
         except Exception as e:
-            self.root.after(0, lambda: self._download_failed(str(e)))
+            message = str(e)
+            self.ui.post(lambda: self._download_failed(message))
+
+    def _fetch_expected_hashes(self, version_type: str, platform: str, architecture: str) -> Dict[str, str]:
+        """获取远程清单中各文件的哈希（解压时跳过未变化的文件），失败时返回空字典"""
+        try:
+            with get_instrumentation().phase("manifest", requests=1):
+                response = requests.get(
+                    f"{self.server_url}/api/v2/files/simple/{version_type}",
+                    params={"platform": platform, "architecture": architecture},
+                    timeout=30
+                )
+            if response.status_code != 200:
+                return {}
+            return {item["relative_path"]: item["file_hash"] for item in response.json().get("files", [])}
+        except Exception:
+            return {}
 
     def _download_success(self, file_path: str):
         """下载成功回调"""
@@ -404,6 +505,15 @@ class SimplifiedDownloadTool:
         self.download_button.config(state="normal")
         messagebox.showinfo("成功", f"下载完成！\n文件保存到: {file_path}")
 
+    def _extract_success(self, install_path: str, result: ExtractResult):
+        """下载并解压成功回调"""
+        summary = f"写入 {result.files_written} 个文件，{result.files_unchanged} 个文件未变化"
+        self.progress_var.set("下载并解压完成！")
+        self.status_var.set(f"已解压到: {install_path}（{summary}）")
+        self.is_downloading = False
+        self.download_button.config(state="normal")
+        messagebox.showinfo("成功", f"下载并解压完成！\n安装目录: {install_path}\n{summary}")
+
     def _download_failed(self, error_msg: str):
         """下载失败回调"""
         self.progress_var.set("下载失败")
@@ -416,13 +526,64 @@ class SimplifiedDownloadTool:
     def cancel_download(self):
         """取消下载"""
         if self.is_downloading:
-            # 这里可以添加取消下载的逻辑
-            pass
+            # 已下载的分段保留，下次下载同一版本时续传
+            self.download_control.cancel()
         self.root.quit()
 
 
+def run_streaming_update(install_path: str, version_type: str, platform: str, architecture: str) -> bool:
+    """
+    增量更新安装目录：边检查本地文件边下载有差异的文件，完成后删除本地多余文件
+
+    Args:
+        install_path: 本地安装目录
+        version_type: 版本类型
+        platform: 平台
+        architecture: 架构
+
+    Returns:
+        是否更新完成
+    """
+    handler = DownloadHandler(LogManager())
+    # 命令行更新明确要求与目标版本一致，删除本地多余文件
+    if not handler.start_streaming_update(install_path, version_type, platform, architecture, delete_extra=True):
+        return False
+    try:
+        completed = handler.wait_streaming_update()
+    except KeyboardInterrupt:
+        handler.streaming_updater.cancel()
+        raise
+
+    manager = handler.download_controller.get_download_manager()
+    if manager is not None:
+        print(f"下载 {manager.files_completed - manager.files_skipped - manager.files_reused} 个文件，"
+              f"本地存储取出 {manager.files_reused} 个，已是最新 {manager.files_skipped} 个，"
+              f"失败 {manager.files_failed} 个，删除 {manager.files_deleted} 个")
+    return completed
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='Omega 下载工具')
+    parser.add_argument('--update', metavar='DIR', help='增量更新该安装目录（不打开界面）')
+    parser.add_argument('--version-type', choices=['stable', 'beta', 'alpha'], default='stable',
+                        help='版本类型（--update 时使用）')
+    parser.add_argument('--platform', default='windows', help='平台（--update 时使用）')
+    parser.add_argument('--architecture', default='x64', help='架构（--update 时使用）')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    profiler = profiler_from_args(args)
+
+    if args.update:
+        try:
+            completed = run_streaming_update(args.update, args.version_type, args.platform, args.architecture)
+        finally:
+            if profiler:
+                print(profiler.stop())
+                print(f"✓ 性能分析结果已写入: {profiler.prof_path}, {profiler.summary_path}")
+        print("✓ 更新完成" if completed else "❌ 更新未完成")
+        sys.exit(0 if completed else 1)
+
     root = tk.Tk()
 
     # 设置主题
@@ -433,7 +594,12 @@ def main():
         pass  # 如果主题文件不存在，使用默认主题
 
     app = SimplifiedDownloadTool(root)
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        if profiler:
+            print(profiler.stop())
+            print(f"✓ 性能分析结果已写入: {profiler.prof_path}, {profiler.summary_path}")
 
 
 if __name__ == "__main__":
@@ -8,11 +8,27 @@ import os
 import hashlib
 import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Callable
+from typing import Dict, Iterator, List, Optional, Callable
 from dataclasses import dataclass
 from datetime import datetime
 import time
 
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.file_fingerprint import hash_with_fingerprint
+from tools.common.hash_cache import HashCache
+from tools.common.instrumentation import get_instrumentation
+from tools.common.manifest_summary import RemoteManifestSummary
+from tools.common.parallel_scan import SCAN_MODES, scan_tree
+
+# 扫描时默认排除的文件和目录
+DEFAULT_EXCLUDE_PATTERNS = [
+    '*.tmp', '*.temp', '*.log', '*.bak',
+    '.git', '.svn', '__pycache__', '*.pyc',
+    'Thumbs.db', '.DS_Store'
+]
+
 
 @dataclass
 class FileInfo:
@@ -38,14 +54,23 @@ class FileInfo:
 class LocalFileScanner:
     """本地文件扫描器"""
 
-    def __init__(self, progress_callback: Optional[Callable] = None):
+    def __init__(self, progress_callback: Optional[Callable] = None, use_hash_cache: bool = True,
+                 scan_mode: str = "serial", workers: Optional[int] = None):
         """
         初始化扫描器
 
         Args:
             progress_callback: 进度回调函数，接收 (current, total, current_file) 参数
+            use_hash_cache: 是否复用本地哈希缓存
+            scan_mode: 扫描模式（serial / thread / process），并行模式按分区报告进度
+            workers: 并行度，默认CPU核数
         """
+        if scan_mode not in SCAN_MODES:
+            raise ValueError(f"不支持的扫描模式: {scan_mode}")
         self.progress_callback = progress_callback
+        self.use_hash_cache = use_hash_cache
+        self.scan_mode = scan_mode
+        self.workers = workers
         self.is_cancelled = False
         self._lock = threading.Lock()
 
@@ -86,13 +111,17 @@ class LocalFileScanner:
             print(f"计算文件哈希失败 {file_path}: {e}")
             return ""
 
-    def get_file_info(self, file_path: Path, base_path: Path) -> Optional[FileInfo]:
+    def get_file_info(self, file_path: Path, base_path: Path,
+                      remote_summary: Optional[RemoteManifestSummary] = None,
+                      hash_cache: Optional[HashCache] = None) -> Optional[FileInfo]:
         """
         获取单个文件的信息
 
         Args:
             file_path: 文件绝对路径
             base_path: 基础路径（用于计算相对路径）
+            remote_summary: 远程清单摘要，肯定与远程不同的文件不计算哈希（sha256_hash 为空）
+            hash_cache: 哈希缓存。修改时间变化的文件总是重新计算完整哈希
 
         Returns:
             文件信息对象
@@ -114,11 +143,35 @@ class LocalFileScanner:
             file_size = stat.st_size
             last_modified = datetime.fromtimestamp(stat.st_mtime)
 
-            # 计算哈希值
-            sha256_hash = self.calculate_file_hash(file_path)
-
-            if not sha256_hash:  # 哈希计算失败或被取消
-                return None
+            # 依次尝试：缓存命中 -> 预检判定肯定变化（推迟哈希） -> 计算哈希
+            metrics = get_instrumentation()
+            sha256_hash = None
+            if hash_cache is not None:
+                sha256_hash = hash_cache.lookup(relative_path, file_size, stat.st_mtime_ns)
+                if sha256_hash:
+                    metrics.increment("hash_cache_hits")
+
+            if not sha256_hash:
+                if remote_summary is not None and self._certainly_changed(
+                        relative_path, file_size, file_path, remote_summary, hash_cache):
+                    sha256_hash = ""
+                else:
+                    fingerprint = ""
+                    with metrics.phase("hash", files=1, bytes=file_size):
+                        if hash_cache is not None:
+                            # 同一遍读取中计算写入缓存的指纹
+                            sha256_hash, fingerprint = hash_with_fingerprint(
+                                file_path, file_size, should_cancel=lambda: self.is_cancelled)
+                        else:
+                            sha256_hash = self.calculate_file_hash(file_path)
+                    if hash_cache is not None:
+                        metrics.increment("hash_cache_misses")
+
+                    if not sha256_hash:  # 哈希计算失败或被取消
+                        return None
+
+                    if hash_cache is not None:
+                        hash_cache.store(relative_path, file_size, stat.st_mtime_ns, sha256_hash, fingerprint)
 
             return FileInfo(
                 relative_path=relative_path,
@@ -133,13 +186,28 @@ class LocalFileScanner:
             print(f"获取文件信息失败 {file_path}: {e}")
             return None
 
-    def scan_directory(self, directory_path: str, exclude_patterns: Optional[List[str]] = None) -> Dict[str, FileInfo]:
+    @staticmethod
+    def _certainly_changed(relative_path: str, file_size: int, file_path: Path,
+                           remote_summary: RemoteManifestSummary, hash_cache: Optional[HashCache]) -> bool:
+        """
+        不计算完整哈希就能判定文件与远程不同：远程不存在或大小不同，
+        或远程仍是缓存中的版本而快速指纹已与缓存不同（指纹一致时不能据此判定未变化）
+        """
+        if remote_summary.is_certainly_changed(relative_path, file_size):
+            return True
+        cached = hash_cache.get(relative_path) if hash_cache is not None else None
+        return bool(cached) and remote_summary.has_digest(relative_path, cached[2]) and \
+            hash_cache.fingerprint_changed(relative_path, file_size, file_path)
+
+    def scan_directory(self, directory_path: str, exclude_patterns: Optional[List[str]] = None,
+                       remote_summary: Optional[RemoteManifestSummary] = None) -> Dict[str, FileInfo]:
         """
         扫描目录并返回所有文件信息
 
         Args:
             directory_path: 要扫描的目录路径
             exclude_patterns: 排除的文件模式列表
+            remote_summary: 远程清单摘要，提供时只对可能未变化的文件计算哈希
 
         Returns:
             文件信息字典，键为相对路径，值为FileInfo对象
@@ -154,30 +222,32 @@ class LocalFileScanner:
 
         # 默认排除模式
         if exclude_patterns is None:
-            exclude_patterns = [
-                '*.tmp', '*.temp', '*.log', '*.bak',
-                '.git', '.svn', '__pycache__', '*.pyc',
-                'Thumbs.db', '.DS_Store'
-            ]
+            exclude_patterns = DEFAULT_EXCLUDE_PATTERNS
+
+        if self.scan_mode != "serial":
+            return self._scan_directory_parallel(base_path, exclude_patterns, remote_summary)
 
         # 收集所有文件
         all_files = []
-        for root, dirs, files in os.walk(base_path):
-            # 检查是否被取消
-            with self._lock:
-                if self.is_cancelled:
-                    return {}
-
-            # 过滤目录
-            dirs[:] = [d for d in dirs if not self._should_exclude(d, exclude_patterns)]
-
-            for file in files:
-                if not self._should_exclude(file, exclude_patterns):
-                    file_path = Path(root) / file
-                    all_files.append(file_path)
+        with get_instrumentation().phase("walk") as timer:
+            for root, dirs, files in os.walk(base_path):
+                # 检查是否被取消
+                with self._lock:
+                    if self.is_cancelled:
+                        return {}
+
+                # 过滤目录
+                dirs[:] = [d for d in dirs if not self._should_exclude(d, exclude_patterns)]
+
+                for file in files:
+                    if not self._should_exclude(file, exclude_patterns):
+                        file_path = Path(root) / file
+                        all_files.append(file_path)
+            timer.add(files=len(all_files))
 
         total_files = len(all_files)
         file_info_dict = {}
+        hash_cache = HashCache(directory_path) if self.use_hash_cache else None
 
         # 处理每个文件
         for i, file_path in enumerate(all_files):
@@ -191,10 +261,75 @@ class LocalFileScanner:
                 self.progress_callback(i + 1, total_files, str(file_path.relative_to(base_path)))
 
             # 获取文件信息
-            file_info = self.get_file_info(file_path, base_path)
+            file_info = self.get_file_info(file_path, base_path, remote_summary, hash_cache)
             if file_info:
                 file_info_dict[file_info.relative_path] = file_info
 
+        if hash_cache is not None:
+            hash_cache.prune(file_info_dict.keys())
+            hash_cache.save()
+
+        return file_info_dict
+
+    def iter_relative_paths(self, directory_path: str,
+                            exclude_patterns: Optional[List[str]] = None) -> Iterator[str]:
+        """
+        只遍历目录（不计算哈希），产出文件相对路径
+
+        Args:
+            directory_path: 目录路径
+            exclude_patterns: 排除的文件模式列表，默认 DEFAULT_EXCLUDE_PATTERNS
+        """
+        if exclude_patterns is None:
+            exclude_patterns = DEFAULT_EXCLUDE_PATTERNS
+
+        base_path = Path(directory_path)
+        for root, dirs, files in os.walk(base_path):
+            with self._lock:
+                if self.is_cancelled:
+                    return
+            dirs[:] = [d for d in dirs if not self._should_exclude(d, exclude_patterns)]
+            for file in files:
+                if not self._should_exclude(file, exclude_patterns):
+                    yield str((Path(root) / file).relative_to(base_path)).replace('\\', '/')
+
+    def _scan_directory_parallel(self, base_path: Path, exclude_patterns: List[str],
+                                 remote_summary: Optional[RemoteManifestSummary]) -> Dict[str, FileInfo]:
+        """按分区并行扫描目录"""
+        hash_cache = HashCache(str(base_path)) if self.use_hash_cache else None
+
+        def on_partition_done(done: int, total: int):
+            if self.progress_callback:
+                self.progress_callback(done, total, f"分区 {done}/{total}")
+
+        def should_cancel() -> bool:
+            with self._lock:
+                return self.is_cancelled
+
+        result = scan_tree(str(base_path), self.scan_mode, self.workers, hash_cache, remote_summary,
+                           exclude_patterns, on_partition_done, should_cancel)
+        if should_cancel():
+            return {}
+
+        for message in result.skipped:
+            print(f"获取文件信息失败 {message}")
+
+        file_info_dict = {}
+        for relative_path, file_size, mtime_ns, sha256_hash, _, _ in result.records:
+            file_path = base_path / relative_path
+            file_info_dict[relative_path] = FileInfo(
+                relative_path=relative_path,
+                absolute_path=str(file_path),
+                file_name=file_path.name,
+                file_size=file_size,
+                sha256_hash=sha256_hash,
+                last_modified=datetime.fromtimestamp(mtime_ns / 1e9)
+            )
+
+        if hash_cache is not None:
+            hash_cache.prune(file_info_dict.keys())
+            hash_cache.save()
+
         return file_info_dict
 
     def _should_exclude(self, name: str, exclude_patterns: List[str]) -> bool:
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+完整安装包下载
+把一个大文件分成固定大小的分段，用多个连接并行发送 Range 请求:
+    - 数据先写入同目录的 <文件名>.part（预先分配到完整大小，各连接按偏移写入）
+    - 已完成的分段记录在 <文件名>.part.json，中断后再次下载只请求未完成的分段
+    - 分段内中途断开时从断开处继续请求，重试次数用完才算失败
+    - 全部完成后按版本信息中的大小和 SHA-256 校验，通过后替换为正式文件
+
+服务器不支持 Range 时退化为单连接顺序下载（无法续传）。
+从开头起连续完成的部分可以边下载边读取（见 open_reader），用于计算哈希和流式解压。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+
+import requests
+
+import sys
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from tools.common.common_utils import get_config
+from tools.common.instrumentation import get_instrumentation
+from tools.common.rate_limiter import TransferThrottle, get_rate_limiter
+from tools.common.transfer_control import TransferControl
+
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+
+DEFAULT_CONNECTIONS = 4
+DEFAULT_SEGMENT_MB = 8
+DEFAULT_RETRIES = 3
+CHUNK_SIZE = 256 * 1024
+
+_CONTENT_RANGE = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+
+class PackageDownloadError(Exception):
+    """安装包下载或校验失败"""
+
+
+class PackageDownloader:
+    """分段并行、可续传的单文件下载"""
+
+    def __init__(self, url: str, dest_path: Path, expected_size: int = 0, expected_hash: str = "",
+                 session: Optional[requests.Session] = None, control: Optional[TransferControl] = None,
+                 connections: Optional[int] = None, segment_size: Optional[int] = None,
+                 timeout: int = 30):
+        """
+        初始化下载
+
+        Args:
+            url: 下载地址
+            dest_path: 保存路径
+            expected_size: 版本信息中的文件大小，0表示未知（以服务器返回为准）
+            expected_hash: 版本信息中的SHA256，为空时只校验大小
+            session: 网络会话，默认新建
+            control: 暂停/取消控制
+            connections: 并行连接数，默认按配置 download.package_connections
+            segment_size: 分段大小（字节），默认按配置 download.package_segment_mb
+            timeout: 单个请求的超时（秒）
+        """
+        download_config = get_config().get("download", {})
+        self.url = url
+        self.dest_path = Path(dest_path)
+        self.part_path = self.dest_path.with_name(self.dest_path.name + PART_SUFFIX)
+        self.state_path = self.dest_path.with_name(self.dest_path.name + STATE_SUFFIX)
+        self.expected_size = expected_size
+        self.expected_hash = (expected_hash or "").lower()
+        self.session = session or requests.Session()
+        self.control = control or TransferControl()
+        self.connections = max(1, connections or download_config.get("package_connections", DEFAULT_CONNECTIONS))
+        self.segment_size = segment_size or \
+            int(download_config.get("package_segment_mb", DEFAULT_SEGMENT_MB) * 1024 * 1024)
+        self.timeout = timeout
+        self.retries = DEFAULT_RETRIES
+
+        self.total_size = 0
+        self.resumed_bytes = 0
+        self._downloaded = 0
+        self._done: Set[int] = set()
+        self._contiguous = 0  # 从开头起连续完成的字节数
+        self._complete = False  # 全部数据已写入
+        self._finished = False  # download() 已返回或即将返回
+        self._readers = 0
+        self._error: Optional[str] = None
+        self._condition = threading.Condition()
+        self._throttle: Optional[TransferThrottle] = None
+        self._progress_callback: Optional[Callable[[int, int], None]] = None
+
+    @property
+    def downloaded(self) -> int:
+        """已写入（含上次续传前已完成）的字节数"""
+        return self._downloaded
+
+    def download(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> bool:
+        """
+        下载文件（阻塞直到完成、失败或取消）
+
+        提供了期望的SHA256时，调用线程在下载进行中就按顺序计算已连续完成部分的哈希，
+        下载结束后不必再完整读取一遍文件。
+
+        Args:
+            progress_callback: 进度回调 (已下载字节数, 总字节数)，在下载线程中调用
+
+        Returns:
+            是否完成（被取消时返回False，已完成的分段保留供下次续传）
+
+        Raises:
+            PackageDownloadError: 请求失败或校验不通过
+        """
+        self._progress_callback = progress_callback
+        self._throttle = get_rate_limiter().open_transfer()
+        self.dest_path.parent.mkdir(parents=True, exist_ok=True)
+        workers: List[threading.Thread] = []
+        try:
+            probe = self._request(0, 0)
+            if probe.status_code in (206, 416):
+                # 416：空文件
+                probe.close()
+                self.total_size = self._parse_total(probe) if probe.status_code == 206 else 0
+                workers = self._start_segments()
+            elif probe.status_code == 200:
+                self.total_size = int(probe.headers.get("content-length", 0)) or self.expected_size
+                workers = [threading.Thread(target=self._download_single, args=(probe,), daemon=True)]
+                workers[0].start()
+            else:
+                probe.close()
+                raise PackageDownloadError(f"下载失败: HTTP {probe.status_code}")
+
+            digest = self._hash_while_downloading() if self.expected_hash else None
+            for thread in workers:
+                thread.join()
+
+            if self.control.is_cancelled:
+                return False
+            if self._error:
+                raise PackageDownloadError(self._error)
+            self._verify(digest)
+        except requests.RequestException as e:
+            self._fail(str(e))
+            raise PackageDownloadError(f"下载失败: {e}") from e
+        except PackageDownloadError as e:
+            self._fail(str(e))
+            raise
+        finally:
+            for thread in workers:
+                thread.join()
+            with self._condition:
+                self._finished = True
+                self._condition.notify_all()
+
+        # 读取器打开着临时文件时（Windows 上）无法替换，等待读取器关闭
+        with self._condition:
+            self._condition.wait_for(lambda: self._readers == 0)
+        os.replace(self.part_path, self.dest_path)
+        self._remove_state()
+        return True
+
+    def open_reader(self) -> "PackageReader":
+        """
+        打开从头顺序读取的读取器，读取到尚未下载的位置时等待
+
+        读取器关闭之前下载不会完成（临时文件不会被替换为正式文件），用完必须关闭。
+        """
+        with self._condition:
+            self._readers += 1
+        return PackageReader(self)
+
+    def _hash_while_downloading(self) -> Optional[str]:
+        """按顺序计算已连续完成部分的SHA256，下载失败或取消时返回None"""
+        sha256 = hashlib.sha256()
+        try:
+            with self.open_reader() as reader:
+                for block in iter(lambda: reader.read(1024 * 1024), b""):
+                    sha256.update(block)
+        except (PackageDownloadError, OSError):
+            return None
+        return sha256.hexdigest()
+
+    # ------------------------------------------------------------------
+    # 分段下载
+
+    def _start_segments(self) -> List[threading.Thread]:
+        """读取续传状态，为未完成的分段启动下载线程"""
+        if self.expected_size and self.total_size != self.expected_size:
+            raise PackageDownloadError(
+                f"服务器文件大小({self.total_size})与版本信息({self.expected_size})不一致")
+
+        segment_count = (self.total_size + self.segment_size - 1) // self.segment_size
+        self._load_state(segment_count)
+        pending = [index for index in range(segment_count) if index not in self._done]
+        self.resumed_bytes = sum(self._segment_length(index) for index in self._done)
+        self._downloaded = self.resumed_bytes
+        with self._condition:
+            self._advance_contiguous()
+            self._complete = not pending
+        self._report_progress()
+
+        segments = iter(pending)
+        segments_lock = threading.Lock()
+
+        metrics = get_instrumentation()
+
+        def worker():
+            try:
+                with open(self.part_path, "r+b") as f:
+                    while self._should_continue():
+                        with segments_lock:
+                            index = next(segments, None)
+                        if index is None:
+                            return
+                        try:
+                            with metrics.phase("download", bytes=self._segment_length(index), requests=1):
+                                finished = self._fetch_segment(f, index)
+                            if not finished:
+                                return
+                        except (requests.RequestException, PackageDownloadError, OSError) as e:
+                            self._fail(f"分段 {index} 下载失败: {e}")
+                            return
+                        f.flush()
+                        self._segment_done(index, segment_count)
+            finally:
+                # 被取消时唤醒等待中的读取器
+                with self._condition:
+                    self._condition.notify_all()
+
+        workers = [threading.Thread(target=worker, daemon=True)
+                   for _ in range(min(self.connections, len(pending)))]
+        for thread in workers:
+            thread.start()
+        return workers
+
+    def _fetch_segment(self, f, index: int) -> bool:
+        """下载一个分段，连接中断时从断开处继续请求；返回是否完成（被取消时返回False）"""
+        start = index * self.segment_size
+        end = start + self._segment_length(index) - 1
+        position = start
+        attempts = 0
+        while position <= end:
+            try:
+                response = self._request(position, end)
+                if response.status_code != 206:
+                    response.close()
+                    raise PackageDownloadError(f"服务器未按范围返回数据: HTTP {response.status_code}")
+                f.seek(position)
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    if not self._should_continue() or not self._throttle.throttle(len(chunk), self.control):
+                        response.close()
+                        return False
+                    chunk = chunk[:end + 1 - position]
+                    f.write(chunk)
+                    position += len(chunk)
+                    self._add_downloaded(len(chunk))
+                    if position > end:
+                        break
+                response.close()
+                if position <= end:
+                    raise PackageDownloadError("连接提前结束")
+            except (requests.RequestException, PackageDownloadError):
+                attempts += 1
+                if attempts > self.retries or not self.control.sleep(min(2 ** attempts, 10)):
+                    raise
+                get_instrumentation().count("download", requests=1, retries=1)
+        return True
+
+    def _download_single(self, response):
+        """服务器不支持 Range：单连接顺序下载（无法续传，在下载线程中运行）"""
+        self._remove_state()
+        try:
+            with get_instrumentation().phase("download", requests=1) as timer, open(self.part_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    if not self.control.checkpoint() or not self._throttle.throttle(len(chunk), self.control):
+                        return
+                    f.write(chunk)
+                    f.flush()
+                    self._add_downloaded(len(chunk))
+                    timer.add(bytes=len(chunk))
+                    with self._condition:
+                        self._contiguous += len(chunk)
+                        self._condition.notify_all()
+            with self._condition:
+                if self.total_size == 0:
+                    self.total_size = self._downloaded
+                self._complete = True
+        except (requests.RequestException, OSError) as e:
+            self._fail(f"下载失败: {e}")
+        finally:
+            response.close()
+            with self._condition:
+                self._condition.notify_all()
+
+    def _request(self, start: int, end: int):
+        return self.session.get(self.url, headers={"Range": f"bytes={start}-{end}"},
+                                stream=True, timeout=self.timeout)
+
+    def _parse_total(self, response) -> int:
+        match = _CONTENT_RANGE.match(response.headers.get("content-range", ""))
+        if not match:
+            raise PackageDownloadError("服务器返回的 Content-Range 无效")
+        return int(match.group(1))
+
+    def _segment_length(self, index: int) -> int:
+        start = index * self.segment_size
+        return min(self.segment_size, self.total_size - start)
+
+    def _segment_done(self, index: int, segment_count: int):
+        with self._condition:
+            self._done.add(index)
+            self._advance_contiguous()
+            self._complete = len(self._done) == segment_count
+            self._save_state()
+            self._condition.notify_all()
+
+    def _advance_contiguous(self):
+        """推进连续完成的前缀（调用方持有锁）"""
+        while self._contiguous < self.total_size and self._contiguous // self.segment_size in self._done:
+            self._contiguous += self._segment_length(self._contiguous // self.segment_size)
+
+    def _add_downloaded(self, amount: int):
+        with self._condition:
+            self._downloaded += amount
+        self._report_progress()
+
+    def _report_progress(self):
+        if self._progress_callback:
+            self._progress_callback(self._downloaded, self.total_size)
+
+    def _should_continue(self) -> bool:
+        return self._error is None and self.control.checkpoint()
+
+    def _fail(self, message: str):
+        with self._condition:
+            if self._error is None:
+                self._error = message
+            self._condition.notify_all()
+
+    # ------------------------------------------------------------------
+    # 续传状态
+
+    def _load_state(self, segment_count: int):
+        """读取续传状态；与本次下载不符或临时文件缺失时重新开始"""
+        state = None
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        valid = (
+            isinstance(state, dict)
+            and state.get("url") == self.url
+            and state.get("total_size") == self.total_size
+            and state.get("segment_size") == self.segment_size
+            and state.get("expected_hash", "") == self.expected_hash
+            and self.part_path.exists()
+            and self.part_path.stat().st_size == self.total_size
+        )
+        if valid:
+            self._done = {index for index in state.get("done", []) if 0 <= index < segment_count}
+            return
+
+        self._done = set()
+        with open(self.part_path, "wb") as f:
+            f.truncate(self.total_size)
+        self._save_state()
+
+    def _save_state(self):
+        """原子写入续传状态"""
+        state = {
+            "url": self.url,
+            "total_size": self.total_size,
+            "segment_size": self.segment_size,
+            "expected_hash": self.expected_hash,
+            "done": sorted(self._done),
+        }
+        temp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp, self.state_path)
+
+    def _remove_state(self):
+        try:
+            self.state_path.unlink()
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------
+    # 校验
+
+    def _verify(self, digest: Optional[str]):
+        """校验大小和SHA256（digest 为下载过程中计算的哈希）；不通过时删除临时文件和续传状态"""
+        size = self.part_path.stat().st_size
+        problem = None
+        if self.expected_size and size != self.expected_size:
+            problem = f"文件大小不一致: {size} != {self.expected_size}"
+        elif self.expected_hash:
+            if digest is None:
+                sha256 = hashlib.sha256()
+                with open(self.part_path, "rb") as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        sha256.update(block)
+                digest = sha256.hexdigest()
+            if digest != self.expected_hash:
+                problem = "文件完整性验证失败（SHA256不一致）"
+        if problem:
+            self.part_path.unlink()
+            self._remove_state()
+            raise PackageDownloadError(problem)
+
+
+class PackageReader:
+    """顺序读取下载中的文件：读取到尚未完成的位置时等待，下载失败或取消时抛出异常"""
+
+    def __init__(self, downloader: PackageDownloader):
+        self._downloader = downloader
+        self._file = None
+        self._position = 0
+        self._closed = False
+
+    def read(self, size: int = -1) -> bytes:
+        downloader = self._downloader
+        with downloader._condition:
+            downloader._condition.wait_for(
+                lambda: self._available() > 0 or downloader._complete or downloader._finished
+                or downloader._error is not None or downloader.control.is_cancelled
+            )
+            available = self._available()
+            if available <= 0:
+                if downloader._error is not None:
+                    raise PackageDownloadError(downloader._error)
+                if not downloader._complete:
+                    raise PackageDownloadError("下载已取消")
+                return b""
+        if self._file is None:
+            self._file = open(downloader.part_path, "rb")
+        length = available if size is None or size < 0 else min(size, available)
+        self._file.seek(self._position)
+        data = self._file.read(length)
+        self._position += len(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._file:
+            self._file.close()
+            self._file = None
+        with self._downloader._condition:
+            self._downloader._readers -= 1
+            self._downloader._condition.notify_all()
+
+    def _available(self) -> int:
+        return self._downloader._contiguous - self._position
+
+    def __enter__(self) -> "PackageReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
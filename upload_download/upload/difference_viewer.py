@@ -2,20 +2,197 @@
 """
 差异查看器
 显示文件差异报告的GUI组件
+
+文件列表是虚拟化的：Treeview 中只有可见窗口那么多行，滚动时只改写这些行的内容，
+大小在显示时才格式化，因此几十万个文件的报告也能立即打开。
 """
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 from pathlib import Path
 
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from tools.upload.incremental_uploader import DifferenceReport, ChangeType, FileInfo
+from tools.upload.incremental_uploader import DifferenceReport, ChangeType, FileDifference, FileInfo
 from tools.common.common_utils import FileUtils
 
 
+STATUS_TEXT = {
+    ChangeType.NEW: "新增",
+    ChangeType.MODIFIED: "修改",
+    ChangeType.DELETED: "删除",
+    ChangeType.SAME: "相同"
+}
+
+
+def _file_size(file_diff: FileDifference) -> int:
+    file_info = file_diff.local_info or file_diff.remote_info
+    return file_info.file_size if file_info else 0
+
+
+class VirtualFileList(ttk.Frame):
+    """
+    虚拟化文件列表
+
+    Treeview 只保留可见的行，滚动、搜索和排序都只改变当前视图的起始位置和顺序，
+    然后重写可见行。支持按路径搜索（输入停顿后过滤，在上次结果上继续缩小）和按大小排序。
+    """
+
+    DEFAULT_ROW_HEIGHT = 20
+    # 输入停顿多久后开始过滤（毫秒）
+    FILTER_DELAY_MS = 150
+
+    def __init__(self, parent, file_list: List[FileDifference]):
+        super().__init__(parent)
+        self._all = file_list
+        self._view = file_list      # 过滤、排序后的当前视图
+        self._query = ""
+        self._matched = file_list   # 当前搜索条件匹配的文件（未排序）
+        self._sort_desc: Optional[bool] = None  # None 按原顺序，True/False 按大小降序/升序
+        self._offset = 0
+        self._filter_job = None
+
+        style = ttk.Style(self)
+        self._row_height = int(style.lookup("Treeview", "rowheight") or self.DEFAULT_ROW_HEIGHT)
+
+        # 搜索栏
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(toolbar, text="搜索路径:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        ttk.Entry(toolbar, textvariable=self.search_var, width=40).pack(side=tk.LEFT, padx=(5, 10))
+        self.count_var = tk.StringVar()
+        ttk.Label(toolbar, textvariable=self.count_var, foreground="gray").pack(side=tk.LEFT)
+        self.search_var.trace_add("write", lambda *args: self._schedule_filter())
+        self.count_var.set(f"共 {len(file_list)} 个文件")
+
+        # 列表
+        columns = ("文件路径", "大小", "状态")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=15, selectmode="browse")
+        self.tree.heading("文件路径", text="文件路径", anchor=tk.W)
+        self.tree.column("文件路径", width=400, anchor=tk.W)
+        self.tree.heading("大小", text="大小 ↕", anchor=tk.E, command=self.toggle_size_sort)
+        self.tree.column("大小", width=100, anchor=tk.E)
+        self.tree.heading("状态", text="状态", anchor=tk.CENTER)
+        self.tree.column("状态", width=100, anchor=tk.CENTER)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<Configure>", lambda event: self._render())
+        self.tree.bind("<MouseWheel>", self._on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self._visible_rows()))
+        self.tree.bind("<Next>", lambda event: self.scroll(self._visible_rows()))
+        self.tree.bind("<Home>", lambda event: self.scroll_to(0))
+        self.tree.bind("<End>", lambda event: self.scroll_to(len(self._view)))
+
+        self._render()
+
+    def scroll(self, rows: int):
+        """滚动若干行"""
+        self.scroll_to(self._offset + rows)
+
+    def scroll_to(self, offset: int):
+        """把第 offset 个文件滚动到第一行"""
+        max_offset = max(0, len(self._view) - self._visible_rows())
+        offset = max(0, min(offset, max_offset))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def toggle_size_sort(self):
+        """按大小排序：降序 -> 升序 -> 原顺序"""
+        self._sort_desc = {None: True, True: False, False: None}[self._sort_desc]
+        arrow = {None: "↕", True: "↓", False: "↑"}[self._sort_desc]
+        self.tree.heading("大小", text=f"大小 {arrow}")
+        self._update_view()
+
+    def _visible_rows(self) -> int:
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # 尚未布局，按配置的行数
+            return int(self.tree.cget("height"))
+        # 减去表头占用的一行
+        return max(1, height // self._row_height - 1)
+
+    def _render(self):
+        """重写可见行（行数随窗口大小增减）"""
+        rows = self._visible_rows()
+        items = self.tree.get_children()
+        for item in items[rows:]:
+            self.tree.delete(item)
+        items = list(items[:rows])
+        while len(items) < rows:
+            items.append(self.tree.insert("", tk.END, values=("", "", "")))
+
+        for i, item in enumerate(items):
+            index = self._offset + i
+            if index < len(self._view):
+                file_diff = self._view[index]
+                values = (file_diff.relative_path,
+                          FileUtils.format_file_size(_file_size(file_diff)),
+                          STATUS_TEXT.get(file_diff.change_type, "未知"))
+            else:
+                values = ("", "", "")
+            self.tree.item(item, values=values)
+
+        total = len(self._view)
+        if total:
+            self.scrollbar.set(self._offset / total, min(1.0, (self._offset + rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _on_scrollbar(self, action: str, amount: str, unit: Optional[str] = None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self._view)))
+        elif unit == "pages":
+            self.scroll(int(amount) * self._visible_rows())
+        else:
+            self.scroll(int(amount))
+
+    def _on_mouse_wheel(self, event):
+        # Windows 每格 120，macOS 为较小的增量
+        delta = event.delta // 120 * 3 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-delta)
+
+    def _schedule_filter(self):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(self.FILTER_DELAY_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        query = self.search_var.get().strip().lower()
+        if query == self._query:
+            return
+        if not query:
+            self._matched = self._all
+        else:
+            # 新条件包含上次的条件时只需在上次结果中继续过滤
+            base = self._matched if self._query and query.startswith(self._query) else self._all
+            self._matched = [file_diff for file_diff in base if query in file_diff.relative_path.lower()]
+        self._query = query
+        self._update_view()
+
+    def _update_view(self):
+        if self._sort_desc is None:
+            self._view = self._matched
+        else:
+            self._view = sorted(self._matched, key=_file_size, reverse=self._sort_desc)
+        if self._query:
+            self.count_var.set(f"匹配 {len(self._view)} / {len(self._all)} 个文件")
+        else:
+            self.count_var.set(f"共 {len(self._all)} 个文件")
+        self._offset = 0
+        self._render()
+
+
 class DifferenceViewerWindow:
     """差异查看器窗口"""
     
@@ -145,64 +322,37 @@ class DifferenceViewerWindow:
             deleted_tab = self.create_file_list_tab(notebook, self.report.deleted_files, "删除文件", "red")
             notebook.add(deleted_tab, text=f"🗑️ 删除 ({len(self.report.deleted_files)})")
         
-        # 相同文件标签页（可选显示）
+        # 相同文件标签页（只显示摘要，需要时再展开列表）
         if self.report.same_files:
-            same_tab = self.create_file_list_tab(notebook, self.report.same_files, "相同文件", "gray")
+            same_tab = self.create_summary_tab(notebook, self.report.same_files)
             notebook.add(same_tab, text=f"✅ 相同 ({len(self.report.same_files)})")
     
     def create_file_list_tab(self, parent, file_list, title, color):
-        """创建文件列表标签页"""
+        """创建文件列表标签页（虚拟化列表）"""
         tab_frame = ttk.Frame(parent)
+        VirtualFileList(tab_frame, file_list).pack(fill=tk.BOTH, expand=True)
+        return tab_frame
+    
+    def create_summary_tab(self, parent, file_list):
+        """创建只显示摘要的标签页，点击按钮后才显示文件列表"""
+        tab_frame = ttk.Frame(parent)
+        summary_frame = ttk.Frame(tab_frame, padding="20")
+        summary_frame.pack(fill=tk.BOTH, expand=True)
         
-        # 创建树形视图
-        columns = ("文件路径", "大小", "状态")
-        tree = ttk.Treeview(tab_frame, columns=columns, show="tree headings", height=15)
-        
-        # 配置列
-        tree.heading("#0", text="", anchor=tk.W)
-        tree.column("#0", width=0, stretch=False)
-        
-        tree.heading("文件路径", text="文件路径", anchor=tk.W)
-        tree.column("文件路径", width=400, anchor=tk.W)
-        
-        tree.heading("大小", text="大小", anchor=tk.E)
-        tree.column("大小", width=100, anchor=tk.E)
-        
-        tree.heading("状态", text="状态", anchor=tk.CENTER)
-        tree.column("状态", width=100, anchor=tk.CENTER)
-        
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(tab_frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        
-        # 填充数据
-        for file_diff in file_list:
-            file_info = file_diff.local_info or file_diff.remote_info
-            if file_info:
-                size_str = FileUtils.format_file_size(file_info.file_size)
-                status = self.get_status_text(file_diff.change_type)
-                
-                tree.insert("", tk.END, values=(
-                    file_diff.relative_path,
-                    size_str,
-                    status
-                ))
+        total_size = FileUtils.format_file_size(sum(_file_size(file_diff) for file_diff in file_list))
+        ttk.Label(summary_frame, text=f"{len(file_list)} 个文件与云端相同（共 {total_size}），无需上传",
+                 font=("Arial", 10)).pack(pady=(0, 10))
         
-        # 布局
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        def show_list():
+            summary_frame.destroy()
+            VirtualFileList(tab_frame, file_list).pack(fill=tk.BOTH, expand=True)
         
+        ttk.Button(summary_frame, text="显示文件列表", command=show_list).pack()
         return tab_frame
     
     def get_status_text(self, change_type: ChangeType) -> str:
         """获取状态文本"""
-        status_map = {
-            ChangeType.NEW: "新增",
-            ChangeType.MODIFIED: "修改",
-            ChangeType.DELETED: "删除",
-            ChangeType.SAME: "相同"
-        }
-        return status_map.get(change_type, "未知")
+        return STATUS_TEXT.get(change_type, "未知")
     
     def create_buttons_section(self, parent):
         """创建按钮区域"""
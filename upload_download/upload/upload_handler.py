@@ -11,7 +11,7 @@ import threading
 import tempfile
 import zipfile
 from pathlib import Path
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, List, Optional, Callable, Any, Tuple
 from datetime import datetime
 
 import sys
@@ -22,6 +22,23 @@ from tools.common.common_utils import (
     get_server_url, get_api_key, FileUtils, LogManager,
     APIEndpoints, AppConstants, ValidationUtils
 )
+from tools.common.chunked_upload import ChunkedUploader, ChunkedUploadUnsupported
+from tools.common.instrumentation import get_instrumentation
+from tools.common.progress import CoalescingCallback
+from tools.common.rate_limiter import MultipartBody, TransferThrottle, get_rate_limiter
+from tools.common.transfer_control import TransferControl
+from tools.common.transfer_scheduler import schedule
+
+
+def _scheduled_path(item: Tuple[Path, Path]) -> str:
+    return item[1].as_posix()
+
+
+def _scheduled_size(item: Tuple[Path, Path]) -> int:
+    try:
+        return item[0].stat().st_size
+    except OSError:
+        return 0
 
 
 class FolderAnalyzer:
@@ -108,11 +125,26 @@ class FileUploader:
         """
         self.log_manager = log_manager
         self.progress_callback = progress_callback
-        self.is_cancelled = False
+        self.control = TransferControl()
+        self.throttle: Optional[TransferThrottle] = None
+        # 大文件分块上传，中断后从已确认的分块续传
+        self.chunked_uploader = ChunkedUploader(get_server_url(), get_api_key())
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.control.is_cancelled
+
+    def pause_upload(self):
+        """暂停上传"""
+        self.control.pause()
+
+    def resume_upload(self):
+        """恢复上传"""
+        self.control.resume()
 
     def cancel_upload(self):
         """取消上传"""
-        self.is_cancelled = True
+        self.control.cancel()
 
     def upload_folder(self, folder_path: str, upload_config: Dict[str, Any]) -> bool:
         """
@@ -127,6 +159,7 @@ class FileUploader:
         """
         try:
             folder_path_obj = Path(folder_path)
+            self.throttle = get_rate_limiter().open_transfer()
 
             # 收集所有文件
             all_files = []
@@ -135,6 +168,8 @@ class FileUploader:
                     file_path = Path(root) / file
                     relative_path = file_path.relative_to(folder_path)
                     all_files.append((file_path, relative_path))
+            # 可执行文件和配置文件优先，同类按大小降序
+            all_files = schedule(all_files, _scheduled_path, _scheduled_size)
 
             total_files = len(all_files)
             uploaded_files = 0
@@ -143,15 +178,18 @@ class FileUploader:
             if self.log_manager:
                 self.log_manager.log_info(f"找到 {total_files} 个文件")
 
+            # 小文件很多时逐文件回调过于频繁，按间隔合并
+            report_progress = CoalescingCallback(self.progress_callback)
+
             for i, (file_path, relative_path) in enumerate(all_files):
-                if self.is_cancelled:
+                # 暂停时阻塞，取消时结束
+                if not self.control.checkpoint():
                     break
 
                 try:
                     # 更新进度
                     progress = (i / total_files) * 100
-                    if self.progress_callback:
-                        self.progress_callback(progress, f"上传: {relative_path}")
+                    report_progress(progress, f"上传: {relative_path}")
 
                     # 上传单个文件
                     success = self._upload_single_file(file_path, relative_path, upload_config)
@@ -170,6 +208,8 @@ class FileUploader:
                     if self.log_manager:
                         self.log_manager.log_error(f"上传异常 {relative_path}: {e}")
 
+            report_progress.flush()
+
             # 返回结果
             success_rate = uploaded_files / total_files if total_files > 0 else 0
             return success_rate > 0.8  # 80%以上成功率认为成功
@@ -182,18 +222,21 @@ class FileUploader:
     def _upload_single_file(self, file_path: Path, relative_path: Path,
                            upload_config: Dict[str, Any]) -> bool:
         """上传单个文件"""
+        metrics = get_instrumentation()
         try:
+            file_size = file_path.stat().st_size
+
             # 计算文件哈希
-            sha256_hash = hashlib.sha256()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b""):
-                    sha256_hash.update(chunk)
+            with metrics.phase("hash", files=1, bytes=file_size):
+                sha256_hash = hashlib.sha256()
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(8192), b""):
+                        sha256_hash.update(chunk)
 
             file_hash = sha256_hash.hexdigest()
 
             # 准备上传数据
             with open(file_path, 'rb') as f:
-                files = {'file': (file_path.name, f, 'application/octet-stream')}
                 data = {
                     'version': upload_config['version'],
                     'platform': upload_config['platform'],
@@ -211,13 +254,19 @@ class FileUploader:
                 if upload_config['package_type'] == "patch" and upload_config.get('from_version'):
                     data['from_version'] = upload_config['from_version']
 
-                # 发送请求
-                response = requests.post(
-                    f"{get_server_url()}{APIEndpoints.UPLOAD_FILE}",
-                    files=files,
-                    data=data,
-                    timeout=AppConstants.REQUEST_TIMEOUT * 3
-                )
+                body = MultipartBody(data, 'file', file_path.name, f, file_size,
+                                     self.throttle, self.control)
+
+                # 发送请求（文件按块读取并限速）
+                with metrics.phase("upload", files=1, bytes=file_size, requests=1) as timer:
+                    response = requests.post(
+                        f"{get_server_url()}{APIEndpoints.UPLOAD_FILE}",
+                        data=body,
+                        headers={'Content-Type': body.content_type},
+                        timeout=AppConstants.REQUEST_TIMEOUT * 3
+                    )
+                    if response.status_code != 200:
+                        timer.add(errors=1)
 
                 return response.status_code == 200
 
@@ -383,6 +432,14 @@ class UploadHandler:
 
         return self.file_uploader.upload_folder(config['folder_path'], config)
 
+    def pause_upload(self):
+        """暂停上传"""
+        self.file_uploader.pause_upload()
+
+    def resume_upload(self):
+        """恢复上传"""
+        self.file_uploader.resume_upload()
+
     def cancel_upload(self):
         """取消上传"""
         self.file_uploader.cancel_upload()
@@ -435,6 +492,7 @@ class UploadHandler:
                     file_path = Path(root) / file
                     relative_path = file_path.relative_to(folder_path_obj)
                     all_files.append((file_path, relative_path))
+            all_files = schedule(all_files, _scheduled_path, _scheduled_size)
 
             total_files = len(all_files)
             if total_files == 0:
@@ -445,20 +503,22 @@ class UploadHandler:
             if self.log_manager:
                 self.log_manager.log_info(f"开始直接上传 {total_files} 个文件")
 
+            self.file_uploader.throttle = get_rate_limiter().open_transfer()
+
             uploaded_files = 0
             failed_files = 0
+            report_progress = CoalescingCallback(progress_callback)
 
             for i, (file_path, relative_path) in enumerate(all_files):
-                if self.file_uploader.is_cancelled:
+                if not self.file_uploader.control.checkpoint():
                     if self.log_manager:
                         self.log_manager.log_info("上传被用户取消")
                     break
 
                 try:
-                    # 更新进度
+                    # 更新进度（按间隔合并）
                     progress = (i / total_files) * 100
-                    if progress_callback:
-                        progress_callback(progress, f"上传: {relative_path}")
+                    report_progress(progress, f"上传: {relative_path}")
 
                     # 上传单个文件到简化API
                     success = self._upload_single_file_to_simplified_api(
@@ -480,6 +540,7 @@ class UploadHandler:
                         self.log_manager.log_error(f"上传异常 {relative_path}: {e}")
 
             # 最终进度更新
+            report_progress.flush()
             if progress_callback:
                 progress_callback(100, f"完成: {uploaded_files}/{total_files} 个文件")
 
@@ -498,17 +559,36 @@ class UploadHandler:
     def _upload_single_file_to_simplified_api(self, file_path: Path, relative_path: Path,
                                             upload_config: Dict[str, Any]) -> bool:
         """上传单个文件到简化API"""
+        metrics = get_instrumentation()
         try:
+            file_size = file_path.stat().st_size
+
             # 计算文件哈希
-            sha256_hash = hashlib.sha256()
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(8192), b""):
-                    sha256_hash.update(chunk)
+            with metrics.phase("hash", files=1, bytes=file_size):
+                sha256_hash = hashlib.sha256()
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(8192), b""):
+                        sha256_hash.update(chunk)
             file_hash = sha256_hash.hexdigest()
 
+            # 大文件分块上传，服务器不支持时改用单请求上传
+            chunked_uploader = self.file_uploader.chunked_uploader
+            if chunked_uploader.accepts(file_size):
+                try:
+                    # 分块请求数和重试次数由 ChunkedUploader 计入
+                    with metrics.phase("upload", files=1, bytes=file_size):
+                        return chunked_uploader.upload_file(
+                            file_path, str(relative_path).replace('\\', '/'),
+                            upload_config['version_type'], upload_config['platform'],
+                            upload_config['architecture'], file_hash, upload_config['description'],
+                            self.file_uploader.throttle, self.file_uploader.control
+                        )
+                except ChunkedUploadUnsupported:
+                    if self.log_manager:
+                        self.log_manager.log_warning("服务器不支持分块上传，改用单请求上传")
+
             # 准备上传数据
             with open(file_path, 'rb') as f:
-                files = {'file': (file_path.name, f, 'application/octet-stream')}
                 data = {
                     'version_type': upload_config['version_type'],
                     'platform': upload_config['platform'],
@@ -518,14 +598,19 @@ class UploadHandler:
                     'api_key': get_api_key(),
                     'file_hash': file_hash
                 }
-
-                # 发送请求到简化API
-                response = requests.post(
-                    f"{get_server_url()}/api/v2/upload/simple/file",
-                    files=files,
-                    data=data,
-                    timeout=AppConstants.REQUEST_TIMEOUT * 3
-                )
+                body = MultipartBody(data, 'file', file_path.name, f, file_size,
+                                     self.file_uploader.throttle, self.file_uploader.control)
+
+                # 发送请求到简化API（文件按块读取并限速）
+                with metrics.phase("upload", files=1, bytes=file_size, requests=1) as timer:
+                    response = requests.post(
+                        f"{get_server_url()}/api/v2/upload/simple/file",
+                        data=body,
+                        headers={'Content-Type': body.content_type},
+                        timeout=AppConstants.REQUEST_TIMEOUT * 3
+                    )
+                    if response.status_code != 200:
+                        timer.add(errors=1)
 
                 return response.status_code == 200
 
@@ -10,15 +10,18 @@ import sys
 import threading
 import json
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any
 
 # 添加项目路径
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from tools.common.common_utils import get_config, get_server_url, get_api_key, LogManager
+from tools.common.common_utils import get_config, get_server_url, get_api_key, FileUtils, LogManager
+from tools.common.transfer_control import TransferControl
+from tools.common.ui_factory import UIDispatcher
 from tools.upload.upload_handler import UploadHandler
-from tools.upload.incremental_uploader import IncrementalUploader
+from tools.upload.incremental_uploader import DifferenceReport, IncrementalUploader, ScanProgress
 from tools.upload.difference_viewer import show_difference_report
 
 
@@ -51,6 +54,15 @@ class SimplifiedUploadTool:
         self.incremental_uploader = IncrementalUploader()
         self.log_manager = LogManager()
 
+        # 后台线程的界面更新统一经调度器按固定间隔执行
+        self.ui = UIDispatcher(self.root)
+
+        # 差异分析在后台线程中进行
+        self._analysis_executor = ThreadPoolExecutor(max_workers=1)
+        self._analysis: Optional[Future] = None
+        self._analysis_control: Optional[TransferControl] = None
+        self._analysis_done: Optional[Callable[[DifferenceReport], None]] = None
+
         # 创建界面
         self.create_widgets()
 
@@ -251,31 +263,94 @@ class SimplifiedUploadTool:
         platform = self.platform_var.get()
         architecture = self.architecture_var.get()
 
-        try:
-            # 显示分析进度
-            self.progress_var.set("正在分析文件差异...")
-            self.progress_bar.config(mode='indeterminate')
-            self.progress_bar.start()
-            self.root.update()
-
-            # 分析差异
-            report = self.incremental_uploader.analyze_folder_differences(
-                folder_path, version_type, platform, architecture
-            )
+        self._start_analysis(folder_path, version_type, platform, architecture,
+                             lambda report: show_difference_report(self.root, report))
+
+    def _start_analysis(self, folder_path: str, version_type: str, platform: str, architecture: str,
+                        on_done: Callable[[DifferenceReport], None]):
+        """
+        在后台线程中分析差异，完成后在界面线程中调用 on_done
+
+        Args:
+            folder_path: 文件夹路径
+            version_type: 版本类型
+            platform: 平台
+            architecture: 架构
+            on_done: 分析完成后的回调函数，接收差异报告
+        """
+        if self._analysis is not None:
+            return
+
+        control = TransferControl()
+        self._analysis_control = control
+        self._analysis_done = on_done
+
+        def report_progress(progress: ScanProgress):
+            # 只保留最新进度，由调度器在界面线程中显示
+            self.ui.post(lambda: self._show_analysis_progress(control, progress), key="analysis_progress")
 
-            # 停止进度条
-            self.progress_bar.stop()
-            self.progress_bar.config(mode='determinate', value=0)
-            self.progress_var.set("差异分析完成")
+        future = self._analysis_executor.submit(
+            self.incremental_uploader.analyze_folder_differences,
+            folder_path, version_type, platform, architecture, report_progress, control
+        )
+        self._analysis = future
+        future.add_done_callback(lambda done: self.ui.post(lambda: self._analysis_finished(done)))
 
-            # 显示差异报告
-            show_difference_report(self.root, report)
+        self.analyze_button.config(text="取消分析", command=self.cancel_analysis)
+        self.upload_button.config(state="disabled")
+        self.progress_var.set("正在获取远程文件列表...")
+        self.progress_bar.config(mode='determinate', value=0)
 
+    def _show_analysis_progress(self, control: TransferControl, progress: ScanProgress):
+        """界面线程：显示分析进度"""
+        if control is not self._analysis_control:
+            # 已取消
+            return
+        message = (f"正在分析文件差异: 已扫描 {progress.files_scanned} 个文件, "
+                   f"已计算哈希 {FileUtils.format_file_size(progress.bytes_hashed)}")
+        if progress.eta_seconds:
+            message += f", 剩余约 {progress.eta_seconds} 秒"
+        self.progress_var.set(message)
+        self.progress_bar.config(value=progress.fraction * 100)
+
+    def _analysis_finished(self, future: Future):
+        """界面线程：处理分析结果"""
+        if future is not self._analysis:
+            # 已取消
+            return
+
+        on_done = self._analysis_done
+        self._finish_analysis()
+        try:
+            report = future.result()
         except Exception as e:
-            self.progress_bar.stop()
-            self.progress_bar.config(mode='determinate', value=0)
             self.progress_var.set("差异分析失败")
             messagebox.showerror("错误", f"差异分析失败: {e}")
+            return
+        if report is None:
+            self.progress_var.set("差异分析已取消")
+            return
+
+        self.progress_var.set("差异分析完成")
+        on_done(report)
+
+    def cancel_analysis(self):
+        """取消差异分析（后台线程在当前扫描分区完成后停止，界面立即恢复）"""
+        if self._analysis is None:
+            return
+        self._analysis_control.cancel()
+        self._finish_analysis()
+        self.progress_var.set("差异分析已取消")
+
+    def _finish_analysis(self):
+        """恢复分析前的界面状态"""
+        self._analysis = None
+        self._analysis_control = None
+        self._analysis_done = None
+        self.analyze_button.config(text="分析差异", command=self.analyze_differences)
+        if not self.is_uploading:
+            self.upload_button.config(state="normal")
+        self.progress_bar.config(value=0)
 
     def preview_folder(self):
         """预览文件夹内容"""
@@ -319,11 +394,11 @@ class SimplifiedUploadTool:
             try:
                 response = requests.get(f"{self.server_url}/api/v2/status/simple", timeout=5)
                 if response.status_code == 200:
-                    self.status_var.set("服务器连接正常")
+                    self.ui.set_var(self.status_var, "服务器连接正常")
                 else:
-                    self.status_var.set("服务器连接异常")
+                    self.ui.set_var(self.status_var, "服务器连接异常")
             except:
-                self.status_var.set("无法连接到服务器")
+                self.ui.set_var(self.status_var, "无法连接到服务器")
 
         threading.Thread(target=check, daemon=True).start()
 
@@ -366,33 +441,15 @@ class SimplifiedUploadTool:
         }
 
         if self.incremental_mode_var.get():
-            # 增量上传模式：先分析差异，然后确认
-            try:
-                # 分析差异
-                self.progress_var.set("分析文件差异...")
-                self.progress_bar.config(mode='indeterminate')
-                self.progress_bar.start()
-                self.root.update()
-
-                report = self.incremental_uploader.analyze_folder_differences(
-                    folder_path, version_type, platform, architecture
-                )
-
-                self.progress_bar.stop()
-                self.progress_bar.config(mode='determinate', value=0)
-                self.progress_var.set("差异分析完成")
-
-                # 显示差异报告并获取用户确认
+            # 增量上传模式：先在后台分析差异，显示差异报告并获取用户确认后上传
+            def confirm(report: DifferenceReport):
                 if not show_difference_report(self.root, report):
                     self.progress_var.set("用户取消上传")
                     return
+                self._launch_upload(folder_path, version_type, platform, architecture, description)
 
-            except Exception as e:
-                self.progress_bar.stop()
-                self.progress_bar.config(mode='determinate', value=0)
-                self.progress_var.set("差异分析失败")
-                messagebox.showerror("错误", f"差异分析失败: {e}")
-                return
+            self._start_analysis(folder_path, version_type, platform, architecture, confirm)
+            return
         else:
             # 传统上传模式：直接确认
             confirm_msg = f"""
@@ -415,7 +472,11 @@ class SimplifiedUploadTool:
             if not messagebox.askyesno("确认上传", confirm_msg.strip()):
                 return
 
-        # 开始上传
+        self._launch_upload(folder_path, version_type, platform, architecture, description)
+
+    def _launch_upload(self, folder_path: str, version_type: str,
+                       platform: str, architecture: str, description: str):
+        """开始上传（在后台线程中执行）"""
         self.is_uploading = True
         self.upload_button.config(state="disabled")
         self.progress_var.set("准备上传...")
@@ -445,12 +506,12 @@ class SimplifiedUploadTool:
                 )
 
             if success:
-                self.root.after(0, lambda: self._upload_success())
+                self.ui.post(self._upload_success)
             else:
-                self.root.after(0, lambda: self._upload_failed("上传失败"))
+                self.ui.post(lambda: self._upload_failed("上传失败"))
 
         except Exception as e:
-            self.root.after(0, lambda: self._upload_failed(str(e)))
+            self.ui.post(lambda: self._upload_failed(str(e)))
 
     def _upload_incremental(self, folder_path: str, version_type: str,
                            platform: str, architecture: str, description: str) -> bool:
@@ -458,8 +519,7 @@ class SimplifiedUploadTool:
         try:
             # 准备进度回调
             def progress_callback(progress, message):
-                self.root.after(0, lambda: self.progress_var.set(message))
-                self.root.after(0, lambda: self.progress_bar.config(value=progress))
+                self.ui.post(lambda: self._show_progress(progress, message), key="upload_progress")
 
             # 执行增量上传
             success = self.incremental_uploader.perform_incremental_upload(
@@ -492,18 +552,17 @@ class SimplifiedUploadTool:
 
             # 使用UploadHandler的直接上传功能
             def progress_callback(progress, message):
-                self.root.after(0, lambda: self.progress_var.set(message))
-                self.root.after(0, lambda: self.progress_bar.config(value=progress))
+                self.ui.post(lambda: self._show_progress(progress, message), key="upload_progress")
 
-            self.root.after(0, lambda: self.progress_var.set("开始上传文件..."))
-            self.root.after(0, lambda: self.progress_bar.config(value=0))
+            self.ui.set_var(self.progress_var, "开始上传文件...")
+            self.ui.configure(self.progress_bar, value=0)
 
             # 直接上传文件夹
             success = self.upload_handler.upload_folder_directly(
                 folder_path, upload_config, progress_callback
             )
 
-            self.root.after(0, lambda: self.progress_bar.config(value=100))
+            self.ui.configure(self.progress_bar, value=100)
 
             return success
 
@@ -511,6 +570,11 @@ class SimplifiedUploadTool:
             print(f"上传异常: {e}")
             return False
 
+    def _show_progress(self, progress: float, message: str):
+        """在界面线程中更新进度文字和进度条"""
+        self.progress_var.set(message)
+        self.progress_bar.config(value=progress)
+
     def _upload_success(self):
         """上传成功回调"""
         self.progress_var.set("上传完成！")
@@ -530,6 +594,9 @@ class SimplifiedUploadTool:
 
     def cancel_upload(self):
         """取消上传"""
+        if self._analysis is not None:
+            self.cancel_analysis()
+            return
         if self.is_uploading:
             # 这里可以添加取消上传的逻辑
             pass